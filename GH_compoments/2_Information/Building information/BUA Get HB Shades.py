@@ -29,14 +29,20 @@ if rhino_version > 7:
 
 import ghpythonlib.treehelpers as th
 
-import json
 import os
+import sys
 
 from honeybee.shade import Shade
 
+
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 
 # set default value for the simulation folder if not provided
 if path_simulation_folder_ is None:
@@ -47,14 +53,13 @@ path_json = os.path.join(path_simulation_folder_, "urban_canopy.json")
 if _run and os.path.isfile(path_json):
 
     path_json = os.path.join(path_simulation_folder_, "urban_canopy.json")
-    with open(path_json, "r") as f:
-        urban_canopy_dict = json.load(f)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
     # Get the list of the building ids to display
     if _building_id_list_ == [] or _building_id_list_ is None:
         _building_id_list_ = []
         # add the id of the target building
         for building_id in list(urban_canopy_dict["buildings"].keys()):
-            if urban_canopy_dict["buildings"][building_id]["type"] == "BuildingModeled":
+            if urban_canopy_dict["buildings"].get_manifest_entry(building_id)["type"] == "BuildingModeled":
                 _building_id_list_.append(building_id)
     else:  # Check if the building ids are in the json file
         for building_id in _building_id_list_:
@@ -63,7 +68,7 @@ if _run and os.path.isfile(path_json):
             except KeyError:
                 raise KeyError("Building with ID '{}' not found in the dictionary.".format(building_id))
             else:
-                if not urban_canopy_dict["buildings"][building_id]["type"] == "BuildingModeled":
+                if not urban_canopy_dict["buildings"].get_manifest_entry(building_id)["type"] == "BuildingModeled":
                     raise ValueError(
                         "Building with ID {} does not have a HB model and thus not shades".format(
                             building_id))
@@ -30,8 +30,8 @@ if rhino_version > 7:
     c = ghlib.component._get_active_component()
     c.ToggleObsolete(False)
 
-import json
 import os
+import sys
 
 from honeybee.room import Room
 
@@ -46,6 +46,11 @@ def clean_path(path):
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 
 # set default value for the simulation folder if not provided
 if path_simulation_folder_ is None:
@@ -55,8 +60,7 @@ path_json = os.path.join(path_simulation_folder_, "urban_canopy.json")
 
 if _run and os.path.isfile(path_json):
 
-    with open(path_json, "r") as f:
-        urban_canopy_dict = json.load(f)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
 
     # Get the list of the building ids to display
     if building_id_list_ == [] or building_id_list_ is None:
@@ -75,8 +79,8 @@ if _run and os.path.isfile(path_json):
 
     # Get the list of the target, simulated and context buildings
     for building_id in building_id_list_:
-        if urban_canopy_dict["buildings"][building_id]["type"] == "BuildingModeled":
-            if urban_canopy_dict["buildings"][building_id]["is_target_building"] == True:
+        if urban_canopy_dict["buildings"].get_manifest_entry(building_id)["type"] == "BuildingModeled":
+            if urban_canopy_dict["buildings"].get_manifest_entry(building_id)["is_target_building"] == True:
                 target_building_modeled_id_list.append(building_id)
             else :
                 non_target_building_modeled_id_list.append(building_id)
@@ -27,8 +27,8 @@ if rhino_version > 7:
     c = ghlib.component._get_active_component()
     c.ToggleObsolete(False)
 
-import json
 import os
+import sys
 
 from ladybug_rhino.fromgeometry import from_polyface3d
 from ladybug_geometry.geometry3d.polyface import Polyface3D
@@ -42,6 +42,11 @@ def clean_path(path):
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 
 # set default value for the simulation folder if not provided
 if path_simulation_folder_ is None:
@@ -53,8 +58,7 @@ path_json = os.path.join(path_simulation_folder_, "urban_canopy.json")
 if _run and os.path.isfile(path_json):
 
     # Read the json file
-    with open(path_json, 'r') as json_file:
-        urban_canopy_dict = json.load(json_file)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
 
     # Get the list of the building ids to display
     if _building_id_list == [] or _building_id_list is None:
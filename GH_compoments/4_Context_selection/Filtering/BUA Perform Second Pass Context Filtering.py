@@ -41,6 +41,7 @@ if rhino_version > 7:
 
 import os
 import json
+import sys
 
 
 def clean_path(path):
@@ -62,6 +63,11 @@ def read_logs(path_simulation_folder):
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 path_bat_file = os.path.join(path_tool, "Scripts","bua", "mains_tool", "run_BUA.bat")
 
 # Check path_simulation_folder_
@@ -84,8 +90,7 @@ if _run :
         raise ValueError("The urban canopy json file does not exist, buildings need to be loaded before running the context selection.")
 
     # Check if the building id list is not empty
-    with open(path_json, "r") as f:
-        urban_canopy_dict = json.load(f)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
     if building_id_list_ == [] or building_id_list_ is None:
         pass
     else:  # Check if the building ids are in the json file
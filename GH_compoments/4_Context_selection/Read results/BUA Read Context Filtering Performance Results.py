@@ -38,8 +38,8 @@ if rhino_version > 7:
     c = ghlib.component._get_active_component()
     c.ToggleObsolete(False)
 
-import json
 import os
+import sys
 
 import ghpythonlib.treehelpers as th
 from ladybug_rhino.fromgeometry import from_face3d
@@ -56,6 +56,11 @@ def clean_path(path):
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 
 # set default value for the simulation folder if not provided
 if path_simulation_folder_ is None:
@@ -67,14 +72,13 @@ path_json = os.path.join(path_simulation_folder_, "urban_canopy.json")
 if _run and os.path.isfile(path_json):
 
     # Read the json file
-    with open(path_json, 'r') as json_file:
-        urban_canopy_dict = json.load(json_file)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
 
     # Get the list of the building ids to display
     if building_id_list_ == [] or building_id_list_ is None:
         # add the id of the buildings that have been run if no list is provided
         building_id_list_ = [building_id for building_id in urban_canopy_dict["buildings"].keys() if
-                             (urban_canopy_dict["buildings"][building_id]["type"] == "BuildingModeled" and
+                             (urban_canopy_dict["buildings"].get_manifest_entry(building_id)["type"] == "BuildingModeled" and
                               urban_canopy_dict["buildings"][building_id]["context_surfaces"]["first_pass_done"])]
 
     else:  # Check if the building ids are in the json file
@@ -84,7 +88,7 @@ if _run and os.path.isfile(path_json):
             except KeyError:
                 raise KeyError("Building with ID '{}' not found in the dictionary.".format(building_id))
             else:
-                if not urban_canopy_dict["buildings"][building_id]["type"] == "BuildingModeled":
+                if not urban_canopy_dict["buildings"].get_manifest_entry(building_id)["type"] == "BuildingModeled":
                     raise ValueError(
                         "Building with ID {} does not have a HB model, a context filtering cannot be performed on it".format(
                             building_id))
@@ -26,8 +26,9 @@ if rhino_version > 7:
     c = ghlib.component._get_active_component()
     c.ToggleObsolete(False)
 
-import json
 import os
+import sys
+
 
 def clean_path(path):
     path = path.replace("\\", "/")
@@ -55,6 +56,11 @@ def extract_sorted_bes_keys(dictionary):
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 
 # set default value for the simulation folder if not provided
 if path_simulation_folder_ is None:
@@ -70,8 +76,7 @@ if _run:
             "The json file of the urban canopy does not exist, it means that the simulation was not run.")
 
     # Read the json file
-    with open(path_json, 'r') as json_file:
-        urban_canopy_dict = json.load(json_file)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
 
     # Check that the UBES was run
     if not urban_canopy_dict["ubes"]["has_run"]:
@@ -30,8 +30,8 @@ if rhino_version > 7:
 
 import ghpythonlib.treehelpers as th
 
-import json
 import os
+import sys
 
 
 def clean_path(path):
@@ -42,6 +42,11 @@ def clean_path(path):
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 
 # Check path_simulation_folder_
 if path_simulation_folder_ is None:
@@ -64,14 +69,13 @@ if _run:
         raise ValueError(
             "The urban canopy json file does not exist, buildings need to be loaded before running the context selection.")
     # Read the json file
-    with open(path_json, 'r') as json_file:
-        urban_canopy_dict = json.load(json_file)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
 
     # Get the list of the building ids to display
     if building_id_list_ == [] or building_id_list_ is None:
         # add the id of the buildings that have been run if no list is provided
         building_id_list_ = [building_id for building_id in urban_canopy_dict["buildings"].keys() if
-                             (urban_canopy_dict["buildings"][building_id]["type"] == "BuildingModeled" and
+                             (urban_canopy_dict["buildings"].get_manifest_entry(building_id)["type"] == "BuildingModeled" and
                               (urban_canopy_dict["buildings"][building_id]["solar_radiation_and_bipv"]["roof_annual_panel_irradiance_list"] is not None
                               or urban_canopy_dict["buildings"][building_id]["solar_radiation_and_bipv"]["facades_annual_panel_irradiance_list"] is not None))]
 
@@ -82,7 +86,7 @@ if _run:
             except KeyError:
                 raise KeyError("Building with ID '{}' not found in the dictionary.".format(building_id))
             else:
-                if not urban_canopy_dict["buildings"][building_id]["type"] == "BuildingModeled":
+                if not urban_canopy_dict["buildings"].get_manifest_entry(building_id)["type"] == "BuildingModeled":
                     raise ValueError(
                         "Building with ID {} does not have a HB model, no radiation simulation could have been performed on it".format(
                             building_id))
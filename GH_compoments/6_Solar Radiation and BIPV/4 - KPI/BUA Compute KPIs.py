@@ -32,6 +32,7 @@ if rhino_version > 7:
 
 import os
 import json
+import sys
 
 
 def clean_path(path):
@@ -53,6 +54,11 @@ def read_logs(path_simulation_folder):
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 path_bat_file = os.path.join(path_tool, "Scripts","bua", "mains_tool", "run_BUA.bat")
 
 
@@ -95,8 +101,7 @@ if _bipv_simulation_identifier_ is not None:
     # Path to the urban canopy json file
     path_uc_json = os.path.join(path_simulation_folder, "urban_canopy.json")
     if os.path.isfile(path_uc_json):
-        with open(path_uc_json, 'r') as json_file:
-            urban_canopy_dict = json.load(json_file)
+        urban_canopy_dict = load_urban_canopy_json(path_uc_json)
         if _bipv_simulation_identifier_ not in urban_canopy_dict["bipv_scenarios"].keys():
             raise ValueError(
                 "The simulation identifier is not valid, please check the identifier of the bipv simulation"
@@ -113,8 +118,7 @@ if zone_area_ is not None:
 if _bipv_simulation_identifier_ is not None:
     if not os.path.isfile(path_json):
         raise ValueError("The urban canopy json file does not exist, buildings need to be loaded before running the context selection.")
-    with open(path_uc_json, 'r') as json_file:
-        urban_canopy_dict = json.load(json_file)
+    urban_canopy_dict = load_urban_canopy_json(path_uc_json)
     if _bipv_simulation_identifier_ not in urban_canopy_dict["bipv_scenarios"].keys():
         raise ValueError(
             "The simulation identifier is not valid, please check the identifier of the bipv simulation"
@@ -30,8 +30,8 @@ if rhino_version > 7:
     c = ghlib.component._get_active_component()
     c.ToggleObsolete(False)
 
-import json
 import os
+import sys
 
 
 def clean_path(path):
@@ -59,6 +59,11 @@ labels = ["eroi", "ghg emissions intensity [kgCo2eq/kWh]",
 # Get Appdata\local folder
 local_appdata = os.environ['LOCALAPPDATA']
 path_tool = os.path.join(local_appdata, "Building_urban_analysis")
+# The reader of the json files is imported from the scripts of the tool
+path_bua_scripts = os.path.join(path_tool, "Scripts")
+if path_bua_scripts not in sys.path:
+    sys.path.append(path_bua_scripts)
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
 path_bat_file = os.path.join(path_tool, "Scripts","bua", "mains_tool", "run_BUA.bat")
 
 
@@ -75,8 +80,7 @@ path_json = os.path.join(path_simulation_folder_, "urban_canopy.json")
 if _bipv_simulation_identifier_ is not None:
     if not os.path.isfile(path_json):
         raise ValueError("The urban canopy json file does not exist, buildings need to be loaded before running the context selection.")
-    with open(path_json, 'r') as json_file:
-        urban_canopy_dict = json.load(json_file)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
     if _bipv_simulation_identifier_ not in urban_canopy_dict["bipv_scenarios"].keys():
         raise ValueError(
             "The simulation identifier is not valid, please check the identifier of the bipv simulation"
@@ -90,8 +94,7 @@ if _run:
             "The json file of the urban canopy does not exist, it means that the simulation was not run.")
 
     # Read the json file
-    with open(path_json, 'r') as json_file:
-        urban_canopy_dict = json.load(json_file)
+    urban_canopy_dict = load_urban_canopy_json(path_json)
 
     # check if the BIPV simulation identifier is valid
     if urban_canopy_dict["bipv_scenarios"] == {}:
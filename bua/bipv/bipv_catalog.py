@@ -0,0 +1,184 @@
+"""
+Catalog of the BIPV technologies, transportations and inverters of the json libraries.
+The json files are parsed once, the catalog only parses them again when a file was added or removed, or when the
+content of a file changed. The modification time and size of the files are checked first, a file is hashed only if
+one of them changed.
+The objects of the catalog are sent to and from the worker processes as light references, the kind and identifier of
+the object and the version of the catalog, resolved by the catalog of the receiving process. The panels, fleets and
+BIPV parameters exchanged with the workers thus do not each carry a copy of the objects, and the results sent back to
+the main process point to the objects of its catalog. The references are only used by the pickler of multiprocessing,
+the pickle files of the urban canopy still contain the objects themselves.
+"""
+
+import os
+import pickle
+import hashlib
+import logging
+
+from multiprocessing.reduction import ForkingPickler
+
+from bua.bipv.bipv_technology import BipvTechnology
+from bua.bipv.bipv_transportation import BipvTransportation
+from bua.bipv.bipv_inverter import BipvInverter
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+bipv_obj_kind_list = ["technology", "transportation", "inverter"]
+
+
+class BipvObjReference:
+    """
+    Light reference to a BIPV object of a catalog
+    """
+
+    def __init__(self, kind, identifier, catalog_version, path_folder_list):
+        """
+        :param kind: str, kind of the object, "technology", "transportation" or "inverter"
+        :param identifier: str, identifier of the object
+        :param catalog_version: str, version of the catalog the object belongs to
+        :param path_folder_list: list of str, folders of the catalog, to load them if the catalog of the process
+            resolving the reference is not loaded
+        """
+        self.kind = kind
+        self.identifier = identifier
+        self.catalog_version = catalog_version
+        self.path_folder_list = path_folder_list
+
+    def __repr__(self):
+        return f"BipvObjReference({self.kind}, {self.identifier})"
+
+    def resolve(self):
+        """
+        Get the object of the reference from the catalog of the process
+        :return: BipvTechnology, BipvTransportation or BipvInverter object
+        """
+        return bipv_catalog.resolve_reference(self)
+
+
+class BipvCatalog:
+    """
+    Catalog of the BIPV technologies, transportations and inverters of a list of json library folders.
+    The dictionaries of the catalog are shared by all its users and should not be modified.
+    """
+
+    def __init__(self):
+        self.path_folder_list = []
+        # (modification time, size, sha256 hash) by path of the json files of the folders
+        self.json_file_signature_dict = {}
+        self.version = None
+        self.bipv_obj_dict = {kind: {} for kind in bipv_obj_kind_list}
+        # Reference of each object of the catalog, by id of the object
+        self.reference_dict = {}
+        # Statistics
+        self.load_count = 0
+
+    def load(self, path_folder_list):
+        """
+        Load the BIPV objects of the json files of the folders, parsing the files again only if they changed since the
+        last call
+        :param path_folder_list: list of str, paths to the folders of the json files, the objects of a folder cannot
+            have the same identifier as the objects of the previous folders
+        :return bipv_technology_obj_dict: dict, BipvTechnology objects by identifier
+        :return bipv_transportation_obj_dict: dict, BipvTransportation objects by identifier
+        :return bipv_inverter_obj_dict: dict, BipvInverter objects by identifier
+        """
+        path_folder_list = [str(path_folder) for path_folder in path_folder_list]
+        json_file_signature_dict = {}
+        for path_folder in path_folder_list:
+            for json_file in os.listdir(path_folder):
+                if not json_file.endswith(".json"):
+                    continue
+                path_json_file = os.path.join(path_folder, json_file)
+                file_stat = os.stat(path_json_file)
+                signature = self.json_file_signature_dict.get(path_json_file)
+                if signature is None or signature[:2] != (file_stat.st_mtime_ns, file_stat.st_size):
+                    with open(path_json_file, "rb") as json_file_obj:
+                        signature = (file_stat.st_mtime_ns, file_stat.st_size,
+                                     hashlib.sha256(json_file_obj.read()).hexdigest())
+                json_file_signature_dict[path_json_file] = signature
+        version_hash = hashlib.sha256()
+        for path_json_file, signature in json_file_signature_dict.items():
+            version_hash.update(repr((path_json_file, signature[2])).encode("utf-8"))
+        version = version_hash.hexdigest()
+
+        if version != self.version or path_folder_list != self.path_folder_list:
+            dev_logger.info(f"Load the BIPV libraries of the folders {path_folder_list}")
+            bipv_technology_obj_dict = {}
+            bipv_transportation_obj_dict = {}
+            bipv_inverter_obj_dict = {}
+            for path_folder in path_folder_list:
+                bipv_technology_obj_dict = BipvTechnology.load_pv_technologies_from_json_to_dictionary(
+                    bipv_technology_obj_dict=bipv_technology_obj_dict, path_json_folder=path_folder)
+                bipv_transportation_obj_dict = BipvTransportation.load_bipv_transportation_obj_from_json_to_dictionary(
+                    transportation_obj_dict=bipv_transportation_obj_dict, path_json_folder=path_folder)
+                bipv_inverter_obj_dict = BipvInverter.load_bipv_inverter_obj_from_json_to_dictionary(
+                    inverter_obj_dict=bipv_inverter_obj_dict, path_json_folder=path_folder)
+            self.bipv_obj_dict = {"technology": bipv_technology_obj_dict,
+                                  "transportation": bipv_transportation_obj_dict,
+                                  "inverter": bipv_inverter_obj_dict}
+            self.version = version
+            self.path_folder_list = path_folder_list
+            self.reference_dict = {
+                id(bipv_obj): (bipv_obj, BipvObjReference(kind=kind, identifier=identifier, catalog_version=version,
+                                                          path_folder_list=path_folder_list))
+                for kind, obj_dict in self.bipv_obj_dict.items() for identifier, bipv_obj in obj_dict.items()}
+            self.load_count += 1
+        self.json_file_signature_dict = json_file_signature_dict
+
+        return (dict(self.bipv_obj_dict["technology"]), dict(self.bipv_obj_dict["transportation"]),
+                dict(self.bipv_obj_dict["inverter"]))
+
+    def get_reference(self, bipv_obj):
+        """
+        Get the reference of an object of the catalog
+        :param bipv_obj: BipvTechnology, BipvTransportation or BipvInverter object
+        :return: BipvObjReference, None if the object is not in the catalog
+        """
+        obj_and_reference = self.reference_dict.get(id(bipv_obj))
+        if obj_and_reference is None or obj_and_reference[0] is not bipv_obj:
+            return None
+        return obj_and_reference[1]
+
+    def resolve_reference(self, bipv_obj_reference):
+        """
+        Get the object of a reference, loading the folders of the reference if the catalog is not loaded
+        :param bipv_obj_reference: BipvObjReference, reference to an object of a catalog with the same json files
+        :return: BipvTechnology, BipvTransportation or BipvInverter object
+        """
+        if bipv_obj_reference.catalog_version != self.version:
+            self.load(path_folder_list=bipv_obj_reference.path_folder_list)
+            if bipv_obj_reference.catalog_version != self.version:
+                raise ValueError(f"The BIPV libraries were modified since the reference to the "
+                                 f"{bipv_obj_reference.kind} {bipv_obj_reference.identifier} was made")
+        return self.bipv_obj_dict[bipv_obj_reference.kind][bipv_obj_reference.identifier]
+
+
+# Catalog of the process
+bipv_catalog = BipvCatalog()
+
+
+def resolve_bipv_obj_reference(bipv_obj_reference):
+    """
+    Get the object of a reference from the catalog of the process, used to unpickle the references
+    :param bipv_obj_reference: BipvObjReference
+    :return: BipvTechnology, BipvTransportation or BipvInverter object
+    """
+    return bipv_catalog.resolve_reference(bipv_obj_reference)
+
+
+def reduce_bipv_obj_to_reference(bipv_obj):
+    """
+    Reduce a BIPV object to its reference in the catalog of the process for the pickler of multiprocessing, the objects
+    that are not in the catalog are pickled as usual
+    :param bipv_obj: BipvTechnology, BipvTransportation or BipvInverter object
+    :return: tuple, function and arguments to rebuild the object
+    """
+    bipv_obj_reference = bipv_catalog.get_reference(bipv_obj)
+    if bipv_obj_reference is None:
+        return bipv_obj.__reduce_ex__(pickle.DEFAULT_PROTOCOL)
+    return resolve_bipv_obj_reference, (bipv_obj_reference,)
+
+
+for bipv_class in [BipvTechnology, BipvTransportation, BipvInverter]:
+    ForkingPickler.register(bipv_class, reduce_bipv_obj_to_reference)
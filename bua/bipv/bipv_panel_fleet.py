@@ -0,0 +1,146 @@
+"""
+Panel fleet class, modeling all the solar panels of a roof or of the facades of a building with arrays, to track the
+age and energy production of the panels
+"""
+
+import numpy as np
+
+from bua.bipv.bipv_technology import BipvTechnology
+
+# Value of the age and life expectancy of the panels that are not working
+not_working_value = -1
+
+
+class BipvPanelFleet:
+    """
+    Solar panels installed on the faces of a sensor grid, one panel per face.
+    The panels are stored as arrays, the panel i being installed on the face index_array[i] of the sensor grid, with
+    the technology technology_obj_list[technology_index_array[i]].
+    """
+
+    def __init__(self, index_list, pv_technology_obj: BipvTechnology):
+        """
+        Initialize the panels, not working until they are initialized
+        :param index_list: list of int, index of the faces of the sensor grid the panels are installed on
+        :param pv_technology_obj: BipvTechnology object of the panels
+        """
+        self.index_array = np.array(index_list, dtype=int)
+        self.technology_obj_list = [pv_technology_obj]
+        self.technology_index_array = np.zeros(len(self.index_array), dtype=int)
+        self.age_array = np.full(len(self.index_array), not_working_value, dtype=int)
+        self.life_expectancy_array = np.full(len(self.index_array), not_working_value, dtype=int)
+
+    @classmethod
+    def from_bipv_panel_list(cls, bipv_panel_list, pv_technology_obj=None):
+        """
+        Make a fleet from a list of BipvPanel objects, as stored by older versions of the simulation
+        :param bipv_panel_list: list of BipvPanel objects
+        :param pv_technology_obj: BipvTechnology object of the fleet if the list is empty
+        :return: BipvPanelFleet object
+        """
+        if bipv_panel_list:
+            pv_technology_obj = bipv_panel_list[0].panel_technology_object
+        panel_fleet = cls(index_list=[panel.index for panel in bipv_panel_list], pv_technology_obj=pv_technology_obj)
+        for panel_index, panel in enumerate(bipv_panel_list):
+            panel_fleet.technology_index_array[panel_index] = panel_fleet.get_technology_index(
+                panel.panel_technology_object)
+            if panel.is_panel_working():
+                panel_fleet.age_array[panel_index] = panel.age
+                panel_fleet.life_expectancy_array[panel_index] = panel.life_expectancy
+
+        return panel_fleet
+
+    def __len__(self):
+        return len(self.index_array)
+
+    def get_working_mask(self):
+        """
+        Get the panels that are working, a panel is working if it has been switched on and has not failed yet
+        :return: boolean numpy array, True if the panel is working
+        """
+        return self.life_expectancy_array != not_working_value
+
+    def get_technology_index(self, pv_tech_obj):
+        """
+        Get the index of a technology in the technology list, adding it if needed
+        :param pv_tech_obj: BipvTechnology object
+        :return: int, index of the technology
+        """
+        for technology_index, technology_obj in enumerate(self.technology_obj_list):
+            if technology_obj is pv_tech_obj:
+                return technology_index
+        self.technology_obj_list.append(pv_tech_obj)
+        return len(self.technology_obj_list) - 1
+
+    def initialize_or_replace_panels(self, panel_mask=None, pv_tech_obj=None, random_generator=None):
+        """
+        Initialize the panels or replace them with new ones, with a life expectancy drawn from the Weibull law of
+        their technology
+        :param panel_mask: boolean numpy array, panels to initialize or replace, all the panels if None
+        :param pv_tech_obj: BipvTechnology object of the new panels, the technology of the previous panels if None
+        :param random_generator: numpy random Generator used to draw the life expectancies, the global numpy random
+            state if None
+        :return: int, number of panels initialized or replaced
+        """
+        panel_index_array = np.arange(len(self)) if panel_mask is None else np.flatnonzero(panel_mask)
+        if pv_tech_obj is not None:
+            self.technology_index_array[panel_index_array] = self.get_technology_index(pv_tech_obj)
+        # Draw the life expectancy of the panels of each technology in one go
+        for technology_index, technology_obj in enumerate(self.technology_obj_list):
+            technology_panel_index_array = panel_index_array[
+                self.technology_index_array[panel_index_array] == technology_index]
+            self.life_expectancy_array[technology_panel_index_array] = technology_obj.get_life_expectancy_of_panels(
+                number_of_panels=len(technology_panel_index_array), random_generator=random_generator)
+        # put back the age to 0
+        self.age_array[panel_index_array] = 0
+
+        return len(panel_index_array)
+
+    def increment_age_by_one_year(self):
+        """
+        Simulate a year passing for the panels, making them fail when they reach their life expectancy
+        """
+        working_mask = self.get_working_mask()
+        self.age_array[working_mask] += 1
+        failed_mask = working_mask & (self.age_array == self.life_expectancy_array)
+        self.age_array[failed_mask] = not_working_value
+        self.life_expectancy_array[failed_mask] = not_working_value
+
+    def get_power_factor_and_max_irradiance_arrays(self, number_of_faces, **kwargs):
+        """
+        Get for every face of the sensor grid the power generated per unit of irradiance by its panel, and the
+        irradiance above which the panel generates its maximum power output. The faces without a working panel
+        have a power factor of 0 and a maximum irradiance of infinity.
+        :param number_of_faces: int, number of faces of the sensor grid
+        :param kwargs: kwargs passed to the efficiency function of the panels
+        :return power_factor_array: numpy array of the power in W per W/m2 of irradiance of each face
+        :return max_irradiance_array: numpy array of the maximum irradiance in W/m2 of each face
+        """
+        power_factor_array = np.zeros(number_of_faces)
+        max_irradiance_array = np.full(number_of_faces, np.inf)
+        working_mask = self.get_working_mask()
+        # The efficiency of all the panels of a technology is computed at once from their age
+        for technology_index, pv_tech_obj in enumerate(self.technology_obj_list):
+            technology_mask = working_mask & (self.technology_index_array == technology_index)
+            if not technology_mask.any():
+                continue
+            efficiency_array = pv_tech_obj.get_efficiency_of_age_array(age_array=self.age_array[technology_mask],
+                                                                       **kwargs)
+            face_index_array = self.index_array[technology_mask]
+            power_factor_array[face_index_array] = \
+                efficiency_array * pv_tech_obj.panel_area * pv_tech_obj.infrastructure_performance_ratio
+            max_irradiance_array[face_index_array] = pv_tech_obj.max_power_output / pv_tech_obj.panel_area / \
+                                                     efficiency_array / pv_tech_obj.infrastructure_performance_ratio
+
+        return power_factor_array, max_irradiance_array
+
+    def get_sum_of_technology_attribute(self, attribute_name):
+        """
+        Sum an attribute of the technology of the panels over all the panels, for instance the annual maintenance
+        :param attribute_name: str, name of the attribute of the BipvTechnology objects
+        :return: float, sum of the attribute over the panels
+        """
+        number_of_panels_per_technology_array = np.bincount(self.technology_index_array,
+                                                            minlength=len(self.technology_obj_list))
+        return float(sum(number_of_panels * getattr(technology_obj, attribute_name) for number_of_panels, technology_obj
+                         in zip(number_of_panels_per_technology_array, self.technology_obj_list)))
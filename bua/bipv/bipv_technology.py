@@ -3,13 +3,25 @@
 """
 import os
 import json
-import random
-
-from math import log, ceil
+import numpy as np
 
 temp_ref = 25  # temperature reference for the efficiency of the panel
 
 
+def sample_weibull_life_expectancy_array(lifetime, shape, number_of_panels, random_generator=None):
+    """
+    Draw the life expectancy of panels from the Weibull distribution, using the inverse of its quantile function on
+    uniform values between 0 and 1.
+    :param lifetime: float, scale parameter of the Weibull distribution
+    :param shape: float, shape parameter of the Weibull distribution
+    :param number_of_panels: int, number of panels
+    :param random_generator: numpy random Generator, the global numpy random state if None
+    :return life_expectancy_array: numpy array of int, life expectancy of the panels in years
+    """
+    y_array = (np.random if random_generator is None else random_generator).random(number_of_panels)
+    return np.ceil(lifetime * (-np.log(1 - y_array)) ** (1 / shape)).astype(int)
+
+
 class BipvTechnology:
     """
 
@@ -253,45 +265,100 @@ class BipvTechnology:
 
         return gtg_transportation_dict, recycling_dict
 
-    def get_life_expectancy_of_a_panel(self):
+    def get_life_expectancy_of_a_panel(self, random_generator=None):
         """
         Get the probabilistic time failure of a panel using the inverse of the quantile (inverse of the cumulative
         distribution0) function for the Weibull distribution
+        :param random_generator: numpy random Generator, the global numpy random state if None
         return life_expectancy: life expectancy of a panel according to the probabilistic law of Weibull
         """
+        return int(self.get_life_expectancy_of_panels(number_of_panels=1, random_generator=random_generator)[0])
 
-        y = random.random()  # we randomly choose a value between 0 and 1
-        shape = self.weibull_law_failure_parameters["shape"]  # extract the failure parameters
-        lifetime = self.weibull_law_failure_parameters["lifetime"]
-        # Quantile function for the Weibull distribution
-        life_expectancy = ceil(lifetime * (-log(1 - y)) ** (1 / shape))
-        return life_expectancy
+    def get_life_expectancy_of_panels(self, number_of_panels, random_generator=None):
+        """
+        Get the probabilistic time failure of several panels at once, using the inverse of the quantile function
+        of the Weibull distribution
+        :param number_of_panels: int, number of panels
+        :param random_generator: numpy random Generator, to get reproducible life expectancies with a seeded
+            generator, the global numpy random state if None
+        return life_expectancy_array: numpy array of int, life expectancy of the panels
+        """
+        return sample_weibull_life_expectancy_array(
+            lifetime=self.weibull_law_failure_parameters["lifetime"],
+            shape=self.weibull_law_failure_parameters["shape"], number_of_panels=number_of_panels,
+            random_generator=random_generator)
+
+    def get_efficiency_function(self, efficiency_function=None):
+        """
+        Get the efficiency function to use, the one of the technology by default.
+        :param efficiency_function: name of a method of the class computing the efficiency, or the method itself,
+            bound to the object or not, the efficiency function of the technology if None
+        :return: bound method computing the efficiency
+        """
+        if efficiency_function is None:
+            return self.efficiency_function
+        if isinstance(efficiency_function, str):
+            efficiency_function_name = efficiency_function
+        else:
+            efficiency_function_name = getattr(efficiency_function, "__name__", None)
+        # The efficiency function must be a method of the class
+        if efficiency_function_name is None or not callable(getattr(type(self), efficiency_function_name, None)):
+            raise ValueError(f"The efficiency function {efficiency_function} is not a method of the BipvTechnology "
+                             f"class")
+        return getattr(self, efficiency_function_name)
 
     def estimate_yearly_energy_harvested_by_panel_not_considering_inverter(self, irradiance, age, **kwargs):
         """
         Get the energy harvested by a panel in Watt
-        :param irradiance: irradiance on the panel
-        :param age: age of the panel
-        :param kwargs: kwargs
+        :param irradiance: irradiance on the panel, or numpy array of the irradiance on several panels
+        :param age: age of the panel, or numpy array of ages broadcastable with the irradiance
+        :param kwargs: kwargs, can contain the efficiency function to use instead of the one of the technology
 
 
         :return: energy_harvested: energy harvested by the panel
         """
+        efficiency = self.get_efficiency_function(kwargs.get("efficiency_function"))(age=age, irradiance=irradiance,
+                                                                                     **kwargs)
+        energy_harvested = efficiency * irradiance * self.infrastructure_performance_ratio * self.panel_area
+
+        return energy_harvested
 
-        # Check if the efficiency function is defined in the kwargs
-        if "efficiency_function" in kwargs and kwargs["efficiency_function"] in [
-            getattr(self, method_name) for method_name in dir(self) if callable(getattr(self, method_name))]:
-            """ The efficiency function can be defined in the kwargs. If it is not defined, the default efficiency function
-                    is used. If it is defined, the efficiency function is used. The efficiency function must be a method of the
-                    class."""
-            efficiency_function = kwargs["efficiency_function"]
-            efficiency = efficiency_function(age=age, irradiance=irradiance, **kwargs)
+    def get_lifetime_energy_factor(self, efficiency_function=None):
+        """
+        Get the energy harvested by a panel over the lifetime of the Weibull law per unit of annual irradiance, not
+        considering the inverter. It is the sum of the yearly efficiency over the ages of the panel, computed in
+        closed form for the degrading rate efficiency.
+        :param efficiency_function: efficiency function to use instead of the one of the technology, see
+            get_efficiency_function
+        :return lifetime_energy_factor: float, energy harvested over the lifetime per unit of annual irradiance
+        """
+        efficiency_function = self.get_efficiency_function(efficiency_function)
+        number_of_years = int(self.weibull_law_failure_parameters["lifetime"])
+        if efficiency_function.__func__ is BipvTechnology.degrading_rate_efficiency_loss:
+            # The initial efficiency the first year, then a linear degradation from the second year
+            number_of_degraded_years = max(number_of_years - 1, 0)
+            sum_of_efficiency = self.initial_efficiency * min(number_of_years, 1) + self.initial_efficiency * (
+                    number_of_degraded_years * (1 - self.first_year_degrading_rate)
+                    - self.degrading_rate * number_of_degraded_years * (number_of_degraded_years - 1) / 2)
+        elif efficiency_function.__func__ is BipvTechnology.constant_efficiency:
+            sum_of_efficiency = self.initial_efficiency * number_of_years
         else:
-            efficiency = self.efficiency_function(age=age, irradiance=irradiance, **kwargs)
+            sum_of_efficiency = float(np.sum(efficiency_function(age=np.arange(number_of_years))))
 
-        energy_harvested = efficiency * irradiance * self.infrastructure_performance_ratio * self.panel_area
+        return sum_of_efficiency * self.infrastructure_performance_ratio * self.panel_area
 
-        return energy_harvested
+    def get_prescreening_lifetime_energy_factor(self):
+        """
+        Get the lifetime energy factor used to prescreen the faces that can host a panel.
+        We need to differentiate the different cases of efficiency functions, this part is just an approximation,
+        overestimating the energy harvested by the panel, we cannot compute for panels that require hourly timestep,
+        the efficiency is then considered constant.
+        :return lifetime_energy_factor: float, energy harvested over the lifetime per unit of annual irradiance
+        """
+        if getattr(self.efficiency_function, "__func__", None) in [BipvTechnology.constant_efficiency,
+                                                                    BipvTechnology.degrading_rate_efficiency_loss]:
+            return self.get_lifetime_energy_factor()
+        return self.get_lifetime_energy_factor(efficiency_function=BipvTechnology.constant_efficiency)
 
     def get_hourly_power_generation_over_a_year_by_panel(self, hourly_irradiance_list, age, **kwargs):
         """
@@ -303,42 +370,64 @@ class BipvTechnology:
 
         :return: energy_harvested: energy harvested by the panel
         """
+        return self.get_hourly_power_generation_array(hourly_irradiance_array=np.asarray(hourly_irradiance_list),
+                                                      age=age, **kwargs).tolist()
 
-        # Check if the efficiency function is defined in the kwargs
-        if "efficiency_function" in kwargs and kwargs["efficiency_function"] in [
-            getattr(self, method_name) for method_name in dir(self) if callable(getattr(self, method_name))]:
-            """ The efficiency function can be defined in the kwargs. If it is not defined, the default efficiency function
-                    is used. If it is defined, the efficiency function is used. The efficiency function must be a method of the
-                    class."""
-            efficiency_function = getattr(self, kwargs["efficiency_function"])
-            efficiency = efficiency_function(age=age, hourly_irradiance_list=hourly_irradiance_list, **kwargs)
-        else:
-            efficiency = self.efficiency_function(age=age, hourly_irradiance_list=hourly_irradiance_list, **kwargs)
-
-        # Compute the irradiance that would generate the maximum output power of the panel
-        max_irradiance = self.max_power_output / self.panel_area / efficiency / self.infrastructure_performance_ratio
-        # Initialize energy harvested
-        hourly_power_generation_list = []
-        for hourly_irradiance in hourly_irradiance_list:
-            # cap the irradiance to the maximum output power of the panel if necessary (in case of over irradiance)
-            if hourly_irradiance > max_irradiance:
-                hourly_irradiance = max_irradiance
-            hourly_power_generation_list.append(
-                hourly_irradiance * efficiency * self.panel_area * self.infrastructure_performance_ratio)
-
-        return hourly_power_generation_list
-
-    def constant_efficiency(self, **kwargs):
+    def get_hourly_power_generation_array(self, hourly_irradiance_array, age, **kwargs):
+        """
+        Get the hourly power generated by panels of this technology, the irradiance being capped to the one
+        generating the maximum output power of the panels.
+        :param hourly_irradiance_array: numpy array of the hourly irradiance, of shape (number of hours) for a panel
+            or (number of panels, number of hours)
+        :param age: age of the panels, int or numpy array of shape (number of panels)
+        :param kwargs: kwargs, can contain the efficiency function to use instead of the one of the technology
+        :return hourly_power_generation_array: numpy array of the hourly power in W, of the shape of the irradiance
+        """
+        efficiency_array = np.asarray(self.get_efficiency_of_age_array(age_array=age, **kwargs), dtype=float)
+        # Compute the irradiance that would generate the maximum output power of the panels
+        max_irradiance_array = self.max_power_output / self.panel_area / efficiency_array / \
+                               self.infrastructure_performance_ratio
+        if efficiency_array.ndim == 1:  # one efficiency per row of the irradiance matrix
+            efficiency_array = efficiency_array[:, None]
+            max_irradiance_array = max_irradiance_array[:, None]
+        # cap the irradiance to the maximum output power of the panel if necessary (in case of over irradiance)
+        return np.minimum(hourly_irradiance_array, max_irradiance_array) * efficiency_array * self.panel_area * \
+            self.infrastructure_performance_ratio
+
+    def get_efficiency_over_a_year(self, age, **kwargs):
+        """
+        Get the efficiency of a panel during a year, used for all the hours of the year.
+        :param age: age of the panel
+        :param kwargs: kwargs, can contain the efficiency function to use instead of the one of the technology
+        :return: efficiency: efficiency of the panel
+        """
+        return self.get_efficiency_of_age_array(age_array=age, **kwargs)
+
+    def get_efficiency_of_age_array(self, age_array, **kwargs):
+        """
+        Get the efficiency of panels during a year for all their ages at once.
+        :param age_array: numpy array of the age of the panels, or an int for a single panel
+        :param kwargs: kwargs, can contain the efficiency function to use instead of the one of the technology
+        :return: efficiency: numpy array of the efficiency of the panels, or a float for a single panel
+        """
+        return self.get_efficiency_function(kwargs.get("efficiency_function"))(age=age_array, **kwargs)
+
+    def constant_efficiency(self, age=None, **kwargs):
         """ Constant efficiency through the life of the panel """
+        if np.ndim(age) > 0:
+            return np.full(np.shape(age), self.initial_efficiency, dtype=float)
         return self.initial_efficiency
 
     def degrading_rate_efficiency_loss(self, age, **kwargs):
-        """ loose 2% efficiency the first year and then 0.5% every year"""
-        if age == 0:
-            return self.initial_efficiency
-        else:
-            return self.initial_efficiency * (
-                    1 - self.first_year_degrading_rate - self.degrading_rate * (age - 1))
+        """ loose 2% efficiency the first year and then 0.5% every year, the age can be a numpy array """
+        if np.ndim(age) == 0:
+            if age == 0:
+                return self.initial_efficiency
+            return self.initial_efficiency * (1 - self.first_year_degrading_rate - self.degrading_rate * (age - 1))
+        age_array = np.asarray(age)
+        return np.where(age_array == 0, self.initial_efficiency,
+                        self.initial_efficiency * (1 - self.first_year_degrading_rate - self.degrading_rate * (
+                                age_array - 1)))
 
     def irradiance_dependent_efficiency(self, irradiance, **kwargs):
         """ todo: this one is just an example, to be changed"""
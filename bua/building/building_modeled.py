@@ -7,6 +7,8 @@ import os
 import logging
 import shutil
 
+from uuid import uuid4
+
 from ladybug_geometry.geometry3d import Vector3D
 from honeybee.model import Model
 from honeybee.room import Room
@@ -40,6 +42,7 @@ class BuildingModeled(BuildingBasic):
         self.hb_model_obj = None
         self.hb_model_dict = None
         self.merged_faces_hb_model_dict = None  # todo @Elie IMPORTANT, move this obj as well
+        self.merged_faces_hb_model_version = None  # changed every time the merged faces HB model is modified
         # Status of the building
         self.to_simulate = False
         self.is_target = False
@@ -54,13 +57,45 @@ class BuildingModeled(BuildingBasic):
         self.panels = {"roof": None, "facades": None}
         self.results_panels = {"roof": None, "facades": None, "Total": None}
 
+    def __setstate__(self, state):
+        """ Load the building from pickling, older pickles store the Honeybee Model in the hb_model_obj attribute """
+        if "hb_model_obj" in state:
+            state["_hb_model_obj"] = state.pop("hb_model_obj")
+        self.__dict__.update(state)
+
+    @property
+    def hb_model_obj(self):
+        """
+        Honeybee Model of the building. After loading the building, it is converted from the hb_model_dict the first
+        time it is accessed only. The hb_model_dict is then released, use get_hb_model_dict to get the dictionary of
+        the model whether it was converted or not.
+        """
+        if self._hb_model_obj is None and self.hb_model_dict is not None:
+            self._hb_model_obj = Model.from_dict(self.hb_model_dict)
+            self.hb_model_dict = None
+        return self._hb_model_obj
+
+    @hb_model_obj.setter
+    def hb_model_obj(self, hb_model_obj):
+        self._hb_model_obj = hb_model_obj
+        if hb_model_obj is not None:
+            self.hb_model_dict = None
+
+    def get_hb_model_dict(self):
+        """
+        Get the dictionary of the Honeybee Model of the building, from the model if it was converted, as it might have
+        been modified since, from the hb_model_dict otherwise
+        :return: dict, dictionary of the Honeybee Model, None if the building has no model
+        """
+        if self._hb_model_obj is not None:
+            return self._hb_model_obj.to_dict()
+        return self.hb_model_dict
+
     def load_HB_attributes(self):
         """
         Load the attributes that cannot be pickled from equivalent attribute dict.
+        The hb_model_dict is converted to hb_model_obj when it is accessed for the first time.
         """
-        # Convert the hb_model_dict to hb_model_obj
-        self.hb_model_obj = Model.from_dict(self.hb_model_dict)  # todo: test if it works
-        self.hb_model_dict = None
         # Load attributes in the context filter object after pickling
         self.shading_context_obj.load_from_pkl()
 
@@ -68,9 +103,10 @@ class BuildingModeled(BuildingBasic):
         """
         Convert the hb_model_obj to hb_model_dict to be able to pickle it.
         """
-        # Convert the hb_model_obj to hb_model_dict
-        self.hb_model_dict = self.hb_model_obj.to_dict()  # todo: test if it works
-        self.hb_model_obj = None
+        # Convert the hb_model_obj to hb_model_dict, if it was not converted already
+        if self._hb_model_obj is not None:
+            self.hb_model_dict = self._hb_model_obj.to_dict()
+            self._hb_model_obj = None
         # Prepare attributes in the context filter objects
         self.shading_context_obj.prepare_for_pkl()
 
@@ -190,7 +226,7 @@ class BuildingModeled(BuildingBasic):
             # BuildingModeled attributes
             "is_building_to_simulate": self.to_simulate,
             "is_target_building": self.is_target,
-            "hb_model": self.hb_model_dict,
+            "hb_model": self.get_hb_model_dict(),
             "merged_faces_hb_model": self.merged_faces_hb_model_dict,
             "context_surfaces": self.shading_context_obj.to_dict(),
             "bes": self.bes_obj.to_dict(),
@@ -200,10 +236,11 @@ class BuildingModeled(BuildingBasic):
         return building_dict
 
 
-    def move(self, vector):
+    def move(self, vector, hb_model_cache=None):
         """
         Move the building
         :param vector: list: [x, y, z] translation vector
+        :param hb_model_cache: DecodedHbModelCache: default=None, cache of the decoded HB models of the urban canopy
         :return:
         """
         # move the LB footprint
@@ -217,9 +254,16 @@ class BuildingModeled(BuildingBasic):
         moving_vector = Vector3D(vector[0], vector[1], vector[2])
         self.hb_model_obj.move(moving_vector)  # the model is moved fully
         if self.merged_faces_hb_model_dict is not None:
-            moved_merged_faces_hb_model_dict = Model.from_dict(self.merged_faces_hb_model_dict)
-            moved_merged_faces_hb_model_dict.move(moving_vector)
-            self.merged_faces_hb_model_dict = moved_merged_faces_hb_model_dict.to_dict()
+            # The decoded model of the cache is shared, it is copied before being moved
+            moved_merged_faces_hb_model_obj = self.get_merged_faces_hb_model_obj(
+                hb_model_cache=hb_model_cache).duplicate()
+            moved_merged_faces_hb_model_obj.move(moving_vector)
+            self.set_merged_faces_hb_model_dict(moved_merged_faces_hb_model_obj.to_dict())
+            # Keep the moved model in the cache instead of decoding it again
+            if hb_model_cache is not None:
+                hb_model_cache.add_hb_model(building_id=self.id, version_stamp=self.merged_faces_hb_model_version,
+                                            hb_model_obj=moved_merged_faces_hb_model_obj,
+                                            hb_model_dict=self.merged_faces_hb_model_dict)
         # move the context shading object
         self.shading_context_obj.move(moving_vector)  # todo : implement th function
         # move the sensor grid
@@ -260,10 +304,37 @@ class BuildingModeled(BuildingBasic):
                 hb_model_obj=self.hb_model_obj,
                 orient_roof_mesh_to_according_to_building_orientation=orient_roof_mesh_to_according_to_building_orientation,
                 north_angle=north_angle)
-            self.merged_faces_hb_model_dict = merged_faces_hb_model_obj.to_dict()
+            self.set_merged_faces_hb_model_dict(merged_faces_hb_model_obj.to_dict())
+
+    def set_merged_faces_hb_model_dict(self, merged_faces_hb_model_dict):
+        """
+        Set the merged faces HB model dictionary and change its version stamp, so that the decoded models cached
+        for the previous version are not used anymore
+        :param merged_faces_hb_model_dict: dict: dictionary of the merged faces HB model
+        """
+        self.merged_faces_hb_model_dict = merged_faces_hb_model_dict
+        self.merged_faces_hb_model_version = uuid4().hex
+
+    def get_merged_faces_hb_model_obj(self, hb_model_cache=None):
+        """
+        Get the merged faces HB model of the building, from the cache of the urban canopy if provided. The model
+        returned by the cache is shared and should not be modified in place.
+        :param hb_model_cache: DecodedHbModelCache: default=None, cache of the decoded HB models of the urban canopy
+        :return: HB Model: merged faces HB model, None if it was not generated
+        """
+        if self.merged_faces_hb_model_dict is None:
+            return None
+        if hb_model_cache is None:
+            return Model.from_dict(self.merged_faces_hb_model_dict)
+        # Buildings from older pickles do not have a version stamp
+        if getattr(self, "merged_faces_hb_model_version", None) is None:
+            self.merged_faces_hb_model_version = uuid4().hex
+        return hb_model_cache.get_hb_model(building_id=self.id, version_stamp=self.merged_faces_hb_model_version,
+                                           hb_model_dict=self.merged_faces_hb_model_dict)
 
     def perform_first_pass_context_filtering(self, uc_building_id_list, uc_building_bounding_box_list,
-                                             min_vf_criterion=0.01, overwrite=True):
+                                             min_vf_criterion=0.01, overwrite=True,
+                                             uc_bounding_box_spatial_index=None):
         """
         Perform the first pass of the context filtering algorithm on the building.
         :param uc_building_id_list: list of str: list of the building IDs in the urban canopy
@@ -273,6 +344,9 @@ class BuildingModeled(BuildingBasic):
             context filtering algorithm
         :param overwrite: bool: default=False, if True, overwrite the context building list of the building
         if it already exists
+        :param uc_bounding_box_spatial_index: BoundingBoxSpatialIndex: default=None, spatial index of the bounding
+            boxes of the buildings in the urban canopy. If provided, the vectorized version of the first pass is used,
+            testing only the buildings within the cutoff distance of the criterion.
         :return context_building_id_list: list of str: list of the IDs of the buildings that are context for the
             current building
         :return duration: float: duration of the simulation in seconds
@@ -289,12 +363,19 @@ class BuildingModeled(BuildingBasic):
                 get_lb_polyface3d_of_outdoor_faces_from_hb_model(hb_model=self.hb_model_obj)
 
             # Perform the first pass of the context filtering algorithm
-            selected_context_building_id_list, duration = self.shading_context_obj. \
-                select_context_building_using_the_mvfc(
-                target_lb_polyface3d_of_outdoor_faces=target_lb_polyface3d_of_outdoor_faces,
-                target_building_id=self.id,
-                uc_building_id_list=uc_building_id_list,
-                uc_building_bounding_box_list=uc_building_bounding_box_list)
+            if uc_bounding_box_spatial_index is not None:
+                selected_context_building_id_list, duration = self.shading_context_obj. \
+                    select_context_building_using_the_mvfc_vectorized(
+                    target_lb_polyface3d_of_outdoor_faces=target_lb_polyface3d_of_outdoor_faces,
+                    target_building_id=self.id,
+                    uc_bounding_box_spatial_index=uc_bounding_box_spatial_index)
+            else:
+                selected_context_building_id_list, duration = self.shading_context_obj. \
+                    select_context_building_using_the_mvfc(
+                    target_lb_polyface3d_of_outdoor_faces=target_lb_polyface3d_of_outdoor_faces,
+                    target_building_id=self.id,
+                    uc_building_id_list=uc_building_id_list,
+                    uc_building_bounding_box_list=uc_building_bounding_box_list)
 
         # Return the list of context buildings
         return self.shading_context_obj.selected_context_building_id_list, self.shading_context_obj.first_pass_duration
@@ -304,13 +385,15 @@ class BuildingModeled(BuildingBasic):
                                               consider_windows=False,
                                               keep_shades_from_user=False, no_ray_tracing=False,
                                               use_merged_face_hb_model=True, overwrite=True,
-                                              flag_use_envelop=False, keep_discarded_faces=False):
+                                              flag_use_envelop=False, keep_discarded_faces=False,
+                                              canopy_mesh_bvh=None, hb_model_cache=None):
         """
         Perform the second pass of the context filtering for the shading computation. It selects the context surfaces
         for the shading computation using the ray tracing method.
         :param uc_shade_manager: ShadeManager object: ShadeManager object of the urban canopy
         :param uc_building_dictionary: dict: dictionary of the buildings in the urban canopy
-        :param full_urban_canopy_pyvista_mesh: Pyvista mesh: Pyvista mesh of the full urban canopy
+        :param full_urban_canopy_pyvista_mesh: Pyvista mesh: Pyvista mesh of the full urban canopy, not used if
+            canopy_mesh_bvh is provided
         :param number_of_rays: int: default=3, number of rays to use for the ray tracing method
         :param consider_windows: bool: default=False, if True, the windows will be considered for the ray tracing
             method
@@ -324,6 +407,52 @@ class BuildingModeled(BuildingBasic):
             instead of the HB models
         :param keep_discarded_faces: bool: default=False, if True, the discarded faces will be kept in the context
             shading object
+        :param canopy_mesh_bvh: CanopyMeshBvh: default=None, bounding volume hierarchy of the full urban canopy. If
+            provided, all the rays are cast at once on it instead of one by one with Pyvista
+        :param hb_model_cache: DecodedHbModelCache: default=None, cache of the decoded HB models of the urban canopy
+        """
+        # Check if the first pass was done and prepare the second pass
+        is_second_pass_to_run, flag_use_envelop = self.prepare_second_pass_context_filtering(
+            uc_building_dictionary=uc_building_dictionary, number_of_rays=number_of_rays,
+            consider_windows=consider_windows, no_ray_tracing=no_ray_tracing, overwrite=overwrite,
+            flag_use_envelop=flag_use_envelop)
+        if is_second_pass_to_run is None:
+            return
+        if is_second_pass_to_run:
+            # Get the list of the HB models or LB Polyface3d of the context buildings
+            context_hb_model_or_lb_polyface3d_list_to_test = self.get_context_hb_model_or_lb_polyface3d_list_to_test(
+                uc_building_dictionary=uc_building_dictionary, use_merged_face_hb_model=use_merged_face_hb_model,
+                hb_model_cache=hb_model_cache)
+
+            # Perform the first pass of the context filtering algorithm
+            nb_context_faces, duration = self.shading_context_obj.select_non_obstructed_context_faces_with_ray_tracing(
+                uc_shade_manager=uc_shade_manager,
+                target_lb_polyface3d_extruded_footprint=self.lb_polyface3d_extruded_footprint,
+                context_hb_model_or_lb_polyface3d_list_to_test=context_hb_model_or_lb_polyface3d_list_to_test,
+                full_urban_canopy_pyvista_mesh=full_urban_canopy_pyvista_mesh,
+                keep_shades_from_user=keep_shades_from_user, no_ray_tracing=no_ray_tracing,
+                keep_discarded_faces=keep_discarded_faces, canopy_mesh_bvh=canopy_mesh_bvh)
+
+        # Return the list of context buildings
+        nb_context_faces = len(self.shading_context_obj.context_shading_hb_shade_list)
+        return nb_context_faces, self.shading_context_obj.second_pass_duration, flag_use_envelop
+
+    def prepare_second_pass_context_filtering(self, uc_building_dictionary, number_of_rays=3, consider_windows=False,
+                                              no_ray_tracing=False, overwrite=True, flag_use_envelop=False):
+        """
+        Check if the second pass of the context filtering can and should be performed, overwrite the previous results
+        if needed and set the parameters of the second pass.
+        :param uc_building_dictionary: dict: dictionary of the buildings in the urban canopy
+        :param number_of_rays: int: default=3, number of rays to use for the ray tracing method
+        :param consider_windows: bool: default=False, if True, the windows will be considered for the ray tracing
+            method
+        :param no_ray_tracing: bool: default=False, if True, the ray tracing method will not be used
+        :param overwrite: bool: default=False, if True, overwrite the context building list of the building
+        :param flag_use_envelop: bool: default=False, if True, the envelope of the context buildings will be used
+            instead of the HB models
+        :return is_second_pass_to_run: bool, True if the second pass has to be run, None if the first pass was not
+            done
+        :return flag_use_envelop: bool, True if at least one context building is not a BuildingModeled
         """
         # Check if the first pass was done, if not second pass cannot be performed
         if not self.shading_context_obj.first_pass_done:
@@ -331,8 +460,7 @@ class BuildingModeled(BuildingBasic):
                 f"The first pass of the context filtering was not done for the building {self.id}, it will be ignored")
             user_logger.info(
                 f"The first pass of the context filtering was not done for the building {self.id}, it will be ignored")
-            return
-            # overwrite context filtering object if needed
+            return None, flag_use_envelop
 
         # Check if the context building selected with the first pass have are BuildingModeled, if not send a warning
         if not flag_use_envelop:
@@ -348,42 +476,43 @@ class BuildingModeled(BuildingBasic):
         if overwrite:
             self.shading_context_obj.overwrite_filtering(overwrite_second_pass=True)
         # check if the first pass was already done and run it (if it was overwritten, it will be run again)
-        if not self.shading_context_obj.second_pass_done:
-            # Set the min VF criterion
-            self.shading_context_obj.set_number_of_rays(number_of_rays=number_of_rays,
-                                                        no_ray_tracing=no_ray_tracing)
-            self.shading_context_obj.set_consider_windows(consider_windows=consider_windows)
-            # Get the list of the HB models or LB Polyface3d of the context buildings
-            context_hb_model_or_lb_polyface3d_list_to_test = []
-            for building_id in self.shading_context_obj.selected_context_building_id_list:
-                building_obj = uc_building_dictionary[building_id]
-                if isinstance(building_obj, BuildingModeled):
-                    # use the merged faces HB model if it exists, otherwise use the original HB model
-                    if building_obj.merged_faces_hb_model_dict is not None and use_merged_face_hb_model:
-                        context_hb_model_or_lb_polyface3d_list_to_test.append(
-                            Model.from_dict(building_obj.merged_faces_hb_model_dict))
-                    else:
-                        context_hb_model_or_lb_polyface3d_list_to_test.append(building_obj.hb_model_obj)
-                elif isinstance(building_obj, BuildingBasic):
+        if self.shading_context_obj.second_pass_done:
+            return False, flag_use_envelop
+        # Set the min VF criterion
+        self.shading_context_obj.set_number_of_rays(number_of_rays=number_of_rays,
+                                                    no_ray_tracing=no_ray_tracing)
+        self.shading_context_obj.set_consider_windows(consider_windows=consider_windows)
+
+        return True, flag_use_envelop
+
+    def get_context_hb_model_or_lb_polyface3d_list_to_test(self, uc_building_dictionary,
+                                                          use_merged_face_hb_model=True, hb_model_cache=None):
+        """
+        Get the list of the HB models or LB Polyface3d of the context buildings selected with the first pass.
+        :param uc_building_dictionary: dict: dictionary of the buildings in the urban canopy
+        :param use_merged_face_hb_model: bool: default=True, if True, the merged faces HB model will be used
+        :param hb_model_cache: DecodedHbModelCache: default=None, cache of the decoded HB models of the urban canopy
+        :return context_hb_model_or_lb_polyface3d_list_to_test: list of HB Model or LB Polyface3D
+        """
+        context_hb_model_or_lb_polyface3d_list_to_test = []
+        for building_id in self.shading_context_obj.selected_context_building_id_list:
+            building_obj = uc_building_dictionary[building_id]
+            if isinstance(building_obj, BuildingModeled):
+                # use the merged faces HB model if it exists, otherwise use the original HB model
+                if building_obj.merged_faces_hb_model_dict is not None and use_merged_face_hb_model:
                     context_hb_model_or_lb_polyface3d_list_to_test.append(
-                        building_obj.lb_polyface3d_extruded_footprint)
+                        building_obj.get_merged_faces_hb_model_obj(hb_model_cache=hb_model_cache))
                 else:
-                    raise ValueError(
-                        f"The building {building_obj.id} is not a BuildingModeled or a BuildingBasic, it cannot be "
-                        f"handled by the context filter")
-
-            # Perform the first pass of the context filtering algorithm
-            nb_context_faces, duration = self.shading_context_obj.select_non_obstructed_context_faces_with_ray_tracing(
-                uc_shade_manager=uc_shade_manager,
-                target_lb_polyface3d_extruded_footprint=self.lb_polyface3d_extruded_footprint,
-                context_hb_model_or_lb_polyface3d_list_to_test=context_hb_model_or_lb_polyface3d_list_to_test,
-                full_urban_canopy_pyvista_mesh=full_urban_canopy_pyvista_mesh,
-                keep_shades_from_user=keep_shades_from_user, no_ray_tracing=no_ray_tracing,
-                keep_discarded_faces=keep_discarded_faces)
+                    context_hb_model_or_lb_polyface3d_list_to_test.append(building_obj.hb_model_obj)
+            elif isinstance(building_obj, BuildingBasic):
+                context_hb_model_or_lb_polyface3d_list_to_test.append(
+                    building_obj.lb_polyface3d_extruded_footprint)
+            else:
+                raise ValueError(
+                    f"The building {building_obj.id} is not a BuildingModeled or a BuildingBasic, it cannot be "
+                    f"handled by the context filter")
 
-        # Return the list of context buildings
-        nb_context_faces = len(self.shading_context_obj.context_shading_hb_shade_list)
-        return nb_context_faces, self.shading_context_obj.second_pass_duration, flag_use_envelop
+        return context_hb_model_or_lb_polyface3d_list_to_test
 
     def add_selected_bipv_panels_to_shades(self):
         """
@@ -404,9 +533,50 @@ class BuildingModeled(BuildingBasic):
         :param overwrite: bool: default=False, if True, the IDF file will be overwritten if it already exists
         :param silent: bool: default=False, if True, the OpenStudio messages will not be printed
         """
+        path_building_bes_temp_folder = self.prepare_bes_temp_folder_for_idf_generation(
+            path_ubes_temp_sim_folder=path_ubes_temp_sim_folder, overwrite=overwrite)
+        if path_building_bes_temp_folder is None:
+            return
+        # Generate the IDF file
+        self.bes_obj.generate_idf_with_openstudio(path_building_bes_temp_folder=path_building_bes_temp_folder,
+                                                  path_epw_file=path_epw_file,
+                                                  path_hbjson_simulation_parameters=path_hbjson_simulation_parameters,
+                                                  hb_model_obj=self.make_hb_model_with_shades_for_bes(),
+                                                  silent=silent)
+
+    def write_osw_for_bes_with_openstudio(self, path_ubes_temp_sim_folder, path_epw_file,
+                                          path_hbjson_simulation_parameters, overwrite=False):
+        """
+        Write the OpenStudio workflow (osw) file generating the IDF file of the building, to run it outside of
+        Honeybee, for instance in parallel.
+        :param path_ubes_temp_sim_folder: str: path to the temporary folder where the IDF file will be generated
+        :param path_epw_file: str: path to the EPW file
+        :param path_hbjson_simulation_parameters: str: path to the HBJSON file containing the simulation parameters
+        :param overwrite: bool: default=False, if True, the IDF file will be overwritten if it already exists
+        :return path_osw_file: str: path to the osw file, None if the IDF file does not need to be generated
+        """
+        path_building_bes_temp_folder = self.prepare_bes_temp_folder_for_idf_generation(
+            path_ubes_temp_sim_folder=path_ubes_temp_sim_folder, overwrite=overwrite)
+        if path_building_bes_temp_folder is None:
+            return None
+
+        return self.bes_obj.write_osw_for_openstudio(
+            path_building_bes_temp_folder=path_building_bes_temp_folder, path_epw_file=path_epw_file,
+            path_hbjson_simulation_parameters=path_hbjson_simulation_parameters,
+            hb_model_obj=self.make_hb_model_with_shades_for_bes())
+
+    def prepare_bes_temp_folder_for_idf_generation(self, path_ubes_temp_sim_folder, overwrite=False):
+        """
+        Make the temporary folder of the building for the generation of the IDF file and re-initialize the BES
+        object if needed.
+        :param path_ubes_temp_sim_folder: str: path to the temporary folder where the IDF file will be generated
+        :param overwrite: bool: default=False, if True, the IDF file will be overwritten if it already exists
+        :return path_building_bes_temp_folder: str: path to the temporary folder of the building, None if the IDF
+            file was already generated and should not be overwritten
+        """
         # Do not run for if the IDF file already exists and overwrite is False
         if not overwrite and self.bes_obj.idf_generated:
-            return
+            return None
         # Check if the building sub-folder exist in the temporary folder, if not create it
         path_building_bes_temp_folder = os.path.join(path_ubes_temp_sim_folder, self.id)
         if os.path.isdir(path_building_bes_temp_folder):
@@ -415,24 +585,28 @@ class BuildingModeled(BuildingBasic):
                 os.mkdir(path_building_bes_temp_folder)
 
             elif self.bes_obj.idf_generated:
-                return  # todo : make a proper condition to check if the IDF file already exists
+                return None  # todo : make a proper condition to check if the IDF file already exists
         else:
             os.mkdir(path_building_bes_temp_folder)
         # Re-initialize the BES object if needed
         if overwrite:
             self.bes_obj.re_initialize()
+
+        return path_building_bes_temp_folder
+
+    def make_hb_model_with_shades_for_bes(self):
+        """
+        Make a copy of the HB model of the building with the shades of the context for the BES.
+        :return hb_model_with_shades: Honeybee Model
+        """
         # Make a copy of the hb_model attribute and add the shading surfaces
         hb_model_with_shades = self.hb_model_obj.duplicate()
         # Make the list of shades to add to the model
         hb_shade_list = self.shading_context_obj.forced_hb_shades_from_user_list + self.shading_context_obj.context_shading_hb_shade_list
         # Add the shades to the model
         hb_model_with_shades.add_shades(hb_shade_list)
-        # Generate the IDF file
-        self.bes_obj.generate_idf_with_openstudio(path_building_bes_temp_folder=path_building_bes_temp_folder,
-                                                  path_epw_file=path_epw_file,
-                                                  path_hbjson_simulation_parameters=path_hbjson_simulation_parameters,
-                                                  hb_model_obj=hb_model_with_shades,
-                                                  silent=silent)
+
+        return hb_model_with_shades
 
     def run_idf_with_energyplus_for_bes(self, path_ubes_temp_sim_folder, path_epw_file, overwrite=False,
                                         silent=False):
@@ -443,23 +617,34 @@ class BuildingModeled(BuildingBasic):
         :param overwrite: bool: default=False, if True, the IDF file will be overwritten if it already exists
         :param silent: bool: default=False, if True, the EnergyPlus output will not be printed in the console
         """
-        # Check if the building sub-folder exist in the temporary folder, if not create it
+        if not self.is_idf_to_run_with_energyplus_for_bes(overwrite=overwrite):
+            return self.bes_obj.sim_duration if self.bes_obj.has_run else None
+        # Run the IDF file
         path_building_bes_temp_folder = os.path.join(path_ubes_temp_sim_folder, self.id)
+        self.bes_obj.run_idf_with_energyplus(path_building_bes_temp_folder=path_building_bes_temp_folder,
+                                             path_epw_file=path_epw_file, silent=silent)
+        return self.bes_obj.sim_duration
+
+    def is_idf_to_run_with_energyplus_for_bes(self, overwrite=False):
+        """
+        Check if the IDF file of the building should be run with EnergyPlus, and re-initialize the BES object if
+        the previous run should be overwritten.
+        :param overwrite: bool: default=False, if True, the previous run will be overwritten
+        :return: bool: True if the IDF file should be run
+        """
         if not self.bes_obj.idf_generated:
             user_logger.warning(
                 f"The IDF file of the building {self.id} has not been generated yet, it cannot "
                 f"be run with EnergyPlus")
             dev_logger.warning(f"The IDF file not generated for building {self.id}")
-            return None
+            return False
         elif self.bes_obj.has_run:
             if overwrite:
                 self.bes_obj.re_initialize(keep_idf=True)
             else:
-                return self.bes_obj.sim_duration
-        # Run the IDF file
-        self.bes_obj.run_idf_with_energyplus(path_building_bes_temp_folder=path_building_bes_temp_folder,
-                                             path_epw_file=path_epw_file, silent=silent)
-        return self.bes_obj.sim_duration
+                return False
+
+        return True
 
     def move_bes_result_files_from_temp_to_result_folder(self, path_ubes_temp_sim_folder,
                                                          path_ubes_sim_result_folder):
@@ -505,7 +690,7 @@ class BuildingModeled(BuildingBasic):
 
     def generate_sensor_grid(self, bipv_on_roof=True, bipv_on_facades=True,
                              roof_grid_size_x=1, facades_grid_size_x=1, roof_grid_size_y=1,
-                             facades_grid_size_y=1, offset_dist=0.1, overwrite=False):
+                             facades_grid_size_y=1, offset_dist=0.1, overwrite=False, hb_model_cache=None):
         """
         Generate Honeybee SensorGrid on the roof and/or on the facades for the building.
         It does not add the SendorgGrid to the HB model.
@@ -517,6 +702,7 @@ class BuildingModeled(BuildingBasic):
         :param facades_grid_size_y: Number for the size of the test grid on the facades in the y direction
         :param offset_dist: Number for the distance to move points from the surfaces of the geometry of the model.
         :param overwrite: Boolean to indicate if the existing SensorGrid should be overwritten
+        :param hb_model_cache: DecodedHbModelCache: default=None, cache of the decoded HB models of the urban canopy
         """
         # Do not generate the SensorGrid if the building is not a target
         if not self.is_target:
@@ -527,7 +713,7 @@ class BuildingModeled(BuildingBasic):
 
         # Use the merged faces HB model if it exists, otherwise use the original HB model
         if self.merged_faces_hb_model_dict is not None:
-            hb_model_obj = Model.from_dict(self.merged_faces_hb_model_dict)
+            hb_model_obj = self.get_merged_faces_hb_model_obj(hb_model_cache=hb_model_cache)
         else:
             hb_model_obj = self.hb_model_obj
         # generate the sensor grid
@@ -543,7 +729,8 @@ class BuildingModeled(BuildingBasic):
 
     def run_annual_solar_irradiance_simulation(self, path_simulation_folder, path_weather_file,
                                                overwrite=False,
-                                               north_angle=0, silent=False):
+                                               north_angle=0, silent=False, workers=None,
+                                               combine_roof_and_facades=True):
         """
         Run the annual solar radiation simulation for the building on the roof and/or on the facades if a Honeybee SensorGrid
         was generated on them.
@@ -552,6 +739,9 @@ class BuildingModeled(BuildingBasic):
         :param overwrite: bool: default=False, if True, overwrite the simulation files if they already exist
         :param north_angle: float : north angle of the building in degrees
         :param silent: bool: default=False
+        :param workers: int: number of processes used by the Radiance recipes, all the cores if None
+        :param combine_roof_and_facades: bool: default=True, if True, simulate the roof and facades SensorGrids with
+            a single Radiance recipe
         """
         #         # check if the solar radiation and BIPV simulation object was initialized
         if self.solar_radiation_and_bipv_simulation_obj.roof_sensorgrid_dict is None and self.solar_radiation_and_bipv_simulation_obj.facades_sensorgrid_dict is None:
@@ -583,7 +773,8 @@ class BuildingModeled(BuildingBasic):
             hb_model_obj=self.hb_model_obj,
             context_shading_hb_shade_list=hb_shades_list,
             path_weather_file=path_weather_file, overwrite=overwrite,
-            north_angle=north_angle, silent=silent)
+            north_angle=north_angle, silent=silent, workers=workers,
+            combine_roof_and_facades=combine_roof_and_facades)
 
     def building_run_bipv_panel_simulation(self, path_simulation_folder, path_radiation_and_bipv_result_folder,
                                            roof_pv_tech_obj, facades_pv_tech_obj,
@@ -595,7 +786,7 @@ class BuildingModeled(BuildingBasic):
                                            uc_current_year, uc_end_year, efficiency_computation_method="yearly",
                                            minimum_panel_eroi=1.2,
                                            replacement_scenario="replace_failed_panels_every_X_years",
-                                           continue_simulation=False,
+                                           continue_simulation=False, random_generator=None,
                                            **kwargs):
         """
         Run the BIPV simulation for the building on the roof and/or on the facades of the buildings.
@@ -618,6 +809,8 @@ class BuildingModeled(BuildingBasic):
         :param replacement_scenario: str: default="replace_failed_panels_every_X_years", scenario for the replacement
             of the panels. Can be "replace_failed_panels_every_X_years" or "replace_all_panels_every_X_years"
         :param continue_simulation: bool: default=False, if True, continue the simulation from the last year
+        :param random_generator: numpy random Generator: default=None, draws the life expectancies of the panels, the
+            global numpy random state if None
         :param kwargs: dict: "no_csv" option as well as other arguments for the BIPV simulation
         """
 
@@ -635,7 +828,7 @@ class BuildingModeled(BuildingBasic):
             uc_end_year=uc_end_year, uc_start_year=uc_start_year,
             uc_current_year=uc_current_year, efficiency_computation_method=efficiency_computation_method,
             minimum_panel_eroi=minimum_panel_eroi, replacement_scenario=replacement_scenario,
-            continue_simulation=continue_simulation, **kwargs)
+            continue_simulation=continue_simulation, random_generator=random_generator, **kwargs)
         # Write the results in a csv file
         if "no_csv" not in kwargs or not kwargs["no_csv"]:
             self.solar_radiation_and_bipv_simulation_obj.write_building_bipv_results_to_csv(
@@ -3,12 +3,14 @@ todo
 """
 
 import logging
+import numpy as np
 from time import time
 
 from ladybug_geometry.geometry3d.polyface import Polyface3D
 from honeybee.boundarycondition import Outdoors
 
-from bua.building.context_filter.utils_functions_mvfc import majorized_vf_between_2_surfaces
+from bua.building.context_filter.utils_functions_mvfc import majorized_vf_between_2_surfaces, \
+    lb_face3d_list_to_centroid_and_area_arrays, are_groups_verifying_mvfc
 from bua.building.context_filter.utils_functions_context_filter import is_vector3d_vertical
 
 from bua.utils.utils_constants import TOLERANCE_LBT
@@ -73,6 +75,50 @@ class BuildingContextFilter:
 
         return self.selected_context_building_id_list, self.first_pass_duration
 
+    def select_context_building_using_the_mvfc_vectorized(self, target_lb_polyface3d_of_outdoor_faces,
+                                                          target_building_id, uc_bounding_box_spatial_index):
+        """
+        Select the context buildings of a target building using the minimum view factor criterion, evaluating the
+        majorized view factors of all the target face/bounding box face pairs with numpy arrays.
+        Only the bounding box faces within the cutoff distance of the criterion, given by the spatial index,
+        are tested. It gives the same results as select_context_building_using_the_mvfc, but much faster for large
+        urban canopies.
+        :param target_lb_polyface3d_of_outdoor_faces: Ladybug polyface3d of the outdoor faces of the target building
+        :param target_building_id: str, id of the target building
+        :param uc_bounding_box_spatial_index: BoundingBoxSpatialIndex object of the urban canopy
+        """
+        # Timer to tack the duration of the simulation
+        timer = time()
+        # Pack the outdoor faces of the target building
+        target_centroid_array, target_area_array = lb_face3d_list_to_centroid_and_area_arrays(
+            lb_face3d_list=list(target_lb_polyface3d_of_outdoor_faces.faces))
+        # Keep only the bounding box faces close enough to the target to possibly verify the criterion
+        candidate_face_index_array = uc_bounding_box_spatial_index.get_candidate_face_index_array(
+            target_centroid_array=target_centroid_array,
+            target_area_array=target_area_array,
+            min_vf_criterion=self.min_vf_criterion)
+        # Check all the candidate bounding boxes at once
+        is_building_verifying_mvfc_array = are_groups_verifying_mvfc(
+            target_centroid_array=target_centroid_array,
+            target_area_array=target_area_array,
+            context_centroid_array=uc_bounding_box_spatial_index.face_centroid_array[candidate_face_index_array],
+            context_area_array=uc_bounding_box_spatial_index.face_area_array[candidate_face_index_array],
+            context_group_index_array=uc_bounding_box_spatial_index.face_building_index_array[
+                candidate_face_index_array],
+            number_of_groups=len(uc_bounding_box_spatial_index.building_id_list),
+            min_vf_criterion=self.min_vf_criterion)
+        # Keep the order of the buildings in the urban canopy, as in the non vectorized version
+        for building_index in np.flatnonzero(is_building_verifying_mvfc_array):
+            context_building_id = uc_bounding_box_spatial_index.building_id_list[building_index]
+            if (context_building_id != target_building_id
+                    and context_building_id not in self.selected_context_building_id_list):
+                self.selected_context_building_id_list.append(context_building_id)
+        # Set the first pass as done
+        self.first_pass_done = True
+        self.first_pass_duration = time() - timer
+
+        return self.selected_context_building_id_list, self.first_pass_duration
+
     @staticmethod
     def is_bounding_box_context_using_mvfc_criterion(target_lb_polyface3d,
                                                      context_lb_polyface3d_oriented_bounding_box,
@@ -2,6 +2,7 @@
 BuildingShadingContext class, used to perform and store the result of the context filtering for shading computation using the 2 pass filtering method
 """
 import logging
+import numpy as np
 from time import time
 
 from ladybug_geometry.geometry3d.polyface import Polyface3D
@@ -14,7 +15,8 @@ from honeybee.shade import Shade
 
 from bua.building.context_filter.building_context import BuildingContextFilter
 
-from bua.building.context_filter.utils_functions_context_filter import are_hb_face_or_lb_face3d_facing, ray_list_from_emitter_to_receiver
+from bua.building.context_filter.utils_functions_context_filter import are_hb_face_or_lb_face3d_facing, ray_list_from_emitter_to_receiver, \
+    get_face_arrays_for_ray_tracing, are_faces_facing_vectorized, ray_arrays_from_emitter_to_receiver_vectorized
 
 from bua.utils.utils_constants import AREA_TOLERANCE
 
@@ -78,10 +80,11 @@ class BuildingShadingContextFilter(BuildingContextFilter):
             # Second pass
             "number_of_rays": self.number_of_rays,
             "consider_windows": self.consider_windows,
-            "forced_hb_shades_from_user_list": self.forced_hb_shades_from_user_list,
-            # Already converted to dict for pkl
-            "context_shading_hb_shade_list": self.context_shading_hb_shade_list,
-            # Already converted to dict for pkl
+            # The shades are converted to dict for pkl, and back to Shade objects when the building is loaded
+            "forced_hb_shades_from_user_list": [hb_shade.to_dict() if hasattr(hb_shade, "to_dict") else hb_shade
+                                                for hb_shade in self.forced_hb_shades_from_user_list],
+            "context_shading_hb_shade_list": [hb_shade.to_dict() if hasattr(hb_shade, "to_dict") else hb_shade
+                                              for hb_shade in self.context_shading_hb_shade_list],
             "discarded_lb_face3d_context_shading_second_pass_list": [lb_face3d.to_dict() for lb_face3d in
                                                                      self.discarded_lb_face3d_context_shading_second_pass_list],
             "second_pass_duration": self.second_pass_duration,
@@ -143,7 +146,8 @@ class BuildingShadingContextFilter(BuildingContextFilter):
                                                              full_urban_canopy_pyvista_mesh,
                                                              keep_shades_from_user=False,
                                                              no_ray_tracing=False,
-                                                             keep_discarded_faces=False):
+                                                             keep_discarded_faces=False,
+                                                             canopy_mesh_bvh=None):
         """
         Perform the second pass of the context filtering for the shading computation. It selects the context surfaces
         for the shading computation using the ray tracing method.
@@ -152,10 +156,14 @@ class BuildingShadingContextFilter(BuildingContextFilter):
         :param context_hb_model_or_lb_polyface3d_list_to_test: list of Honeybee Model of the context building to test. It will
         be more efficient (for the algorithm efficiency as well as the shading computation in EnergyPlus)
         to use HB models with merged facades.
-        :param full_urban_canopy_pyvista_mesh: Pyvista Mesh containing the envelopes of all the in the urban canopy
+        :param full_urban_canopy_pyvista_mesh: Pyvista Mesh containing the envelopes of all the in the urban canopy,
+            not used if canopy_mesh_bvh is provided
         :param keep_shades_from_user: boolean to keep the shades forced by the user
         :param no_ray_tracing: boolean to not perform the ray tracing (for validation purposes)
         :param keep_discarded_faces: boolean to keep the discarded faces
+        :param canopy_mesh_bvh: CanopyMeshBvh of the envelopes of all the buildings in the urban canopy. If provided,
+            all the rays of the target building are cast at once on it instead of one by one with Pyvista.
+            The selected surfaces are the same.
         """
         # Start the timer
         timer = time()
@@ -164,6 +172,14 @@ class BuildingShadingContextFilter(BuildingContextFilter):
             selected_hb_face_lb_face3d_or_hb_aperture_list, discarded_hb_face_lb_face3d_or_hb_aperture_list = self.get_all_the_surfaces(
                 context_hb_model_or_lb_polyface3d_list_to_test=context_hb_model_or_lb_polyface3d_list_to_test,
                 consider_windows=self.consider_windows)
+        elif canopy_mesh_bvh is not None:
+            selected_hb_face_lb_face3d_or_hb_aperture_list, discarded_hb_face_lb_face3d_or_hb_aperture_list = \
+                self.select_non_obstructed_surfaces_of_context_hb_model_for_target_lb_polyface3d_batched(
+                    target_lb_polyface3d_extruded_footprint=target_lb_polyface3d_extruded_footprint,
+                    context_hb_model_or_lb_polyface3d_list_to_test=context_hb_model_or_lb_polyface3d_list_to_test,
+                    canopy_mesh_bvh=canopy_mesh_bvh,
+                    consider_windows=self.consider_windows,
+                    keep_discarded_faces=keep_discarded_faces)
         else:
             selected_hb_face_lb_face3d_or_hb_aperture_list, discarded_hb_face_lb_face3d_or_hb_aperture_list = \
                 self.select_non_obstructed_surfaces_of_context_hb_model_for_target_lb_polyface3d(
@@ -194,6 +210,26 @@ class BuildingShadingContextFilter(BuildingContextFilter):
 
         return nb_context_faces, self.second_pass_duration
 
+    def set_second_pass_results(self, context_shading_hb_shade_list,
+                                discarded_lb_face3d_context_shading_second_pass_list, second_pass_duration,
+                                keep_shades_from_user=False):
+        """
+        Set the results of a second pass of the context filtering performed outside of this object, for instance in
+        a parallel worker.
+        :param context_shading_hb_shade_list: list of Honeybee Shade selected for the shading computation
+        :param discarded_lb_face3d_context_shading_second_pass_list: list of Ladybug Face3D of the discarded surfaces
+        :param second_pass_duration: float, duration of the second pass
+        :param keep_shades_from_user: boolean to keep the shades forced by the user
+        """
+        self.context_shading_hb_shade_list = context_shading_hb_shade_list
+        self.discarded_lb_face3d_context_shading_second_pass_list = discarded_lb_face3d_context_shading_second_pass_list
+        self.second_pass_duration = second_pass_duration
+        # Delete the forced shades from the user if needed
+        if not keep_shades_from_user:
+            self.forced_hb_shades_from_user_list = []
+
+        self.second_pass_done = True
+
     def select_non_obstructed_surfaces_of_context_hb_model_for_target_lb_polyface3d(self,
                                                                                     target_lb_polyface3d_extruded_footprint,
                                                                                     context_hb_model_or_lb_polyface3d_list_to_test,
@@ -212,21 +248,8 @@ class BuildingShadingContextFilter(BuildingContextFilter):
         # Initialization
         selected_hb_face_lb_face3d_or_hb_aperture_list = []
         discarded_hb_face_lb_face3d_or_hb_aperture_list = []
-        hb_face_or_lb_face3d_to_test_list = []
-        # Loop through the context hb model
-        for context_hb_model_or_lb_polyface_3d in context_hb_model_or_lb_polyface3d_list_to_test:
-            if isinstance(context_hb_model_or_lb_polyface_3d, Model):
-                for hb_room in context_hb_model_or_lb_polyface_3d.rooms:
-                    for hb_face in list(hb_room.faces):
-                        if isinstance(hb_face.boundary_condition, Outdoors) and hb_face.area > AREA_TOLERANCE:
-                            hb_face_or_lb_face3d_to_test_list.append(hb_face)
-            elif isinstance(context_hb_model_or_lb_polyface_3d, Polyface3D):
-                for face in list(context_hb_model_or_lb_polyface_3d.faces):
-                    if face.area > AREA_TOLERANCE:
-                        hb_face_or_lb_face3d_to_test_list.append(face)
-            else:
-                raise ValueError(
-                    "The context_hb_model_or_lb_polyface_3d is not a Honeybee Model or a Ladybug Polyface3D")
+        hb_face_or_lb_face3d_to_test_list = self.get_context_hb_face_or_lb_face3d_to_test_list(
+            context_hb_model_or_lb_polyface3d_list_to_test=context_hb_model_or_lb_polyface3d_list_to_test)
 
         # Loop through the rooms of the context Honeybee model
         for face in hb_face_or_lb_face3d_to_test_list:
@@ -260,6 +283,96 @@ class BuildingShadingContextFilter(BuildingContextFilter):
 
         return selected_hb_face_lb_face3d_or_hb_aperture_list, discarded_hb_face_lb_face3d_or_hb_aperture_list
 
+    def select_non_obstructed_surfaces_of_context_hb_model_for_target_lb_polyface3d_batched(self,
+                                                                                            target_lb_polyface3d_extruded_footprint,
+                                                                                            context_hb_model_or_lb_polyface3d_list_to_test,
+                                                                                            canopy_mesh_bvh,
+                                                                                            consider_windows=False,
+                                                                                            keep_discarded_faces=False):
+        """
+        Select the context surfaces that will be used for the shading simulation of the current target building.
+        Same as select_non_obstructed_surfaces_of_context_hb_model_for_target_lb_polyface3d, but all the rays are
+        collected first and cast at once on the bounding volume hierarchy of the urban canopy, instead of one Pyvista
+        call per ray.
+        :param target_lb_polyface3d_extruded_footprint: Ladybug Polyface3D of the target building
+        :param context_hb_model_or_lb_polyface3d_list_to_test: list of Honeybee Model of the context building to test.
+        :param canopy_mesh_bvh: CanopyMeshBvh of the envelopes of all the buildings in the urban canopy
+        :param consider_windows: boolean to consider the windows as well
+        :param keep_discarded_faces: boolean to keep the discarded faces
+        :return selected_hb_face_lb_face3d_or_hb_aperture_list: list of the selected surfaces
+        :return discarded_hb_face_lb_face3d_or_hb_aperture_list: list of the discarded surfaces
+        """
+        # Initialization
+        selected_hb_face_lb_face3d_or_hb_aperture_list = []
+        discarded_hb_face_lb_face3d_or_hb_aperture_list = []
+        # List the surfaces to test, in the same order as the non-batched version
+        surface_to_test_list = []
+        for face in self.get_context_hb_face_or_lb_face3d_to_test_list(
+                context_hb_model_or_lb_polyface3d_list_to_test=context_hb_model_or_lb_polyface3d_list_to_test):
+            surface_to_test_list.append((face, face))
+            # Consider the windows (only if it is a Honeybee Face)
+            if isinstance(face, Face) and consider_windows:
+                for hb_aperture in list(face.apertures):
+                    surface_to_test_list.append((hb_aperture, hb_aperture.geometry))
+        # Extract the geometric properties of the faces once
+        target_face_array_dict = get_face_arrays_for_ray_tracing(
+            hb_face_or_lb_face3d_list=list(target_lb_polyface3d_extruded_footprint.faces))
+        context_face_array_dict = get_face_arrays_for_ray_tracing(
+            hb_face_or_lb_face3d_list=[geometry for _, geometry in surface_to_test_list])
+        # Keep the pairs of context surface and target face facing each other
+        surface_index_array, target_face_index_array = np.nonzero(are_faces_facing_vectorized(
+            emitter_face_array_dict={key: array[None, :] for key, array in target_face_array_dict.items()},
+            receiver_face_array_dict={key: array[:, None] for key, array in context_face_array_dict.items()}))
+        # Generate all the rays, with the index of the surface they are cast to
+        start_point_array, end_point_array = ray_arrays_from_emitter_to_receiver_vectorized(
+            emitter_face_array_dict={key: array[target_face_index_array] for key, array in
+                                     target_face_array_dict.items()},
+            receiver_face_array_dict={key: array[surface_index_array] for key, array in
+                                      context_face_array_dict.items()},
+            number_of_rays=self.number_of_rays)
+        ray_surface_index_array = np.repeat(surface_index_array, start_point_array.shape[1])
+        # Cast all the rays at once
+        is_ray_obstructed_array = canopy_mesh_bvh.are_segments_obstructed(
+            start_point_array=start_point_array.reshape(-1, 3),
+            end_point_array=end_point_array.reshape(-1, 3))
+        # A surface is not obstructed if at least one of its rays is not obstructed
+        number_of_non_obstructed_rays_array = np.bincount(
+            ray_surface_index_array, weights=~is_ray_obstructed_array, minlength=len(surface_to_test_list))
+        for (surface, _), number_of_non_obstructed_rays in zip(surface_to_test_list,
+                                                                number_of_non_obstructed_rays_array):
+            if number_of_non_obstructed_rays > 0:
+                selected_hb_face_lb_face3d_or_hb_aperture_list.append(surface)
+            elif keep_discarded_faces:
+                discarded_hb_face_lb_face3d_or_hb_aperture_list.append(surface)
+
+        return selected_hb_face_lb_face3d_or_hb_aperture_list, discarded_hb_face_lb_face3d_or_hb_aperture_list
+
+    @staticmethod
+    def get_context_hb_face_or_lb_face3d_to_test_list(context_hb_model_or_lb_polyface3d_list_to_test):
+        """
+        Get the outdoor Honeybee faces or Ladybug Face3D of the context buildings to test in the second pass
+        :param context_hb_model_or_lb_polyface3d_list_to_test: list of Honeybee Model or Ladybug Polyface3D of the
+            context buildings to test
+        :return hb_face_or_lb_face3d_to_test_list: list of Honeybee faces or Ladybug Face3D
+        """
+        hb_face_or_lb_face3d_to_test_list = []
+        # Loop through the context hb model
+        for context_hb_model_or_lb_polyface_3d in context_hb_model_or_lb_polyface3d_list_to_test:
+            if isinstance(context_hb_model_or_lb_polyface_3d, Model):
+                for hb_room in context_hb_model_or_lb_polyface_3d.rooms:
+                    for hb_face in list(hb_room.faces):
+                        if isinstance(hb_face.boundary_condition, Outdoors) and hb_face.area > AREA_TOLERANCE:
+                            hb_face_or_lb_face3d_to_test_list.append(hb_face)
+            elif isinstance(context_hb_model_or_lb_polyface_3d, Polyface3D):
+                for face in list(context_hb_model_or_lb_polyface_3d.faces):
+                    if face.area > AREA_TOLERANCE:
+                        hb_face_or_lb_face3d_to_test_list.append(face)
+            else:
+                raise ValueError(
+                    "The context_hb_model_or_lb_polyface_3d is not a Honeybee Model or a Ladybug Polyface3D")
+
+        return hb_face_or_lb_face3d_to_test_list
+
     @staticmethod
     def get_all_the_surfaces(context_hb_model_or_lb_polyface3d_list_to_test, consider_windows=False):
         """
@@ -277,9 +390,10 @@ class BuildingShadingContextFilter(BuildingContextFilter):
         # Loop through the context hb model
         for context_hb_model_or_lb_polyface_3d in context_hb_model_or_lb_polyface3d_list_to_test:
             if isinstance(context_hb_model_or_lb_polyface_3d, Model):
-                hb_face_or_lb_face3d_to_test_list = [hb_face for hb_face in hb_room.faces for hb_room in
-                                                     context_hb_model_or_lb_polyface_3d.rooms if
-                                                     isinstance(face.boundary_condition, Outdoors)]
+                hb_face_or_lb_face3d_to_test_list = [hb_face for hb_room in
+                                                     context_hb_model_or_lb_polyface_3d.rooms for hb_face in
+                                                     hb_room.faces if
+                                                     isinstance(hb_face.boundary_condition, Outdoors)]
             elif isinstance(context_hb_model_or_lb_polyface_3d, Polyface3D):
                 hb_face_or_lb_face3d_to_test_list = list(context_hb_model_or_lb_polyface_3d.faces)
             else:
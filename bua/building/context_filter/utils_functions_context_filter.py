@@ -99,6 +99,25 @@ def make_pyvista_polydata_from_hb_face_or_lb_face3d_list(face_list):
         return []
 
 
+def get_outdoor_faces_from_hb_model_or_lb_polyface3d(lbt_obj):
+    """
+    Get the faces of a Honeybee Model or Ladybug Polyface3D to consider in the mesh of the context buildings.
+    All the faces are kept for a Ladybug Polyface3D, only the faces with an outdoor or ground boundary condition
+    for a Honeybee Model.
+    :param lbt_obj: Honeybee Model or Ladybug Polyface3D
+    :return: list of Honeybee Face or Ladybug Face3D
+    """
+    if isinstance(lbt_obj, Polyface3D):  # The attribute are the same for both
+        return list(lbt_obj.faces)
+    elif isinstance(lbt_obj, Model):
+        # Select only faces with outdoor boundary condition
+        return [hb_face for hb_face in lbt_obj.faces if
+                isinstance(hb_face.boundary_condition, Outdoors) or isinstance(hb_face.boundary_condition, Ground)]
+    else:
+        raise TypeError("The object {} is not a Honeybee Model or a Ladybug Polyface3D, it cannot be handled "
+                        "by the context filter".format(lbt_obj.identifier))
+
+
 def make_pyvista_polydata_from_list_of_hb_model_and_lb_polyface3d(hb_model_and_lb_polyface3d_list):
     """
     Convert a list of Honeybee Model and Ladybug Polyface3D to a unified Pyvista Polydata mesh.
@@ -111,17 +130,7 @@ def make_pyvista_polydata_from_list_of_hb_model_and_lb_polyface3d(hb_model_and_l
     list_of_faces_objects = []
     # Loop over all the elements of the list
     for lbt_obj in hb_model_and_lb_polyface3d_list:
-        if isinstance(lbt_obj, Polyface3D):  # The attribute are the same for both
-            list_of_faces_objects.extend(list(lbt_obj.faces))
-        elif isinstance(lbt_obj, Model):
-            hb_model_face_list = list(lbt_obj.faces)
-            # Select only faces with outdoor boundary condition
-            for hb_face in hb_model_face_list:
-                if isinstance(hb_face.boundary_condition, Outdoors) or isinstance(hb_face.boundary_condition, Ground):
-                    list_of_faces_objects.append(hb_face)
-        else:
-            raise TypeError("The object {} is not a Honeybee Model or a Ladybug Polyface3D, it cannot be handled "
-                            "by the context filter".format(lbt_obj.identifier))
+        list_of_faces_objects.extend(get_outdoor_faces_from_hb_model_or_lb_polyface3d(lbt_obj=lbt_obj))
     # Convert the list of faces to a Pyvista Polydata mesh
     pyvista_polydata_mesh = make_pyvista_polydata_from_hb_face_or_lb_face3d_list(face_list=list_of_faces_objects)
 
@@ -244,6 +253,106 @@ def are_hb_face_or_lb_face3d_facing(face_emitter, face_receiver):
         return False
 
 
+def get_face_arrays_for_ray_tracing(hb_face_or_lb_face3d_list):
+    """
+    Extract the geometric properties of a list of Honeybee Faces or Ladybug Face3D used to check if the surfaces are
+    facing each other and to generate the rays between them, in numpy arrays. It avoids computing them again for each
+    pair of surfaces.
+    :param hb_face_or_lb_face3d_list: list of Honeybee Faces or Ladybug Face3D
+    :return: face_array_dict: dict of numpy arrays, with the keys "centroid", "normal", "max_z", "lower_left_corner"
+        and "lower_right_corner"
+    """
+    face3d_list = [face.geometry if isinstance(face, Face) else face for face in hb_face_or_lb_face3d_list]
+    number_of_faces = len(face3d_list)
+    face_array_dict = {
+        "centroid": np.array([convert_point3d_to_list(face3d.centroid) for face3d in face3d_list], dtype=float),
+        "normal": np.array([convert_point3d_to_list(face3d.normal) for face3d in face3d_list], dtype=float),
+        "max_z": np.array([face3d.max.z for face3d in face3d_list], dtype=float),
+        "lower_left_corner": np.array([convert_point3d_to_list(face3d.lower_left_corner) for face3d in face3d_list],
+                                      dtype=float),
+        "lower_right_corner": np.array([convert_point3d_to_list(face3d.lower_right_corner) for face3d in face3d_list],
+                                       dtype=float)
+    }
+    for key, array in face_array_dict.items():
+        if key != "max_z":
+            face_array_dict[key] = array.reshape(number_of_faces, 3)
+
+    return face_array_dict
+
+
+def are_faces_facing_vectorized(emitter_face_array_dict, receiver_face_array_dict):
+    """
+    Vectorized version of are_hb_face_or_lb_face3d_facing, checking pairs of emitter and receiver faces at once.
+    The arrays of the emitters and the receivers are paired by index (or broadcast).
+    :param emitter_face_array_dict: dict of numpy arrays of the emitter faces, from get_face_arrays_for_ray_tracing
+    :param receiver_face_array_dict: dict of numpy arrays of the receiver faces, from get_face_arrays_for_ray_tracing
+    :return: boolean numpy array, True if the surfaces are facing each other
+    """
+    emitter_normal_array = emitter_face_array_dict["normal"]
+    receiver_normal_array = receiver_face_array_dict["normal"]
+    # Special treatment for the roofs, same as the non vectorized version
+    is_receiver_roof_array = (receiver_normal_array[..., 0] == 0) & (receiver_normal_array[..., 1] == 0) & (
+            receiver_normal_array[..., 2] > 0)
+    is_roof_lower_array = receiver_face_array_dict["max_z"] < emitter_face_array_dict["max_z"]
+    # vectors from centroid_2 to centroid_1
+    vector_21_array = emitter_face_array_dict["centroid"] - receiver_face_array_dict["centroid"]
+    dot_product_sup_array = receiver_normal_array[..., 0] * vector_21_array[..., 0] + receiver_normal_array[..., 1] * \
+        vector_21_array[..., 1] + receiver_normal_array[..., 2] * vector_21_array[..., 2]
+    dot_product_inf_array = emitter_normal_array[..., 0] * vector_21_array[..., 0] + emitter_normal_array[..., 1] * \
+        vector_21_array[..., 1] + emitter_normal_array[..., 2] * vector_21_array[..., 2]
+    is_facing_array = (dot_product_sup_array > 0) & (dot_product_inf_array < 0)
+
+    return np.where(is_receiver_roof_array, is_roof_lower_array, is_facing_array)
+
+
+def ray_arrays_from_emitter_to_receiver_vectorized(emitter_face_array_dict, receiver_face_array_dict,
+                                                   number_of_rays=3):
+    """
+    Vectorized version of ray_list_from_emitter_to_receiver (with the rays excluding the surfaces and lowered on the
+    z-axis), generating the rays for pairs of emitter and receiver faces at once. The arrays of the emitters and the
+    receivers are paired by index.
+    :param emitter_face_array_dict: dict of numpy arrays of the emitter faces, from get_face_arrays_for_ray_tracing
+    :param receiver_face_array_dict: dict of numpy arrays of the receiver faces, from get_face_arrays_for_ray_tracing
+    :param number_of_rays: int, number of rays per pair of faces
+    :return: start_point_array: numpy array of shape (number of pairs, number_of_rays, 3), start points of the rays
+    :return: end_point_array: numpy array of shape (number of pairs, number_of_rays, 3), end points of the rays
+    """
+    # z coordinate of the start and end of the rays
+    z_receiver_array = receiver_face_array_dict["max_z"]
+    z_emitter_array = np.minimum(emitter_face_array_dict["max_z"], z_receiver_array)
+    # start vertices, as in the non vectorized version the z coordinate of the right corner is not corrected
+    start_point_l_array = emitter_face_array_dict["lower_left_corner"].copy()
+    start_point_r_array = emitter_face_array_dict["lower_right_corner"].copy()
+    start_point_c_array = (start_point_l_array + start_point_r_array) / 2.
+    start_point_l_array[:, 2], start_point_c_array[:, 2] = z_emitter_array, z_emitter_array
+    # end vertices
+    end_point_l_array = receiver_face_array_dict["lower_left_corner"].copy()
+    end_point_r_array = receiver_face_array_dict["lower_right_corner"].copy()
+    end_point_c_array = (end_point_l_array + end_point_r_array) / 2.
+    end_point_l_array[:, 2], end_point_c_array[:, 2] = z_receiver_array, z_receiver_array
+    # rays, in the same order as the non vectorized version
+    start_point_array = np.stack([start_point_c_array, start_point_c_array, start_point_c_array, start_point_l_array,
+                                  start_point_r_array, start_point_l_array, start_point_r_array, start_point_l_array,
+                                  start_point_r_array], axis=1)[:, :number_of_rays]
+    end_point_array = np.stack([end_point_c_array, end_point_l_array, end_point_r_array, end_point_l_array,
+                                end_point_r_array, end_point_c_array, end_point_c_array, end_point_r_array,
+                                end_point_l_array], axis=1)[:, :number_of_rays]
+    # Exclude the surfaces from the rays, as in excluding_surfaces_from_ray
+    ray_vector_array = end_point_array - start_point_array
+    unit_vector_array = ray_vector_array / np.sqrt(np.sum(ray_vector_array * ray_vector_array, axis=-1))[..., None]
+    new_start_point_array = start_point_array + unit_vector_array * 0.05
+    new_end_point_array = end_point_array - unit_vector_array * 0.05
+    new_start_point_array[..., 2], new_end_point_array[..., 2] = start_point_array[..., 2], end_point_array[..., 2]
+    # Raise the rays toward the roofs and lower the ones toward the facades, as in correct_rays
+    receiver_normal_array = receiver_face_array_dict["normal"]
+    is_receiver_vertical_array = (receiver_normal_array[:, 0] == 0) & (receiver_normal_array[:, 1] == 0)
+    new_start_point_array[is_receiver_vertical_array, :, 2] += 0.1
+    new_end_point_array[is_receiver_vertical_array, :, 2] += 0.1
+    new_end_point_array[~is_receiver_vertical_array, :, 2] -= 0.1
+
+    return new_start_point_array, new_end_point_array
+
+
 def correct_rays(ray_list, face_receiver, exclude_surface_from_ray=True, lower_ray_z_axis=True):
     """ Correct the rays to avoid considering the sender and receiver in the raytracing obstruction detection
         :param ray_list: list of rays
@@ -2,8 +2,16 @@
 Functions used in the first pass of the context filtering algorithm, the minimum view factor criterion.
 """
 
+import numpy as np
+
 from math import sqrt, atan, log, pi
 
+from bua.building.context_filter.utils_functions_context_filter import is_vector3d_vertical
+
+# Maximum number of target/context face pairs evaluated at once by the vectorized engine, to limit the memory usage
+default_max_number_of_pairs_per_block = 2 ** 22
+
+
 def distance_between_lb_point3d(pt_1, pt_2):
     """ 
     Distance between 2 Ladybug geometry Point3D 
@@ -35,5 +43,111 @@ def majorized_vf_between_2_surfaces(point3d_centroid_1, area_1, point3d_centroid
     v = sqrt(y ** 2 + 4)
     s = u * (x * atan(x / u) - y * atan(y / u))
     t = v * (x * atan(x / v) - y * atan(y / v))
+    # The terms cancel out at large distances, the rounding errors are bounded by the view factor from the closest
+    # point of the surface 1 to the surface 2
+    return min(1 / (pi * w_1 ** 2) * (log(p / q) + s - t), area_2 / (pi * d ** 2))
+
+
+def majorized_vf_between_2_surfaces_vectorized(distance_array, area_1_array, area_2_array):
+    """
+    Vectorized version of majorized_vf_between_2_surfaces, working on numpy arrays of distances and areas.
+    The arrays are broadcast together, so that a full matrix of view factors can be computed in one call.
+    :param distance_array: numpy array, distances between the centroids of the surfaces
+    :param area_1_array: numpy array, areas of the surfaces 1 (emitting surfaces)
+    :param area_2_array: numpy array, areas of the surfaces 2 (receiving surfaces)
+    :return: numpy array of the majorized view factors
+    """
+    ## distance between the centroids, avoid cases when surfaces are overlapping
+    d = np.where(distance_array == 0, 0.01, distance_array)
+    ## intermediary variable for the computation
+    w_1 = np.sqrt(area_1_array) / d  # "normalized width" of the surface 1
+    w_2 = np.sqrt(area_2_array) / d  # "normalized width" of the surface 2
+    x = w_2 - w_1
+    y = w_2 + w_1
+    p = (w_1 ** 2 + w_2 ** 2 + 2) ** 2
+    q = (x ** 2 + 2) * (y ** 2 + 2)
+    u = np.sqrt(x ** 2 + 4)
+    v = np.sqrt(y ** 2 + 4)
+    s = u * (x * np.arctan(x / u) - y * np.arctan(y / u))
+    t = v * (x * np.arctan(x / v) - y * np.arctan(y / v))
+    # The terms cancel out at large distances, the rounding errors are bounded by the view factor from the closest
+    # point of the surface 1 to the surface 2
+    return np.minimum(1 / (pi * w_1 ** 2) * (np.log(p / q) + s - t), area_2_array / (pi * d ** 2))
+
+
+def lb_face3d_list_to_centroid_and_area_arrays(lb_face3d_list):
+    """
+    Pack the centroids and areas of a list of Ladybug Face3D into numpy arrays
+    :param lb_face3d_list: list of Ladybug Face3D
+    :return centroid_array: numpy array of shape (n, 3) of the centroids of the faces
+    :return area_array: numpy array of shape (n,) of the areas of the faces
+    """
+    centroid_array = np.array([[face.centroid.x, face.centroid.y, face.centroid.z] for face in lb_face3d_list],
+                              dtype=float).reshape(-1, 3)
+    area_array = np.array([face.area for face in lb_face3d_list], dtype=float)
+
+    return centroid_array, area_array
+
+
+def make_bounding_box_face_arrays(uc_building_bounding_box_list):
+    """
+    Pack the non-horizontal faces of the oriented bounding boxes of the buildings into numpy arrays, to be used by the
+    vectorized first pass of the context filtering. The horizontal faces (roof and ground) are excluded, as in
+    the original first pass.
+    :param uc_building_bounding_box_list: list of Ladybug polyface3d of the oriented bounding box of the buildings
+    :return centroid_array: numpy array of shape (n, 3) of the centroids of the faces
+    :return area_array: numpy array of shape (n,) of the areas of the faces
+    :return building_index_array: numpy array of shape (n,) of the index of the building in
+        uc_building_bounding_box_list each face belongs to
+    """
+    lb_face3d_list = []
+    building_index_list = []
+    for building_index, lb_polyface3d_oriented_bounding_box in enumerate(uc_building_bounding_box_list):
+        for lb_face3d in lb_polyface3d_oriented_bounding_box.faces:
+            if not is_vector3d_vertical(lb_face3d.normal):  # exclude the horizontal/roof/ground surfaces
+                lb_face3d_list.append(lb_face3d)
+                building_index_list.append(building_index)
+    centroid_array, area_array = lb_face3d_list_to_centroid_and_area_arrays(lb_face3d_list)
+
+    return centroid_array, area_array, np.array(building_index_list, dtype=int)
+
+
+def are_groups_verifying_mvfc(target_centroid_array, target_area_array, context_centroid_array,
+                              context_area_array, context_group_index_array, number_of_groups, min_vf_criterion,
+                              max_number_of_pairs_per_block=default_max_number_of_pairs_per_block):
+    """
+    Check for each group of context faces (usually the faces of the bounding box of a building) if at least one of its
+    faces verifies the minimum view factor criterion with at least one of the target faces.
+    The majorized view factors are computed by blocks of context faces to limit the memory usage.
+    :param target_centroid_array: numpy array of shape (n, 3) of the centroids of the target faces
+    :param target_area_array: numpy array of shape (n,) of the areas of the target faces
+    :param context_centroid_array: numpy array of shape (m, 3) of the centroids of the context faces
+    :param context_area_array: numpy array of shape (m,) of the areas of the context faces
+    :param context_group_index_array: numpy array of shape (m,) of the index of the group of each context face
+    :param number_of_groups: int, number of groups
+    :param min_vf_criterion: float, minimum view factor criterion
+    :param max_number_of_pairs_per_block: int, maximum number of face pairs evaluated at once
+    :return: numpy array of booleans of shape (number_of_groups,), True if the group verifies the criterion
+    """
+    is_group_verifying_array = np.zeros(number_of_groups, dtype=bool)
+    if len(target_area_array) == 0 or len(context_area_array) == 0:
+        return is_group_verifying_array
+    block_size = max(1, max_number_of_pairs_per_block // len(target_area_array))
+    for start in range(0, len(context_area_array), block_size):
+        group_index_array = context_group_index_array[start:start + block_size]
+        # Skip the faces of the groups that already verify the criterion
+        to_test_mask = ~is_group_verifying_array[group_index_array]
+        if not to_test_mask.any():
+            continue
+        centroid_block = context_centroid_array[start:start + block_size][to_test_mask]
+        area_block = context_area_array[start:start + block_size][to_test_mask]
+        # Distance matrix between the target faces (rows) and the context faces (columns)
+        distance_matrix = np.sqrt(
+            np.sum((target_centroid_array[:, None, :] - centroid_block[None, :, :]) ** 2, axis=2))
+        majorized_vf_matrix = majorized_vf_between_2_surfaces_vectorized(distance_array=distance_matrix,
+                                                                         area_1_array=target_area_array[:, None],
+                                                                         area_2_array=area_block[None, :])
+        is_face_verifying_array = np.any(majorized_vf_matrix > min_vf_criterion, axis=0)
+        is_group_verifying_array[group_index_array[to_test_mask][is_face_verifying_array]] = True
 
-    return 1 / (pi * w_1 ** 2) * (log(p / q) + s - t)
+    return is_group_verifying_array
@@ -0,0 +1,110 @@
+"""
+Functions to cast batches of rays (segments) on a triangulated mesh with numpy, used for the second pass of the
+context filtering.
+"""
+
+import numpy as np
+
+# Tolerance on the determinant to consider a ray parallel to a triangle
+parallel_tolerance = 1e-12
+
+
+def make_triangle_arrays_from_pyvista_mesh(pyvista_mesh):
+    """
+    Triangulate a Pyvista PolyData mesh and convert it to numpy arrays, in the format used by the Moller-Trumbore
+    intersection algorithm.
+    :param pyvista_mesh: Pyvista PolyData mesh
+    :return: vertex_0_array: numpy array of shape (n, 3) of the first vertex of the triangles
+    :return: edge_1_array: numpy array of shape (n, 3) of the first edge of the triangles (vertex 1 - vertex 0)
+    :return: edge_2_array: numpy array of shape (n, 3) of the second edge of the triangles (vertex 2 - vertex 0)
+    """
+    if pyvista_mesh is None or pyvista_mesh == [] or pyvista_mesh.n_cells == 0:
+        empty_array = np.zeros((0, 3))
+        return empty_array, empty_array.copy(), empty_array.copy()
+    triangulated_mesh = pyvista_mesh.triangulate()
+    point_array = np.asarray(triangulated_mesh.points, dtype=float)
+    # Faces of a triangulated mesh are in the format [3, i0, i1, i2, 3, i0, i1, i2, ...]
+    triangle_index_array = np.asarray(triangulated_mesh.faces).reshape(-1, 4)[:, 1:]
+    vertex_0_array = point_array[triangle_index_array[:, 0]]
+    edge_1_array = point_array[triangle_index_array[:, 1]] - vertex_0_array
+    edge_2_array = point_array[triangle_index_array[:, 2]] - vertex_0_array
+
+    return vertex_0_array, edge_1_array, edge_2_array
+
+
+def expand_index_ranges(start_index_array, stop_index_array):
+    """
+    Expand ranges of integers given by their start and stop indices into flat arrays.
+    For instance, the ranges [2, 4[ and [7, 8[ give the owner array [0, 0, 1] and the index array [2, 3, 7].
+    :param start_index_array: numpy array of int, start index of the ranges (included)
+    :param stop_index_array: numpy array of int, stop index of the ranges (excluded)
+    :return: owner_array: numpy array of int, index of the range of each element
+    :return: index_array: numpy array of int, the integers of the ranges
+    """
+    count_array = np.maximum(stop_index_array - start_index_array, 0)
+    owner_array = np.repeat(np.arange(len(count_array)), count_array)
+    offset_array = np.arange(owner_array.size) - np.repeat(np.cumsum(count_array) - count_array, count_array)
+
+    return owner_array, start_index_array[owner_array] + offset_array
+
+
+def are_segments_intersecting_boxes(start_point_array, end_point_array, box_min_array, box_max_array):
+    """
+    Check for each pair of segment and axis-aligned box if the segment crosses the box, using the slab method.
+    The arrays of the segments and the boxes are paired by index.
+    :param start_point_array: numpy array of shape (n, 3) of the start points of the segments
+    :param end_point_array: numpy array of shape (n, 3) of the end points of the segments
+    :param box_min_array: numpy array of shape (n, 3) of the minimum corners of the boxes
+    :param box_max_array: numpy array of shape (n, 3) of the maximum corners of the boxes
+    :return: boolean numpy array of shape (n,), True if the segment crosses the box
+    """
+    direction_array = end_point_array - start_point_array
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse_direction_array = 1. / direction_array
+        t_1_array = (box_min_array - start_point_array) * inverse_direction_array
+        t_2_array = (box_max_array - start_point_array) * inverse_direction_array
+    t_min_array = np.minimum(t_1_array, t_2_array)
+    t_max_array = np.maximum(t_1_array, t_2_array)
+    # Segments parallel to a slab cross it everywhere if they start inside it, nowhere otherwise
+    is_parallel_array = direction_array == 0.
+    if is_parallel_array.any():
+        is_inside_slab_array = (start_point_array >= box_min_array) & (start_point_array <= box_max_array)
+        t_min_array[is_parallel_array] = np.where(is_inside_slab_array[is_parallel_array], -np.inf, np.inf)
+        t_max_array[is_parallel_array] = np.where(is_inside_slab_array[is_parallel_array], np.inf, -np.inf)
+    t_entry_array = t_min_array.max(axis=1)
+    t_exit_array = t_max_array.min(axis=1)
+
+    return (t_exit_array >= np.maximum(t_entry_array, 0.)) & (t_entry_array <= 1.)
+
+
+def are_segments_intersecting_triangles(start_point_array, end_point_array, vertex_0_array, edge_1_array,
+                                        edge_2_array):
+    """
+    Check for each pair of segment and triangle if the segment intersects the triangle, using the Moller-Trumbore
+    algorithm. The arrays of the segments and the triangles are paired by index.
+    :param start_point_array: numpy array of shape (n, 3) of the start points of the segments
+    :param end_point_array: numpy array of shape (n, 3) of the end points of the segments
+    :param vertex_0_array: numpy array of shape (n, 3) of the first vertex of the triangles
+    :param edge_1_array: numpy array of shape (n, 3) of the first edge of the triangles
+    :param edge_2_array: numpy array of shape (n, 3) of the second edge of the triangles
+    :return: boolean numpy array of shape (n,), True if the segment intersects the triangle
+    """
+    # The cross and dot products are written by component, much faster than np.cross and np.sum on large arrays
+    d_x, d_y, d_z = (end_point_array - start_point_array).T
+    e1_x, e1_y, e1_z = edge_1_array.T
+    e2_x, e2_y, e2_z = edge_2_array.T
+    p_x, p_y, p_z = d_y * e2_z - d_z * e2_y, d_z * e2_x - d_x * e2_z, d_x * e2_y - d_y * e2_x
+    determinant_array = e1_x * p_x + e1_y * p_y + e1_z * p_z
+    # Ignore the rays parallel to the triangles
+    is_not_parallel_array = np.abs(determinant_array) > parallel_tolerance
+    inverse_determinant_array = np.divide(1., determinant_array, out=np.zeros_like(determinant_array),
+                                          where=is_not_parallel_array)
+    t_x, t_y, t_z = (start_point_array - vertex_0_array).T
+    u_array = (t_x * p_x + t_y * p_y + t_z * p_z) * inverse_determinant_array
+    q_x, q_y, q_z = t_y * e1_z - t_z * e1_y, t_z * e1_x - t_x * e1_z, t_x * e1_y - t_y * e1_x
+    v_array = (d_x * q_x + d_y * q_y + d_z * q_z) * inverse_determinant_array
+    # Position of the intersection along the segment, between 0 (start) and 1 (end)
+    t_array = (e2_x * q_x + e2_y * q_y + e2_z * q_z) * inverse_determinant_array
+
+    return is_not_parallel_array & (u_array >= 0.) & (v_array >= 0.) & (u_array + v_array <= 1.) & (
+            t_array >= 0.) & (t_array <= 1.)
@@ -11,7 +11,7 @@ from time import time
 from copy import deepcopy
 
 from honeybee.model import Model
-from honeybee_energy.run import to_openstudio_osw, run_osw, run_idf
+from honeybee_energy.run import to_openstudio_osw, run_osw, run_idf, _output_openstudio_files
 from honeybee_energy.result.eui import eui_from_sql
 
 user_logger = logging.getLogger("user")
@@ -101,6 +101,24 @@ class BuildingEnergySimulation:
         :param hb_model_obj: Honeybee Model object
         :param silent: bool, if True, the EnergyPlus output will not be printed in the console
         """
+        path_osw_file = self.write_osw_for_openstudio(
+            path_building_bes_temp_folder=path_building_bes_temp_folder, path_epw_file=path_epw_file,
+            path_hbjson_simulation_parameters=path_hbjson_simulation_parameters, hb_model_obj=hb_model_obj)
+        ## Run simulation in OpenStudio to generate IDF ##
+        run_osw(path_osw_file, silent=silent)
+
+        self.idf_generated = True
+
+    def write_osw_for_openstudio(self, path_building_bes_temp_folder, path_epw_file,
+                                 path_hbjson_simulation_parameters, hb_model_obj: Model):
+        """
+        Write the hbjson file of the building and the OpenStudio workflow (osw) file converting it to an idf file.
+        :param path_building_bes_temp_folder: str, path to the folder where the idf file will be saved
+        :param path_epw_file: str, path to the epw file
+        :param path_hbjson_simulation_parameters: str, path to the simulation parameter file
+        :param hb_model_obj: Honeybee Model object
+        :return path_osw_file: str, path to the osw file
+        """
         hb_model_copy = hb_model_obj.duplicate()
         if len(hb_model_copy.stories) == 0 and len(hb_model_copy.rooms) != 0:
             hb_model_copy.assign_stories_by_floor_height()
@@ -116,12 +134,25 @@ class BuildingEnergySimulation:
         # Export the Honeybee Model to a hbjson file in the path_building_bes_temp_folder
         # path_hbjson_file = hb_model_obj.to_hbjson(name=self.building_id, folder=path_building_bes_temp_folder)
 
-        from_hbjson_to_idf(dir_to_write_idf_in=path_building_bes_temp_folder,
-                           path_hbjson_file=path_hbjson_file,
-                           path_epw_file=path_epw_file,
-                           path_hbjson_simulation_parameters=path_hbjson_simulation_parameters, silent=silent)
+        # pass the hbjson file to Openstudio to convert it to idf
+        return to_openstudio_osw(osw_directory=path_building_bes_temp_folder,
+                                 model_path=path_hbjson_file,
+                                 sim_par_json_path=path_hbjson_simulation_parameters,
+                                 epw_file=path_epw_file)
+
+    def check_idf_generated_by_openstudio(self, path_building_bes_temp_folder):
+        """
+        Check that OpenStudio generated the idf file when the osw file was run outside of Honeybee, and replace the
+        idf file by the pre-processed one with the function used by Honeybee after running the osw file.
+        :param path_building_bes_temp_folder: str, path to the folder where the idf file was saved
+        :return: bool, True if the idf file was generated
+        """
+        _, path_idf_file = _output_openstudio_files(path_building_bes_temp_folder)
+        if path_idf_file is None:
+            return False
 
         self.idf_generated = True
+        return True
 
     def run_idf_with_energyplus(self, path_building_bes_temp_folder, path_epw_file, silent=False):
         """
@@ -141,6 +172,20 @@ class BuildingEnergySimulation:
 
         self.has_run = True
 
+    def check_energyplus_run(self, path_building_bes_temp_folder, sim_duration):
+        """
+        Check that EnergyPlus ran when the idf file was run outside of Honeybee, and set the duration of the
+        simulation.
+        :param path_building_bes_temp_folder: str, path to the folder where the idf file was saved
+        :param sim_duration: float, duration of the simulation in seconds
+        :return: bool, True if the sql result file was generated
+        """
+        if not os.path.isfile(os.path.join(path_building_bes_temp_folder, "run", "eplusout.sql")):
+            return False
+        self.sim_duration = sim_duration
+        self.has_run = True
+        return True
+
     def move_result_files_from_temp_to_result_folder(self, path_ubes_temp_sim_folder,
                                                      path_ubes_sim_result_folder):
         """
@@ -254,20 +299,6 @@ class BuildingEnergySimulation:
         return self.bes_results_dict["total"]["yearly"]
 
 
-def from_hbjson_to_idf(dir_to_write_idf_in, path_hbjson_file, path_epw_file,
-                       path_hbjson_simulation_parameters, silent=False):
-    """
-    Convert a hbjson file to an idf file (input for EnergyPlus)
-    """
-    # pass the hbjson file to Openstudio to convert it to idf
-    osw = to_openstudio_osw(osw_directory=dir_to_write_idf_in,
-                            model_path=path_hbjson_file,
-                            sim_par_json_path=path_hbjson_simulation_parameters,
-                            epw_file=path_epw_file)
-    ## Run simulation in OpenStudio to generate IDF ##
-    (path_osm, path_idf) = run_osw(osw, silent=silent)
-
-
 def bes_result_dict_to_csv(bes_results_dict, path_csv_file):
     """
     Export the results to a csv file.
@@ -1,19 +1,21 @@
 import numpy as np
-from math import pi, cos, sin
+from math import cos, sin
 
 from shapely.geometry import Polygon, MultiPolygon
-from shapely import coverage_union, normalize
+from shapely import coverage_union_all, union_all, normalize
+from shapely.errors import GEOSException
 from ladybug_geometry.geometry3d.polyface import Polyface3D
 from ladybug_geometry.geometry3d.face import Face3D
 from ladybug_geometry.geometry3d.pointvector import Point3D, Vector3D
 from ladybug_geometry.geometry3d.plane import Plane
-from ladybug_geometry.bounding import bounding_rectangle_extents
 
 from honeybee.room import Room
 from honeybee.model import Model
 from honeybee.boundarycondition import Outdoors, Ground
 from honeybee.facetype import Wall, RoofCeiling
 
+from bua.building.utils_buildings.lbt_obj_methods.lb_face_addons import \
+    get_oriented_bounding_rectangle_of_footprint_array, get_footprint_array_from_LB_Face3D
 from bua.utils.utils_constants import TOLERANCE_LBT
 
 
@@ -67,42 +69,19 @@ def merge_facades_and_roof_faces_in_hb_model(hb_model_obj, orient_roof_mesh_to_a
 
     # Merge coplanar faces
     merged_multipolygon_and_matrix = []  # List of merged faces
-    used_faces = []  # List of used faces
-
-    # Loop through all the faces
-    for index, face in enumerate(lb_face3d_list):
-        # print(index)
-        # Check if the face has been used already, and don't reuse it if so
-        if index not in used_faces:
-            plane = face.plane  # Get the plane of the face
-            origin_new_coordinate_system = plane.o  # Get the origin of the new coordinate system
-            # Make a rotation matrix from the plane to project the other faces on the plane
-            rotation_matrix = make_rotation_matrix(plane)
-            # Make a Polygon 2d from the face
-            new_shapely_multipolygon_2d = make_shapely_2d_polygon_from_lb_face(face)  # Initialize the new multipolygon
-            used_faces.append(index)
-            for index_face_to_merge, face_to_merge in enumerate(lb_face3d_list):  # Loop through all the faces
-                # Merge only if the face is not used and is coplanar to the first face
-                if index_face_to_merge not in used_faces and face.plane.is_coplanar_tolerance(
-                        face_to_merge.plane,
-                        tolerance=0.01,
-                        angle_tolerance=0.1):
-                    # Convert the face into shapely polygon
-                    shapely_polygon_2d_to_merge = make_shapely_2d_polygon_from_lb_face_in_plan(face_to_merge,
-                                                                                               rotation_matrix,
-                                                                                               origin_new_coordinate_system)
-                    # Merge the new polygon with the previous one
-                    new_shapely_multipolygon_2d = normalize(coverage_union(new_shapely_multipolygon_2d,
-                                                                           shapely_polygon_2d_to_merge))
-                    # Add the face to the list of used faces
-                    used_faces.append(index_face_to_merge)
-                else:
-                    pass
-            # Add the merged polygon to the list of merged polygons
-            merged_multipolygon_and_matrix.append(
-                (new_shapely_multipolygon_2d, rotation_matrix, origin_new_coordinate_system, plane))
-        else:
-            pass
+    for face_group in group_coplanar_lb_face3d(lb_face3d_list, tolerance=0.01, angle_tolerance=0.1):
+        plane = face_group[0].plane  # Get the plane of the first face of the group
+        origin_new_coordinate_system = plane.o  # Get the origin of the new coordinate system
+        # Make a rotation matrix from the plane to project the other faces on the plane
+        rotation_matrix = make_rotation_matrix(plane)
+        # Project all the faces of the group on the plane and merge them at once
+        shapely_polygon_2d_list = [make_shapely_2d_polygon_from_lb_face(face_group[0])] + [
+            make_shapely_2d_polygon_from_lb_face_in_plan(face_to_merge, rotation_matrix, origin_new_coordinate_system)
+            for face_to_merge in face_group[1:]]
+        new_shapely_multipolygon_2d = merge_shapely_2d_polygon_list(shapely_polygon_2d_list)
+        # Add the merged polygon to the list of merged polygons
+        merged_multipolygon_and_matrix.append(
+            (new_shapely_multipolygon_2d, rotation_matrix, origin_new_coordinate_system, plane))
 
     # Convert back to LB Face3D format
     new_lb_face3d_list = []  # Initialize the list of new LB Face3D
@@ -139,6 +118,75 @@ def merge_facades_and_roof_faces_in_hb_model(hb_model_obj, orient_roof_mesh_to_a
     return merged_faces_hb_model_obj
 
 
+def group_coplanar_lb_face3d(lb_face3d_list, tolerance=0.01, angle_tolerance=0.1):
+    """
+    Group the coplanar faces. Each face is added to the group of the first face, in the order of the list, that is
+    coplanar with it, or starts a new group. The first faces of the groups are stored in a hash map by a quantized
+    key of their plane, the normal and the offset of the plane, so that each face is only compared to the first faces
+    of the groups in the neighbouring cells of the key instead of all the other faces.
+    :param lb_face3d_list: list of Ladybug Face3D
+    :param tolerance: float: distance between the planes under which they are considered coplanar
+    :param angle_tolerance: float: angle in radians between the normals under which the planes are considered coplanar
+    :return face_group_list: list of list of Ladybug Face3D, the first face of each group gives its plane
+    """
+    if not lb_face3d_list:
+        return []
+    normal_array = np.array([[face.plane.n.x, face.plane.n.y, face.plane.n.z] for face in lb_face3d_list])
+    origin_array = np.array([[face.plane.o.x, face.plane.o.y, face.plane.o.z] for face in lb_face3d_list])
+    # Offsets of the planes relative to the first origin, to keep them small. The offsets of coplanar planes differ
+    # by less than the tolerance plus the difference of their normals times the distance of their origin to the
+    # reference, the size of the cells is thus large enough for coplanar planes to be in neighbouring cells
+    origin_array = origin_array - origin_array[0]
+    offset_array = np.einsum("ij,ij->i", normal_array, origin_array)
+    offset_cell_size = tolerance + angle_tolerance * max(float(np.linalg.norm(origin_array, axis=1).max()), 1.)
+    # The chord between two unit normals is lower than their angle, the normals of coplanar planes are thus in
+    # neighbouring cells of size angle_tolerance
+    normal_key_array = np.floor(normal_array / angle_tolerance).astype(int)
+    offset_key_array = np.floor(offset_array / offset_cell_size).astype(int)
+    reversed_normal_key_array = np.floor(-normal_array / angle_tolerance).astype(int)
+    reversed_offset_key_array = np.floor(-offset_array / offset_cell_size).astype(int)
+    neighbour_shift_list = [(i, j, k, l) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1) for l in
+                            (-1, 0, 1)]
+
+    group_index_list_by_key_dict = {}  # index of the groups by plane key of their first face
+    face_group_list = []
+    for index, face in enumerate(lb_face3d_list):
+        # The planes with a reversed normal are also coplanar
+        candidate_group_index_set = set()
+        for normal_key, offset_key in [(normal_key_array[index], offset_key_array[index]),
+                                       (reversed_normal_key_array[index], reversed_offset_key_array[index])]:
+            for shift_x, shift_y, shift_z, shift_offset in neighbour_shift_list:
+                candidate_group_index_set.update(group_index_list_by_key_dict.get(
+                    (normal_key[0] + shift_x, normal_key[1] + shift_y, normal_key[2] + shift_z,
+                     offset_key + shift_offset), []))
+        for group_index in sorted(candidate_group_index_set):
+            if face_group_list[group_index][0].plane.is_coplanar_tolerance(face.plane, tolerance=tolerance,
+                                                                           angle_tolerance=angle_tolerance):
+                face_group_list[group_index].append(face)
+                break
+        else:
+            key = (*normal_key_array[index].tolist(), int(offset_key_array[index]))
+            group_index_list_by_key_dict.setdefault(key, []).append(len(face_group_list))
+            face_group_list.append([face])
+
+    return face_group_list
+
+
+def merge_shapely_2d_polygon_list(shapely_polygon_2d_list):
+    """
+    Merge coplanar polygons with a single union. The faces of a HB model are not supposed to overlap, the faster
+    coverage union is used, the regular union is only used if shapely cannot process the polygons with it.
+    :param shapely_polygon_2d_list: list of shapely Polygon
+    :return: shapely Polygon or MultiPolygon
+    """
+    if len(shapely_polygon_2d_list) == 1:
+        return shapely_polygon_2d_list[0]
+    try:
+        return normalize(coverage_union_all(shapely_polygon_2d_list))
+    except GEOSException:
+        return normalize(union_all(shapely_polygon_2d_list))
+
+
 def make_shapely_2d_polygon_from_lb_face(lb_face_3D):
     """Convert a Ladybug Face to a Shapely Polygon."""
     # convert vertices into tuples
@@ -202,25 +250,13 @@ def make_lb_face_from_shapely_2d_polygon(polygon, rotation_matrix, origin_new_co
     return lb_face_footprint
 
 
-def get_orientation_of_lb_face3d(LB_Face3D_footprint, n_step=360):
-    """ Get the Face3D oriented bounding rectangle/box of a Face3D geometry
+def get_orientation_of_lb_face3d(LB_Face3D_footprint):
+    """ Get the orientation of the oriented bounding rectangle of a Face3D geometry, projected on the XY plane
     :param LB_Face3D_footprint: Ladybug Face3D
-    :param n_step: int : number of steps for the angle of rotation of the bounding box
-    :return: LB_Face3D_bounding_rectangle: Ladybug Face3D : oriented bounding rectangle
+    :return: angle: float : angle of rotation of the bounding rectangle in radians
     """
-    # Initialization
-    bounding_rectangle_area_list = []  # List of the area of the bounding rectangle for each angle at each step
-    angle = 0  # Initial angle
-    step = 2 * pi / n_step  # Step of the angle
-    # Loop for all the angles
-    for i in range(n_step):
-        # Get the length and width of the bounding rectangle
-        # Geometries accepts only a list of geometry, so we need to convert the Face3D to a list
-        length, width = bounding_rectangle_extents(geometries=[LB_Face3D_footprint], axis_angle=angle)
-        bounding_rectangle_area_list.append(length * width)
-        angle += step
-    # get the angle that minimize the area of the bounding rectangle
-    angle = step * bounding_rectangle_area_list.index(min(bounding_rectangle_area_list))
+    _, angle = get_oriented_bounding_rectangle_of_footprint_array(
+        get_footprint_array_from_LB_Face3D(LB_Face3D_footprint))
     return angle
 
 
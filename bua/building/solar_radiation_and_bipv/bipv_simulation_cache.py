@@ -0,0 +1,111 @@
+"""
+Cache of the inputs of the BIPV simulation that do not depend on the BIPV scenario, to run many scenarios on the same
+irradiance results without loading the irradiance tables and rebuilding the meshes of the SensorGrids every time.
+The cache is meant to be used for a set of simulations on the same SensorGrids and irradiance results, such as a
+sweep of BIPV scenarios.
+"""
+
+import os
+import logging
+import numpy as np
+
+from honeybee_radiance.sensorgrid import SensorGrid
+
+from bua.building.solar_radiation_and_bipv.utils_solar_radiation import get_hourly_irradiance_table, \
+    get_path_npy_file_of_ill_file, is_npy_file_of_ill_file_up_to_date
+from bua.building.solar_radiation_and_bipv.utils_bipv import get_face_area_array_of_lb_mesh
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+
+class BipvSimulationCache:
+    """
+    Cache of the hourly irradiance tables, of the area of the faces of the SensorGrids and of the energy harvested
+    over the lifetime of a panel on each face of the SensorGrids, by technology.
+    The cached arrays are shared by all the simulations and should not be modified in place.
+    """
+
+    def __init__(self):
+        # (modification time of the .npy file, hourly irradiance table) by path of the .ill file
+        self.hourly_irradiance_table_dict = {}
+        # Area of the faces by SensorGrid identifier
+        self.face_area_array_dict = {}
+        # Lifetime energy of a panel on each face by (SensorGrid identifier, technology identifier)
+        self.panel_lifetime_energy_array_dict = {}
+        # Statistics
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def get_hourly_irradiance_table(self, path_ill_file):
+        """
+        Get the hourly irradiance table of a .ill file as a float array, loading it again only if the .ill file was
+        modified or its .npy file converted again since it was loaded
+        :param path_ill_file: str, path to the .ill file
+        :return hourly_irradiance_table: numpy array of shape (number of faces, number of sun-up hours)
+        """
+        if path_ill_file in self.hourly_irradiance_table_dict:
+            npy_modification_time, hourly_irradiance_table = self.hourly_irradiance_table_dict[path_ill_file]
+            if is_npy_file_of_ill_file_up_to_date(path_ill_file) and os.path.getmtime(
+                    get_path_npy_file_of_ill_file(path_ill_file)) == npy_modification_time:
+                self.hit_count += 1
+                return hourly_irradiance_table
+        self.miss_count += 1
+        hourly_irradiance_table = np.asarray(get_hourly_irradiance_table(path_ill_file), dtype=float)
+        self.hourly_irradiance_table_dict[path_ill_file] = (
+            os.path.getmtime(get_path_npy_file_of_ill_file(path_ill_file)), hourly_irradiance_table)
+
+        return hourly_irradiance_table
+
+    def get_face_area_array(self, sensorgrid_dict):
+        """
+        Get the area of the faces of a SensorGrid
+        :param sensorgrid_dict: dict, dictionary of the SensorGrid
+        :return face_area_array: numpy array of the area of the faces
+        """
+        if sensorgrid_dict["identifier"] in self.face_area_array_dict:
+            self.hit_count += 1
+            return self.face_area_array_dict[sensorgrid_dict["identifier"]]
+        self.miss_count += 1
+        face_area_array = get_face_area_array_of_lb_mesh(SensorGrid.from_dict(sensorgrid_dict).mesh)
+        self.face_area_array_dict[sensorgrid_dict["identifier"]] = face_area_array
+
+        return face_area_array
+
+    def get_panel_lifetime_energy_array(self, sensorgrid_dict, annual_panel_irradiance_list, pv_tech_obj):
+        """
+        Get the energy harvested over the lifetime of a panel on each face of a SensorGrid, the annual irradiance of
+        the faces times the lifetime energy factor of the technology, as used to prescreen the faces.
+        :param sensorgrid_dict: dict, dictionary of the SensorGrid
+        :param annual_panel_irradiance_list: list of float, annual irradiance of the faces of the SensorGrid
+        :param pv_tech_obj: BipvTechnology object
+        :return panel_lifetime_energy_array: numpy array of the lifetime energy of a panel on each face
+        """
+        key = (sensorgrid_dict["identifier"], pv_tech_obj.identifier)
+        if key in self.panel_lifetime_energy_array_dict:
+            self.hit_count += 1
+            return self.panel_lifetime_energy_array_dict[key]
+        self.miss_count += 1
+        panel_lifetime_energy_array = pv_tech_obj.get_prescreening_lifetime_energy_factor() * np.asarray(
+            annual_panel_irradiance_list, dtype=float)
+        self.panel_lifetime_energy_array_dict[key] = panel_lifetime_energy_array
+
+        return panel_lifetime_energy_array
+
+    def clear(self):
+        """ Remove all the arrays from the cache, keeping the statistics """
+        self.hourly_irradiance_table_dict = {}
+        self.face_area_array_dict = {}
+        self.panel_lifetime_energy_array_dict = {}
+
+    def get_statistics_dict(self):
+        """
+        Get the statistics of the cache
+        :return: dict, number of hits and misses and number of cached arrays
+        """
+        return {
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "number_of_cached_arrays": len(self.hourly_irradiance_table_dict) + len(self.face_area_array_dict) + len(
+                self.panel_lifetime_energy_array_dict)
+        }
@@ -6,8 +6,9 @@ import os
 import logging
 import shutil
 import csv
+import pickle
 
-from copy import deepcopy
+from copy import copy, deepcopy
 from time import time
 
 from honeybee_radiance.sensorgrid import SensorGrid
@@ -16,12 +17,16 @@ from ladybug_geometry.geometry3d.face import Face3D
 from bua.building.solar_radiation_and_bipv.utils_sensorgrid import generate_sensor_grid_for_hb_model
 from bua.building.solar_radiation_and_bipv.utils_solar_radiation import \
     run_hb_model_annual_irradiance_simulation, move_annual_irr_hb_radiance_results, \
-    get_hourly_irradiance_table
+    get_hourly_irradiance_table, get_path_npy_file_of_ill_file
+from bua.building.solar_radiation_and_bipv.utils_radiance_cache import get_path_sky_matrix_cache_folder, \
+    get_path_irradiance_result_cache_folder, get_irradiance_result_cache_key, is_irradiance_result_in_cache, \
+    add_irradiance_result_to_cache, copy_irradiance_result_from_cache
 from bua.building.solar_radiation_and_bipv.utils_bipv import init_bipv_on_sensor_grid, \
     simulate_bipv_yearly_energy_harvesting, compute_lca_and_cost_for_gtg, \
     compute_lca_cost_and_dmfa_for_recycling, \
     compute_lca_and_cost_for_transportation, \
     compute_lca_and_cost_for_inverter, compute_lca_and_cost_for_maintenance
+from bua.bipv.bipv_panel_fleet import BipvPanelFleet
 
 from bua.utils.utils_configuration import name_temporary_files_folder, name_radiation_simulation_folder
 
@@ -111,7 +116,14 @@ name_roof_ill_file = "roof.ill"
 name_facades_ill_file = "facades.ill"
 name_roof_sun_up_hours_file = "roof_" + sun_up_hours_file_name
 name_facades_sun_up_hours_file = "facades_" + sun_up_hours_file_name
+name_ill_file_dict = {"roof": name_roof_ill_file, "facades": name_facades_ill_file}
+name_sun_up_hours_file_dict = {"roof": name_roof_sun_up_hours_file, "facades": name_facades_sun_up_hours_file}
+default_radiance_parameters = '-ab 2 -ad 5000 -lw 2e-05'
 name_results_file_csv = "bipv_results.csv"
+name_bipv_input_file = "bipv_input.pkl"
+# Attributes of the SolarRadAndBipvSimulation objects read by the BIPV simulation and not modified by it
+bipv_input_attribute_list = ["on_roof", "on_facades", "roof_sensorgrid_dict", "facades_sensorgrid_dict",
+                             "roof_annual_panel_irradiance_list", "facades_annual_panel_irradiance_list"]
 
 
 class SolarRadAndBipvSimulation:
@@ -129,13 +141,17 @@ class SolarRadAndBipvSimulation:
         # SensorGrid objects
         self.roof_sensorgrid_dict = None
         self.facades_sensorgrid_dict = None
-        # Panel objects
-        self.roof_panel_list = None
-        self.facades_panel_list = None
+        # Panels, BipvPanelFleet objects
+        self.roof_panel_fleet = None
+        self.facades_panel_fleet = None
         # Solar irradiance on each of the face of the mesh
         self.roof_annual_panel_irradiance_list = None
         self.facades_annual_panel_irradiance_list = None
         self.irradiance_simulation_duration = {"roof": None, "facades": None}
+        # Keys of the inputs of the irradiance results in the cache
+        self.irradiance_result_key_dict = {"roof": None, "facades": None}
+        # Key of the inputs written in the BIPV input file of the result folder, None if not written
+        self.bipv_input_file_key = None
         # bipv results
         self.bipv_results_dict = None
         self.init_bipv_results_dict()
@@ -147,6 +163,22 @@ class SolarRadAndBipvSimulation:
         self.roof_bipv_sim_run = False
         self.facades_bipv_sim_run = False
 
+    def __setstate__(self, state):
+        """
+        Load the object from pickling, older pickles do not have the keys of the irradiance results and store the
+        panels as lists of BipvPanel objects
+        """
+        state.setdefault("irradiance_result_key_dict", {"roof": None, "facades": None})
+        state.setdefault("bipv_input_file_key", None)
+        for roof_or_facades in ["roof", "facades"]:
+            bipv_panel_list = state.pop(f"{roof_or_facades}_panel_list", None)
+            if f"{roof_or_facades}_panel_fleet" not in state:
+                state[f"{roof_or_facades}_panel_fleet"] = None if bipv_panel_list is None else \
+                    BipvPanelFleet.from_bipv_panel_list(
+                        bipv_panel_list=bipv_panel_list,
+                        pv_technology_obj=state["parameter_dict"][roof_or_facades]["panel_technology"])
+        self.__dict__.update(state)
+
     def set_mesh_parameters(self, roof_or_facades, on_roof_or_facades, grid_size_x=1, grid_size_y=1,
                             offset_dist=0.1):
         """
@@ -174,8 +206,8 @@ class SolarRadAndBipvSimulation:
 
         """
         self.init_bipv_results_dict()
-        self.roof_panel_list = None
-        self.facades_panel_list = None
+        self.roof_panel_fleet = None
+        self.facades_panel_fleet = None
         for roof_or_facade in ["roof", "facades"]:
             self.parameter_dict[roof_or_facade]["panel_technology"] = None
             self.parameter_dict[roof_or_facade]["minimum_panel_eroi"] = None
@@ -186,6 +218,67 @@ class SolarRadAndBipvSimulation:
             self.parameter_dict[roof_or_facade]["efficiency_computation_method"] = {"id": None,
                                                                                     "parameter": None}
 
+    def copy_for_new_bipv_simulation(self):
+        """
+        Make a copy of the object with a new BIPV simulation, to simulate another scenario. The SensorGrids and the
+        irradiance results are not modified by the BIPV simulation, they are shared with the copy.
+        :return solar_rad_and_bipv_obj: SolarRadAndBipvSimulation object
+        """
+        solar_rad_and_bipv_obj = copy(self)
+        solar_rad_and_bipv_obj.parameter_dict = deepcopy(self.parameter_dict)
+        solar_rad_and_bipv_obj.init_bipv_simulation()
+        return solar_rad_and_bipv_obj
+
+    def get_bipv_input_key(self):
+        """
+        Get the key of the inputs of the BIPV simulation, made of the keys of the irradiance results in the cache, that
+        depend on the SensorGrids
+        :return bipv_input_key: tuple, None if the irradiance results of a SensorGrid have no key, the inputs can then
+            not be identified
+        """
+        bipv_input_key = (self.on_roof, self.on_facades)
+        for roof_or_facades, annual_panel_irradiance_list in [("roof", self.roof_annual_panel_irradiance_list),
+                                                              ("facades", self.facades_annual_panel_irradiance_list)]:
+            if annual_panel_irradiance_list is None:
+                bipv_input_key += (None,)
+            elif self.irradiance_result_key_dict[roof_or_facades] is None:
+                return None
+            else:
+                bipv_input_key += (self.irradiance_result_key_dict[roof_or_facades],)
+        return bipv_input_key
+
+    def write_bipv_input_file(self, path_result_folder):
+        """
+        Write the SensorGrids and the annual irradiance results, the inputs of the BIPV simulation, in the result
+        folder of the building, if the file is missing or its inputs changed
+        :param path_result_folder: str, path to the result folder of the building
+        """
+        bipv_input_key = self.get_bipv_input_key()
+        path_bipv_input_file = os.path.join(path_result_folder, name_bipv_input_file)
+        if bipv_input_key is not None and bipv_input_key == self.bipv_input_file_key and os.path.isfile(
+                path_bipv_input_file):
+            return
+        os.makedirs(path_result_folder, exist_ok=True)
+        with open(path_bipv_input_file, "wb") as pkl_file:
+            pickle.dump({attribute: getattr(self, attribute) for attribute in bipv_input_attribute_list}, pkl_file)
+        self.bipv_input_file_key = bipv_input_key
+
+    @classmethod
+    def from_bipv_input_file(cls, building_id, path_result_folder):
+        """
+        Make a SolarRadAndBipvSimulation object from the BIPV input file of the result folder of a building
+        :param building_id: str, id of the building
+        :param path_result_folder: str, path to the result folder of the building
+        :return solar_rad_and_bipv_obj: SolarRadAndBipvSimulation object, with the SensorGrids and the annual
+            irradiance results of the building
+        """
+        with open(os.path.join(path_result_folder, name_bipv_input_file), "rb") as pkl_file:
+            bipv_input_dict = pickle.load(pkl_file)
+        solar_rad_and_bipv_obj = cls(building_id=building_id)
+        for attribute, value in bipv_input_dict.items():
+            setattr(solar_rad_and_bipv_obj, attribute, value)
+        return solar_rad_and_bipv_obj
+
     def set_bipv_parameters(self, roof_or_facades, pv_tech_obj, minimum_panel_eroi, start_year,
                             replacement_scenario,
                             efficiency_computation_method, **kwargs):
@@ -245,10 +338,10 @@ class SolarRadAndBipvSimulation:
             "total_result_dict": self.bipv_results_dict["total"]
         }
         # Add the mesh index list to plot on GH the location of the kept panels
-        if self.roof_panel_list is not None:
-            json_dict["roof_panel_mesh_index_list"] = [panel.index for panel in self.roof_panel_list]
-        if self.facades_panel_list is not None:
-            json_dict["facades_panel_mesh_index_list"] = [panel.index for panel in self.facades_panel_list]
+        if self.roof_panel_fleet is not None:
+            json_dict["roof_panel_mesh_index_list"] = self.roof_panel_fleet.index_array.tolist()
+        if self.facades_panel_fleet is not None:
+            json_dict["facades_panel_mesh_index_list"] = self.facades_panel_fleet.index_array.tolist()
         # Adjust the parameter dict to make it json serializable
         json_dict["parameters"]["roof"]["panel_technology"] = json_dict["parameters"]["roof"]["panel_technology"].identifier if json_dict["parameters"]["roof"]["panel_technology"] is not None else None
         json_dict["parameters"]["roof"]["inverter"]["technology"] = json_dict["parameters"]["roof"]["inverter"]["technology"].identifier if json_dict["parameters"]["roof"]["inverter"]["technology"] is not None else None
@@ -319,7 +412,8 @@ class SolarRadAndBipvSimulation:
     def run_annual_solar_irradiance_simulation(self, path_simulation_folder, hb_model_obj,
                                                context_shading_hb_shade_list, path_weather_file,
                                                overwrite=False,
-                                               north_angle=0, silent=False):
+                                               north_angle=0, silent=False, workers=None,
+                                               combine_roof_and_facades=True):
         """
         Run the annual solar radiation simulation for the roof and/or the facades
         :param path_simulation_folder: str : the path to the simulation folder
@@ -329,93 +423,190 @@ class SolarRadAndBipvSimulation:
         :param overwrite: bool : whether to overwrite the existing results
         :param north_angle: float : the north angle of the building
         :param silent: bool : whether to print the logs or not
+        :param workers: int : number of processes used by the Radiance recipes, all the cores if None
+        :param combine_roof_and_facades: bool : if True, the roof and facades SensorGrids are simulated with a single
+            recipe, sharing the octree and sky matrix, instead of one recipe each
         """
         path_folder_run_radiation_temp = os.path.join(path_simulation_folder, name_temporary_files_folder,
                                                       str(self.building_id))
         path_result_folder = os.path.join(path_simulation_folder, name_radiation_simulation_folder,
                                           str(self.building_id))
 
-        # Distinguish between roof and facades
-        if self.roof_sensorgrid_dict is not None:
-            # Check if the simulation has already been run
-            if self.roof_annual_panel_irradiance_list is None or overwrite:
-                # Make a copy of the Honeybee Model and add the sensorgrid and context to it
-                hb_model_copy_roof = hb_model_obj.duplicate()
-                hb_model_copy_roof.properties.radiance.add_sensor_grid(
-                    SensorGrid.from_dict(self.roof_sensorgrid_dict))
-                hb_model_copy_roof.add_shades(context_shading_hb_shade_list)
-                # run in the temporary folder
-                path_folder_run_radiation_temp_roof = os.path.join(path_folder_run_radiation_temp, "roof")
-                duration = time()
-                self.roof_annual_panel_irradiance_list = run_hb_model_annual_irradiance_simulation(
-                    hb_model_obj=hb_model_copy_roof,
-                    path_folder_run=path_folder_run_radiation_temp_roof,
-                    path_weather_file=path_weather_file,
-                    timestep=1,
-                    visible=False, north=north_angle,
-                    radiance_parameters='-ab 2 -ad 5000 -lw 2e-05',
-                    silent=silent)
-                duration = time() - duration
-                self.irradiance_simulation_duration["roof"] = duration
-                # Delete the useless results files and move the results to the right folder
-                path_folder_result_run_radiation_temp_roof = os.path.join(path_folder_run_radiation_temp_roof,
-                                                                          "annual_irradiance",
-                                                                          "results", "total")
-                annual_irradiance_file_name = SensorGrid.from_dict(
-                    self.roof_sensorgrid_dict).identifier + ".ill"
-                path_result_file_ill = os.path.join(path_folder_result_run_radiation_temp_roof,
-                                                    annual_irradiance_file_name)
-                path_sun_hours_file = os.path.join(path_folder_result_run_radiation_temp_roof,
-                                                   sun_up_hours_file_name)
-                move_annual_irr_hb_radiance_results(path_temp_ill_result_file=path_result_file_ill,
-                                                    path_temp_sun_hours_file=path_sun_hours_file,
-                                                    new_ill_file_name=name_roof_ill_file,
-                                                    new_sun_hours_file_name=name_roof_sun_up_hours_file,
-                                                    path_result_folder=path_result_folder)
-
-        # Do not run the simulation if there is no SensorGrid on the facades
-        if self.facades_sensorgrid_dict is not None:
-            # Check if the simulation has already been run
-            if self.facades_annual_panel_irradiance_list is None or overwrite:
-                # Make a copy of the Honeybee Model and add the SensorGrid and context to it
-                hb_model_copy_facades = hb_model_obj.duplicate()
-                hb_model_copy_facades.properties.radiance.add_sensor_grid(
-                    SensorGrid.from_dict(self.facades_sensorgrid_dict))
-                hb_model_copy_facades.add_shades(context_shading_hb_shade_list)
-                # run in the temporary folder
-                path_folder_run_radiation_temp_facades = os.path.join(path_folder_run_radiation_temp,
-                                                                      "facades")
-                duration = time()
-                self.facades_annual_panel_irradiance_list = run_hb_model_annual_irradiance_simulation(
-                    hb_model_obj=hb_model_copy_facades,
-                    path_folder_run=path_folder_run_radiation_temp_facades,
-                    path_weather_file=path_weather_file,
-                    timestep=1,
-                    visible=False, north=north_angle,
-                    radiance_parameters='-ab 2 -ad 5000 -lw 2e-05',
-                    silent=silent)
-                duration = time() - duration
-                self.irradiance_simulation_duration["facades"] = duration
-                # Delete the useless results files and mov ethe results to the right folder
-                path_folder_result_run_radiation_temp_facades = os.path.join(
-                    path_folder_run_radiation_temp_facades,
-                    "annual_irradiance",
-                    "results", "total")
-                annual_irradiance_file_name = SensorGrid.from_dict(
-                    self.facades_sensorgrid_dict).identifier + ".ill"
-                path_result_file_ill = os.path.join(path_folder_result_run_radiation_temp_facades,
-                                                    annual_irradiance_file_name)
-                path_sun_hours_file = os.path.join(path_folder_result_run_radiation_temp_facades,
-                                                   sun_up_hours_file_name)
-                move_annual_irr_hb_radiance_results(path_temp_ill_result_file=path_result_file_ill,
-                                                    path_temp_sun_hours_file=path_sun_hours_file,
-                                                    new_ill_file_name=name_facades_ill_file,
-                                                    new_sun_hours_file_name=name_facades_sun_up_hours_file,
-                                                    path_result_folder=path_result_folder)
+        # Distinguish between roof and facades, do not run the simulation if there is no SensorGrid or if the
+        # simulation has already been run with the same inputs. The results of the inputs that were already simulated
+        # are taken from the cache, even when overwriting
+        path_irradiance_result_cache_folder = get_path_irradiance_result_cache_folder(path_simulation_folder)
+        irradiance_result_key_dict = self.get_irradiance_result_key_dict(
+            hb_model_obj=hb_model_obj, context_shading_hb_shade_list=context_shading_hb_shade_list,
+            path_weather_file=path_weather_file, north_angle=north_angle)
+        roof_or_facades_to_simulate_list = []
+        for roof_or_facades, irradiance_result_key in irradiance_result_key_dict.items():
+            annual_panel_irradiance_list = self.roof_annual_panel_irradiance_list if roof_or_facades == "roof" else \
+                self.facades_annual_panel_irradiance_list
+            # Results of older versions of the tool do not have a key
+            is_up_to_date = annual_panel_irradiance_list is not None and \
+                            self.irradiance_result_key_dict[roof_or_facades] in [None, irradiance_result_key]
+            if is_up_to_date and not overwrite:
+                continue
+            if is_irradiance_result_in_cache(path_irradiance_result_cache_folder, irradiance_result_key):
+                if not (is_up_to_date and self.irradiance_result_key_dict[roof_or_facades] == irradiance_result_key):
+                    self.load_annual_irradiance_results_from_cache(
+                        roof_or_facades=roof_or_facades, path_result_folder=path_result_folder,
+                        path_irradiance_result_cache_folder=path_irradiance_result_cache_folder,
+                        irradiance_result_key=irradiance_result_key)
+                continue
+            roof_or_facades_to_simulate_list.append(roof_or_facades)
+        if combine_roof_and_facades and roof_or_facades_to_simulate_list:
+            recipe_roof_or_facades_list = [roof_or_facades_to_simulate_list]
+        else:
+            recipe_roof_or_facades_list = [[roof_or_facades] for roof_or_facades in roof_or_facades_to_simulate_list]
+
+        for roof_or_facades_list in recipe_roof_or_facades_list:
+            self.run_annual_solar_irradiance_recipe(roof_or_facades_list=roof_or_facades_list,
+                                                    path_folder_run_radiation_temp=path_folder_run_radiation_temp,
+                                                    path_result_folder=path_result_folder,
+                                                    hb_model_obj=hb_model_obj,
+                                                    context_shading_hb_shade_list=context_shading_hb_shade_list,
+                                                    path_weather_file=path_weather_file, north_angle=north_angle,
+                                                    silent=silent, workers=workers,
+                                                    path_sky_matrix_cache_folder=get_path_sky_matrix_cache_folder(
+                                                        path_simulation_folder))
+        # Add the new results to the cache
+        for roof_or_facades in roof_or_facades_to_simulate_list:
+            add_irradiance_result_to_cache(
+                path_irradiance_result_cache_folder=path_irradiance_result_cache_folder,
+                irradiance_result_key=irradiance_result_key_dict[roof_or_facades],
+                annual_irradiance_list=self.roof_annual_panel_irradiance_list if roof_or_facades == "roof" else
+                self.facades_annual_panel_irradiance_list,
+                path_hourly_irradiance_npy_file=get_path_npy_file_of_ill_file(
+                    os.path.join(path_result_folder, name_ill_file_dict[roof_or_facades])),
+                path_sun_up_hours_file=os.path.join(path_result_folder,
+                                                    name_sun_up_hours_file_dict[roof_or_facades]))
+            self.irradiance_result_key_dict[roof_or_facades] = irradiance_result_key_dict[roof_or_facades]
         # delete all the temporary files if they exist
         if os.path.isdir(path_folder_run_radiation_temp):
             shutil.rmtree(path_folder_run_radiation_temp)
 
+    def get_irradiance_result_key_dict(self, hb_model_obj, context_shading_hb_shade_list, path_weather_file,
+                                       north_angle=0):
+        """
+        Get the keys of the annual irradiance results of the SensorGrids of the roof and facades in the cache
+        :param hb_model_obj: Honeybee Model object
+        :param context_shading_hb_shade_list: list of Honeybee Shades objects for the context shading
+        :param path_weather_file: str : the path to the epw file
+        :param north_angle: float : the north angle of the building
+        :return irradiance_result_key_dict: dict : key by "roof" and/or "facades", for the generated SensorGrids only
+        """
+        hb_model_dict = hb_model_obj.to_dict()
+        context_hb_shade_dict_list = [hb_shade.to_dict() for hb_shade in context_shading_hb_shade_list]
+        irradiance_result_key_dict = {}
+        for roof_or_facades, sensorgrid_dict in [("roof", self.roof_sensorgrid_dict),
+                                                 ("facades", self.facades_sensorgrid_dict)]:
+            if sensorgrid_dict is not None:
+                irradiance_result_key_dict[roof_or_facades] = get_irradiance_result_cache_key(
+                    hb_model_dict=hb_model_dict, sensor_dict_list=sensorgrid_dict["sensors"],
+                    context_hb_shade_dict_list=context_hb_shade_dict_list, path_weather_file=path_weather_file,
+                    radiance_parameters=default_radiance_parameters, north=north_angle)
+
+        return irradiance_result_key_dict
+
+    def load_annual_irradiance_results_from_cache(self, roof_or_facades, path_result_folder,
+                                                  path_irradiance_result_cache_folder, irradiance_result_key):
+        """
+        Load the cached annual irradiance results of the roof or the facades, and copy the hourly results to the
+        result folder of the building
+        :param roof_or_facades: str : "roof" or "facades"
+        :param path_result_folder: str : the path to the result folder of the building
+        :param path_irradiance_result_cache_folder: str : the path to the folder of the cached irradiance results
+        :param irradiance_result_key: str : the key of the results in the cache
+        """
+        annual_panel_irradiance_list = copy_irradiance_result_from_cache(
+            path_irradiance_result_cache_folder=path_irradiance_result_cache_folder,
+            irradiance_result_key=irradiance_result_key,
+            path_hourly_irradiance_npy_file=get_path_npy_file_of_ill_file(
+                os.path.join(path_result_folder, name_ill_file_dict[roof_or_facades])),
+            path_sun_up_hours_file=os.path.join(path_result_folder, name_sun_up_hours_file_dict[roof_or_facades]))
+        if roof_or_facades == "roof":
+            self.roof_annual_panel_irradiance_list = annual_panel_irradiance_list
+        else:
+            self.facades_annual_panel_irradiance_list = annual_panel_irradiance_list
+        self.irradiance_simulation_duration[roof_or_facades] = 0.
+        self.irradiance_result_key_dict[roof_or_facades] = irradiance_result_key
+        dev_logger.info(f"The annual irradiance of the {roof_or_facades} of the building {self.building_id} was "
+                        f"taken from the cache")
+
+    def run_annual_solar_irradiance_recipe(self, roof_or_facades_list, path_folder_run_radiation_temp,
+                                           path_result_folder, hb_model_obj, context_shading_hb_shade_list,
+                                           path_weather_file, north_angle=0, silent=False, workers=None,
+                                           path_sky_matrix_cache_folder=None):
+        """
+        Run a single annual solar radiation recipe for the SensorGrids of the roof and/or the facades, and split the
+        results of each SensorGrid
+        :param roof_or_facades_list: list of str : "roof" and/or "facades", the SensorGrids to simulate
+        :param path_folder_run_radiation_temp: str : the path to the temporary folder of the building
+        :param path_result_folder: str : the path to the result folder of the building
+        :param hb_model_obj: Honeybee Model object
+        :param context_shading_hb_shade_list: list of Honeybee Shades objects for the context shading
+        :param path_weather_file: str : the path to the epw file
+        :param north_angle: float : the north angle of the building
+        :param silent: bool : whether to print the logs or not
+        :param workers: int : number of processes used by the Radiance recipe, all the cores if None
+        :param path_sky_matrix_cache_folder: str : the path to the folder of the sky matrices shared by the
+            buildings, the sky matrix is generated by the recipe if None
+        """
+        sensorgrid_obj_dict = {}
+        if "roof" in roof_or_facades_list:
+            sensorgrid_obj_dict["roof"] = SensorGrid.from_dict(self.roof_sensorgrid_dict)
+        if "facades" in roof_or_facades_list:
+            sensorgrid_obj_dict["facades"] = SensorGrid.from_dict(self.facades_sensorgrid_dict)
+        # Make a copy of the Honeybee Model and add the SensorGrids and context to it
+        hb_model_copy = hb_model_obj.duplicate()
+        for roof_or_facades in roof_or_facades_list:
+            hb_model_copy.properties.radiance.add_sensor_grid(sensorgrid_obj_dict[roof_or_facades])
+        hb_model_copy.add_shades(context_shading_hb_shade_list)
+        # run in the temporary folder
+        path_folder_run_radiation_temp_recipe = os.path.join(path_folder_run_radiation_temp,
+                                                             "_and_".join(roof_or_facades_list))
+        duration = time()
+        annual_panel_irradiance_dict = run_hb_model_annual_irradiance_simulation(
+            hb_model_obj=hb_model_copy,
+            path_folder_run=path_folder_run_radiation_temp_recipe,
+            path_weather_file=path_weather_file,
+            timestep=1,
+            visible=False, north=north_angle,
+            radiance_parameters=default_radiance_parameters,
+            silent=silent, workers=workers, path_sky_matrix_cache_folder=path_sky_matrix_cache_folder,
+            grid_identifier_list=[sensorgrid_obj_dict[roof_or_facades].identifier for roof_or_facades in
+                                  roof_or_facades_list])
+        duration = time() - duration
+        # The duration of a combined recipe is shared between the roof and the facades by number of sensors
+        number_of_sensors = sum(len(sensorgrid_obj_dict[roof_or_facades].sensors) for roof_or_facades in
+                                roof_or_facades_list)
+        # Delete the useless results files and move the results to the right folder
+        path_folder_result_run_radiation_temp = os.path.join(path_folder_run_radiation_temp_recipe,
+                                                             "annual_irradiance", "results", "total")
+        path_sun_hours_file = os.path.join(path_folder_result_run_radiation_temp, sun_up_hours_file_name)
+        for index, roof_or_facades in enumerate(roof_or_facades_list):
+            sensorgrid_obj = sensorgrid_obj_dict[roof_or_facades]
+            if roof_or_facades == "roof":
+                self.roof_annual_panel_irradiance_list = annual_panel_irradiance_dict[sensorgrid_obj.identifier]
+            else:
+                self.facades_annual_panel_irradiance_list = annual_panel_irradiance_dict[sensorgrid_obj.identifier]
+            self.irradiance_simulation_duration[roof_or_facades] = \
+                duration * len(sensorgrid_obj.sensors) / number_of_sensors
+            # The sun up hours file is shared by the SensorGrids of the recipe
+            path_sun_hours_file_of_grid = path_sun_hours_file
+            if index < len(roof_or_facades_list) - 1:
+                path_sun_hours_file_of_grid = path_sun_hours_file + "." + roof_or_facades
+                shutil.copyfile(path_sun_hours_file, path_sun_hours_file_of_grid)
+            move_annual_irr_hb_radiance_results(
+                path_temp_ill_result_file=os.path.join(path_folder_result_run_radiation_temp,
+                                                       sensorgrid_obj.identifier + ".ill"),
+                path_temp_sun_hours_file=path_sun_hours_file_of_grid,
+                new_ill_file_name=name_ill_file_dict[roof_or_facades],
+                new_sun_hours_file_name=name_sun_up_hours_file_dict[roof_or_facades],
+                path_result_folder=path_result_folder)
+
     def run_bipv_panel_simulation(self, path_simulation_folder, roof_pv_tech_obj,
                                   facades_pv_tech_obj,
                                   roof_inverter_tech_obj, facades_inverter_tech_obj, roof_inverter_sizing_ratio,
@@ -424,16 +615,19 @@ class SolarRadAndBipvSimulation:
                                   efficiency_computation_method="yearly",
                                   minimum_panel_eroi=1.2,
                                   replacement_scenario="replace_failed_panels_every_X_years",
-                                  continue_simulation=False, **kwargs):
+                                  continue_simulation=False, bipv_simulation_cache=None, random_generator=None,
+                                  **kwargs):
         """
-
+        Run the BIPV simulation on the roof and on the facades of the building.
+        The random_generator, a numpy random Generator, draws the life expectancies of the panels, the roof first then
+        the facades, the simulation is reproducible with a seeded generator.
         """
 
         run_bipv_on_roof = self.run_bipv_panel_simulation_on_roof_or_facades(roof_or_facades="roof",
                                                                              on_roof_or_facades=self.on_roof,
                                                                              sensorgrid_dict=self.roof_sensorgrid_dict,
                                                                              annual_panel_irradiance_list=self.roof_annual_panel_irradiance_list,
-                                                                             panel_list=self.roof_panel_list,
+                                                                             panel_fleet=self.roof_panel_fleet,
                                                                              path_simulation_folder=path_simulation_folder,
                                                                              pv_tech_obj=roof_pv_tech_obj,
                                                                              inverter_tech_obj=roof_inverter_tech_obj,
@@ -446,13 +640,15 @@ class SolarRadAndBipvSimulation:
                                                                              minimum_panel_eroi=minimum_panel_eroi,
                                                                              replacement_scenario=replacement_scenario,
                                                                              continue_simulation=continue_simulation,
+                                                                             bipv_simulation_cache=bipv_simulation_cache,
+                                                                             random_generator=random_generator,
                                                                              **kwargs)
 
         run_bipv_on_facades = self.run_bipv_panel_simulation_on_roof_or_facades(roof_or_facades="facades",
                                                                                 on_roof_or_facades=self.on_facades,
                                                                                 sensorgrid_dict=self.facades_sensorgrid_dict,
                                                                                 annual_panel_irradiance_list=self.facades_annual_panel_irradiance_list,
-                                                                                panel_list=self.facades_panel_list,
+                                                                                panel_fleet=self.facades_panel_fleet,
                                                                                 path_simulation_folder=path_simulation_folder,
                                                                                 pv_tech_obj=facades_pv_tech_obj,
                                                                                 inverter_tech_obj=facades_inverter_tech_obj,
@@ -465,6 +661,8 @@ class SolarRadAndBipvSimulation:
                                                                                 minimum_panel_eroi=minimum_panel_eroi,
                                                                                 replacement_scenario=replacement_scenario,
                                                                                 continue_simulation=continue_simulation,
+                                                                                bipv_simulation_cache=bipv_simulation_cache,
+                                                                                random_generator=random_generator,
                                                                                 **kwargs)
 
         # Total results
@@ -490,7 +688,7 @@ class SolarRadAndBipvSimulation:
 
     def run_bipv_panel_simulation_on_roof_or_facades(self, roof_or_facades, on_roof_or_facades,
                                                      sensorgrid_dict,
-                                                     annual_panel_irradiance_list, panel_list,
+                                                     annual_panel_irradiance_list, panel_fleet,
                                                      path_simulation_folder,
                                                      pv_tech_obj, inverter_tech_obj,
                                                      inverter_sizing_ratio,
@@ -499,16 +697,19 @@ class SolarRadAndBipvSimulation:
                                                      uc_current_year, efficiency_computation_method,
                                                      minimum_panel_eroi,
                                                      replacement_scenario, continue_simulation=False,
+                                                     bipv_simulation_cache=None, random_generator=None,
                                                      **kwargs):
         """
-
+        Run the BIPV simulation on the roof or on the facades of the building.
+        The bipv_simulation_cache, a BipvSimulationCache object, can be given to reuse the irradiance tables and the
+        arrays of the faces of the SensorGrid between simulations, such as in a sweep of scenarios.
         """
         # Condition to run the simulation
         if on_roof_or_facades and sensorgrid_dict is not None and annual_panel_irradiance_list is not None:
             simulation_has_run = True  # run flag
 
             # Init the BIPV panels if necessary
-            if not continue_simulation or panel_list is None:
+            if not continue_simulation or panel_fleet is None:
                 """ If there is no panel list, we init the panels, but if we want to continue the simulation and there 
                 are already panels, we do not init them again """
 
@@ -521,14 +722,26 @@ class SolarRadAndBipvSimulation:
                                          replacement_scenario=replacement_scenario, **kwargs)
                 # todo: add the additional transport and inverter parameters
 
-                panel_list = init_bipv_on_sensor_grid(sensor_grid=SensorGrid.from_dict(sensorgrid_dict),
-                                                      pv_technology_obj=pv_tech_obj,
-                                                      bipv_transportation_obj=transport_obj,
-                                                      annual_panel_irradiance_list=annual_panel_irradiance_list,
-                                                      minimum_panel_eroi=minimum_panel_eroi)
+                if bipv_simulation_cache is None:
+                    panel_fleet = init_bipv_on_sensor_grid(sensor_grid=SensorGrid.from_dict(sensorgrid_dict),
+                                                          pv_technology_obj=pv_tech_obj,
+                                                          bipv_transportation_obj=transport_obj,
+                                                          annual_panel_irradiance_list=annual_panel_irradiance_list,
+                                                          minimum_panel_eroi=minimum_panel_eroi,
+                                                          random_generator=random_generator)
+                else:
+                    panel_fleet = init_bipv_on_sensor_grid(
+                        sensor_grid=None, pv_technology_obj=pv_tech_obj, bipv_transportation_obj=transport_obj,
+                        annual_panel_irradiance_list=annual_panel_irradiance_list,
+                        minimum_panel_eroi=minimum_panel_eroi,
+                        face_area_array=bipv_simulation_cache.get_face_area_array(sensorgrid_dict),
+                        panel_lifetime_energy_array=bipv_simulation_cache.get_panel_lifetime_energy_array(
+                            sensorgrid_dict=sensorgrid_dict, annual_panel_irradiance_list=annual_panel_irradiance_list,
+                            pv_tech_obj=pv_tech_obj),
+                        random_generator=random_generator)
 
                 # Size the inverters capacity
-                peak_power = pv_tech_obj.max_power_output * len(panel_list)
+                peak_power = pv_tech_obj.max_power_output * len(panel_fleet)
                 total_capacity, sub_capacities_list = inverter_tech_obj.size_inverter(peak_power=peak_power,
                                                                                       sizing_ratio=inverter_sizing_ratio)
                 self.parameter_dict[roof_or_facades]["inverter"]["technology"] = inverter_tech_obj
@@ -583,10 +796,13 @@ class SolarRadAndBipvSimulation:
                 path_sun_up_hours_file = os.path.join(path_result_folder, name_facades_sun_up_hours_file)
 
             # Get the hourly irradiance table
-            hourly_irradiance_table = get_hourly_irradiance_table(path_ill_file)
+            if bipv_simulation_cache is None:
+                hourly_irradiance_table = get_hourly_irradiance_table(path_ill_file)
+            else:
+                hourly_irradiance_table = bipv_simulation_cache.get_hourly_irradiance_table(path_ill_file)
 
             energy_harvested_yearly_list, nb_of_panels_installed_yearly_list = simulate_bipv_yearly_energy_harvesting(
-                pv_panel_obj_list=panel_list,
+                bipv_panel_fleet=panel_fleet,
                 hourly_solar_irradiance_table=hourly_irradiance_table,
                 inverter_capacity=self.parameter_dict[roof_or_facades]["inverter"]["capacity"],
                 start_year=self.parameter_dict[roof_or_facades]["start_year"],
@@ -594,7 +810,7 @@ class SolarRadAndBipvSimulation:
                     "study_duration_in_years"],
                 uc_start_year=uc_start_year, uc_end_year=uc_end_year,
                 replacement_scenario=replacement_scenario,
-                pv_tech_obj=pv_tech_obj, **kwargs)
+                pv_tech_obj=pv_tech_obj, random_generator=random_generator, **kwargs)
 
             # LCA and economic for the gate to gate processes for the panels except transportation
             gtg_result_dict = compute_lca_and_cost_for_gtg(
@@ -608,7 +824,7 @@ class SolarRadAndBipvSimulation:
                 transportation_obj=transport_obj)
             # LCA and economic for maintenance
             maintenance_result_dict = compute_lca_and_cost_for_maintenance(
-                panel_list=panel_list,
+                bipv_panel_fleet=panel_fleet,
                 start_year=self.parameter_dict[roof_or_facades]["start_year"],
                 current_study_duration_in_years=self.parameter_dict[roof_or_facades][
                     "study_duration_in_years"],
@@ -642,9 +858,9 @@ class SolarRadAndBipvSimulation:
                                                                                   "start_year"]
             # Update the panel lists
             if roof_or_facades == "roof":
-                self.roof_panel_list = panel_list
+                self.roof_panel_fleet = panel_fleet
             else:
-                self.facades_panel_list = panel_list
+                self.facades_panel_fleet = panel_fleet
 
         else:
             simulation_has_run = False
@@ -792,16 +1008,18 @@ class SolarRadAndBipvSimulation:
         :return panel_lb_face_list: list of lb_face3d
         """
         panel_lb_face_list = []
-        if self.roof_panel_list is not None and self.roof_panel_list != []:
+        if self.roof_panel_fleet is not None and len(self.roof_panel_fleet) > 0:
             roof_sensorgrid = SensorGrid.from_dict(self.roof_sensorgrid_dict)
             panel_lb_face_list += [
-                from_sensorgrid_face_index_to_lb_face3d(sensorgrid_face_index=panel.id, sensorgrid=roof_sensorgrid) for
-                panel in self.roof_panel_list]
-        if self.facades_panel_list is not None and self.facades_panel_list != []:
+                from_sensorgrid_face_index_to_lb_face3d(sensorgrid_face_index=int(face_index),
+                                                        sensorgrid=roof_sensorgrid) for
+                face_index in self.roof_panel_fleet.index_array]
+        if self.facades_panel_fleet is not None and len(self.facades_panel_fleet) > 0:
             facades_sensorgrid = SensorGrid.from_dict(self.facades_sensorgrid_dict)
             panel_lb_face_list += [
-                from_sensorgrid_face_index_to_lb_face3d(sensorgrid_face_index=panel.id, sensorgrid=facades_sensorgrid)
-                for panel in self.facades_panel_list]
+                from_sensorgrid_face_index_to_lb_face3d(sensorgrid_face_index=int(face_index),
+                                                        sensorgrid=facades_sensorgrid)
+                for face_index in self.facades_panel_fleet.index_array]
 
         return panel_lb_face_list
 
@@ -3,11 +3,11 @@ Functions used to load bipvs and to perfom  the simulation of the energy harvest
 """
 
 import logging
+import numpy as np
 
 from honeybee_radiance.sensorgrid import SensorGrid
 
-from bua.bipv.bipv_panel import BipvPanel
-from bua.bipv.bipv_technology import BipvTechnology
+from bua.bipv.bipv_panel_fleet import BipvPanelFleet
 
 user_logger = logging.getLogger("user")
 dev_logger = logging.getLogger("dev")
@@ -15,7 +15,8 @@ dev_logger = logging.getLogger("dev")
 
 def init_bipv_on_sensor_grid(sensor_grid: SensorGrid, pv_technology_obj, bipv_transportation_obj,
                              annual_panel_irradiance_list,
-                             minimum_panel_eroi):
+                             minimum_panel_eroi, face_area_array=None, panel_lifetime_energy_array=None,
+                             random_generator=None):
     """
     Initialize the bipvs on the sensor_grid and return a list of the bipvs.
     The function will check if the area of the faces of the sensor_grid is big enough to contain the bipvs
@@ -26,61 +27,25 @@ def init_bipv_on_sensor_grid(sensor_grid: SensorGrid, pv_technology_obj, bipv_tr
     :param annual_panel_irradiance_list: list of floats: annual irradiance on each face of the sensor_grid
     :param minimum_panel_eroi: float: minimum energy return on investment of the PV, (Default=1.2)
     electricity for the grid (Default=1.)
-
-    :return panel_obj_list
+    :param face_area_array: numpy array of the area of the faces of the sensor_grid, computed from its mesh if None,
+        the sensor_grid is then not used
+    :param panel_lifetime_energy_array: numpy array of the energy harvested over the lifetime of a panel on each face,
+        computed from the annual irradiance if None
+    :param random_generator: numpy random Generator used to draw the life expectancies of the panels, the global numpy
+        random state if None
+
+    :return bipv_panel_fleet: BipvPanelFleet object of the panels
     """
-    # initialize the list of the panel objects
-    panel_obj_list = []
-    # Extract the parameters from the Sensorgrid qbd the pv_technology_obj
-    lb_mesh_obj = sensor_grid.mesh
-    mesh_face_area_list = list(lb_mesh_obj.face_areas)  # face_areas is a tuple
-    # Initialize the flags
-    area_flag_warning = False
-    eroi_flag_warning = False
-
-    for face_index, face in enumerate(lb_mesh_obj.faces):
-        # Calculate the energy harvested by the panel
-        """ We need to differentiate the different cases of efficiency functions, this part is just 
-        an approximation, overestimating th energy harvested by the panel, we cannot compute for panels that 
-        require hourly timestep """
-        if pv_technology_obj.efficiency_function == BipvTechnology.constant_efficiency or \
-                pv_technology_obj.efficiency_function == BipvTechnology.degrading_rate_efficiency_loss:
-            energy_harvested = sum(
-                [pv_technology_obj.estimate_yearly_energy_harvested_by_panel_not_considering_inverter(
-                    irradiance=annual_panel_irradiance_list[face_index], age=year) for year in
-                    range(pv_technology_obj.weibull_law_failure_parameters["lifetime"])])
-        else:
-            """ If the efficiency function is not constant_efficiency of"""
-            energy_harvested = sum(
-                [pv_technology_obj.estimate_yearly_energy_harvested_by_panel_not_considering_inverter(
-                    irradiance=annual_panel_irradiance_list[face_index], age=year,
-                    efficiency_function=BipvTechnology.constant_efficiency) for
-                    year in range(pv_technology_obj.weibull_law_failure_parameters["lifetime"])])
-
-        gtg_transportation_dict, recycling_dict = pv_technology_obj.compute_transportation_lca_and_cost(
-            bipv_transportation_obj=bipv_transportation_obj)
-        primary_energy_transportation = gtg_transportation_dict["primary_energy"]
-        primary_energy_recycling = recycling_dict["primary_energy"]
-        primary_energy_inverter_estimated = pv_technology_obj.estimated_primary_energy_inverter
-
-        primary_energy = \
-            pv_technology_obj.primary_energy_manufacturing + primary_energy_transportation + primary_energy_recycling + \
-            primary_energy_inverter_estimated
-        panel_eroi = energy_harvested / primary_energy
-        """
-        Note that it is not exactly the reql eroi thqt is computed here, we assume that the panel will last for 
-        the average lifetime of the weibull law.
-        """
-        # Check if the area is big enough and if the eroi is above the threshold
-        if mesh_face_area_list[face_index] < pv_technology_obj.panel_area:
-            area_flag_warning = True
-        # Check if the eroi of teh panel is above the threshold
-        elif panel_eroi <= minimum_panel_eroi:
-            eroi_flag_warning = True
-        else:
-            new_panel = BipvPanel(face_index, pv_technology_obj)
-            new_panel.initialize_or_replace_panel()
-            panel_obj_list.append(new_panel)
+    # Area of the faces of the sensor grid, to check that they can contain a panel
+    if face_area_array is None:
+        face_area_array = get_face_area_array_of_lb_mesh(sensor_grid.mesh)
+    panel_face_index_array, area_mask, eroi_mask = prescreen_faces_for_bipv(
+        face_area_array=face_area_array, annual_panel_irradiance_array=np.asarray(annual_panel_irradiance_list,
+                                                                                  dtype=float),
+        pv_technology_obj=pv_technology_obj, bipv_transportation_obj=bipv_transportation_obj,
+        minimum_panel_eroi=minimum_panel_eroi, panel_lifetime_energy_array=panel_lifetime_energy_array)
+    area_flag_warning = bool(area_mask.any())
+    eroi_flag_warning = bool(eroi_mask.any())
     # raise flag if needed
     if area_flag_warning:
         user_logger.warning(
@@ -93,20 +58,77 @@ def init_bipv_on_sensor_grid(sensor_grid: SensorGrid, pv_technology_obj, bipv_tr
         dev_logger.warning(
             "Some PV panels have an eroi below the threshold, no panel will be initialized in those faces")
 
-    return panel_obj_list
+    bipv_panel_fleet = BipvPanelFleet(index_list=panel_face_index_array, pv_technology_obj=pv_technology_obj)
+    bipv_panel_fleet.initialize_or_replace_panels(random_generator=random_generator)
+
+    return bipv_panel_fleet
+
+
+def prescreen_faces_for_bipv(face_area_array, annual_panel_irradiance_array, pv_technology_obj,
+                             bipv_transportation_obj, minimum_panel_eroi, panel_lifetime_energy_array=None):
+    """
+    Select the faces of a sensor grid that can host a panel, evaluating the eroi of all the faces at once.
+    The energy harvested over the lifetime of a panel is the annual irradiance times the lifetime energy factor of the
+    technology, computed once.
+    :param face_area_array: numpy array of the area of the faces of the sensor grid
+    :param annual_panel_irradiance_array: numpy array of the annual irradiance on each face of the sensor grid
+    :param pv_technology_obj: BipvTechnology object
+    :param bipv_transportation_obj: BipvTransportation object
+    :param minimum_panel_eroi: float: minimum energy return on investment of the PV
+    :param panel_lifetime_energy_array: numpy array of the energy harvested over the lifetime of a panel on each face,
+        computed from the annual irradiance if None
+    :return panel_face_index_array: numpy array of the index of the faces with a panel
+    :return area_mask: boolean numpy array, True for the faces too small to contain a panel
+    :return eroi_mask: boolean numpy array, True for the faces large enough but with an eroi below the threshold
+    """
+    if panel_lifetime_energy_array is None:
+        panel_lifetime_energy_array = pv_technology_obj.get_prescreening_lifetime_energy_factor() * \
+                                      annual_panel_irradiance_array
+    # The transportation only depends on the technology and the transportation object
+    gtg_transportation_dict, recycling_dict = pv_technology_obj.compute_transportation_lca_and_cost(
+        bipv_transportation_obj=bipv_transportation_obj)
+    primary_energy = pv_technology_obj.primary_energy_manufacturing + gtg_transportation_dict["primary_energy"] + \
+                     recycling_dict["primary_energy"] + pv_technology_obj.estimated_primary_energy_inverter
+    """
+    Note that it is not exactly the reql eroi thqt is computed here, we assume that the panel will last for 
+    the average lifetime of the weibull law.
+    """
+    panel_eroi_array = panel_lifetime_energy_array / primary_energy
+    # Check if the area is big enough and if the eroi is above the threshold
+    area_mask = face_area_array < pv_technology_obj.panel_area
+    eroi_mask = ~area_mask & (panel_eroi_array <= minimum_panel_eroi)
+
+    return np.flatnonzero(~area_mask & ~eroi_mask), area_mask, eroi_mask
 
 
-def simulate_bipv_yearly_energy_harvesting(pv_panel_obj_list,
+def get_face_area_array_of_lb_mesh(lb_mesh_obj):
+    """
+    Get the area of the triangular and quad faces of a planar Ladybug Mesh3D, as half the norm of the cross product of
+    their diagonals.
+    :param lb_mesh_obj: Ladybug Mesh3D object
+    :return face_area_array: numpy array of the area of the faces
+    """
+    vertex_array = np.array([[vertex.x, vertex.y, vertex.z] for vertex in lb_mesh_obj.vertices])
+    # Triangles are made quads by repeating their last vertex, the diagonals are then two of their sides
+    face_array = np.array([face if len(face) == 4 else (*face, face[-1]) for face in lb_mesh_obj.faces], dtype=int)
+    if len(face_array) == 0:
+        return np.zeros(0)
+    first_diagonal_array = vertex_array[face_array[:, 2]] - vertex_array[face_array[:, 0]]
+    second_diagonal_array = vertex_array[face_array[:, 3]] - vertex_array[face_array[:, 1]]
+    return 0.5 * np.linalg.norm(np.cross(first_diagonal_array, second_diagonal_array), axis=1)
+
+
+def simulate_bipv_yearly_energy_harvesting(bipv_panel_fleet,
                                            hourly_solar_irradiance_table,
                                            inverter_capacity,
                                            start_year, current_study_duration_in_years,
                                            uc_start_year,
                                            uc_end_year, replacement_scenario,
-                                           pv_tech_obj=None, **kwargs):
+                                           pv_tech_obj=None, random_generator=None, **kwargs):
     """
     Loop over every year of the study duration to get the energy harvested, the energy used and the dmfa waste harvested
     every year
-    :param pv_panel_obj_list: list of panel objects
+    :param bipv_panel_fleet: BipvPanelFleet object of the panels
     :param hourly_solar_irradiance_table: list of floats: table (list of list) with the hourly solar irradiance
     in Wh/m2, of all the faces of the sensor grid
     :param inverter_capacity: float: capacity of the inverter in kW
@@ -118,6 +140,8 @@ def simulate_bipv_yearly_energy_harvesting(pv_panel_obj_list,
     :param replacement_scenario: string: replacement scenario chosen between
     "replace_failed_panels_every_X_year" and "replace_all_panels_every_X_year", "no_replacement", "uc_replace_failed_panels_every_X_years", "uc_replace_all_panels_every_X_years"
     Default="replace_failed_panels_every_X_year"
+    :param random_generator: numpy random Generator used to draw the life expectancies of the new panels, the global
+        numpy random state if None
     :param kwargs: dictionary of the parameters for the replacement scenario, keys are
         "replacement_frequency_in_years" : int: frequency of the replacement in years
         "panel_replacement_min_age": int: minimum age of the panel to be replaced
@@ -137,6 +161,10 @@ def simulate_bipv_yearly_energy_harvesting(pv_panel_obj_list,
     # Initialize the lists
     energy_production_per_year_list = []
     nb_of_panels_installed_per_year_list = []
+    # The irradiance table and its peak value for every face are used every year
+    hourly_irradiance_array = np.asarray(hourly_solar_irradiance_table, dtype=float)
+    peak_irradiance_array = hourly_irradiance_array.max(axis=1) if hourly_irradiance_array.size > 0 else np.zeros(
+        len(hourly_irradiance_array))
     # Loop over the years
     iteration_start_year = start_year + current_study_duration_in_years
 
@@ -144,69 +172,41 @@ def simulate_bipv_yearly_energy_harvesting(pv_panel_obj_list,
     if iteration_start_year < uc_end_year:
         for year in range(iteration_start_year, uc_end_year):
             # initialize
-            annual_energy_harvested = 0.
             nb_of_new_panels = 0
             if "infrastructure_replacement_last_year" in kwargs \
                     and year - start_year > kwargs["infrastructure_replacement_last_year"]:
                 None
             # Initialize panels for the first year they are installed
             elif (start_year - year) == 0:
-                for panel_obj in pv_panel_obj_list:
-                    panel_obj.initialize_or_replace_panel(pv_tech_obj=pv_tech_obj)
-                    nb_of_new_panels += 1
+                nb_of_new_panels = bipv_panel_fleet.initialize_or_replace_panels(pv_tech_obj=pv_tech_obj,
+                                                                                 random_generator=random_generator)
             # Panel replacement according to replacement scenario
-            elif replacement_scenario == "replace_failed_panels_every_X_years":
-                replacement_frequency_in_years = kwargs["replacement_frequency_in_years"]
-                if (year - start_year) % replacement_frequency_in_years == 0:
-                    for panel_obj in pv_panel_obj_list:
-                        if not panel_obj.is_panel_working():
-                            panel_obj.initialize_or_replace_panel(pv_tech_obj=pv_tech_obj)
-                            nb_of_new_panels += 1
-            elif replacement_scenario == "replace_all_panels_every_X_years":
-                replacement_frequency_in_years = kwargs["replacement_frequency_in_years"]
-                if (year - start_year) % replacement_frequency_in_years == 0:
-                    for panel_obj in pv_panel_obj_list:
-                        if (not panel_obj.is_panel_working() or "panel_replacement_min_age" not in kwargs
-                                or panel_obj.age >= kwargs["panel_replacement_min_age"]):
-                            panel_obj.initialize_or_replace_panel(pv_tech_obj=pv_tech_obj)
-                            nb_of_new_panels += 1
-
-            elif replacement_scenario == "uc_replace_failed_panels_every_X_years":
-                replacement_frequency_in_years = kwargs["replacement_frequency_in_years"]
-                if (year - uc_start_year) % replacement_frequency_in_years == 0:
-                    for panel_obj in pv_panel_obj_list:
-                        if not panel_obj.is_panel_working():
-                            panel_obj.initialize_or_replace_panel(pv_tech_obj=pv_tech_obj)
-                            nb_of_new_panels += 1
-
-            elif replacement_scenario == "uc_replace_all_panels_every_X_years":
-                replacement_frequency_in_years = kwargs["replacement_frequency_in_years"]
-                if (year - uc_start_year) % replacement_frequency_in_years == 0:
-                    for panel_obj in pv_panel_obj_list:
-                        if (not panel_obj.is_panel_working() or "panel_replacement_min_age" not in kwargs
-                                or panel_obj.age >= kwargs["panel_replacement_min_age"]):
-                            panel_obj.initialize_or_replace_panel(pv_tech_obj=pv_tech_obj)
-                            nb_of_new_panels += 1
+            elif replacement_scenario in ["replace_failed_panels_every_X_years",
+                                          "uc_replace_failed_panels_every_X_years"]:
+                replacement_start_year = uc_start_year if replacement_scenario.startswith("uc_") else start_year
+                if (year - replacement_start_year) % kwargs["replacement_frequency_in_years"] == 0:
+                    nb_of_new_panels = bipv_panel_fleet.initialize_or_replace_panels(
+                        panel_mask=~bipv_panel_fleet.get_working_mask(), pv_tech_obj=pv_tech_obj,
+                        random_generator=random_generator)
+            elif replacement_scenario in ["replace_all_panels_every_X_years", "uc_replace_all_panels_every_X_years"]:
+                replacement_start_year = uc_start_year if replacement_scenario.startswith("uc_") else start_year
+                if (year - replacement_start_year) % kwargs["replacement_frequency_in_years"] == 0:
+                    if "panel_replacement_min_age" not in kwargs:
+                        panel_mask = None
+                    else:
+                        panel_mask = ~bipv_panel_fleet.get_working_mask() | (
+                                bipv_panel_fleet.age_array >= kwargs["panel_replacement_min_age"])
+                    nb_of_new_panels = bipv_panel_fleet.initialize_or_replace_panels(
+                        panel_mask=panel_mask, pv_tech_obj=pv_tech_obj, random_generator=random_generator)
 
             elif replacement_scenario == "no_replacement":
                 pass
 
-            # Loop over all the sun hours
-            nb_of_sun_hours = len(
-                hourly_solar_irradiance_table[0])  # Number of sun hours in the year, same for all faces
-            hourly_power_generation_by_panels_table = [panel_obj.get_hourly_power_generation_over_a_year(
-                hourly_irradiance_list=hourly_solar_irradiance_table[panel_obj.index], **kwargs) for panel_obj
-                in
-                pv_panel_obj_list]
-            for i in range(nb_of_sun_hours):
-                total_power = sum(
-                    [hourly_power_generation_by_panels_table[j][i] for j in range(len(pv_panel_obj_list))])
-                if total_power > inverter_capacity:
-                    total_power = inverter_capacity
-                # Energy in kWh/h is power in kW * 1h
-                annual_energy_harvested += total_power
-            for panel_obj in pv_panel_obj_list:
-                panel_obj.increment_age_by_one_year()
+            # Sum the power generated by the panels for every sun hour, capped to the inverter capacity
+            annual_energy_harvested = compute_yearly_energy_harvested_by_panels(
+                bipv_panel_fleet=bipv_panel_fleet, hourly_irradiance_array=hourly_irradiance_array,
+                peak_irradiance_array=peak_irradiance_array, inverter_capacity=inverter_capacity, **kwargs)
+            bipv_panel_fleet.increment_age_by_one_year()
 
             energy_production_per_year_list.append(annual_energy_harvested / 1000)  # convert Wh to kWh
             nb_of_panels_installed_per_year_list.append(nb_of_new_panels)
@@ -214,6 +214,40 @@ def simulate_bipv_yearly_energy_harvesting(pv_panel_obj_list,
     return energy_production_per_year_list, nb_of_panels_installed_per_year_list
 
 
+def compute_yearly_energy_harvested_by_panels(bipv_panel_fleet, hourly_irradiance_array, inverter_capacity,
+                                              peak_irradiance_array=None, **kwargs):
+    """
+    Compute the energy harvested by the panels during a year. The hourly power of each panel is capped to its maximum
+    power output, and the total hourly power of the panels is capped to the capacity of the inverter.
+    The hourly power of the panels is summed with a matrix product on the irradiance table, only the panels that can
+    reach their maximum power output are capped hour by hour.
+    :param bipv_panel_fleet: BipvPanelFleet object of the panels
+    :param hourly_irradiance_array: numpy array of shape (number of faces, number of sun hours) of the hourly
+        irradiance in Wh/m2 of all the faces of the sensor grid
+    :param inverter_capacity: float: capacity of the inverter
+    :param peak_irradiance_array: numpy array of the maximum hourly irradiance of each face, computed if None
+    :param kwargs: kwargs passed to the efficiency function of the panels
+    :return annual_energy_harvested: float: energy harvested during the year in Wh
+    """
+    if len(bipv_panel_fleet) == 0 or hourly_irradiance_array.size == 0:
+        return 0.
+    if peak_irradiance_array is None:
+        peak_irradiance_array = hourly_irradiance_array.max(axis=1)
+    # Power generated by each face per unit of irradiance, and irradiance above which the power of the panel is capped
+    power_factor_array, max_irradiance_array = bipv_panel_fleet.get_power_factor_and_max_irradiance_arrays(
+        number_of_faces=len(hourly_irradiance_array), **kwargs)
+    # Faces which panel reach their maximum power output at least once during the year
+    is_capped_array = (power_factor_array != 0.) & (peak_irradiance_array > max_irradiance_array)
+    not_capped_power_factor_array = np.where(is_capped_array, 0., power_factor_array)
+    hourly_power_array = not_capped_power_factor_array @ hourly_irradiance_array
+    if is_capped_array.any():
+        capped_index_array = np.flatnonzero(is_capped_array)
+        hourly_power_array += power_factor_array[capped_index_array] @ np.minimum(
+            hourly_irradiance_array[capped_index_array], max_irradiance_array[capped_index_array, None])
+    # Energy in kWh/h is power in kW * 1h
+    return float(np.minimum(hourly_power_array, inverter_capacity).sum())
+
+
 def compute_lca_and_cost_for_gtg(nb_of_panels_installed_yearly_list, pv_tech_obj, roof_or_facades):
     """
     Take the results from function loop_over_the_years_for_solar_panels and use the pv_tech_obj info to transform it to data
@@ -295,11 +329,11 @@ def compute_lca_cost_and_dmfa_for_recycling(nb_of_panels_installed_yearly_list,
     return recycling_dict
 
 
-def compute_lca_and_cost_for_maintenance(panel_list, start_year, current_study_duration_in_years,
+def compute_lca_and_cost_for_maintenance(bipv_panel_fleet, start_year, current_study_duration_in_years,
                                          uc_end_year):
     """
     Compute the LCA and cost of the maintenance of the panels over the simulated years
-    :param panel_list: list of BipvPanel objects
+    :param bipv_panel_fleet: BipvPanelFleet object of the panels
     :param start_year: int: year when the simulation starts
     :param current_study_duration_in_years: int: duration of the study in years
     :param uc_end_year: int: year when the uc ends
@@ -313,12 +347,11 @@ def compute_lca_and_cost_for_maintenance(panel_list, start_year, current_study_d
     if iteration_start_year < uc_end_year:
         for year in range(iteration_start_year, uc_end_year):
             primary_energy_maintenance_yearly_list.append(
-                sum([panel_obj.panel_technology_object.primary_energy_annual_maintenance for panel_obj in
-                     panel_list]))
+                bipv_panel_fleet.get_sum_of_technology_attribute("primary_energy_annual_maintenance"))
             ghg_maintenance_yearly_list.append(
-                sum([panel_obj.panel_technology_object.ghg_annual_maintenance for panel_obj in panel_list]))
+                bipv_panel_fleet.get_sum_of_technology_attribute("ghg_annual_maintenance"))
             cost_maintenance_yearly_list.append(
-                sum([panel_obj.panel_technology_object.cost_annual_maintenance for panel_obj in panel_list]))
+                bipv_panel_fleet.get_sum_of_technology_attribute("cost_annual_maintenance"))
 
     maintenance_result_dict = {
         "primary_energy": primary_energy_maintenance_yearly_list,
@@ -0,0 +1,243 @@
+"""
+Cache of the Radiance files shared by the annual irradiance simulations of the buildings of an urban canopy.
+The sky matrices, sky dome and sun path only depend on the weather file and on the parameters of the sky, they are
+generated by the recipe of the first building and copied in the folder of the recipe of the other buildings, the
+recipe then skips the steps generating them.
+The results of the simulations are also cached, by a hash of the Honeybee Model, the sensors, the context shades, the
+weather file and the parameters of the simulation, so that a building that did not change is not simulated again.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import threading
+import json
+import numpy as np
+
+from importlib.metadata import version, PackageNotFoundError
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+name_radiance_cache_folder = "radiance_cache"
+name_sky_matrix_cache_folder = "sky_matrix"
+name_irradiance_result_cache_folder = "irradiance_results"
+name_cached_annual_irradiance_file = "annual_irradiance.npy"
+name_cached_hourly_irradiance_file = "hourly_irradiance.npy"
+name_cached_sun_up_hours_file = "sun-up-hours.txt"
+# Files generated by the annual irradiance recipe in its "resources" folder that only depend on the sky
+sky_matrix_file_name_list = ["sky.mtx", "sky_direct.mtx", "sky.dome", "sunpath.mtx", "sunpath.mod", "sun-up-hours.txt"]
+
+
+def get_version_of_package(package_name):
+    """
+    Get the version of an installed package, the files of the cache depend on the version of the recipes
+    :param package_name: str, name of the package
+    :return: str, version of the package, an empty string if it is not installed
+    """
+    try:
+        return version(package_name)
+    except PackageNotFoundError:
+        return ""
+
+
+def get_hash_of_file(path_file, chunk_size=2 ** 20):
+    """
+    Get the sha256 hash of the content of a file
+    :param path_file: str, path of the file
+    :param chunk_size: int, size of the chunks read
+    :return: str, hexadecimal hash
+    """
+    file_hash = hashlib.sha256()
+    with open(path_file, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_sky_matrix_cache_key(path_weather_file, north=0, timestep=1, visible=False):
+    """
+    Get the key of the sky matrix of a weather file in the cache, from the content of the weather file, the
+    parameters of the sky and the versions of the recipes
+    :param path_weather_file: str, path of the epw or wea file
+    :param north: float, north angle in degrees
+    :param timestep: int, timestep of the weather file
+    :param visible: bool, if True, the sky is generated for the visible spectrum
+    :return: str, key of the sky matrix
+    """
+    key_hash = hashlib.sha256()
+    for value in [get_hash_of_file(path_weather_file), float(north), int(timestep), bool(visible),
+                  get_version_of_package("lbt-recipes"), get_version_of_package("honeybee-radiance")]:
+        key_hash.update(repr(value).encode("utf-8"))
+    return key_hash.hexdigest()
+
+
+def get_path_sky_matrix_cache_folder(path_simulation_folder):
+    """
+    Get the path of the folder of the cached sky matrices of a simulation folder
+    :param path_simulation_folder: str, path of the simulation folder
+    :return: str, path of the folder
+    """
+    return os.path.join(path_simulation_folder, name_radiance_cache_folder, name_sky_matrix_cache_folder)
+
+
+def is_sky_matrix_in_cache(path_sky_matrix_cache_folder, sky_matrix_key):
+    """
+    Check if the files of a sky matrix are in the cache
+    :param path_sky_matrix_cache_folder: str, path of the folder of the cached sky matrices
+    :param sky_matrix_key: str, key of the sky matrix
+    :return: bool
+    """
+    path_cached_folder = os.path.join(path_sky_matrix_cache_folder, sky_matrix_key)
+    return all(os.path.isfile(os.path.join(path_cached_folder, file_name)) for file_name in sky_matrix_file_name_list)
+
+
+def copy_sky_matrix_from_cache(path_sky_matrix_cache_folder, sky_matrix_key, path_recipe_resources_folder):
+    """
+    Copy the cached files of a sky matrix in the resources folder of a recipe, so that the recipe does not generate
+    them again
+    :param path_sky_matrix_cache_folder: str, path of the folder of the cached sky matrices
+    :param sky_matrix_key: str, key of the sky matrix
+    :param path_recipe_resources_folder: str, path of the resources folder of the recipe
+    :return: bool, True if the sky matrix was in the cache and was copied
+    """
+    if not is_sky_matrix_in_cache(path_sky_matrix_cache_folder, sky_matrix_key):
+        return False
+    os.makedirs(path_recipe_resources_folder, exist_ok=True)
+    for file_name in sky_matrix_file_name_list:
+        shutil.copyfile(os.path.join(path_sky_matrix_cache_folder, sky_matrix_key, file_name),
+                        os.path.join(path_recipe_resources_folder, file_name))
+    return True
+
+
+def add_sky_matrix_to_cache(path_sky_matrix_cache_folder, sky_matrix_key, path_recipe_resources_folder):
+    """
+    Add the sky matrix generated by a recipe to the cache. The files are copied to a temporary folder renamed
+    afterward, so that a recipe running at the same time never copies an incomplete sky matrix.
+    :param path_sky_matrix_cache_folder: str, path of the folder of the cached sky matrices
+    :param sky_matrix_key: str, key of the sky matrix
+    :param path_recipe_resources_folder: str, path of the resources folder of the recipe
+    """
+    if is_sky_matrix_in_cache(path_sky_matrix_cache_folder, sky_matrix_key) or not all(
+            os.path.isfile(os.path.join(path_recipe_resources_folder, file_name)) for file_name in
+            sky_matrix_file_name_list):
+        return
+    path_cached_folder = os.path.join(path_sky_matrix_cache_folder, sky_matrix_key)
+    path_temp_cached_folder = path_cached_folder + f".tmp{os.getpid()}_{threading.get_ident()}"
+    os.makedirs(path_temp_cached_folder, exist_ok=True)
+    for file_name in sky_matrix_file_name_list:
+        shutil.copyfile(os.path.join(path_recipe_resources_folder, file_name),
+                        os.path.join(path_temp_cached_folder, file_name))
+    if os.path.isdir(path_cached_folder):  # incomplete folder of an interrupted run
+        shutil.rmtree(path_cached_folder, ignore_errors=True)
+    try:
+        os.rename(path_temp_cached_folder, path_cached_folder)
+    except OSError:  # another recipe added the same sky matrix in the meantime
+        shutil.rmtree(path_temp_cached_folder, ignore_errors=True)
+    dev_logger.info(f"The sky matrix {sky_matrix_key} was added to the cache")
+
+
+def get_hash_of_json_serializable_object(obj):
+    """
+    Get the sha256 hash of an object that can be serialized to json, such as the dictionary of a Honeybee object,
+    independently of the order of the keys of the dictionaries
+    :param obj: dict or list
+    :return: str, hexadecimal hash
+    """
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_irradiance_result_cache_key(hb_model_dict, sensor_dict_list, context_hb_shade_dict_list, path_weather_file,
+                                    radiance_parameters, north=0, timestep=1, visible=False):
+    """
+    Get the key of the annual irradiance results of a SensorGrid in the cache
+    :param hb_model_dict: dict, dictionary of the Honeybee Model of the building
+    :param sensor_dict_list: list of dict, sensors of the SensorGrid
+    :param context_hb_shade_dict_list: list of dict, dictionaries of the context Honeybee Shades, in any order
+    :param path_weather_file: str, path of the epw or wea file
+    :param radiance_parameters: str, Radiance parameters of the ray tracing
+    :param north: float, north angle in degrees
+    :param timestep: int, timestep of the weather file
+    :param visible: bool, if True, the irradiance is computed for the visible spectrum
+    :return: str, key of the results
+    """
+    key_hash = hashlib.sha256()
+    for value in [get_hash_of_json_serializable_object(hb_model_dict),
+                  get_hash_of_json_serializable_object(sensor_dict_list),
+                  sorted(get_hash_of_json_serializable_object(hb_shade_dict) for hb_shade_dict in
+                         context_hb_shade_dict_list),
+                  get_sky_matrix_cache_key(path_weather_file=path_weather_file, north=north, timestep=timestep,
+                                           visible=visible),
+                  radiance_parameters]:
+        key_hash.update(repr(value).encode("utf-8"))
+    return key_hash.hexdigest()
+
+
+def get_path_irradiance_result_cache_folder(path_simulation_folder):
+    """
+    Get the path of the folder of the cached irradiance results of a simulation folder
+    :param path_simulation_folder: str, path of the simulation folder
+    :return: str, path of the folder
+    """
+    return os.path.join(path_simulation_folder, name_radiance_cache_folder, name_irradiance_result_cache_folder)
+
+
+def is_irradiance_result_in_cache(path_irradiance_result_cache_folder, irradiance_result_key):
+    """
+    Check if the annual irradiance results of a SensorGrid are in the cache
+    :param path_irradiance_result_cache_folder: str, path of the folder of the cached irradiance results
+    :param irradiance_result_key: str, key of the results
+    :return: bool
+    """
+    path_cached_folder = os.path.join(path_irradiance_result_cache_folder, irradiance_result_key)
+    return all(os.path.isfile(os.path.join(path_cached_folder, file_name)) for file_name in
+               [name_cached_annual_irradiance_file, name_cached_hourly_irradiance_file,
+                name_cached_sun_up_hours_file])
+
+
+def add_irradiance_result_to_cache(path_irradiance_result_cache_folder, irradiance_result_key,
+                                   annual_irradiance_list, path_hourly_irradiance_npy_file, path_sun_up_hours_file):
+    """
+    Add the annual irradiance results of a SensorGrid to the cache, in a temporary folder renamed afterward
+    :param path_irradiance_result_cache_folder: str, path of the folder of the cached irradiance results
+    :param irradiance_result_key: str, key of the results
+    :param annual_irradiance_list: list of float, annual irradiance of each sensor in kWh/m2
+    :param path_hourly_irradiance_npy_file: str, path of the .npy file of the hourly irradiance of the sensors
+    :param path_sun_up_hours_file: str, path of the sun up hours file
+    """
+    if is_irradiance_result_in_cache(path_irradiance_result_cache_folder, irradiance_result_key):
+        return
+    path_cached_folder = os.path.join(path_irradiance_result_cache_folder, irradiance_result_key)
+    path_temp_cached_folder = path_cached_folder + f".tmp{os.getpid()}_{threading.get_ident()}"
+    os.makedirs(path_temp_cached_folder, exist_ok=True)
+    np.save(os.path.join(path_temp_cached_folder, name_cached_annual_irradiance_file),
+            np.asarray(annual_irradiance_list, dtype=float))
+    shutil.copyfile(path_hourly_irradiance_npy_file,
+                    os.path.join(path_temp_cached_folder, name_cached_hourly_irradiance_file))
+    shutil.copyfile(path_sun_up_hours_file, os.path.join(path_temp_cached_folder, name_cached_sun_up_hours_file))
+    if os.path.isdir(path_cached_folder):  # incomplete folder of an interrupted run
+        shutil.rmtree(path_cached_folder, ignore_errors=True)
+    try:
+        os.rename(path_temp_cached_folder, path_cached_folder)
+    except OSError:  # another simulation added the same results in the meantime
+        shutil.rmtree(path_temp_cached_folder, ignore_errors=True)
+
+
+def copy_irradiance_result_from_cache(path_irradiance_result_cache_folder, irradiance_result_key,
+                                      path_hourly_irradiance_npy_file, path_sun_up_hours_file):
+    """
+    Copy the cached annual irradiance results of a SensorGrid to the result folder of a building
+    :param path_irradiance_result_cache_folder: str, path of the folder of the cached irradiance results
+    :param irradiance_result_key: str, key of the results
+    :param path_hourly_irradiance_npy_file: str, path of the .npy file of the hourly irradiance in the result folder
+    :param path_sun_up_hours_file: str, path of the sun up hours file in the result folder
+    :return annual_irradiance_list: list of float, annual irradiance of each sensor in kWh/m2
+    """
+    path_cached_folder = os.path.join(path_irradiance_result_cache_folder, irradiance_result_key)
+    for cached_file_name, path_file in [(name_cached_hourly_irradiance_file, path_hourly_irradiance_npy_file),
+                                        (name_cached_sun_up_hours_file, path_sun_up_hours_file)]:
+        os.makedirs(os.path.dirname(path_file), exist_ok=True)
+        shutil.copyfile(os.path.join(path_cached_folder, cached_file_name), path_file + ".tmp")
+        os.replace(path_file + ".tmp", path_file)
+    return np.load(os.path.join(path_cached_folder, name_cached_annual_irradiance_file)).tolist()
@@ -1,15 +1,16 @@
 """
-Utils functions for the generation of SensorGrids objects
+Utils functions for the generation of SensorGrids objects.
+The grids are generated on numpy arrays of vertices and faces for all the faces of a building at once, the Ladybug
+geometry objects are only made when converting the grid to a SensorGrid.
 """
 
 import logging
+import numpy as np
 
 from ladybug_geometry.geometry3d.mesh import Mesh3D
+from ladybug_geometry.geometry3d.pointvector import Point3D
 from ladybug_geometry.geometry2d.mesh import Mesh2D
 from ladybug_geometry.geometry2d.polygon import Polygon2D
-from ladybug_geometry.geometry2d.pointvector import Vector2D, Point2D
-from ladybug_geometry.geometry2d.ray import Ray2D
-from ladybug_geometry.intersection2d import does_intersection_exist_line2d
 from honeybee.model import Model
 from honeybee.boundarycondition import Outdoors
 from honeybee.facetype import Wall, RoofCeiling
@@ -60,11 +61,11 @@ def generate_sensorgrid_obj_on_lb_punched_face_list(lb_punched_face3d_list, grid
 
     :return sensor_grid_obj: Honeybee SensorGrid object
     """
-    # generate Ladybug Mesh on the Honeybee Face
-    lb_mesh_obj = generate_lb_mesh_from_lb_punched_face_list(lb_punched_face3d_list, grid_size_x, grid_size_y,
-                                                             offset_dist, surface_type)
-    # Generate a SensorGrid object out of the mesh
-    sensor_grid_obj = create_sensor_grid_from_mesh(lb_mesh_obj)
+    # generate the arrays of the grid on the Honeybee Faces
+    vertex_array, face_array, centroid_array, normal_array = generate_grid_arrays_from_lb_punched_face_list(
+        lb_punched_face3d_list, grid_size_x, grid_size_y, offset_dist, surface_type)
+    # Generate a SensorGrid object out of the grid
+    sensor_grid_obj = create_sensor_grid_from_grid_arrays(vertex_array, face_array, centroid_array, normal_array)
 
     return sensor_grid_obj
 
@@ -82,64 +83,92 @@ def get_hb_faces_list_according_to_type(model, face_type_function):
     return lb_punched_face3d_list
 
 
-def create_sensor_grid_from_mesh(mesh, name=None):
-    """Create a HB SensorGrid and add it to a HB model"""
+def create_sensor_grid_from_grid_arrays(vertex_array, face_array, centroid_array, normal_array, name=None):
+    """
+    Create a HB SensorGrid from the arrays of a grid, the Ladybug Mesh3D of the SensorGrid is only made here.
+    :param vertex_array: numpy array of shape (number of vertices, 3) with the coordinates of the vertices
+    :param face_array: numpy array of shape (number of faces, 4) with the indices of the vertices of the faces
+    :param centroid_array: numpy array of shape (number of faces, 3) with the centroids of the faces, used as sensors
+    :param normal_array: numpy array of shape (number of faces, 3) with the normals of the faces
+    :param name: str : name of the SensorGrid, a random one is generated if None
+    :return sensor_grid: Honeybee SensorGrid object
+    """
     name = clean_and_id_rad_string('SensorGrid') if name is None else name
     id = clean_rad_string(name) if '/' not in name else clean_rad_string(name.split('/')[0])
-    sensor_grid = SensorGrid.from_mesh3d(id, mesh)
+    sensor_grid = SensorGrid.from_position_and_direction(id, centroid_array.tolist(), normal_array.tolist())
+    sensor_grid.mesh = Mesh3D(tuple(Point3D(*vertex) for vertex in vertex_array.tolist()),
+                              tuple(tuple(face) for face in face_array.tolist()))
     return sensor_grid
 
 
-def generate_lb_mesh_from_lb_punched_face_list(lb_punched_face3d_list, grid_size_x, grid_size_y, offset_dist,
-                                               surface_type):
+def generate_grid_arrays_from_lb_punched_face_list(lb_punched_face3d_list, grid_size_x, grid_size_y, offset_dist,
+                                                   surface_type):
     """
-    Create a Ladybug Mesh3D from a list of LB punched geometry
+    Generate the arrays of a single grid covering a list of LB punched geometry
     :param lb_punched_face3d_list: list of LB punched geometry
     :param grid_size_x: float : size of the grid in the x direction in meter
     :param grid_size_y: float : size of the grid in the y direction in meter
     :param offset_dist: float : offset distance on the border of the face to generate the mesh
     :param surface_type: str : Surface type to generate the Sensorgrid on, either "roof" or "facades"
+    :return vertex_array, face_array, centroid_array, normal_array: numpy arrays of the joined grid
     """
-    # Initialize the list of Ladybug Meshes
-    lb_meshes = []
+    grid_array_tuple_list = []
     for lb_face_obj in lb_punched_face3d_list:
         try:
-            new_mesh = generate_lb_mesh3d_from_hb_face(lb_face_obj, grid_size_x, grid_size_y, offset=offset_dist)
-            if new_mesh is not None:
-                lb_meshes.append(new_mesh)
-            # lb_meshes.append(generate_lb_mesh3d_from_hb_face(lb_face_obj, grid_size_x, grid_size_y, offset=offset_dist))
+            grid_array_tuple = generate_grid_arrays_from_lb_face3d(lb_face_obj, grid_size_x, grid_size_y,
+                                                                   offset=offset_dist)
+            if grid_array_tuple is not None:
+                grid_array_tuple_list.append(grid_array_tuple)
         except AssertionError:  # tiny geometry not compatible with quad faces
             continue
-    if len(lb_meshes) == 0:
+    if len(grid_array_tuple_list) == 0:
         # todo : Correct that to continue the simulation anyway, not generating the Sensorgrid and disabling the simulation
         #  for the roof/facade for that building
-        lb_mesh = None
         dev_logger.warning("No mesh was generated for the Honeybee Model")
         raise AssertionError(
             f"No mesh could be generated. It is liokely that there is not enough room in the {surface_type} to generate a mesh")
-    elif len(lb_meshes) == 1:
-        lb_mesh = lb_meshes[0]
-    else:  # join the meshes
-        lb_mesh = Mesh3D.join_meshes(lb_meshes)
-    return lb_mesh
+    # Join the grids, shifting the vertex indices of the faces of each grid by the vertices of the previous ones
+    vertex_index_offset_list = np.cumsum([0] + [len(vertex_array) for vertex_array, _, _, _ in grid_array_tuple_list])
+    vertex_array = np.concatenate([vertex_array for vertex_array, _, _, _ in grid_array_tuple_list])
+    face_array = np.concatenate([face_array + vertex_index_offset for (_, face_array, _, _), vertex_index_offset
+                                 in zip(grid_array_tuple_list, vertex_index_offset_list)])
+    centroid_array = np.concatenate([centroid_array for _, _, centroid_array, _ in grid_array_tuple_list])
+    normal_array = np.concatenate([normal_array for _, _, _, normal_array in grid_array_tuple_list])
+
+    return vertex_array, face_array, centroid_array, normal_array
+
+
+def generate_lb_mesh_from_lb_punched_face_list(lb_punched_face3d_list, grid_size_x, grid_size_y, offset_dist,
+                                               surface_type):
+    """
+    Create a Ladybug Mesh3D from a list of LB punched geometry
+    :param lb_punched_face3d_list: list of LB punched geometry
+    :param grid_size_x: float : size of the grid in the x direction in meter
+    :param grid_size_y: float : size of the grid in the y direction in meter
+    :param offset_dist: float : offset distance on the border of the face to generate the mesh
+    :param surface_type: str : Surface type to generate the Sensorgrid on, either "roof" or "facades"
+    """
+    vertex_array, face_array, _, _ = generate_grid_arrays_from_lb_punched_face_list(
+        lb_punched_face3d_list, grid_size_x, grid_size_y, offset_dist, surface_type)
+    return Mesh3D(tuple(Point3D(*vertex) for vertex in vertex_array.tolist()),
+                  tuple(tuple(face) for face in face_array.tolist()))
 
 
-def generate_lb_mesh3d_from_hb_face(lb_punched_face3d, x_dim, y_dim=None, offset=None, flip=False,
-                                    generate_centroids=True):
+def generate_grid_arrays_from_lb_face3d(lb_punched_face3d, x_dim, y_dim=None, offset=None, flip=False):
     """
-    Function highly inspired from the in the todo @Elie, add the name of the function
-     function in the original Honeybee code, modified to fit the needs of the project.
+    Function highly inspired from the Face3D.get_mesh_grid function in the original Ladybug code, modified to fit
+    the needs of the project and to work on numpy arrays instead of Ladybug points.
 
-    Get a gridded Mesh3D over this lb_punched_face3d.
+    Get the arrays of a quad grid over this lb_punched_face3d.
 
-    This method generates a mesh grid over the domain of the lb_punched_face3d
+    This method generates a grid over the domain of the lb_punched_face3d
     and then removes any vertices that do not lie within it.
 
     Note that the x_dim and y_dim refer to dimensions within the X and Y
-    coordinate system of this hb_face_objs's plane. So rotating this plane will
+    coordinate system of this face's plane. So rotating this plane will
     result in rotated grid cells.
 
-    :param lb_punched_face3d: A Honeybee Face object.
+    :param lb_punched_face3d: A Ladybug Face3D object.
     :param x_dim: The x dimension of the grid cells as a number.
     :param y_dim: The y dimension of the grid cells as a number. Default is None,
         which will assume the same cell dimension for y as is set for x.
@@ -148,13 +177,8 @@ def generate_lb_mesh3d_from_hb_face(lb_punched_face3d, x_dim, y_dim=None, offset
     :param flip: Set to True to have the mesh normals reversed from the direction
         of this face and to have the offset input move the mesh in the
         opposite direction from this face's normal.
-    :param generate_centroids: Set to True to have the face centroids generated
-        alongside the grid of vertices, which is much faster than having
-        them generated upon request as they typically are. However, if you
-        have no need for the face centroids, you would save time and memory
-        by setting this to False. Default is True.
 
-    :returns: A Honeybee Mesh3D object.
+    :returns: The vertex, face, centroid and normal arrays of the grid, None if no face of the grid is in the face.
     """
     # check the inputs and set defaults
     assert isinstance(x_dim, (float, int)), '{} for Face3D.get_mesh_grid' \
@@ -168,66 +192,48 @@ def generate_lb_mesh3d_from_hb_face(lb_punched_face3d, x_dim, y_dim=None, offset
         assert isinstance(offset, (float, int)), '{} for Face3D.get_mesh_grid' \
                                                  ' must be a number. Got {}.'.format('offset', type(input))
 
-    # generate the mesh grid and convert it to a 3D mesh
-    grid_mesh2d = generate_lb_mesh2d_from_lb_polygon2d(
-        lb_punched_face3d, x_dim, y_dim, generate_centroids)
-    # if the grid mesh is None, return None
-    if grid_mesh2d is None:
+    # generate the grid in the plane of the face
+    grid_array_tuple_2d = generate_grid_arrays_from_lb_polygon2d(lb_punched_face3d, x_dim, y_dim)
+    # if the grid is None, return None
+    if grid_array_tuple_2d is None:
         return None
-
-    if offset is None or offset == 0:
-        vert_3d = tuple(lb_punched_face3d.plane.xy_to_xyz(pt)
-                        for pt in grid_mesh2d.vertices)
-    else:
-        _off_num = -1 * offset if flip is True else offset
-        _off_plane = lb_punched_face3d.plane.move(lb_punched_face3d.plane.n * _off_num)
-        vert_3d = tuple(_off_plane.xy_to_xyz(pt)
-                        for pt in grid_mesh2d.vertices)
-    grid_mesh3d = Mesh3D(vert_3d, grid_mesh2d.faces)
-    grid_mesh3d._face_areas = grid_mesh2d.face_areas
-
-    # assign the face plane normal to the mesh normals
+    vertex_array_2d, face_array, centroid_array_2d = grid_array_tuple_2d
+
+    # convert the grid to 3D, moving the plane by the offset
+    plane = lb_punched_face3d.plane
+    plane_normal = np.array([plane.n.x, plane.n.y, plane.n.z])
+    plane_origin = np.array([plane.o.x, plane.o.y, plane.o.z])
+    if offset is not None and offset != 0:
+        plane_origin = plane_origin + plane_normal * (-1 * offset if flip is True else offset)
+    plane_axes = np.array([[plane.x.x, plane.x.y, plane.x.z], [plane.y.x, plane.y.y, plane.y.z]])
+    vertex_array = plane_origin + vertex_array_2d @ plane_axes
+    centroid_array = plane_origin + centroid_array_2d @ plane_axes
+
+    # assign the face plane normal to the faces
     if flip is True:
-        grid_mesh3d._face_normals = lb_punched_face3d.plane.n.reverse()
-        grid_mesh3d._vertex_normals = lb_punched_face3d.plane.n.reverse()
-        grid_mesh3d._faces = tuple(
-            tuple(reversed(face)) for face in grid_mesh3d.faces)  # right-hand rule
-    else:
-        grid_mesh3d._face_normals = lb_punched_face3d.plane.n
-        grid_mesh3d._vertex_normals = lb_punched_face3d.plane.n
+        plane_normal = -plane_normal
+        face_array = face_array[:, ::-1]  # right-hand rule
+    normal_array = np.tile(plane_normal, (len(face_array), 1))
 
-    # transform the centroids to 3D space if they were generated
-    if generate_centroids is True:
-        _conv_plane = lb_punched_face3d.plane if offset is None or offset == 0 else _off_plane
-        grid_mesh3d._face_centroids = tuple(_conv_plane.xy_to_xyz(pt)
-                                            for pt in grid_mesh2d.face_centroids)
+    return vertex_array, face_array, centroid_array, normal_array
 
-    return grid_mesh3d
 
+def generate_grid_arrays_from_lb_polygon2d(polygon, x_dim, y_dim):
+    """
+    Generate the arrays of a quad grid over the Polygon2D of a LB punched geometry, in the plane of the geometry.
 
-def generate_lb_mesh2d_from_lb_polygon2d(polygon, x_dim, y_dim, generate_centroids=True):
-    """Initialize a gridded Mesh2D from a Polygon2D.
-
-    Note that this gridded mesh will usually not completely fill the polygon.
+    Note that this grid will usually not completely fill the polygon.
     Essentially, this method generates a grid over the domain of the polygon
-    and then removes any points that do not lie within the polygon.
-
-    Args:
-        polygon: A Polygon2D object.
-        x_dim: The x dimension of the grid cells as a number.
-        y_dim: The y dimension of the grid cells as a number.
-        generate_centroids: Set to True to have the face centroids generated
-            alongside the grid of vertices, which is much faster than having
-            them generated upon request as they typically are. However, if you
-            have no need for the face centroids, you would save memory by setting
-            this to False. Default is True.
-    todo @Elie, change the name of variables and put more comments
-    todo @Elie, rework on the whole structure of the function, it works but it is unclear
+    and then removes any points that do not lie within the polygon and any face that overlaps its holes.
 
     Credits, Highly inspired from ladybug_geometry.geometry2d.mesh.Mesh2D.from_polygon_grid, with adjusments
     not to overlap holes/apertures/windows
-    """
 
+    :param polygon: LB punched geometry, with its polygon2d and its hole_polygon2d
+    :param x_dim: The x dimension of the grid cells as a number.
+    :param y_dim: The y dimension of the grid cells as a number.
+    :return vertex_array, face_array, centroid_array: numpy arrays of the 2D grid, None if no face is in the polygon
+    """
     polygon_face = polygon.polygon2d
 
     assert isinstance(polygon_face, Polygon2D), 'Expected Polygon2D for' \
@@ -236,91 +242,97 @@ def generate_lb_mesh2d_from_lb_polygon2d(polygon, x_dim, y_dim, generate_centroi
     # figure out how many x and y cells to make
     _x_dim, _num_x = Mesh2D._domain_dimensions(polygon_face.max.x - polygon_face.min.x, x_dim)
     _y_dim, _num_y = Mesh2D._domain_dimensions(polygon_face.max.y - polygon_face.min.y, y_dim)
-    _poly_min = polygon_face.min
+    poly_min_array = np.array([polygon_face.min.x, polygon_face.min.y])
 
-    # generate the gid of points and faces
-    _verts = Mesh2D._grid_vertices(_poly_min, _num_x, _num_y, _x_dim, _y_dim)
-    _faces = Mesh2D._grid_faces(_num_x, _num_y)
-    _centroids = Mesh2D._grid_centroids(_poly_min, _num_x, _num_y, _x_dim, _y_dim)
+    # generate the grid of vertices and faces, in the same order as Mesh2D.from_polygon_grid
+    x_array, y_array = np.meshgrid(poly_min_array[0] + np.arange(_num_x + 1) * _x_dim,
+                                   poly_min_array[1] + np.arange(_num_y + 1) * _y_dim, indexing="ij")
+    vertex_array = np.column_stack([x_array.ravel(), y_array.ravel()])
+    first_vertex_index_array = (np.arange(_num_x)[:, None] * (_num_y + 1) + np.arange(_num_y)[None, :]).ravel()
+    face_array = np.column_stack([first_vertex_index_array, first_vertex_index_array + _num_y + 1,
+                                  first_vertex_index_array + _num_y + 2, first_vertex_index_array + 1])
+    centroid_array = vertex_array[first_vertex_index_array] + np.array([_x_dim / 2, _y_dim / 2])
 
     # figure out which vertices lie inside the polygon
     # for tolerance reasons, we scale the polygon by a very small amount
     # this avoids the fringe cases noted in the Polygon2d.is_point_inside description
-    tol_pt = Vector2D(0.0000001, 0.0000001)
+    polygon_vertex_array = np.array([[pt.x, pt.y] for pt in polygon_face.vertices])
+    scaled_polygon_vertex_array = poly_min_array + (polygon_vertex_array - poly_min_array) * 1.000001 - 0.0000001
+    hole_vertex_array_list = [np.array([[pt.x, pt.y] for pt in polygon_hole.vertices])
+                              for polygon_hole in polygon.hole_polygon2d] if polygon.has_holes else []
+
+    # Remove the vertices that are out of the polygon or on the holes/windows
+    vertex_pattern = are_points_inside_polygon(vertex_array, scaled_polygon_vertex_array)
+    for hole_vertex_array in hole_vertex_array_list:
+        vertex_pattern &= ~are_points_inside_or_on_edge_of_polygon(vertex_array, hole_vertex_array, tolerance=0.1)
+    # Keep only the faces with all their vertices kept
+    face_pattern = vertex_pattern[face_array].all(axis=1)
+    # Remove the faces whose centroid or the middle of one of their sides is on the holes/windows
+    if hole_vertex_array_list:
+        face_vertex_array = vertex_array[face_array]
+        middle_point_array = (face_vertex_array + np.roll(face_vertex_array, -1, axis=1)) / 2
+        test_point_array = np.concatenate([centroid_array[:, None, :], middle_point_array], axis=1).reshape(-1, 2)
+        for hole_vertex_array in hole_vertex_array_list:
+            face_pattern &= ~are_points_inside_or_on_edge_of_polygon(
+                test_point_array, hole_vertex_array, tolerance=0.1).reshape(len(face_array), -1).any(axis=1)
+    if not face_pattern.any():
+        return None
 
-    scaled_poly = Polygon2D(
-        tuple(pt.scale(1.000001, _poly_min) - tol_pt for pt in polygon_face.vertices))
+    # Remove the faces that are not in the pattern and the vertices that are not used anymore
+    face_array = face_array[face_pattern]
+    used_vertex_pattern = np.zeros(len(vertex_array), dtype=bool)
+    used_vertex_pattern[face_array] = True
+    new_vertex_index_array = np.cumsum(used_vertex_pattern) - 1
 
+    return vertex_array[used_vertex_pattern], new_vertex_index_array[face_array], centroid_array[face_pattern]
+
+
+def are_points_inside_polygon(point_array, polygon_vertex_array, test_vector=(1, 0.00001)):
     """
-    The element of the mesh that overlap with windows/holes should be removed.
-    The separation of vertices that and faces will be differentiated, as the functions to remove them 
-    are different and cannot be used at the same time.
+    Test whether points lie inside a polygon, counting the intersections of a ray from each point with the edges of
+    the polygon, the same way as Polygon2D.is_point_inside, but for all the points at once.
+    :param point_array: numpy array of shape (number of points, 2)
+    :param polygon_vertex_array: numpy array of shape (number of vertices, 2) with the vertices of the polygon
+    :param test_vector: tuple, direction of the ray, a slight variation of the X-unit vector by default
+    :return: numpy array of booleans, True if the point is inside the polygon
     """
+    test_vector_x, test_vector_y = test_vector
+    segment_vector_array = np.roll(polygon_vertex_array, -1, axis=0) - polygon_vertex_array
+    number_of_intersection_array = np.zeros(len(point_array), dtype=int)
+    for (segment_x, segment_y), (segment_vector_x, segment_vector_y) in zip(polygon_vertex_array,
+                                                                            segment_vector_array):
+        determinant = test_vector_y * segment_vector_x - test_vector_x * segment_vector_y
+        if determinant == 0:  # the ray is parallel to the segment
+            continue
+        dx = segment_x - point_array[:, 0]
+        dy = segment_y - point_array[:, 1]
+        u_segment_array = (test_vector_x * dy - test_vector_y * dx) / determinant
+        u_ray_array = (segment_vector_x * dy - segment_vector_y * dx) / determinant
+        number_of_intersection_array += (u_segment_array >= 0) & (u_segment_array <= 1) & (u_ray_array >= 0)
 
-    # Remove the vertices that are on the wholes/windows
-    _pattern_vertices = [scaled_poly.is_point_inside(_v) for _v in _verts]
-    if polygon.has_holes:
-        for polygon_hole in polygon.hole_polygon2d:
-            # figure out how many x and y cells to make
-            for vert in _verts:
-                if polygon_hole.is_point_inside(vert) or polygon_hole.is_point_on_edge(vert, 0.1):
-                    _pattern_vertices[_verts.index(vert)] = False
-
-    # build the mesh
-    _mesh_init = Mesh2D(_verts, _faces)
-    _mesh_init._face_centroids = _centroids
-    # Remove the vertices that are not in the pattern
-    _new_mesh, _face_pattern = _mesh_init.remove_vertices(_pattern_vertices)
-    _new_mesh._face_areas = x_dim * y_dim
-    # Get new value sof th enew_mesh
-    mesh_faces = _new_mesh.faces
-    mesh_verts = _new_mesh.vertices
-    mesh_centroid = _new_mesh.face_centroids
-
-    # Remove the faces that are on the wholes/windows
-    _pattern_faces = []
-    # Initialize the pattern of the faces
-    for mesh_face in mesh_faces:
-        if [scaled_poly.is_point_inside(mesh_verts[i]) for i in mesh_face] == [True, True, True, True]:
-            _pattern_faces.append(True)
-        else:
-            _pattern_faces.append(False)
-
-    if polygon.has_holes:
-        for polygon_hole in polygon.hole_polygon2d:
-            for index, mesh_face in enumerate(mesh_faces):
-                # Check if the centroid is in the window
-                if polygon_hole.is_point_inside(mesh_centroid[index]) or polygon_hole.is_point_on_edge(
-                        mesh_centroid[index], 0.1):
-                    _pattern_faces[index] = False
-                # Check if the middle point of the polygon side is in the window
-                else:
-                    face_point2d_list = [mesh_verts[i] for i in mesh_face]
-                    face_middle_point2_list = [middle_point2d(face_point2d_list[i], face_point2d_list[i + 1])
-                                               for i in range(0, len(face_point2d_list) - 1)]
-                    face_middle_point2_list.append(
-                        middle_point2d(face_point2d_list[-1], face_point2d_list[0]))
-                    for middle_point in face_middle_point2_list:
-                        if polygon_hole.is_point_inside(middle_point) or polygon_hole.is_point_on_edge(
-                                middle_point, 0.1):
-                            _pattern_faces[index] = False
-                            break
-    # Remove the vertices that are not in the pattern
-    if True not in _pattern_faces:
-        return None
-    _new_mesh, _face_pattern = _new_mesh.remove_faces(_pattern_faces)
-    _new_mesh._face_areas = x_dim * y_dim
-
-    return _new_mesh
+    return number_of_intersection_array % 2 == 1
 
 
-def middle_point2d(point2d_1, point2d_2):
+def are_points_inside_or_on_edge_of_polygon(point_array, polygon_vertex_array, tolerance):
     """
-    Return the middle point between two Ladybug Point2D objects
-    :param point2d_1: tuple of float
-    :param point2d_2: tuple of float
+    Test whether points lie inside a polygon or at a distance from its edges lower than the tolerance
+    :param point_array: numpy array of shape (number of points, 2)
+    :param polygon_vertex_array: numpy array of shape (number of vertices, 2) with the vertices of the polygon
+    :param tolerance: float, distance from the edges under which a point is considered on the edges
+    :return: numpy array of booleans
     """
-    return (Point2D((point2d_1[0] + point2d_2[0]) / 2, (point2d_1[1] + point2d_2[1]) / 2))
+    is_on_edge_array = np.zeros(len(point_array), dtype=bool)
+    segment_vector_array = np.roll(polygon_vertex_array, -1, axis=0) - polygon_vertex_array
+    for segment_start, segment_vector in zip(polygon_vertex_array, segment_vector_array):
+        segment_length_squared = segment_vector @ segment_vector
+        if segment_length_squared == 0:  # zero-length segment, the closest point is its start
+            u_array = np.zeros(len(point_array))
+        else:
+            u_array = np.clip((point_array - segment_start) @ segment_vector / segment_length_squared, 0., 1.)
+        closest_point_array = segment_start + u_array[:, None] * segment_vector
+        is_on_edge_array |= np.linalg.norm(point_array - closest_point_array, axis=1) <= tolerance
+
+    return is_on_edge_array | are_points_inside_polygon(point_array, polygon_vertex_array)
 
 
 def is_facade(hb_face):
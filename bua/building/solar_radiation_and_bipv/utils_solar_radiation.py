@@ -6,6 +6,7 @@ import logging
 import os
 import shutil
 import subprocess
+import numpy as np
 from typing import List
 
 from ladybug.futil import write_to_file
@@ -16,6 +17,9 @@ from pollination_handlers.outputs.helper import read_sensor_grid_result
 from lbt_recipes.settings import RecipeSettings
 from lbt_recipes.recipe import Recipe
 
+from bua.building.solar_radiation_and_bipv.utils_radiance_cache import get_sky_matrix_cache_key, \
+    copy_sky_matrix_from_cache, add_sky_matrix_to_cache
+
 user_logger = logging.getLogger("user")
 dev_logger = logging.getLogger("dev")
 
@@ -25,7 +29,8 @@ def run_hb_model_annual_irradiance_simulation(hb_model_obj, path_folder_run, pat
                                               timestep=1, visible=False, north=0,
                                               grid_filter=None,
                                               radiance_parameters='-ab 2 -ad 5000 -lw 2e-05',
-                                              silent=False):
+                                              silent=False, workers=None, grid_identifier_list=None,
+                                              path_sky_matrix_cache_folder=None):
     """
     Run the Honeybee annual irradiance simulation on a Honeybee Model.
     :param model : A HB model for which Annual Irradiance will be simulated ( this model must have grids assigned to it)
@@ -47,16 +52,34 @@ def run_hb_model_annual_irradiance_simulation(hb_model_obj, path_folder_run, pat
     :param radiance_parameters : Text for the radiance parameters to be used for ray tracing. (Default : -ab 2 -ad 5000 -lw 2e-05)
     :param run : Set to True to run the Recipe and get results. This input can also be the integer 2 to run the recipe
     silently
+    :param workers : Number of processes used by the recipe, all the cores if None
+    :param grid_identifier_list : List of the identifiers of the sensor grids of the model, to run a single recipe for
+    several grids. The results are then returned in a dictionary by grid identifier. By default, the model should
+    have a single grid and the list of its results is returned.
+    :param path_sky_matrix_cache_folder : Path to the folder of the cached sky matrices. If provided, the sky matrix of
+    the weather file is copied from the cache if it was already generated by another recipe, or added to the cache
+    after the run otherwise.
     """
 
     # @ credit LBT
 
-    # Generate the recipe settings
-    run_settings = RecipeSettings(folder=path_folder_run, workers=None, reload_old=not overwrite,
-                                  report_out=False)
-
     # create the recipe and set the input arguments
     recipe = Recipe('annual-irradiance')
+    reload_old = not overwrite
+    if path_sky_matrix_cache_folder is not None:
+        # The old results are deleted here instead of by the recipe, to keep the cached sky matrix copied in its folder
+        path_recipe_folder = os.path.join(path_folder_run, recipe.simulation_id)
+        if overwrite and os.path.isdir(path_recipe_folder):
+            shutil.rmtree(path_recipe_folder)
+        reload_old = True
+        sky_matrix_key = get_sky_matrix_cache_key(path_weather_file=path_weather_file, north=north,
+                                                  timestep=timestep, visible=visible)
+        is_sky_matrix_from_cache = copy_sky_matrix_from_cache(
+            path_sky_matrix_cache_folder=path_sky_matrix_cache_folder, sky_matrix_key=sky_matrix_key,
+            path_recipe_resources_folder=os.path.join(path_recipe_folder, "resources"))
+    # Generate the recipe settings
+    run_settings = RecipeSettings(folder=path_folder_run, workers=workers, reload_old=reload_old,
+                                  report_out=False)
     recipe.input_value_by_name('model', hb_model_obj)
     recipe.input_value_by_name('wea', path_weather_file)
     recipe.input_value_by_name('timestep', timestep)
@@ -69,17 +92,27 @@ def run_hb_model_annual_irradiance_simulation(hb_model_obj, path_folder_run, pat
     otherwise it will lead to an error, using the queenbee.exe of the LBT and will have some issues creating folders and
      will make the simulation fail """
     project_folder = recipe.run(run_settings, radiance_check=True, silent=silent, queenbee_path="queenbee")
+    if path_sky_matrix_cache_folder is not None and not is_sky_matrix_from_cache:
+        add_sky_matrix_to_cache(path_sky_matrix_cache_folder=path_sky_matrix_cache_folder,
+                                sky_matrix_key=sky_matrix_key,
+                                path_recipe_resources_folder=os.path.join(path_recipe_folder, "resources"))
     # Compute the cumulative annual irradiance
     path_result = os.path.join(project_folder, "annual_irradiance", "results", "total")
-    annual_cum_values = hb_ann_cum_values(path_results=[path_result])[0]  # it's a list of one item
-
-    return [value / 1000. for value in annual_cum_values]
+    if grid_identifier_list is None:
+        annual_cum_values = hb_ann_cum_values(path_results=[path_result])[0]  # it's a list of one item
+        return [value / 1000. for value in annual_cum_values]
+    # Split the results of the grids of the model
+    return {grid_identifier: [value / 1000. for value in
+                              hb_ann_cum_values(path_results=[path_result], grid_filter=grid_identifier)[0]]
+            for grid_identifier in grid_identifier_list}
 
 
 def move_annual_irr_hb_radiance_results(path_temp_ill_result_file, path_temp_sun_hours_file,
                                         new_ill_file_name, new_sun_hours_file_name, path_result_folder):
     """
-    Move the result file from the temp folder to the result folder
+    Move the result file from the temp folder to the result folder.
+    The .ill file is stored in the result folder as a binary .npy file that can be memory-mapped by the BIPV
+    simulation instead of parsing the text file again.
     :param path_temp_ill_result_file : Path to the ill result file in the temporary folder
     :param path_temp_sun_hours_file : Path to the sun hours file in the temporary folder
     :param new_ill_file_name : New name for the .ill file
@@ -87,16 +120,30 @@ def move_annual_irr_hb_radiance_results(path_temp_ill_result_file, path_temp_sun
     :param path_result_folder : Path to the result folder
     """
     # Create the result folder if it doesn't exist
-    if not os.path.isdir(path_result_folder):
-        os.makedirs(path_result_folder)
-    # Delete the file if it already exist to overwrite it
-    if os.path.isfile(os.path.join(path_result_folder, new_ill_file_name)):
-        os.remove(os.path.join(path_result_folder, new_ill_file_name))
-    if os.path.isfile(os.path.join(path_result_folder, new_sun_hours_file_name)):
-        os.remove(os.path.join(path_result_folder, new_sun_hours_file_name))
-    # move the files
-    shutil.move(path_temp_ill_result_file, os.path.join(path_result_folder, new_ill_file_name))
-    shutil.move(path_temp_sun_hours_file, os.path.join(path_result_folder, new_sun_hours_file_name))
+    os.makedirs(path_result_folder, exist_ok=True)
+    path_new_ill_file = os.path.join(path_result_folder, new_ill_file_name)
+    # Delete the text .ill file of an older version of the tool, the .npy file and sun hours file are replaced
+    if os.path.isfile(path_new_ill_file):
+        os.remove(path_new_ill_file)
+    # Convert the .ill file if it was not already done when computing the cumulative values, and move the files
+    path_temp_npy_file = get_path_npy_file_of_ill_file(path_temp_ill_result_file)
+    if not is_npy_file_of_ill_file_up_to_date(path_temp_ill_result_file):
+        convert_ill_file_to_npy(path_temp_ill_result_file)
+    move_file_atomically(path_temp_npy_file, get_path_npy_file_of_ill_file(path_new_ill_file))
+    os.remove(path_temp_ill_result_file)
+    move_file_atomically(path_temp_sun_hours_file, os.path.join(path_result_folder, new_sun_hours_file_name))
+
+
+def move_file_atomically(path_source_file, path_destination_file):
+    """
+    Move a file next to its destination first and then rename it, so that the destination file is either the previous
+    or the new one, even if the move is interrupted or if the temporary folder is on another drive
+    :param path_source_file: str, path of the file to move
+    :param path_destination_file: str, path of the destination
+    """
+    path_temp_destination_file = path_destination_file + ".tmp"
+    shutil.move(path_source_file, path_temp_destination_file)
+    os.replace(path_temp_destination_file, path_destination_file)
 
 
 def hb_ann_cum_values(path_results, hoys=None, grid_filter=None):
@@ -190,29 +237,70 @@ def parse_sun_up_hours(sun_up_hours, hoys, timestep):
 def cumulative_values(ill_file, su_pattern, timestep):
     """Compute average values for a given result file."""
     # @ credit LBT
-    cumul_vals = []
-    with open(ill_file) as results:
-        if su_pattern is None:  # no HOY filter on results
-            for pt_res in results:
-                values = [float(r) for r in pt_res.split()]
-                cumul_vals.append(sum(values) / timestep)
-        else:
-            for pt_res in results:
-                values = [float(r) for r, is_hoy in zip(pt_res.split(), su_pattern) if is_hoy]
-                cumul_vals.append(sum(values) / timestep)
-    return cumul_vals
+    irradiance_array = load_irradiance_array(ill_file)
+    if su_pattern is not None:  # HOY filter on results
+        irradiance_array = irradiance_array[:, np.asarray(su_pattern, dtype=bool)]
+    return (irradiance_array.sum(axis=1, dtype=float) / timestep).tolist()
+
+
+def get_path_npy_file_of_ill_file(path_ill_file):
+    """
+    Get the path of the binary .npy file storing the values of a .ill file
+    :param path_ill_file : Path to the .ill file
+    :return path_npy_file : Path to the .npy file, in the same folder as the .ill file, with the .npy extension
+    appended to its name
+    """
+    return path_ill_file + ".npy"
+
+
+def is_npy_file_of_ill_file_up_to_date(path_ill_file):
+    """
+    Check if the .npy file of a .ill file exists and is not older than the .ill file
+    :param path_ill_file : Path to the .ill file, it might not exist anymore if only the .npy file was kept
+    :return: bool, True if the .npy file can be used instead of the .ill file
+    """
+    path_npy_file = get_path_npy_file_of_ill_file(path_ill_file)
+    if not os.path.isfile(path_npy_file):
+        return False
+    if not os.path.isfile(path_ill_file):
+        return True
+    return os.path.getmtime(path_npy_file) >= os.path.getmtime(path_ill_file)
+
+
+def convert_ill_file_to_npy(path_ill_file):
+    """
+    Convert a .ill file to a binary .npy file of float32, with one row per sensor and one column per sun-up hour.
+    The file is written to a temporary file first and then renamed, so that an interrupted conversion does not leave
+    a corrupted .npy file.
+    :param path_ill_file : Path to the .ill file
+    :return path_npy_file : Path to the .npy file
+    """
+    path_npy_file = get_path_npy_file_of_ill_file(path_ill_file)
+    irradiance_array = np.loadtxt(path_ill_file, dtype=np.float32, ndmin=2)
+    path_temp_npy_file = path_npy_file + ".tmp"
+    with open(path_temp_npy_file, "wb") as npy_file:
+        np.save(npy_file, irradiance_array)
+    os.replace(path_temp_npy_file, path_npy_file)
+    return path_npy_file
+
+
+def load_irradiance_array(path_ill_file):
+    """
+    Load the values of a .ill file as a read-only memory-mapped array, converting the .ill file to a .npy file the
+    first time, or if the .ill file was modified since the conversion.
+    :param path_ill_file : Path to the .ill file
+    :return irradiance_array : numpy array of shape (number of sensors, number of sun-up hours)
+    """
+    if not is_npy_file_of_ill_file_up_to_date(path_ill_file):
+        convert_ill_file_to_npy(path_ill_file)
+    return np.load(get_path_npy_file_of_ill_file(path_ill_file), mmap_mode="r")
 
 
 def get_hourly_irradiance_table(path_to_ill_file):
     """
-    Get the hourly irradiance table from a .ill file
+    Get the hourly irradiance table from a .ill file, or from its .npy file if it was already converted
     :param path_to_ill_file : Path to the .ill file
-    :return hourly_irradiance_table : List of 8760 lists of 145 values, each list of 145 values represents the hourly
-    irradiance on a sensor grid
+    :return hourly_irradiance_table : numpy array with one row per face of the sensor grid, each row containing the
+    hourly irradiance of the face during the sun-up hours
     """
-    # @ credit LBT
-    hourly_irradiance_table: list[list[float]] = []
-    with open(path_to_ill_file) as results:
-        for pt_res in results:
-            hourly_irradiance_table.append([float(value) for value in pt_res.split()])
-    return hourly_irradiance_table
+    return load_irradiance_array(path_to_ill_file)
@@ -4,24 +4,31 @@ Additional functions for Ladybug Face objects.
 
 
 import logging
+import hashlib
+import numpy as np
 from math import pi
+from concurrent.futures import ProcessPoolExecutor
 
-from shapely.geometry import Polygon
+from shapely.geometry import Polygon, MultiPoint
 
 
 from ladybug_geometry.geometry3d.pointvector import Point3D, Vector3D
 from ladybug_geometry.geometry3d.face import Face3D
 from ladybug_geometry.geometry3d.polyface import Polyface3D
-from ladybug_geometry.bounding import bounding_domain_x, bounding_domain_y, bounding_rectangle_extents, _orient_geometry
+from ladybug_geometry.bounding import bounding_domain_x, bounding_domain_y, _orient_geometry
 from honeybee.boundarycondition import Outdoors
 import dragonfly
 from dragonfly.building import Building
 
 from bua.utils.utils_constants import TOLERANCE_LBT
+from bua.utils.utils_parallel import get_number_of_workers
 
 default_elevation = 0.
 default_height = 9.
 
+# Oriented bounding rectangles of the footprints already processed, (rectangle vertices, angle) by footprint hash
+oriented_bounding_rectangle_cache_dict = {}
+
 dev_logger = logging.getLogger("dev")
 user_logger = logging.getLogger("user")
 
@@ -82,32 +89,108 @@ def make_LB_polyface3D_oriented_bounding_box_from_LB_face3D_footprint(lb_face_fo
     return lb_polyface3d_bounding_box
 
 
-def make_LB_Face3D_oriented_bounding_rectangle_from_LB_Face3D_footprint(LB_Face3D_footprint, n_step=360):
+def make_LB_Face3D_oriented_bounding_rectangle_from_LB_Face3D_footprint(LB_Face3D_footprint):
     """ Get the Face3D oriented bounding rectangle/box of a Face3D geometry
     :param LB_Face3D_footprint: Ladybug Face3D
-    :param n_step: int : number of steps for the angle of rotation of the bounding box
     :return: LB_Face3D_bounding_rectangle: Ladybug Face3D : oriented bounding rectangle
+    :return: angle: float : angle of rotation of the bounding rectangle in radians
     """
-    # Initialization
-    bounding_rectangle_area_list = []  # List of the area of the bounding rectangle for each angle at each step
-    angle = 0  # Initial angle
-    step = 2 * pi / n_step  # Step of the angle
-    # Loop for all the angles
-    for i in range(n_step):
-        # Get the length and width of the bounding rectangle
-        # Geometries accepts only a list of geometry, so we need to convert the Face3D to a list
-        length, width = bounding_rectangle_extents(geometries=[LB_Face3D_footprint], axis_angle=angle)
-        bounding_rectangle_area_list.append(length * width)
-        angle += step
-    # get the angle that minimize the area of the bounding rectangle
-    angle = step * bounding_rectangle_area_list.index(min(bounding_rectangle_area_list))
-    # get the bounding rectangle for the best angle
-    oriented_bounding_rectangle = make_LB_Face3D_footprint_bounding_rectangle(LB_Face3D_footprint=LB_Face3D_footprint,
-                                                                              angle=angle)
+    rectangle_vertex_array, angle = get_oriented_bounding_rectangle_of_footprint_array(
+        get_footprint_array_from_LB_Face3D(LB_Face3D_footprint))
+    # The points need to be counterclockwise
+    oriented_bounding_rectangle = Face3D([Point3D(x, y, 0.) for x, y in rectangle_vertex_array.tolist()])
 
     return oriented_bounding_rectangle, angle
 
 
+def get_footprint_array_from_LB_Face3D(LB_Face3D_footprint):
+    """ Get the numpy array of the x and y coordinates of the boundary of a Face3D geometry
+    :param LB_Face3D_footprint: Ladybug Face3D
+    :return: footprint_array: numpy array of shape (number of vertices, 2)
+    """
+    return np.array([[vertex.x, vertex.y] for vertex in LB_Face3D_footprint.boundary], dtype=float)
+
+
+def get_oriented_bounding_rectangle_of_footprint_array(footprint_array):
+    """ Get the minimum area bounding rectangle of a footprint, memoized by the hash of the footprint as the same
+    footprints are processed again when the bounding boxes or the merged faces are made again.
+    :param footprint_array: numpy array of shape (number of vertices, 2) with the x and y coordinates of the footprint
+    :return: rectangle_vertex_array: numpy array of shape (4, 2) with the vertices of the rectangle, counterclockwise
+    :return: angle: float : angle of rotation of the bounding rectangle in radians, between 0 and pi/2
+    """
+    footprint_array = np.ascontiguousarray(footprint_array, dtype=float)
+    footprint_hash = hashlib.sha256(footprint_array.tobytes()).hexdigest()
+    if footprint_hash not in oriented_bounding_rectangle_cache_dict:
+        oriented_bounding_rectangle_cache_dict[footprint_hash] = compute_minimum_area_bounding_rectangle(
+            footprint_array)
+    rectangle_vertex_array, angle = oriented_bounding_rectangle_cache_dict[footprint_hash]
+
+    return rectangle_vertex_array.copy(), angle
+
+
+def compute_minimum_area_bounding_rectangle(footprint_array):
+    """ Compute the minimum area bounding rectangle of a footprint with the rotating calipers method: one of the sides
+    of the rectangle is collinear with an edge of the convex hull of the footprint, all the edges are tested at once.
+    :param footprint_array: numpy array of shape (number of vertices, 2) with the x and y coordinates of the footprint
+    :return: rectangle_vertex_array: numpy array of shape (4, 2) with the vertices of the rectangle, counterclockwise
+    :return: angle: float : angle of rotation of the bounding rectangle in radians, between 0 and pi/2
+    """
+    convex_hull = MultiPoint(footprint_array).convex_hull
+    # The convex hull is a LineString or a Point if the footprint is degenerated
+    hull_array = np.array(convex_hull.exterior.coords if isinstance(convex_hull, Polygon) else convex_hull.coords)
+    edge_array = np.diff(hull_array, axis=0)
+    edge_array = edge_array[np.any(edge_array != 0, axis=1)]
+    if len(edge_array) == 0:  # the footprint is a single point
+        return np.tile(footprint_array[0], (4, 1)), 0.
+    # The extents of a rectangle are the same for the angles modulo pi/2
+    angle_array = np.mod(np.arctan2(edge_array[:, 1], edge_array[:, 0]), pi / 2)
+    angle_array[np.isclose(angle_array, pi / 2)] = 0.
+    x_axis_array = np.column_stack([np.cos(angle_array), np.sin(angle_array)])
+    y_axis_array = np.column_stack([-np.sin(angle_array), np.cos(angle_array)])
+    # Coordinates of the vertices of the hull in the axes of each edge, of shape (number of vertices, number of edges)
+    x_coordinate_array = hull_array @ x_axis_array.T
+    y_coordinate_array = hull_array @ y_axis_array.T
+    area_array = np.ptp(x_coordinate_array, axis=0) * np.ptp(y_coordinate_array, axis=0)
+    # Among the edges giving the minimum area, take the smallest angle, so that the result does not depend on the
+    # first vertex of the footprint
+    is_minimum_area_array = area_array <= area_array.min() * (1 + 1e-9) + 1e-12
+    edge_index = np.flatnonzero(is_minimum_area_array)[np.argmin(angle_array[is_minimum_area_array])]
+    x_min, x_max = x_coordinate_array[:, edge_index].min(), x_coordinate_array[:, edge_index].max()
+    y_min, y_max = y_coordinate_array[:, edge_index].min(), y_coordinate_array[:, edge_index].max()
+    rectangle_coordinate_array = np.array([[x_max, y_min], [x_max, y_max], [x_min, y_max], [x_min, y_min]])
+    rectangle_vertex_array = rectangle_coordinate_array @ np.vstack([x_axis_array[edge_index],
+                                                                     y_axis_array[edge_index]])
+
+    return rectangle_vertex_array, float(angle_array[edge_index])
+
+
+def compute_oriented_bounding_rectangles_in_parallel(footprint_array_list, number_of_workers=None):
+    """ Compute the oriented bounding rectangles of footprints in a pool of processes and add them to the cache of
+    the main process, the footprints already in the cache are not sent to the workers.
+    :param footprint_array_list: list of numpy arrays of the x and y coordinates of the footprints
+    :param number_of_workers: int : number of processes, all the cores if None
+    """
+    footprint_array_dict = {}
+    for footprint_array in footprint_array_list:
+        footprint_array = np.ascontiguousarray(footprint_array, dtype=float)
+        footprint_hash = hashlib.sha256(footprint_array.tobytes()).hexdigest()
+        if footprint_hash not in oriented_bounding_rectangle_cache_dict:
+            footprint_array_dict[footprint_hash] = footprint_array
+    if not footprint_array_dict:
+        return
+    number_of_workers = get_number_of_workers(number_of_workers=number_of_workers,
+                                              number_of_tasks=len(footprint_array_dict))
+    dev_logger.info(f"Compute the oriented bounding rectangles of {len(footprint_array_dict)} footprints with "
+                    f"{number_of_workers} processes")
+    with ProcessPoolExecutor(max_workers=number_of_workers) as executor:
+        # The footprints are cheap to process, they are sent by chunks to limit the communication between processes
+        chunksize = max(len(footprint_array_dict) // (4 * number_of_workers), 1)
+        for footprint_hash, result in zip(footprint_array_dict.keys(),
+                                          executor.map(compute_minimum_area_bounding_rectangle,
+                                                       footprint_array_dict.values(), chunksize=chunksize)):
+            oriented_bounding_rectangle_cache_dict[footprint_hash] = result
+
+
 def make_LB_Face3D_footprint_bounding_rectangle(LB_Face3D_footprint, angle=0):
     """ Get the oriented bounding rectangle of a Face3D geometry
     :param LB_Face3D_footprint: Ladybug Face3D
@@ -88,8 +88,7 @@ def main():
     # Move building to origin
     if (simulation_step_dictionary["run_move_buildings_to_origin"]
             or (urban_canopy_object.moving_vector_to_origin is not None
-                and False in [building_obj.moved_to_origin for building_obj in
-                              urban_canopy_object.building_dict.values()])):
+                and not urban_canopy_object.are_all_buildings_moved_to_origin())):
         # Move to origin if asked or if some buildings, but not all of them (a priori new ones), were moved to origin
         # before
         SimulationBuildingManipulationFunctions.move_buildings_to_origin(
@@ -104,14 +103,18 @@ def main():
             building_id_list=arguments_dictionary["building_id_list"],
             orient_roof_mesh_to_according_to_building_orientation=arguments_dictionary[
                 "orient_roof_according_to_building_orientation"],
-            north_angle=arguments_dictionary["north_angle"])
+            north_angle=arguments_dictionary["north_angle"],
+            run_in_parallel=arguments_dictionary["run_in_parallel_merged_faces"],
+            number_of_workers=arguments_dictionary["number_of_workers"])
 
     # Context filtering #
     # Generate bounding boxes
     if simulation_step_dictionary["run_generate_bounding_boxes"]:
         SimulationBuildingManipulationFunctions.make_oriented_bounding_boxes_of_buildings_in_urban_canopy(
             urban_canopy_object=urban_canopy_object,
-            overwrite=arguments_dictionary["overwrite"])
+            overwrite=arguments_dictionary["overwrite"],
+            run_in_parallel=arguments_dictionary["run_in_parallel_bounding_boxes"],
+            number_of_workers=arguments_dictionary["number_of_workers"])
 
     # Perform first step of context filtering
     if simulation_step_dictionary["run_first_pass_context_filtering"]:
@@ -133,7 +136,9 @@ def main():
             keep_shades_from_user=arguments_dictionary["keep_shades_from_user"],
             no_ray_tracing=arguments_dictionary["no_ray_tracing"],
             overwrite=arguments_dictionary["overwrite"],
-            keep_discarded_faces=arguments_dictionary["keep_discarded_faces"])
+            keep_discarded_faces=arguments_dictionary["keep_discarded_faces"],
+            run_in_parallel=arguments_dictionary["run_in_parallel_second_pass"],
+            number_of_workers=arguments_dictionary["number_of_workers"])
 
     # Perform all steps of context filtering
     # todo @Elie
@@ -154,14 +159,19 @@ def main():
             path_simulation_folder=arguments_dictionary["path_simulation_folder"],
             building_id_list=arguments_dictionary["building_id_list"],
             overwrite=arguments_dictionary["overwrite"],
-            silent=arguments_dictionary["silent"])
+            silent=arguments_dictionary["silent"],
+            run_in_parallel=arguments_dictionary["run_in_parallel_ubes"],
+            number_of_workers=arguments_dictionary["number_of_workers"],
+            timeout=arguments_dictionary["ubes_timeout"])
         UrbanBuildingEnergySimulationFunctions.run_idf_files_with_energyplus_for_ubes_in_urban_canopy(
             urban_canopy_obj=urban_canopy_object,
             path_simulation_folder=arguments_dictionary["path_simulation_folder"],
             building_id_list=arguments_dictionary["building_id_list"],
             overwrite=arguments_dictionary["overwrite"],
             silent=arguments_dictionary["silent"],
-            run_in_parallel=arguments_dictionary["run_in_parallel"])
+            run_in_parallel=arguments_dictionary["run_in_parallel_ubes"],
+            number_of_workers=arguments_dictionary["number_of_workers"],
+            timeout=arguments_dictionary["ubes_timeout"])
         UrbanBuildingEnergySimulationFunctions.extract_results_from_ep_simulation(
             urban_canopy_obj=urban_canopy_object,
             path_simulation_folder=arguments_dictionary["path_simulation_folder"],
@@ -192,7 +202,9 @@ def main():
             path_weather_file=arguments_dictionary["path_weather_file"],
             overwrite=arguments_dictionary["overwrite"],
             north_angle=arguments_dictionary["north_angle"],
-            silent=arguments_dictionary["silent"])
+            silent=arguments_dictionary["silent"],
+            run_in_parallel=arguments_dictionary["run_in_parallel_annual_irradiance"],
+            number_of_workers=arguments_dictionary["number_of_workers"])
 
     # Run panel simulation
     if simulation_step_dictionary["run_bipv_harvesting_and_lca_simulation"]:
@@ -227,6 +239,10 @@ def main():
                                                                          "replacement_scenario"],
                                                                      continue_simulation=(
                                                                          not arguments_dictionary["overwrite"]),
+                                                                     run_in_parallel=arguments_dictionary[
+                                                                         "run_in_parallel_bipv"],
+                                                                     number_of_workers=arguments_dictionary[
+                                                                         "number_of_workers"],
                                                                      replacement_frequency_in_years=
                                                                      arguments_dictionary[
                                                                          "replacement_frequency_in_years"],
@@ -79,14 +79,19 @@ class SimulationBuildingManipulationFunctions:
 
 
     @staticmethod
-    def make_oriented_bounding_boxes_of_buildings_in_urban_canopy(urban_canopy_object, overwrite=False):
+    def make_oriented_bounding_boxes_of_buildings_in_urban_canopy(urban_canopy_object, overwrite=False,
+                                                                  run_in_parallel=False, number_of_workers=None):
         """
         Make oriented bounding boxes of buildings in the urban canopy
         :param urban_canopy_object:
         :param overwrite: bool: default=False: if True, the existing oriented bounding boxes will be overwritten
+        :param run_in_parallel: bool: default=False: if True, the bounding rectangles are computed in a pool of processes
+        :param number_of_workers: int: default=None: number of processes if run_in_parallel is True, all the cores if None
         :return:
         """
-        urban_canopy_object.make_oriented_bounding_boxes_of_buildings(overwrite=overwrite)
+        urban_canopy_object.make_oriented_bounding_boxes_of_buildings(overwrite=overwrite,
+                                                                      run_in_parallel=run_in_parallel,
+                                                                      number_of_workers=number_of_workers)
         user_logger.info("Oriented bounding boxes of buildings in the urban canopy have been made successfully")
         dev_logger.info("Oriented bounding boxes of buildings in the urban canopy have been made successfully")
 
@@ -94,7 +99,8 @@ class SimulationBuildingManipulationFunctions:
     def make_merged_face_of_buildings_in_urban_canopy(urban_canopy_object, building_id_list=None,
                                                       orient_roof_mesh_to_according_to_building_orientation=True,
                                                       north_angle=0,
-                                                      overwrite=False):
+                                                      overwrite=False, run_in_parallel=False,
+                                                      number_of_workers=None):
         """
         Make oriented bounding boxes of buildings in the urban canopy
         :param urban_canopy_object: urban canopy object
@@ -102,10 +108,14 @@ class SimulationBuildingManipulationFunctions:
         :param orient_roof_mesh_to_according_to_building_orientation: bool: default=True if True, the roof mesh will be oriented according to the building orientation
         :param north_angle: number: default=0: number of degrees to rotate the roof mesh
         :param overwrite: bool: default=False: if True, the existing merged faces will be overwritten
+        :param run_in_parallel: bool: default=False: if True, the faces of the buildings are merged in a pool of processes
+        :param number_of_workers: int: default=None: number of processes if run_in_parallel is True, all the cores if None
         """
         # todo @Elie: add the overwrite option in the function
         urban_canopy_object.make_merged_faces_hb_model_of_buildings(building_id_list=building_id_list,
                                                                     orient_roof_mesh_to_according_to_building_orientation=orient_roof_mesh_to_according_to_building_orientation,
-                                                                    north_angle=north_angle,overwrite=overwrite)
+                                                                    north_angle=north_angle,overwrite=overwrite,
+                                                                    run_in_parallel=run_in_parallel,
+                                                                    number_of_workers=number_of_workers)
         user_logger.info("Honeybee models with merges faces of the buildings have been generated successfully")
         dev_logger.info("Honeybee models with merges faces of the buildings have been generated successfully")
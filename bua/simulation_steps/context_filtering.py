@@ -99,7 +99,9 @@ class SimulationContextFiltering:
                                                               keep_shades_from_user=True,
                                                               no_ray_tracing=False,
                                                               overwrite=False,
-                                                              keep_discarded_faces=False):
+                                                              keep_discarded_faces=False,
+                                                              run_in_parallel=False,
+                                                              number_of_workers=None):
         """
         Perform second pass of context filtering on buildings.
         :param urban_canopy_object: UrbanCanopy object, the urban canopy
@@ -111,6 +113,8 @@ class SimulationContextFiltering:
         :param no_ray_tracing: bool, if True, the second pass context filtering will be performed without ray-tracing.
         :param overwrite: bool, if True, the existing context selection will be overwritten.
         :param keep_discarded_faces: bool, if True, the discarded faces will be kept in the context filtering.
+        :param run_in_parallel: bool, if True, the target buildings are processed in a pool of processes.
+        :param number_of_workers: int, number of processes used if run_in_parallel is True, all the cores if None.
         :return tot_duration: float, the total duration of the second pass context filtering.
         :return result_summary_dict: dict, the result summary of the second pass context filtering.
         """
@@ -126,7 +130,9 @@ class SimulationContextFiltering:
             keep_shades_from_user=keep_shades_from_user,
             no_ray_tracing=no_ray_tracing,
             overwrite=overwrite,
-            keep_discarded_faces=keep_discarded_faces)
+            keep_discarded_faces=keep_discarded_faces,
+            run_in_parallel=run_in_parallel,
+            number_of_workers=number_of_workers)
 
         tot_duration = time() - timer
 
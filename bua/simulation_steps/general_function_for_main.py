@@ -7,8 +7,9 @@ import shutil
 import logging
 
 from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.urban_canopy.utils_urban_canopy.urban_canopy_store import is_urban_canopy_store
 from bua.utils.utils_configuration import path_simulation_temp_folder, name_gh_components_logs_folder, \
-    name_temporary_files_folder
+    name_temporary_files_folder, name_urban_canopy_store_folder
 
 user_logger = logging.getLogger("user")  
 dev_logger = logging.getLogger("dev")  
@@ -28,8 +29,14 @@ class SimulationCommonMethods:
     @staticmethod
     def create_or_load_urban_canopy_object(path_simulation_folder=path_simulation_temp_folder):
         # todo @Elie, correct the function
+        path_urban_canopy_store = os.path.join(path_simulation_folder, name_urban_canopy_store_folder)
         path_urban_canopy_pkl = os.path.join(path_simulation_folder, "urban_canopy.pkl")
-        if os.path.isfile(path_urban_canopy_pkl):
+        if is_urban_canopy_store(path_urban_canopy_store):
+            urban_canopy = UrbanCanopy.make_urban_canopy_from_store(path_urban_canopy_store)
+            dev_logger.info(
+                "An urban canopy already exist in the simulation folder, the input GIS will be added to it")
+        # Urban canopies saved before the store was introduced
+        elif os.path.isfile(path_urban_canopy_pkl):
             urban_canopy = UrbanCanopy.make_urban_canopy_from_pkl(path_urban_canopy_pkl)
             dev_logger.info(
                 "An urban canopy already exist in the simulation folder, the input GIS will be added to it")
@@ -43,9 +50,13 @@ class SimulationCommonMethods:
     def save_urban_canopy_object_to_pickle(urban_canopy_object, path_simulation_folder=path_simulation_temp_folder):
         """ #todo"""
         # todo @Elie, correct the function
-        urban_canopy_object.to_pkl(path_simulation_folder=path_simulation_folder)
-        user_logger.info("Urban canopy object saved as pkl successfully")
-        dev_logger.info("Urban canopy object saved as pkl successfully")
+        urban_canopy_object.to_store(path_simulation_folder=path_simulation_folder)
+        # Remove the urban canopy pkl of older versions, it would be outdated
+        path_urban_canopy_pkl = os.path.join(path_simulation_folder, "urban_canopy.pkl")
+        if os.path.isfile(path_urban_canopy_pkl):
+            os.remove(path_urban_canopy_pkl)
+        user_logger.info("Urban canopy object saved successfully")
+        dev_logger.info("Urban canopy object saved successfully")
 
     @staticmethod
     def save_urban_canopy_to_json(urban_canopy_object, path_simulation_folder=path_simulation_temp_folder):
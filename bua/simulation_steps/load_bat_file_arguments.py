@@ -36,8 +36,30 @@ class LoadArguments:
                             nargs='?', default=False)
         parser.add_argument("--overwrite", help="if True overwrite the previous simulation",
                             nargs='?', default=False)
-        parser.add_argument("--run_in_parallel", help="if, True run the simulation in parallel",
-                            nargs='?', default=False)
+        parser.add_argument("--run_in_parallel",
+                            help="if True, run in parallel all the steps that can be, the flag of a step below "
+                                 "overrides it for this step", nargs='?', default=False)
+        parser.add_argument("--run_in_parallel_merged_faces",
+                            help="if True, merge the faces of the buildings in a pool of processes, "
+                                 "--run_in_parallel by default", nargs='?', default=None)
+        parser.add_argument("--run_in_parallel_bounding_boxes",
+                            help="if True, make the oriented bounding boxes of the buildings in a pool of processes, "
+                                 "--run_in_parallel by default", nargs='?', default=None)
+        parser.add_argument("--run_in_parallel_second_pass",
+                            help="if True, perform the second pass of the context filtering in a pool of processes, "
+                                 "--run_in_parallel by default", nargs='?', default=None)
+        parser.add_argument("--run_in_parallel_ubes",
+                            help="if True, run OpenStudio and EnergyPlus for several buildings at the same time, "
+                                 "--run_in_parallel by default", nargs='?', default=None)
+        parser.add_argument("--run_in_parallel_annual_irradiance",
+                            help="if True, run the annual irradiance simulations of several buildings at the same "
+                                 "time, --run_in_parallel by default", nargs='?', default=None)
+        parser.add_argument("--run_in_parallel_bipv",
+                            help="if True, run the BIPV simulation of the buildings in a pool of processes, "
+                                 "--run_in_parallel by default", nargs='?', default=None)
+        parser.add_argument("--number_of_workers",
+                            help="int, number of processes used when the simulation is run in parallel, "
+                                 "all the cores by default", nargs='?', default=None)
         # Building manipulation
         parser.add_argument("-t", "--are_buildings_target",
                             help="boolean (here '0' or '1') telling if the buildings inputed in the component are "
@@ -110,6 +132,9 @@ class LoadArguments:
         parser.add_argument("--path_ddy_file", help="path to the ddy file", default=None)
         parser.add_argument("--cop_cooling", help="COP cooling", default=default_cop_cooling)
         parser.add_argument("--cop_heating", help="COP heating", default=default_cop_heating)
+        parser.add_argument("--ubes_timeout",
+                            help="float, timeout in seconds of the idf generation and of the EnergyPlus simulation of "
+                                 "each building when run in parallel, no timeout by default", default=None)
 
         # Sensorgrid
         parser.add_argument("--on_roof", help="True if the simulation is to be run on the roof, else False",
@@ -307,6 +332,19 @@ class LoadArguments:
             "silent": bool(int(args.silent)),
             "overwrite": bool(int(args.overwrite)),
             "run_in_parallel": bool(int(args.run_in_parallel)),
+            "run_in_parallel_merged_faces": parse_run_in_parallel_of_step(
+                args.run_in_parallel_merged_faces, run_in_parallel=args.run_in_parallel),
+            "run_in_parallel_bounding_boxes": parse_run_in_parallel_of_step(
+                args.run_in_parallel_bounding_boxes, run_in_parallel=args.run_in_parallel),
+            "run_in_parallel_second_pass": parse_run_in_parallel_of_step(
+                args.run_in_parallel_second_pass, run_in_parallel=args.run_in_parallel),
+            "run_in_parallel_ubes": parse_run_in_parallel_of_step(
+                args.run_in_parallel_ubes, run_in_parallel=args.run_in_parallel),
+            "run_in_parallel_annual_irradiance": parse_run_in_parallel_of_step(
+                args.run_in_parallel_annual_irradiance, run_in_parallel=args.run_in_parallel),
+            "run_in_parallel_bipv": parse_run_in_parallel_of_step(
+                args.run_in_parallel_bipv, run_in_parallel=args.run_in_parallel),
+            "number_of_workers": int(args.number_of_workers) if args.number_of_workers is not None else None,
             # Building manipulation
             "are_buildings_target": bool(int(args.are_buildings_target)),
             "on_building_to_simulate": bool(int(args.on_building_to_simulate)),
@@ -336,6 +374,7 @@ class LoadArguments:
             "path_ddy_file": args.path_ddy_file,
             "cop_cooling": float(args.cop_cooling),
             "cop_heating": float(args.cop_heating),
+            "ubes_timeout": float(args.ubes_timeout) if args.ubes_timeout is not None else None,
             # Sensorgrid
             "on_roof": bool(int(args.on_roof)),
             "on_facades": bool(int(args.on_facades)),
@@ -427,6 +466,18 @@ def parse_and_clean_building_id_list_from_argument_parser(building_id_list_form_
         return [string_list[i * 2 + 1] for i in range(len(string_list) // 2) if id != '']
 
 
+def parse_run_in_parallel_of_step(run_in_parallel_of_step, run_in_parallel):
+    """
+    Parse the flag running a simulation step in parallel, the global flag is used if it was not given for the step
+    :param run_in_parallel_of_step: str : '0' or '1', None if the flag was not given for the step
+    :param run_in_parallel: str : '0' or '1', global flag of the parallel runs
+    :return: bool, True if the step is run in parallel
+    """
+    if run_in_parallel_of_step is None:
+        return bool(int(run_in_parallel))
+    return bool(int(run_in_parallel_of_step))
+
+
 if __name__ == "__main__":
     list_test = "['Buil_TA_0', 'Buil_TA_3']"
     print(parse_and_clean_building_id_list_from_argument_parser(list_test))
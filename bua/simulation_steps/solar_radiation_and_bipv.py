@@ -65,7 +65,8 @@ class SimFunSolarRadAndBipv:
                                                path_simulation_folder=default_path_simulation_folder,
                                                building_id_list=None,
                                                path_weather_file=default_path_weather_file,
-                                               overwrite=False, north_angle=0, silent=False):
+                                               overwrite=False, north_angle=0, silent=False,
+                                               run_in_parallel=False, number_of_workers=None):
         """
         Make oriented bounding boxes of buildings in the urban canopy
         :param urban_canopy_object: urban canopy object
@@ -75,6 +76,8 @@ class SimFunSolarRadAndBipv:
         :param overwrite: bool: default=False: if True, overwrite the existing simulation
         :param north_angle: float: default=0: number of degrees to rotate the roof mesh
         :param silent: bool: default=False: if True, run the simulation silently
+        :param run_in_parallel: bool: default=False: if True, simulate several buildings at the same time
+        :param number_of_workers: int: default=None: total number of processes, all the cores if None
         """
 
         urban_canopy_object.run_annual_solar_irradiance_simulation_on_buildings(
@@ -82,7 +85,7 @@ class SimFunSolarRadAndBipv:
             building_id_list=building_id_list,
             path_weather_file=path_weather_file,
             overwrite=overwrite, north_angle=north_angle,
-            silent=silent)
+            silent=silent, run_in_parallel=run_in_parallel, number_of_workers=number_of_workers)
         user_logger.info("The annual solar irradiance simulation have been performed successfully")
         dev_logger.info("The annual solar irradiance simulation have been performed successfully")
 
@@ -103,7 +106,8 @@ class SimFunSolarRadAndBipv:
                                                start_year=default_start_year,
                                                end_year=default_end_year,
                                                replacement_scenario=default_replacement_scenario,
-                                               continue_simulation=False, **kwargs):
+                                               continue_simulation=False, run_in_parallel=False,
+                                               number_of_workers=None, seed=None, **kwargs):
         """
         Make oriented bounding boxes of buildings in the urban canopy
         :param urban_canopy_object: urban canopy object
@@ -124,6 +128,9 @@ class SimFunSolarRadAndBipv:
         :param end_year: int: default=start_year+50: year when the scenario ends
         :param replacement_scenario: str: default="replace_failed_panels_every_X_years": scenario for the replacement
         :param continue_simulation: bool: default=False: if True, continue the simulation
+        :param run_in_parallel: bool: default=False: if True, the buildings are simulated in a pool of processes
+        :param number_of_workers: int: default=None: number of processes if run_in_parallel is True, all the cores if None
+        :param seed: int: default=None: seed of the life expectancies of the panels, a new one is drawn if None
         :param kwargs: dict: other parameters
         """
 
@@ -144,7 +151,9 @@ class SimFunSolarRadAndBipv:
             start_year=start_year,
             end_year=end_year,
             replacement_scenario=replacement_scenario,
-            continue_simulation=continue_simulation, **kwargs)
+            continue_simulation=continue_simulation,
+            run_in_parallel=run_in_parallel,
+            number_of_workers=number_of_workers, seed=seed, **kwargs)
 
         user_logger.info("The BIPV simulation have been performed successfully")
         dev_logger.info("The BIPV simulation have been performed successfully")
@@ -49,7 +49,10 @@ class UrbanBuildingEnergySimulationFunctions:
                                                                     path_simulation_folder=default_path_simulation_folder,
                                                                     building_id_list=None,
                                                                     overwrite=False,
-                                                                    silent=False):
+                                                                    silent=False,
+                                                                    run_in_parallel=False,
+                                                                    number_of_workers=None,
+                                                                    timeout=None):
         """
         Generate idf files of buildings in the Urban Canopy through OpenStudio for further simulation with EnergyPlus.
         :param urban_canopy_obj: UrbanCanopy object
@@ -57,13 +60,19 @@ class UrbanBuildingEnergySimulationFunctions:
         :param building_id_list: list of str, list of building id to run the simulation on
         :param overwrite: bool, if True, overwrite the existing idf files
         :param silent: bool, if True, do not print the progress
+        :param run_in_parallel: bool, True if the idf files should be generated in parallel
+        :param number_of_workers: int, number of OpenStudio processes in parallel, all the cores if None
+        :param timeout: float, timeout per building in seconds when run in parallel, no timeout if None
         """
 
         urban_canopy_obj.generate_idf_files_for_ubes_with_openstudio(
             path_simulation_folder=path_simulation_folder,
             building_id_list=building_id_list,
             overwrite=overwrite,
-            silent=silent)
+            silent=silent,
+            run_in_parallel=run_in_parallel,
+            number_of_workers=number_of_workers,
+            timeout=timeout)
 
         user_logger.info("The idf files for the UBES were generated")
         dev_logger.info("The idf files for the UBES were generated")
@@ -76,7 +85,9 @@ class UrbanBuildingEnergySimulationFunctions:
                                                                building_id_list=None,
                                                                overwrite=False,
                                                                silent=False,
-                                                               run_in_parallel=False):
+                                                               run_in_parallel=False,
+                                                               number_of_workers=None,
+                                                               timeout=None):
         """
         Run idf files of buildings in the Urban Canopy through EnergyPlus
         :param urban_canopy_obj: UrbanCanopy object
@@ -85,6 +96,8 @@ class UrbanBuildingEnergySimulationFunctions:
         :param overwrite: bool, if True, overwrite the existing idf files
         :param silent: bool, if True, do not print the progress
         :param run_in_parallel: bool, True if the idf files should be run in parallel
+        :param number_of_workers: int, number of EnergyPlus processes in parallel, all the cores if None
+        :param timeout: float, timeout per building in seconds when run in parallel, no timeout if None
         :return total_duration: float, total duration of the simulation
         :return duration_dict: dict, duration of the simulation for each building
         """
@@ -95,7 +108,9 @@ class UrbanBuildingEnergySimulationFunctions:
             building_id_list=building_id_list,
             overwrite=overwrite,
             silent=silent,
-            run_in_parallel=run_in_parallel)
+            run_in_parallel=run_in_parallel,
+            number_of_workers=number_of_workers,
+            timeout=timeout)
 
         tot_duration = time() - timer
 
@@ -1,8 +1,26 @@
 """
 Contains all the functions to export the data of an urban canopy object to json files.
+The urban canopy json file is a manifest, the data of each building, of each BIPV scenario and of the UBES are written
+in separate json files, referenced in the manifest as {"json_shard_file": relative path}, so that the readers load
+only the files they need. The references of the buildings also contain their type and status, for the readers to select
+the buildings without loading their files.
 """
 
+import os
 import copy
+import json
+import hashlib
+
+from bua.urban_canopy.utils_urban_canopy.urban_canopy_store import LazyBuildingDict
+
+# Folder of the json files of the buildings, BIPV scenarios and UBES, next to the manifest
+name_json_shard_folder = "urban_canopy_json"
+name_building_json_shard_folder = "buildings"
+name_bipv_scenario_json_shard_folder = "bipv_scenarios"
+name_ubes_json_shard_file = "ubes.json"
+json_shard_key = "json_shard_file"
+# Keys of the dictionary of the buildings copied in their reference in the manifest
+manifest_building_key_list = ["type", "is_target_building", "is_building_to_simulate"]
 
 # Tree structure of the urban canopy json file
 tree_structure_urban_canopy_json_dict = {
@@ -13,35 +31,29 @@ tree_structure_urban_canopy_json_dict = {
     "ubes": None
 }
 
-# # Tree structure for each building
-# tree_structure_per_building_urban_canopy_json_dict = {
-#     # General attributes
-#     "index_in_gis": None,
-#     "height": None,
-#     "age": None,
-#     "typology": None,
-#     "hb_room_envelope": None,
-#     # BuildingModeled specific attributes
-#     "is_target_building": False,
-#     "is_building_to_simulate": False,
-#     "hb_model": None,
-#     "merged_faces_hb_model": None,
-#     "lb_polyface3d_oriented_bounding_box": None,
-#     "context_surfaces": {
-#         "parameters": {
-#             "first_pass_done": False,
-#             "second_pass_done": False,
-#             "min_vf_criterion": None,
-#             "number_of_rays": None,
-#             "consider_windows": None
-#         },
-#         "first_pass_selected_building_id_list": None,
-#         "second_pass_selected_hb_shade_list": None,
-#         "discarded_face3d_second_pass_list": None,
-#         "forced_shades_from_user": None
-#     },
-#     "solar_radiation_and_bipv": None
-# }
+
+def get_json_shard_file_name(identifier):
+    """
+    Get the name of the json file of a building or of a BIPV scenario, the identifiers might contain characters that
+    cannot be used in file names
+    :param identifier: str, identifier of the building or of the BIPV scenario
+    :return: str, name of the json file
+    """
+    return hashlib.sha1(identifier.encode("utf-8")).hexdigest() + ".json"
+
+
+def write_json_shard(json_dict, path_json_file):
+    """
+    Write a dictionary to a json file, streaming it to a temporary file that is then renamed, so that a reader never
+    loads a partially written file
+    :param json_dict: dict, dictionary to write
+    :param path_json_file: str, path of the json file
+    """
+    os.makedirs(os.path.dirname(path_json_file), exist_ok=True)
+    path_temp_json_file = path_json_file + ".tmp"
+    with open(path_temp_json_file, "w") as json_file:
+        json.dump(json_dict, json_file)
+    os.replace(path_temp_json_file, path_json_file)
 
 
 class ExportUrbanCanopyToJson:
@@ -50,164 +62,62 @@ class ExportUrbanCanopyToJson:
     """
 
     @classmethod
-    def make_urban_canopy_json_dict(cls, urban_canopy_obj):
-        """ Make the dictionary of the urban canopy object to be exported to a json file. """
-
-        # Initialize the json dictionary
+    def write_urban_canopy_json_shards(cls, urban_canopy_obj, path_json_manifest_file):
+        """
+        Write the urban canopy to a json manifest file and one json file per building, per BIPV scenario and for the
+        UBES. The files are written one after the other and the manifest is written last. The buildings of an urban
+        canopy loaded from a store that were not loaded before the export are released once their file is written,
+        so that they are not all kept in memory.
+        :param urban_canopy_obj: UrbanCanopy object
+        :param path_json_manifest_file: str, path of the urban canopy json file, the other files are written in a
+            folder next to it, with relative paths using "/" in the manifest
+        """
+        path_shard_folder = os.path.join(os.path.dirname(path_json_manifest_file), name_json_shard_folder)
+        # Initialize the json dictionary, used as manifest
         cls.init_json_dict(urban_canopy_obj)
-        # Initialize the buildings in the json dictionary
-        cls.add_buildings_to_json_dict(urban_canopy_obj)
-        # Add the attributes of the building to the json dictionary
-        cls.add_urban_canopy_bipv_scenarios(urban_canopy_obj)
-        # Add the building shades to the json dictionary
-        cls.add_urban_canopy_ubes_obj_to_json_dict(urban_canopy_obj)
-
+        manifest_dict = urban_canopy_obj.json_dict
+        written_relative_path_set = set()
+        # Buildings
+        building_dict = urban_canopy_obj.building_dict
+        is_lazy_building_dict = isinstance(building_dict, LazyBuildingDict)
+        for building_id in list(building_dict.keys()):
+            was_loaded = not is_lazy_building_dict or building_dict.is_loaded(building_id)
+            relative_path = name_building_json_shard_folder + "/" + get_json_shard_file_name(building_id)
+            building_json_dict = building_dict[building_id].to_dict()
+            write_json_shard(json_dict=building_json_dict,
+                             path_json_file=os.path.normpath(os.path.join(path_shard_folder, relative_path)))
+            manifest_dict["list_of_building_ids"].append(building_id)
+            # The BuildingBasic are neither targets nor simulated
+            manifest_dict["buildings"][building_id] = {
+                json_shard_key: relative_path,
+                **{key: building_json_dict.get(key, False) for key in manifest_building_key_list}}
+            written_relative_path_set.add(relative_path)
+            if not was_loaded:
+                building_dict.release_building(building_id)
+        # BIPV scenarios
+        for scenario_id, scenario_obj in urban_canopy_obj.bipv_scenario_dict.items():
+            relative_path = name_bipv_scenario_json_shard_folder + "/" + get_json_shard_file_name(scenario_id)
+            write_json_shard(json_dict=scenario_obj.to_dict(),
+                             path_json_file=os.path.normpath(os.path.join(path_shard_folder, relative_path)))
+            manifest_dict["bipv_scenarios"][scenario_id] = {json_shard_key: relative_path}
+            written_relative_path_set.add(relative_path)
+        # UBES
+        write_json_shard(json_dict=urban_canopy_obj.ubes_obj.to_dict(),
+                         path_json_file=os.path.join(path_shard_folder, name_ubes_json_shard_file))
+        manifest_dict["ubes"] = {json_shard_key: name_ubes_json_shard_file}
+        written_relative_path_set.add(name_ubes_json_shard_file)
+        # Write the manifest
+        write_json_shard(json_dict=manifest_dict, path_json_file=path_json_manifest_file)
+        # Delete the files of the removed buildings and scenarios
+        for folder_name in [name_building_json_shard_folder, name_bipv_scenario_json_shard_folder]:
+            path_folder = os.path.join(path_shard_folder, folder_name)
+            if not os.path.isdir(path_folder):
+                continue
+            for file_name in os.listdir(path_folder):
+                if folder_name + "/" + file_name not in written_relative_path_set:
+                    os.remove(os.path.join(path_folder, file_name))
 
     @staticmethod
     def init_json_dict(urban_canopy_obj):
         """ Initialize the json dictionary of the urban canopy object. """
         urban_canopy_obj.json_dict = copy.deepcopy(tree_structure_urban_canopy_json_dict)
-
-    @staticmethod
-    def add_buildings_to_json_dict(urban_canopy_obj):
-        """
-        Initialize the buildings in the json dictionary of the urban canopy object.
-        """
-        for building_id, building_obj in urban_canopy_obj.building_dict.items():
-            urban_canopy_obj.json_dict["list_of_building_ids"].append(building_id)
-            urban_canopy_obj.json_dict["buildings"][building_id] = building_obj.to_dict()
-
-    @staticmethod
-    def add_urban_canopy_bipv_scenarios(urban_canopy_obj):
-        """ Add the BIPV scenarios of the urban canopy object to the json dictionary. """
-        for scenario_id, scenario_obj in urban_canopy_obj.bipv_scenario_dict.items():
-            urban_canopy_obj.json_dict["bipv_scenarios"][scenario_id] = scenario_obj.to_dict()
-
-    @staticmethod
-    def add_urban_canopy_ubes_obj_to_json_dict(urban_canopy_obj):
-        """ Add the UBES object of the urban canopy object to the json dictionary. """
-        urban_canopy_obj.json_dict["ubes"] = urban_canopy_obj.ubes_obj.to_dict()
-
-
-    #
-    # @classmethod
-    # def make_urban_canopy_json_dict(cls, urban_canopy_obj):
-    #     """ Make the dictionary of the urban canopy object to be exported to a json file. """
-    #
-    #     # Initialize the json dictionary
-    #     cls.init_json_dict(urban_canopy_obj)
-    #     # Initialize the buildings in the json dictionary
-    #     cls.init_buildings_in_json_dict(urban_canopy_obj)
-    #     # Add the attributes of the building to the json dictionary
-    #     cls.add_building_attributes_to_json_dict(urban_canopy_obj)
-    #     # Add the building shades to the json dictionary
-    #     cls.add_building_shades_to_json_dict(urban_canopy_obj)
-    #     # Add the solar radiation and BIPV data to the json dictionary
-    #     cls.add_solar_radiation_and_bipv_to_json_dict(urban_canopy_obj)
-    #     # todo @Elie, add the other data when ready
-
-    # @staticmethod
-    # def add_building_attributes_to_json_dict(urban_canopy_obj):
-    #     """ Add the attributes of the building to the json dictionary of the urban canopy object. """
-    #     for building_id, building_obj in urban_canopy_obj.building_dict.items():
-    #         urban_canopy_obj.json_dict["buildings"][building_id]["index_in_gis"] = building_obj.index_in_gis
-    #         urban_canopy_obj.json_dict["buildings"][building_id]["height"] = building_obj.height
-    #         urban_canopy_obj.json_dict["buildings"][building_id]["age"] = building_obj.age
-    #         urban_canopy_obj.json_dict["buildings"][building_id]["typology"] = building_obj.typology
-    #         if building_obj.lb_polyface3d_extruded_footprint is None:
-    #             building_obj.make_lb_polyface3d_extruded_footprint()
-    #         building_hb_room_envelope_dict = Room.from_polyface3d(identifier=building_id,
-    #                                                               polyface=building_obj.lb_polyface3d_extruded_footprint).to_dict()
-    #         urban_canopy_obj.json_dict["buildings"][building_id][
-    #             "hb_room_envelope"] = building_hb_room_envelope_dict
-    #
-    #         # Bounding box of the building, used for the context filtering
-    #         if building_obj.lb_polyface3d_oriented_bounding_box is not None:
-    #             urban_canopy_obj.json_dict["buildings"][building_id][
-    #                 "lb_polyface3d_oriented_bounding_box"] = building_obj.lb_polyface3d_oriented_bounding_box.to_dict()
-    #
-    #         if isinstance(building_obj, BuildingModeled):
-    #             urban_canopy_obj.json_dict["buildings"][building_id][
-    #                 "is_target_building"] = building_obj.is_target
-    #             urban_canopy_obj.json_dict["buildings"][building_id][
-    #                 "is_building_to_simulate"] = building_obj.to_simulate
-    #             urban_canopy_obj.json_dict["buildings"][building_id]["hb_model"] = building_obj.hb_model_dict
-    #             # HB model with merged faces of the building (used for the context filtering and the solar radiation)
-    #             urban_canopy_obj.json_dict["buildings"][building_id][
-    #                 "merged_faces_hb_model"] = building_obj.merged_faces_hb_model_dict
-    #
-    # @staticmethod
-    # def add_building_shades_to_json_dict(urban_canopy_obj):
-    #     """ Add the context filtering results of the building to the json dictionary of the urban canopy object. """
-    #     for building_id, building_obj in urban_canopy_obj.building_dict.items():
-    #         if isinstance(building_obj, BuildingModeled):
-    #             # List of the forced shades from the user
-    #             # No need to convert the shades to dict, they are already in dict format after pickling
-    #             urban_canopy_obj.json_dict["buildings"][building_id][
-    #                 "context_surfaces"]["forced_shades_from_user"] = \
-    #                 building_obj.shading_context_obj.forced_hb_shades_from_user_list
-    #             if building_obj.shading_context_obj.first_pass_done:
-    #                 # Ids of the selected context buildings from the first pass
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["first_pass_selected_building_id_list"] = \
-    #                     building_obj.shading_context_obj.selected_context_building_id_list
-    #                 # parameters of the first pass
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["parameters"]["first_pass_done"] = \
-    #                     building_obj.shading_context_obj.first_pass_done
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["parameters"]["min_vf_criterion"] = \
-    #                     building_obj.shading_context_obj.min_vf_criterion
-    #             if building_obj.shading_context_obj.second_pass_done:
-    #                 # List of the selected context shades from the second pass
-    #                 # No need to convert the shades to dict, they are already in dict format after pickling
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["second_pass_selected_hb_shade_list"] = \
-    #                     building_obj.shading_context_obj.context_shading_hb_shade_list
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["discarded_face3d_second_pass_list"] = [face.to_dict() for face in
-    #                                                                                 building_obj.shading_context_obj.discarded_lb_face3d_context_shading_second_pass_list]
-    #                 # parameters of the second pass
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["parameters"]["second_pass_done"] = \
-    #                     building_obj.shading_context_obj.second_pass_done
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["parameters"]["number_of_rays"] = \
-    #                     building_obj.shading_context_obj.number_of_rays
-    #                 urban_canopy_obj.json_dict["buildings"][building_id][
-    #                     "context_surfaces"]["parameters"]["consider_windows"] = \
-    #                     building_obj.shading_context_obj.consider_windows
-    #
-    # @staticmethod
-    # def add_solar_radiation_and_bipv_to_json_dict(urban_canopy_obj):
-    #     """ Add the solar radiation and BIPV data to the json dictionary of the urban canopy object. """
-    #     for building_id, building_obj in urban_canopy_obj.building_dict.items():
-    #         if isinstance(building_obj, BuildingModeled) \
-    #                 and building_obj.solar_radiation_and_bipv_simulation_obj is not None:
-    #             # Paramters
-    #             urban_canopy_obj.json_dict["buildings"][building_id][
-    #                 "solar_radiation_and_bipv"] = building_obj.solar_radiation_and_bipv_simulation_obj.to_json_dict()
-    #
-    #     # Add the results of the BIPV scenarios
-    #     for scenario_id, scenario_obj in urban_canopy_obj.bipv_scenario_dict.items():
-    #         urban_canopy_obj.json_dict["bipv_scenarios"][scenario_id] = scenario_obj.to_dict()
-
-
-#
-# def replace_bipv_technology_obj_by_id(parameter_dict):
-#     """
-#     Replace the technology object by its id
-#     :param parameter_dict: dict of the parameters
-#     :return: dict of the parameters
-#     """
-#     for key, value in parameter_dict.items():
-#         if isinstance(value, dict):
-#             parameter_dict[key] = replace_bipv_technology_obj_by_id(value)
-#         elif isinstance(value, list):
-#             for i, v in enumerate(value):
-#                 if isinstance(v, dict):
-#                     value[i] = replace_bipv_technology_obj_by_id(v)
-#         elif isinstance(value, BipvTechnology):
-#             parameter_dict[key] = value.identifier
-#
-#     return parameter_dict
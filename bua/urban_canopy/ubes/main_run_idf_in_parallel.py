@@ -1,13 +1,216 @@
 """
-Run in parallel the idf files send as inputs in this file
+Generate the idf files of the buildings with OpenStudio and run them with EnergyPlus in parallel.
+OpenStudio and EnergyPlus run in their own processes, they are thus launched from a pool of threads, with a timeout
+per building. A building that fails or times out is reported and does not stop the simulation of the others.
 """
 import os
+import logging
+import signal
 import subprocess
 
-# todo: import the function to run idf from path to idf, epw etc
+from time import time
+from concurrent.futures import ThreadPoolExecutor
 
+from honeybee_energy.config import folders
 
+from bua.utils.utils_parallel import get_number_of_workers, report_failed_buildings
 
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+
+def make_openstudio_command(path_osw_file, path_openstudio_exe=None):
+    """
+    Make the command running an OpenStudio workflow (osw) file, applying only the measures, as done by Honeybee.
+    :param path_osw_file: str, path to the osw file
+    :param path_openstudio_exe: str, path to the OpenStudio executable, the one of Honeybee if None
+    :return: list of str, the command
+    """
+    path_openstudio_exe = path_openstudio_exe or folders.openstudio_exe
+    if path_openstudio_exe is None:
+        raise OSError("No OpenStudio installation was found on this machine, the idf files cannot be generated")
+
+    return [path_openstudio_exe, "run", "--show-stdout", "-m", "-w", path_osw_file]
+
+
+def make_energyplus_command(path_epw_file, path_energyplus_exe=None, expand_objects=True):
+    """
+    Make the command running the in.idf file of the current directory with EnergyPlus, as done by Honeybee.
+    :param path_epw_file: str, path to the epw file
+    :param path_energyplus_exe: str, path to the EnergyPlus executable, the one of Honeybee if None
+    :param expand_objects: bool, if True, expand the HVAC Template objects before the simulation
+    :return: list of str, the command
+    """
+    command_list = [path_energyplus_exe or folders.energyplus_exe]
+    if command_list[0] is None:
+        raise OSError("No EnergyPlus installation was found on this machine, the idf files cannot be run")
+    command_list += ["-w", os.path.abspath(path_epw_file)]
+    # The IDD file of Honeybee is only used with the EnergyPlus executable of Honeybee
+    if path_energyplus_exe is None and folders.energyplus_idd_path is not None:
+        command_list += ["-i", folders.energyplus_idd_path]
+    if expand_objects:
+        command_list.append("-x")
+
+    return command_list
+
+
+def run_command_with_timeout(command_list, cwd=None, timeout=None, silent=False):
+    """
+    Run a command in a new process group, to be able to kill the process and its children if it times out.
+    :param command_list: list of str, the command
+    :param cwd: str, working directory of the command
+    :param timeout: float, timeout in seconds, no timeout if None
+    :param silent: bool, if True, the output of the command will not be printed in the console
+    :return: int, return code of the command
+    """
+    output = subprocess.DEVNULL if silent else None
+    if os.name == "nt":
+        process = subprocess.Popen(command_list, cwd=cwd, stdout=output, stderr=output,
+                                   creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        process = subprocess.Popen(command_list, cwd=cwd, stdout=output, stderr=output, start_new_session=True)
+    try:
+        return process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if os.name == "nt":
+            subprocess.call(["taskkill", "/F", "/T", "/PID", str(process.pid)], stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+        raise
+
+
+def run_command_of_building(building_id, command_list, cwd=None, timeout=None, silent=False):
+    """
+    Run the command of a building and catch its errors, so that the other buildings are not affected.
+    :param building_id: str, id of the building
+    :param command_list: list of str, the command
+    :param cwd: str, working directory of the command
+    :param timeout: float, timeout in seconds, no timeout if None
+    :param silent: bool, if True, the output of the command will not be printed in the console
+    :return result_dict: dict, success, duration and error message of the run
+    """
+    duration = time()
+    error = None
+    try:
+        return_code = run_command_with_timeout(command_list=command_list, cwd=cwd, timeout=timeout, silent=silent)
+        if return_code != 0:
+            error = f"the process returned the exit code {return_code}"
+    except subprocess.TimeoutExpired:
+        error = f"the process did not end within the timeout of {timeout} s and was killed"
+    except OSError as os_error:
+        error = str(os_error)
+
+    return {"building_id": building_id, "success": error is None, "duration": time() - duration, "error": error}
+
+
+def run_commands_of_buildings_in_parallel(command_dict, cwd_dict=None, number_of_workers=None, timeout=None,
+                                          silent=False):
+    """
+    Run the commands of the buildings in parallel.
+    :param command_dict: dict, command by building id
+    :param cwd_dict: dict, working directory of the command by building id, the current directory if not provided
+    :param number_of_workers: int, number of commands running at the same time, all the cores if None
+    :param timeout: float, timeout per building in seconds, no timeout if None
+    :param silent: bool, if True, the output of the commands will not be printed in the console
+    :return result_dict: dict, success, duration and error message of the run by building id
+    """
+    if not command_dict:
+        return {}
+    cwd_dict = cwd_dict or {}
+    number_of_workers = get_number_of_workers(number_of_workers=number_of_workers,
+                                              number_of_tasks=len(command_dict))
+    dev_logger.info(f"Run {len(command_dict)} simulations with {number_of_workers} workers")
+    with ThreadPoolExecutor(max_workers=number_of_workers) as executor:
+        future_list = [executor.submit(run_command_of_building, building_id=building_id, command_list=command_list,
+                                       cwd=cwd_dict.get(building_id), timeout=timeout, silent=silent)
+                       for building_id, command_list in command_dict.items()]
+        result_dict = {}
+        for future in future_list:
+            building_result_dict = future.result()
+            result_dict[building_result_dict["building_id"]] = building_result_dict
+
+    return result_dict
+
+
+def generate_idf_files_with_openstudio_in_parallel(building_obj_list, path_ubes_temp_sim_folder, path_epw_file,
+                                                   path_hbjson_simulation_parameters, overwrite=False, silent=False,
+                                                   number_of_workers=None, timeout=None, path_openstudio_exe=None):
+    """
+    Generate the idf files of the buildings with OpenStudio in parallel.
+    The hbjson and osw files are written sequentially, as they need the Honeybee objects, then OpenStudio is run
+    in parallel.
+    :param building_obj_list: list of BuildingModeled objects
+    :param path_ubes_temp_sim_folder: str, path to the temporary folder of the UBES
+    :param path_epw_file: str, path to the epw file
+    :param path_hbjson_simulation_parameters: str, path to the simulation parameter file
+    :param overwrite: bool, if True, the existing idf files will be overwritten
+    :param silent: bool, if True, the OpenStudio messages will not be printed
+    :param number_of_workers: int, number of OpenStudio processes running at the same time, all the cores if None
+    :param timeout: float, timeout per building in seconds, no timeout if None
+    :param path_openstudio_exe: str, path to the OpenStudio executable, the one of Honeybee if None
+    :return result_dict: dict, success, duration and error message of the generation by building id
+    """
+    command_dict = {}
+    cwd_dict = {}
+    for building_obj in building_obj_list:
+        path_osw_file = building_obj.write_osw_for_bes_with_openstudio(
+            path_ubes_temp_sim_folder=path_ubes_temp_sim_folder, path_epw_file=path_epw_file,
+            path_hbjson_simulation_parameters=path_hbjson_simulation_parameters, overwrite=overwrite)
+        if path_osw_file is not None:
+            command_dict[building_obj.id] = make_openstudio_command(path_osw_file=path_osw_file,
+                                                                    path_openstudio_exe=path_openstudio_exe)
+            cwd_dict[building_obj.id] = os.path.dirname(path_osw_file)
+    result_dict = run_commands_of_buildings_in_parallel(command_dict=command_dict, cwd_dict=cwd_dict,
+                                                        number_of_workers=number_of_workers, timeout=timeout,
+                                                        silent=silent)
+    for building_obj in building_obj_list:
+        if building_obj.id in result_dict and result_dict[building_obj.id]["success"]:
+            if not building_obj.bes_obj.check_idf_generated_by_openstudio(
+                    path_building_bes_temp_folder=os.path.join(path_ubes_temp_sim_folder, building_obj.id)):
+                result_dict[building_obj.id].update(success=False, error="OpenStudio did not generate the idf file")
+    report_failed_buildings(result_dict=result_dict, step_name="generation of the idf file")
+
+    return result_dict
+
+
+def run_idf_files_with_energyplus_in_parallel(building_obj_list, path_ubes_temp_sim_folder, path_epw_file,
+                                              overwrite=False, silent=False, number_of_workers=None, timeout=None,
+                                              path_energyplus_exe=None):
+    """
+    Run the idf files of the buildings with EnergyPlus in parallel.
+    :param building_obj_list: list of BuildingModeled objects
+    :param path_ubes_temp_sim_folder: str, path to the temporary folder of the UBES
+    :param path_epw_file: str, path to the epw file
+    :param overwrite: bool, if True, the buildings that already ran will be run again
+    :param silent: bool, if True, the EnergyPlus messages will not be printed
+    :param number_of_workers: int, number of EnergyPlus processes running at the same time, all the cores if None
+    :param timeout: float, timeout per building in seconds, no timeout if None
+    :param path_energyplus_exe: str, path to the EnergyPlus executable, the one of Honeybee if None
+    :return duration_dict: dict, duration of the simulation by building id, for the buildings that ran
+    """
+    command_dict = {}
+    cwd_dict = {}
+    for building_obj in building_obj_list:
+        if building_obj.is_idf_to_run_with_energyplus_for_bes(overwrite=overwrite):
+            command_dict[building_obj.id] = make_energyplus_command(path_epw_file=path_epw_file,
+                                                                    path_energyplus_exe=path_energyplus_exe)
+            # EnergyPlus runs the in.idf file of the working directory and writes the results next to it
+            cwd_dict[building_obj.id] = os.path.join(path_ubes_temp_sim_folder, building_obj.id, "run")
+    result_dict = run_commands_of_buildings_in_parallel(command_dict=command_dict, cwd_dict=cwd_dict,
+                                                        number_of_workers=number_of_workers, timeout=timeout,
+                                                        silent=silent)
+    for building_obj in building_obj_list:
+        if building_obj.id in result_dict and result_dict[building_obj.id]["success"]:
+            if not building_obj.bes_obj.check_energyplus_run(
+                    path_building_bes_temp_folder=os.path.join(path_ubes_temp_sim_folder, building_obj.id),
+                    sim_duration=result_dict[building_obj.id]["duration"]):
+                result_dict[building_obj.id].update(success=False, error="EnergyPlus did not generate the sql file")
+    report_failed_buildings(result_dict=result_dict, step_name="EnergyPlus simulation")
+
+    return {building_obj.id: building_obj.bes_obj.sim_duration for building_obj in building_obj_list if
+            building_obj.bes_obj.has_run}
 
 
 if __name__ == '__main__':
@@ -15,12 +218,28 @@ if __name__ == '__main__':
     import argparse
     # Get the inputs from the command line
     parser = argparse.ArgumentParser()
-    # todo: add the other parameters
-    parser.add_argument("path_to_folder", type=str, help="path to the folder containing the idf files")
+    parser.add_argument("path_to_folder", type=str,
+                        help="path to the folder containing one sub-folder per building, with the idf file in "
+                             "run/in.idf")
+    parser.add_argument("path_epw_file", type=str, help="path to the epw file")
+    parser.add_argument("--number_of_workers", type=int, default=None,
+                        help="number of simulations running at the same time, all the cores by default")
+    parser.add_argument("--timeout", type=float, default=None, help="timeout per building in seconds")
+    parser.add_argument("--path_energyplus_exe", type=str, default=None, help="path to the EnergyPlus executable")
+    args = parser.parse_args()
 
     # make a list of the idf files
+    path_run_folder_dict = {
+        folder_name: os.path.join(args.path_to_folder, folder_name, "run") for folder_name in
+        sorted(os.listdir(args.path_to_folder)) if
+        os.path.isfile(os.path.join(args.path_to_folder, folder_name, "run", "in.idf"))}
 
     # run the idf files in parallel
-
-
-
+    main_result_dict = run_commands_of_buildings_in_parallel(
+        command_dict={folder_name: make_energyplus_command(path_epw_file=args.path_epw_file,
+                                                           path_energyplus_exe=args.path_energyplus_exe)
+                      for folder_name in path_run_folder_dict},
+        cwd_dict=path_run_folder_dict, number_of_workers=args.number_of_workers, timeout=args.timeout, silent=True)
+    for folder_name, main_building_result_dict in main_result_dict.items():
+        print(f"{folder_name}: {'success' if main_building_result_dict['success'] else main_building_result_dict['error']}"
+              f" ({main_building_result_dict['duration']:.1f} s)")
@@ -0,0 +1,139 @@
+"""
+Spatial index of the oriented bounding boxes of the buildings, to prune the candidate context buildings of the
+first pass of the context filtering (minimum view factor criterion).
+"""
+
+import logging
+import numpy as np
+
+from math import sqrt, pi
+from scipy.spatial import cKDTree
+
+from bua.building.context_filter.utils_functions_mvfc import make_bounding_box_face_arrays
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+# Relative margin added to the cutoff distance, to be safe regarding the rounding errors of the bound of the view factor
+cutoff_distance_margin = 0.01
+
+
+class BoundingBoxSpatialIndex:
+    """
+    KD-tree over the centroids of the non-horizontal faces of the oriented bounding boxes of the buildings in the
+    urban canopy. It is built once per urban canopy and reused for all the target buildings.
+
+    The majorized view factor F between a target face of area A1 and a context face of area A2 which centroids are
+    at a distance d is bounded by the view factor from the closest point of the target face to the context face:
+        F <= A2 / (pi * (d - (sqrt(A1) + sqrt(A2)) / sqrt(2))^2)
+    as no point of the 2 squares is closer than their half diagonals. Thus, any context face further than
+        (sqrt(A1) + sqrt(A2_max)) / sqrt(2) + sqrt(A2_max / (pi * min_vf_criterion))
+    cannot verify the minimum view factor criterion, and only the faces within that radius need to be tested.
+    The majorized view factor is computed with the same bound, its rounding errors at large distances cannot make a
+    face beyond that radius verify the criterion, the pruned first pass is thus identical to the brute force one.
+    """
+
+    def __init__(self):
+        self.building_id_list = []
+        # Faces of the bounding boxes
+        self.face_centroid_array = None
+        self.face_area_array = None
+        self.face_building_index_array = None
+        self.max_face_area = 0.
+        # KD-tree of the face centroids
+        self.kd_tree = None
+
+    @classmethod
+    def from_building_bounding_boxes(cls, uc_building_id_list, uc_building_bounding_box_list):
+        """
+        Build the spatial index from the oriented bounding boxes of the buildings
+        :param uc_building_id_list: list of str, list of the id of the buildings in the urban canopy
+        :param uc_building_bounding_box_list: list of Ladybug polyface3d of the oriented bounding box of the buildings
+            in the urban canopy
+        :return: BoundingBoxSpatialIndex object
+        """
+        spatial_index_obj = cls()
+        spatial_index_obj.building_id_list = list(uc_building_id_list)
+        spatial_index_obj.face_centroid_array, spatial_index_obj.face_area_array, \
+            spatial_index_obj.face_building_index_array = make_bounding_box_face_arrays(
+            uc_building_bounding_box_list=uc_building_bounding_box_list)
+        if len(spatial_index_obj.face_area_array) > 0:
+            spatial_index_obj.max_face_area = float(np.max(spatial_index_obj.face_area_array))
+            spatial_index_obj.kd_tree = cKDTree(spatial_index_obj.face_centroid_array)
+
+        return spatial_index_obj
+
+    def is_up_to_date(self, uc_building_id_list):
+        """
+        Check if the spatial index was built for the same buildings as the ones currently in the urban canopy
+        :param uc_building_id_list: list of str, list of the id of the buildings in the urban canopy
+        :return: bool
+        """
+        return self.building_id_list == list(uc_building_id_list)
+
+    @staticmethod
+    def mvfc_cutoff_distance(target_face_area, max_context_face_area, min_vf_criterion):
+        """
+        Distance between face centroids beyond which no context face can verify the minimum view factor criterion
+        with the target face.
+        :param target_face_area: float or numpy array, area of the target face(s)
+        :param max_context_face_area: float, largest area of the context faces
+        :param min_vf_criterion: float, minimum view factor criterion
+        :return: float or numpy array, cutoff distance(s)
+        """
+        cutoff_distance = (np.sqrt(target_face_area) + sqrt(max_context_face_area)) / sqrt(2) + sqrt(
+            max_context_face_area / (pi * min_vf_criterion))
+
+        return cutoff_distance * (1 + cutoff_distance_margin)
+
+    def get_candidate_face_index_array(self, target_centroid_array, target_area_array, min_vf_criterion):
+        """
+        Get the indices of the bounding box faces that are close enough to at least one of the target faces to
+        possibly verify the minimum view factor criterion.
+        :param target_centroid_array: numpy array of shape (n, 3) of the centroids of the target faces
+        :param target_area_array: numpy array of shape (n,) of the areas of the target faces
+        :param min_vf_criterion: float, minimum view factor criterion
+        :return: numpy array of the sorted indices of the candidate faces
+        """
+        if self.kd_tree is None or len(target_area_array) == 0:
+            return np.array([], dtype=int)
+        cutoff_distance_array = self.mvfc_cutoff_distance(target_face_area=target_area_array,
+                                                          max_context_face_area=self.max_face_area,
+                                                          min_vf_criterion=min_vf_criterion)
+        candidate_face_index_list_list = self.kd_tree.query_ball_point(target_centroid_array,
+                                                                       r=cutoff_distance_array)
+        candidate_face_index_list = [face_index for face_index_list in candidate_face_index_list_list
+                                     for face_index in face_index_list]
+
+        return np.unique(np.array(candidate_face_index_list, dtype=int))
+
+
+def get_axis_aligned_bounds_of_lb_polyface3d_list(lb_polyface3d_list):
+    """
+    Get the axis-aligned bounds of a list of Ladybug Polyface3D, for instance the oriented bounding boxes of buildings
+    :param lb_polyface3d_list: list of Ladybug Polyface3D
+    :return min_array: numpy array of shape (n, 3) of the minimum corners of the bounds
+    :return max_array: numpy array of shape (n, 3) of the maximum corners of the bounds
+    """
+    if not lb_polyface3d_list:
+        return np.zeros((0, 3)), np.zeros((0, 3))
+    min_array = np.array([[lb_polyface3d.min.x, lb_polyface3d.min.y, lb_polyface3d.min.z] for lb_polyface3d in
+                          lb_polyface3d_list])
+    max_array = np.array([[lb_polyface3d.max.x, lb_polyface3d.max.y, lb_polyface3d.max.z] for lb_polyface3d in
+                          lb_polyface3d_list])
+
+    return min_array, max_array
+
+
+def get_distance_between_axis_aligned_bounds(min_array_1, max_array_1, min_array_2, max_array_2):
+    """
+    Get the distance between axis-aligned bounds, 0 if they overlap. The arrays are broadcast against each other.
+    :param min_array_1: numpy array of shape (..., 3) of the minimum corners of the first bounds
+    :param max_array_1: numpy array of shape (..., 3) of the maximum corners of the first bounds
+    :param min_array_2: numpy array of shape (..., 3) of the minimum corners of the second bounds
+    :param max_array_2: numpy array of shape (..., 3) of the maximum corners of the second bounds
+    :return: numpy array of the distances
+    """
+    gap_array = np.maximum(np.maximum(min_array_1 - max_array_2, min_array_2 - max_array_1), 0.)
+
+    return np.sqrt(np.sum(gap_array ** 2, axis=-1))
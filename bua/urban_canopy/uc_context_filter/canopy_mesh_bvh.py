@@ -0,0 +1,281 @@
+"""
+Bounding volume hierarchy (BVH) of the triangulated envelopes of all the buildings in the urban canopy, used to cast
+the rays of the second pass of the context filtering.
+"""
+
+import logging
+import numpy as np
+import pyvista as pv
+
+from bua.building.context_filter.utils_functions_context_filter import \
+    get_outdoor_faces_from_hb_model_or_lb_polyface3d
+from bua.building.context_filter.utils_functions_ray_tracing import make_triangle_arrays_from_pyvista_mesh, \
+    expand_index_ranges, are_segments_intersecting_triangles, are_segments_intersecting_boxes
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+# Maximum number of triangles in the leaves of the hierarchy
+default_max_number_of_triangles_per_leaf = 4
+# Number of rays traversing the hierarchy at once, to limit the memory usage
+default_number_of_rays_per_block = 1024
+# Margin added to the bounding boxes of the nodes, so that the rays grazing a triangle are not missed
+node_bounding_box_margin = 1e-7
+
+
+class CanopyMeshBvh:
+    """
+    Bounding volume hierarchy of the triangles of the envelopes of the buildings in the urban canopy.
+    The triangles are stored by building, the triangles of the i-th building of building_id_list being the ones
+    between building_triangle_start_index_array[i] and building_triangle_start_index_array[i+1].
+    The hierarchy is a binary tree stored in flat numpy arrays, the two children of a node being consecutive, so that
+    the object can be pickled with the urban canopy and reused in the following simulations.
+    """
+
+    def __init__(self):
+        # Buildings
+        self.building_id_list = []
+        self.building_source_key_list = []  # to check if the geometry used for the buildings changed
+        self.building_triangle_start_index_array = np.zeros(1, dtype=np.int64)
+        # Triangles
+        self.vertex_0_array = np.zeros((0, 3))
+        self.edge_1_array = np.zeros((0, 3))
+        self.edge_2_array = np.zeros((0, 3))
+        # Hierarchy
+        self.triangle_index_array = np.zeros(0, dtype=np.int64)  # index of the triangles ordered by leaf
+        self.node_min_array = np.zeros((0, 3))
+        self.node_max_array = np.zeros((0, 3))
+        self.node_first_child_index_array = np.zeros(0, dtype=np.int64)  # -1 for the leaves
+        self.node_start_index_array = np.zeros(0, dtype=np.int64)  # in triangle_index_array
+        self.node_number_of_triangles_array = np.zeros(0, dtype=np.int64)
+
+    @property
+    def number_of_triangles(self):
+        return len(self.vertex_0_array)
+
+    @classmethod
+    def from_hb_model_and_lb_polyface3d_list(cls, building_id_list, hb_model_and_lb_polyface3d_list,
+                                             building_source_key_list=None,
+                                             max_number_of_triangles_per_leaf=default_max_number_of_triangles_per_leaf):
+        """
+        Make the BVH from the Honeybee Models or Ladybug Polyface3D of the buildings.
+        The outdoor faces are selected the same way as for the Pyvista mesh of the urban canopy.
+        :param building_id_list: list of str, id of the buildings
+        :param hb_model_and_lb_polyface3d_list: list of Honeybee Model or Ladybug Polyface3D of the buildings
+        :param building_source_key_list: list of str, key of the geometry used for each building, to check later if
+            the BVH is up to date
+        :param max_number_of_triangles_per_leaf: int, maximum number of triangles in the leaves of the hierarchy
+        :return: CanopyMeshBvh object
+        """
+        # Make a single Pyvista mesh of all the faces, with the index of the building of each face
+        vertex_list = []
+        face_list = []
+        face_building_index_list = []
+        for building_index, lbt_obj in enumerate(hb_model_and_lb_polyface3d_list):
+            for face_obj in get_outdoor_faces_from_hb_model_or_lb_polyface3d(lbt_obj=lbt_obj):
+                lb_vertex_list = face_obj.vertices
+                # format of the face expected by PyVista [number of vertices, index vertex 1, index vertex 2 ...]
+                face_list.append(len(lb_vertex_list))
+                face_list.extend(range(len(vertex_list), len(vertex_list) + len(lb_vertex_list)))
+                vertex_list.extend([vertex.x, vertex.y, vertex.z] for vertex in lb_vertex_list)
+                face_building_index_list.append(building_index)
+        if face_building_index_list:
+            pyvista_mesh = pv.PolyData(np.array(vertex_list, dtype=float), np.array(face_list))
+            pyvista_mesh.cell_data["building_index"] = np.array(face_building_index_list)
+            triangulated_mesh = pyvista_mesh.triangulate()
+            vertex_0_array, edge_1_array, edge_2_array = make_triangle_arrays_from_pyvista_mesh(
+                pyvista_mesh=triangulated_mesh)
+            triangle_building_index_array = np.asarray(triangulated_mesh.cell_data["building_index"])
+        else:
+            vertex_0_array, edge_1_array, edge_2_array = make_triangle_arrays_from_pyvista_mesh(pyvista_mesh=None)
+            triangle_building_index_array = np.zeros(0, dtype=np.int64)
+        # Group the triangles by building
+        sorting_index_array = np.argsort(triangle_building_index_array, kind="stable")
+        building_triangle_start_index_array = np.searchsorted(triangle_building_index_array[sorting_index_array],
+                                                              np.arange(len(building_id_list) + 1))
+
+        return cls.from_triangle_arrays(vertex_0_array=vertex_0_array[sorting_index_array],
+                                        edge_1_array=edge_1_array[sorting_index_array],
+                                        edge_2_array=edge_2_array[sorting_index_array],
+                                        building_id_list=building_id_list,
+                                        building_triangle_start_index_array=building_triangle_start_index_array,
+                                        building_source_key_list=building_source_key_list,
+                                        max_number_of_triangles_per_leaf=max_number_of_triangles_per_leaf)
+
+    @classmethod
+    def from_triangle_arrays(cls, vertex_0_array, edge_1_array, edge_2_array, building_id_list=None,
+                             building_triangle_start_index_array=None, building_source_key_list=None,
+                             max_number_of_triangles_per_leaf=default_max_number_of_triangles_per_leaf):
+        """
+        Make the BVH from the triangle arrays, grouped by building.
+        :param vertex_0_array: numpy array of shape (n, 3) of the first vertex of the triangles
+        :param edge_1_array: numpy array of shape (n, 3) of the first edge of the triangles
+        :param edge_2_array: numpy array of shape (n, 3) of the second edge of the triangles
+        :param building_id_list: list of str, id of the buildings. By default, all the triangles are considered
+            as part of a single unnamed building.
+        :param building_triangle_start_index_array: numpy array of int of size len(building_id_list) + 1, index of the
+            first triangle of each building
+        :param building_source_key_list: list of str, key of the geometry used for each building
+        :param max_number_of_triangles_per_leaf: int, maximum number of triangles in the leaves of the hierarchy
+        :return: CanopyMeshBvh object
+        """
+        bvh_obj = cls()
+        bvh_obj.vertex_0_array = np.asarray(vertex_0_array, dtype=float).reshape(-1, 3)
+        bvh_obj.edge_1_array = np.asarray(edge_1_array, dtype=float).reshape(-1, 3)
+        bvh_obj.edge_2_array = np.asarray(edge_2_array, dtype=float).reshape(-1, 3)
+        if building_id_list is None:
+            building_id_list = [None]
+            building_triangle_start_index_array = [0, bvh_obj.number_of_triangles]
+        bvh_obj.building_id_list = list(building_id_list)
+        bvh_obj.building_triangle_start_index_array = np.asarray(building_triangle_start_index_array,
+                                                                 dtype=np.int64)
+        bvh_obj.building_source_key_list = list(building_source_key_list) if building_source_key_list is not None \
+            else [None] * len(bvh_obj.building_id_list)
+        bvh_obj.build_hierarchy(max_number_of_triangles_per_leaf=max_number_of_triangles_per_leaf)
+
+        return bvh_obj
+
+    @classmethod
+    def from_pyvista_mesh(cls, pyvista_mesh,
+                          max_number_of_triangles_per_leaf=default_max_number_of_triangles_per_leaf):
+        """
+        Make the BVH from a Pyvista mesh, all the triangles being considered as part of a single unnamed building.
+        :param pyvista_mesh: Pyvista PolyData mesh
+        :param max_number_of_triangles_per_leaf: int, maximum number of triangles in the leaves of the hierarchy
+        :return: CanopyMeshBvh object
+        """
+        vertex_0_array, edge_1_array, edge_2_array = make_triangle_arrays_from_pyvista_mesh(pyvista_mesh=pyvista_mesh)
+
+        return cls.from_triangle_arrays(vertex_0_array=vertex_0_array, edge_1_array=edge_1_array,
+                                        edge_2_array=edge_2_array,
+                                        max_number_of_triangles_per_leaf=max_number_of_triangles_per_leaf)
+
+    def build_hierarchy(self, max_number_of_triangles_per_leaf=default_max_number_of_triangles_per_leaf):
+        """
+        Build the hierarchy top-down, splitting the triangles of each node in two halves along the largest extent of
+        their centroids.
+        :param max_number_of_triangles_per_leaf: int, maximum number of triangles in the leaves of the hierarchy
+        """
+        number_of_triangles = self.number_of_triangles
+        triangle_min_array = np.minimum(self.vertex_0_array, np.minimum(self.vertex_0_array + self.edge_1_array,
+                                                                        self.vertex_0_array + self.edge_2_array))
+        triangle_max_array = np.maximum(self.vertex_0_array, np.maximum(self.vertex_0_array + self.edge_1_array,
+                                                                        self.vertex_0_array + self.edge_2_array))
+        triangle_centroid_array = (triangle_min_array + triangle_max_array) / 2.
+        # A binary tree with leaves of at least one triangle has less than 2 * number_of_triangles nodes
+        max_number_of_nodes = max(2 * number_of_triangles, 1)
+        self.triangle_index_array = np.arange(number_of_triangles)
+        self.node_min_array = np.zeros((max_number_of_nodes, 3))
+        self.node_max_array = np.zeros((max_number_of_nodes, 3))
+        self.node_first_child_index_array = -np.ones(max_number_of_nodes, dtype=np.int64)
+        self.node_start_index_array = np.zeros(max_number_of_nodes, dtype=np.int64)
+        self.node_number_of_triangles_array = np.zeros(max_number_of_nodes, dtype=np.int64)
+        if number_of_triangles == 0:
+            self.node_min_array[0], self.node_max_array[0] = np.inf, -np.inf  # empty box, never hit
+            number_of_nodes = 1
+        else:
+            number_of_nodes = 1
+            node_to_split_list = [(0, 0, number_of_triangles)]  # (node index, start index, stop index)
+            while node_to_split_list:
+                node_index, start_index, stop_index = node_to_split_list.pop()
+                node_triangle_index_array = self.triangle_index_array[start_index:stop_index]
+                self.node_min_array[node_index] = triangle_min_array[node_triangle_index_array].min(axis=0)
+                self.node_max_array[node_index] = triangle_max_array[node_triangle_index_array].max(axis=0)
+                self.node_start_index_array[node_index] = start_index
+                self.node_number_of_triangles_array[node_index] = stop_index - start_index
+                if stop_index - start_index <= max_number_of_triangles_per_leaf:
+                    continue
+                # Split at the median of the centroids along the axis of largest extent
+                node_centroid_array = triangle_centroid_array[node_triangle_index_array]
+                split_axis = np.argmax(node_centroid_array.max(axis=0) - node_centroid_array.min(axis=0))
+                number_of_triangles_left = (stop_index - start_index) // 2
+                self.triangle_index_array[start_index:stop_index] = node_triangle_index_array[
+                    np.argpartition(node_centroid_array[:, split_axis], number_of_triangles_left)]
+                self.node_first_child_index_array[node_index] = number_of_nodes
+                node_to_split_list.append((number_of_nodes, start_index, start_index + number_of_triangles_left))
+                node_to_split_list.append((number_of_nodes + 1, start_index + number_of_triangles_left, stop_index))
+                number_of_nodes += 2
+        # Trim the arrays and add the margin to the bounding boxes
+        self.node_min_array = self.node_min_array[:number_of_nodes] - node_bounding_box_margin
+        self.node_max_array = self.node_max_array[:number_of_nodes] + node_bounding_box_margin
+        self.node_first_child_index_array = self.node_first_child_index_array[:number_of_nodes]
+        self.node_start_index_array = self.node_start_index_array[:number_of_nodes]
+        self.node_number_of_triangles_array = self.node_number_of_triangles_array[:number_of_nodes]
+
+    def is_up_to_date(self, building_id_list, building_source_key_list):
+        """
+        Check if the BVH was built with the same buildings and geometries as the ones currently in the urban canopy
+        :param building_id_list: list of str, list of the id of the buildings in the urban canopy
+        :param building_source_key_list: list of str, key of the geometry used for each building
+        :return: bool
+        """
+        return self.building_id_list == list(building_id_list) and self.building_source_key_list == list(
+            building_source_key_list)
+
+    def get_building_triangle_index_range(self, building_id):
+        """
+        Get the range of the triangles of a building in the triangle arrays
+        :param building_id: str, id of the building
+        :return: (start index, stop index) of the triangles of the building
+        """
+        building_index = self.building_id_list.index(building_id)
+
+        return (int(self.building_triangle_start_index_array[building_index]),
+                int(self.building_triangle_start_index_array[building_index + 1]))
+
+    def are_segments_obstructed(self, start_point_array, end_point_array,
+                                number_of_rays_per_block=default_number_of_rays_per_block):
+        """
+        Check for each segment if it intersects at least one triangle of the mesh.
+        The segments traverse the hierarchy all together, level by level, and stop as soon as they hit a triangle.
+        :param start_point_array: numpy array of shape (n, 3) of the start points of the segments
+        :param end_point_array: numpy array of shape (n, 3) of the end points of the segments
+        :param number_of_rays_per_block: int, number of segments traversing the hierarchy at once
+        :return: boolean numpy array of shape (n,), True if the segment is obstructed
+        """
+        start_point_array = np.asarray(start_point_array, dtype=float).reshape(-1, 3)
+        end_point_array = np.asarray(end_point_array, dtype=float).reshape(-1, 3)
+        number_of_segments = len(start_point_array)
+        is_obstructed_array = np.zeros(number_of_segments, dtype=bool)
+        if number_of_segments == 0 or self.number_of_triangles == 0:
+            return is_obstructed_array
+        # Gather the triangles of the pairs in one go
+        triangle_array = np.hstack([self.vertex_0_array, self.edge_1_array, self.edge_2_array])
+        for block_start in range(0, number_of_segments, number_of_rays_per_block):
+            # All the segments of the block start at the root node
+            segment_index_array = np.arange(block_start, min(block_start + number_of_rays_per_block,
+                                                             number_of_segments))
+            node_index_array = np.zeros(len(segment_index_array), dtype=np.int64)
+            while len(segment_index_array) > 0:
+                # Keep the segments not obstructed yet that cross the bounding box of the node
+                is_kept_array = ~is_obstructed_array[segment_index_array]
+                segment_index_array = segment_index_array[is_kept_array]
+                node_index_array = node_index_array[is_kept_array]
+                is_kept_array = are_segments_intersecting_boxes(
+                    start_point_array=start_point_array[segment_index_array],
+                    end_point_array=end_point_array[segment_index_array],
+                    box_min_array=self.node_min_array[node_index_array],
+                    box_max_array=self.node_max_array[node_index_array])
+                segment_index_array = segment_index_array[is_kept_array]
+                node_index_array = node_index_array[is_kept_array]
+                # Test the triangles of the leaves
+                is_leaf_array = self.node_first_child_index_array[node_index_array] < 0
+                leaf_node_index_array = node_index_array[is_leaf_array]
+                pair_owner_array, position_array = expand_index_ranges(
+                    start_index_array=self.node_start_index_array[leaf_node_index_array],
+                    stop_index_array=self.node_start_index_array[leaf_node_index_array] +
+                                     self.node_number_of_triangles_array[leaf_node_index_array])
+                pair_segment_index_array = segment_index_array[is_leaf_array][pair_owner_array]
+                pair_triangle_array = triangle_array[self.triangle_index_array[position_array]]
+                is_intersecting_array = are_segments_intersecting_triangles(
+                    start_point_array=start_point_array[pair_segment_index_array],
+                    end_point_array=end_point_array[pair_segment_index_array],
+                    vertex_0_array=pair_triangle_array[:, 0:3], edge_1_array=pair_triangle_array[:, 3:6],
+                    edge_2_array=pair_triangle_array[:, 6:9])
+                is_obstructed_array[pair_segment_index_array[is_intersecting_array]] = True
+                # Go down to the children of the other nodes
+                first_child_index_array = self.node_first_child_index_array[node_index_array[~is_leaf_array]]
+                segment_index_array = np.repeat(segment_index_array[~is_leaf_array], 2)
+                node_index_array = np.stack([first_child_index_array, first_child_index_array + 1], axis=1).ravel()
+
+        return is_obstructed_array
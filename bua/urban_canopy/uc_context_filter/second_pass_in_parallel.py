@@ -0,0 +1,206 @@
+"""
+Functions to run the second pass of the context filtering on the target buildings in a pool of processes.
+Honeybee objects cannot be pickled, the geometries of the context buildings are thus sent as dictionaries, the same
+way as when the urban canopy is pickled, and the shades are sent back as their geometry and construction properties.
+"""
+
+import logging
+
+from concurrent.futures import ProcessPoolExecutor
+
+from honeybee.model import Model
+from honeybee.shade import Shade
+from ladybug_geometry.geometry3d import Face3D, Polyface3D
+
+from bua.building.building_basic import BuildingBasic
+from bua.building.building_modeled import BuildingModeled
+from bua.building.context_filter.building_shading_context import BuildingShadingContextFilter
+from bua.urban_canopy.uc_context_filter.shade_manager import ShadeManager
+from bua.utils.utils_parallel import get_number_of_workers
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+# Data shared by all the tasks of a worker, set once by the initializer of the pool
+worker_data_dict = {}
+
+
+def make_context_geometry_dict_for_workers(uc_building_dictionary, context_building_id_list,
+                                           use_merged_face_hb_model=True):
+    """
+    Convert the geometries of the context buildings to dictionaries to send them to the workers, choosing the same
+    geometry as BuildingModeled.get_context_hb_model_or_lb_polyface3d_list_to_test.
+    :param uc_building_dictionary: dict, dictionary of the buildings in the urban canopy
+    :param context_building_id_list: list of str, id of the context buildings
+    :param use_merged_face_hb_model: bool, if True, the merged faces HB model will be used
+    :return context_geometry_dict: dict, (type of geometry, geometry dict) by building id
+    """
+    context_geometry_dict = {}
+    for building_id in context_building_id_list:
+        building_obj = uc_building_dictionary[building_id]
+        if isinstance(building_obj, BuildingModeled):
+            if building_obj.merged_faces_hb_model_dict is not None and use_merged_face_hb_model:
+                context_geometry_dict[building_id] = ("hb_model", building_obj.merged_faces_hb_model_dict)
+            else:
+                context_geometry_dict[building_id] = ("hb_model", building_obj.hb_model_obj.to_dict())
+        elif isinstance(building_obj, BuildingBasic):
+            context_geometry_dict[building_id] = ("lb_polyface3d",
+                                                  building_obj.lb_polyface3d_extruded_footprint.to_dict())
+        else:
+            raise ValueError(
+                f"The building {building_obj.id} is not a BuildingModeled or a BuildingBasic, it cannot be "
+                f"handled by the context filter")
+
+    return context_geometry_dict
+
+
+def initialize_second_pass_worker(context_geometry_dict, full_urban_canopy_pyvista_mesh, canopy_mesh_bvh):
+    """
+    Store the data shared by all the tasks in the worker.
+    :param context_geometry_dict: dict, geometry of the context buildings, from make_context_geometry_dict_for_workers
+    :param full_urban_canopy_pyvista_mesh: Pyvista mesh of the urban canopy, None if the BVH is used
+    :param canopy_mesh_bvh: CanopyMeshBvh of the urban canopy, None if the Pyvista mesh is used
+    """
+    worker_data_dict["context_geometry_dict"] = context_geometry_dict
+    worker_data_dict["full_urban_canopy_pyvista_mesh"] = full_urban_canopy_pyvista_mesh
+    worker_data_dict["canopy_mesh_bvh"] = canopy_mesh_bvh
+    # The geometries are loaded once per worker, when they are needed for the first time
+    worker_data_dict["context_geometry_obj_dict"] = {}
+
+
+def get_context_geometry_in_worker(building_id):
+    """
+    Get the HB Model or LB Polyface3D of a context building in the worker.
+    :param building_id: str, id of the context building
+    :return: HB Model or LB Polyface3D
+    """
+    context_geometry_obj_dict = worker_data_dict["context_geometry_obj_dict"]
+    if building_id not in context_geometry_obj_dict:
+        geometry_type, geometry_dict = worker_data_dict["context_geometry_dict"][building_id]
+        if geometry_type == "hb_model":
+            context_geometry_obj_dict[building_id] = Model.from_dict(geometry_dict)
+        else:
+            context_geometry_obj_dict[building_id] = Polyface3D.from_dict(geometry_dict)
+
+    return context_geometry_obj_dict[building_id]
+
+
+def run_second_pass_context_filtering_in_worker(task_dict):
+    """
+    Run the second pass of the context filtering of a target building in a worker.
+    :param task_dict: dict, parameters of the second pass of the target building
+    :return result_dict: dict, identifier, geometry and construction properties of the selected shades, discarded
+        faces as dictionaries and duration of the second pass
+    """
+    shading_context_obj = BuildingShadingContextFilter()
+    shading_context_obj.set_number_of_rays(number_of_rays=task_dict["number_of_rays"],
+                                           no_ray_tracing=task_dict["no_ray_tracing"])
+    shading_context_obj.set_consider_windows(consider_windows=task_dict["consider_windows"])
+    # The constructions of the shades are merged back in the ShadeManager of the urban canopy
+    shading_context_obj.select_non_obstructed_context_faces_with_ray_tracing(
+        uc_shade_manager=ShadeManager(),
+        target_lb_polyface3d_extruded_footprint=Polyface3D.from_dict(task_dict["target_lb_polyface3d_dict"]),
+        context_hb_model_or_lb_polyface3d_list_to_test=[get_context_geometry_in_worker(building_id) for building_id
+                                                        in task_dict["context_building_id_list"]],
+        full_urban_canopy_pyvista_mesh=worker_data_dict["full_urban_canopy_pyvista_mesh"],
+        keep_shades_from_user=True, no_ray_tracing=task_dict["no_ray_tracing"],
+        keep_discarded_faces=task_dict["keep_discarded_faces"],
+        canopy_mesh_bvh=worker_data_dict["canopy_mesh_bvh"])
+
+    return {
+        "building_id": task_dict["building_id"],
+        "context_shading_hb_shade_tuple_list": [
+            (hb_shade.identifier, hb_shade.geometry.to_dict(), (
+                hb_shade.properties.energy.construction.solar_reflectance,
+                hb_shade.properties.energy.construction.visible_reflectance,
+                hb_shade.properties.energy.construction.is_specular))
+            for hb_shade in shading_context_obj.context_shading_hb_shade_list],
+        "discarded_lb_face3d_dict_list": [lb_face3d.to_dict() for lb_face3d in
+                                          shading_context_obj.discarded_lb_face3d_context_shading_second_pass_list],
+        "second_pass_duration": shading_context_obj.second_pass_duration
+    }
+
+
+def make_hb_shade_from_worker_result(uc_shade_manager, identifier, lb_face3d_dict, shade_construction_key):
+    """
+    Make a Honeybee Shade selected by a worker, with the shade construction of the urban canopy ShadeManager, so that
+    the shades of all the buildings share the same constructions.
+    :param uc_shade_manager: ShadeManager object of the urban canopy
+    :param identifier: str, identifier of the shade
+    :param lb_face3d_dict: dict, geometry of the shade
+    :param shade_construction_key: tuple, (solar reflectance, visible reflectance, is specular) of the construction
+    :return hb_shade: Honeybee Shade
+    """
+    hb_shade = Shade(identifier=identifier, geometry=Face3D.from_dict(lb_face3d_dict), is_detached=True)
+    hb_shade.properties.energy.construction = uc_shade_manager.get_shade_construction(*shade_construction_key)
+
+    return hb_shade
+
+
+def run_second_pass_context_filtering_in_parallel(uc_shade_manager, uc_building_dictionary, target_building_id_list,
+                                                  full_urban_canopy_pyvista_mesh=None, canopy_mesh_bvh=None,
+                                                  number_of_rays=3, consider_windows=False,
+                                                  keep_shades_from_user=False, no_ray_tracing=False,
+                                                  use_merged_face_hb_model=True, keep_discarded_faces=False,
+                                                  number_of_workers=None):
+    """
+    Run the second pass of the context filtering of the target buildings in a pool of processes.
+    The second pass of the target buildings should be prepared beforehand with
+    BuildingModeled.prepare_second_pass_context_filtering. The results are set in the buildings in the order of
+    target_building_id_list, so that the shade constructions of the ShadeManager are the same as in a sequential run.
+    :param uc_shade_manager: ShadeManager object of the urban canopy
+    :param uc_building_dictionary: dict, dictionary of the buildings in the urban canopy
+    :param target_building_id_list: list of str, id of the target buildings to run the second pass on
+    :param full_urban_canopy_pyvista_mesh: Pyvista mesh of the urban canopy, not used if canopy_mesh_bvh is provided
+    :param canopy_mesh_bvh: CanopyMeshBvh of the urban canopy
+    :param number_of_rays: int, number of rays to use for the ray tracing method
+    :param consider_windows: bool, if True, the windows will be considered for the ray tracing method
+    :param keep_shades_from_user: bool, if True, the shades from the user will be kept
+    :param no_ray_tracing: bool, if True, the ray tracing method will not be used
+    :param use_merged_face_hb_model: bool, if True, the merged faces HB model will be used
+    :param keep_discarded_faces: bool, if True, the discarded faces will be kept
+    :param number_of_workers: int, number of processes, all the cores if None
+    """
+    if not target_building_id_list:
+        return
+    # Send to the workers only the geometries of the context buildings used by the target buildings
+    context_building_id_list = list(dict.fromkeys(
+        context_building_id for building_id in target_building_id_list for context_building_id in
+        uc_building_dictionary[building_id].shading_context_obj.selected_context_building_id_list))
+    context_geometry_dict = make_context_geometry_dict_for_workers(
+        uc_building_dictionary=uc_building_dictionary, context_building_id_list=context_building_id_list,
+        use_merged_face_hb_model=use_merged_face_hb_model)
+    if canopy_mesh_bvh is not None or no_ray_tracing:
+        full_urban_canopy_pyvista_mesh = None
+    task_dict_list = [{
+        "building_id": building_id,
+        "target_lb_polyface3d_dict": uc_building_dictionary[building_id].lb_polyface3d_extruded_footprint.to_dict(),
+        "context_building_id_list": uc_building_dictionary[
+            building_id].shading_context_obj.selected_context_building_id_list,
+        "number_of_rays": number_of_rays,
+        "consider_windows": consider_windows,
+        "no_ray_tracing": no_ray_tracing,
+        "keep_discarded_faces": keep_discarded_faces
+    } for building_id in target_building_id_list]
+    number_of_workers = get_number_of_workers(number_of_workers=number_of_workers,
+                                              number_of_tasks=len(task_dict_list))
+    dev_logger.info(f"Second pass of the context filtering of {len(task_dict_list)} buildings with "
+                    f"{number_of_workers} processes")
+
+    with ProcessPoolExecutor(max_workers=number_of_workers, initializer=initialize_second_pass_worker,
+                             initargs=(context_geometry_dict, full_urban_canopy_pyvista_mesh,
+                                       canopy_mesh_bvh)) as executor:
+        # map returns the results in the order of the tasks, the merge is thus deterministic
+        for result_dict in executor.map(run_second_pass_context_filtering_in_worker, task_dict_list):
+            uc_building_dictionary[result_dict["building_id"]].shading_context_obj.set_second_pass_results(
+                context_shading_hb_shade_list=[
+                    make_hb_shade_from_worker_result(uc_shade_manager=uc_shade_manager, identifier=identifier,
+                                                     lb_face3d_dict=lb_face3d_dict,
+                                                     shade_construction_key=shade_construction_key)
+                    for identifier, lb_face3d_dict, shade_construction_key in
+                    result_dict["context_shading_hb_shade_tuple_list"]],
+                discarded_lb_face3d_context_shading_second_pass_list=[
+                    Face3D.from_dict(lb_face3d_dict) for lb_face3d_dict in
+                    result_dict["discarded_lb_face3d_dict_list"]],
+                second_pass_duration=result_dict["second_pass_duration"],
+                keep_shades_from_user=keep_shades_from_user)
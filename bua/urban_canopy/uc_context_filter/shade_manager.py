@@ -49,13 +49,9 @@ class ShadeManager:
         # Get the solar and visible reflectance of the HB object
         solar_reflectance, visible_reflectance, is_specular = self.get_solar_and_visible_reflectance(hb_or_lb_object)
         # Get the shade construction from the dict if it exists, otherwise create it
-        if (solar_reflectance, visible_reflectance, is_specular) in self.shade_construction_dict:
-            hb_shade_construction = self.shade_construction_dict[(solar_reflectance, visible_reflectance, is_specular)]
-        else:
-            hb_shade_construction = self.create_shade_construction(solar_reflectance=solar_reflectance,
-                                                                   visible_reflectance=visible_reflectance,
-                                                                   is_specular=is_specular)
-            self.shade_construction_dict[(solar_reflectance, visible_reflectance, is_specular)] = hb_shade_construction
+        hb_shade_construction = self.get_shade_construction(solar_reflectance=solar_reflectance,
+                                                            visible_reflectance=visible_reflectance,
+                                                            is_specular=is_specular)
 
         # Create the shade object
         if isinstance(hb_or_lb_object, Face):
@@ -83,6 +79,22 @@ class ShadeManager:
 
         return hb_shade
 
+    def get_shade_construction(self, solar_reflectance, visible_reflectance, is_specular):
+        """
+        Get the shade construction with the given properties from the dict if it exists, otherwise create it.
+        :param solar_reflectance: float
+        :param visible_reflectance: float
+        :param is_specular: boolean, true if the object is an Aperture/window
+        :return hb_shade_construction: ShadeConstruction
+        """
+        if (solar_reflectance, visible_reflectance, is_specular) not in self.shade_construction_dict:
+            self.shade_construction_dict[(solar_reflectance, visible_reflectance, is_specular)] = \
+                self.create_shade_construction(solar_reflectance=solar_reflectance,
+                                               visible_reflectance=visible_reflectance,
+                                               is_specular=is_specular)
+
+        return self.shade_construction_dict[(solar_reflectance, visible_reflectance, is_specular)]
+
     def get_solar_and_visible_reflectance(self, hb_or_lb_object):
         """
         Get the solar and visible reflectance of the HB object
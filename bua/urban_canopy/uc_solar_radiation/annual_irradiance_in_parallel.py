@@ -0,0 +1,96 @@
+"""
+Run the annual solar irradiance simulations of several buildings at the same time, sharing a budget of workers.
+The Radiance recipes run in their own processes, they are thus launched from a pool of threads, each recipe using
+a share of the workers. Each building runs in its own temporary folder and its results are moved atomically to its
+result folder. A building that fails is reported and does not stop the simulation of the others.
+The sky matrix of the weather file is generated once by the first building, before the others are run in parallel,
+and then copied from the cache of the simulation folder.
+"""
+import os
+import logging
+
+from time import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bua.building.solar_radiation_and_bipv.utils_radiance_cache import get_sky_matrix_cache_key, \
+    is_sky_matrix_in_cache, get_path_sky_matrix_cache_folder
+from bua.utils.utils_parallel import split_workers_between_tasks, report_failed_buildings
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+
+def run_annual_solar_irradiance_simulation_of_building(building_obj, path_simulation_folder, path_weather_file,
+                                                       overwrite=False, north_angle=0, silent=False, workers=None):
+    """
+    Run the annual solar irradiance simulation of a building and catch its errors, so that the other buildings are
+    not affected.
+    :param building_obj: BuildingModeled object
+    :param path_simulation_folder: str, path to the simulation folder
+    :param path_weather_file: str, path to the epw file
+    :param overwrite: bool, if True, the existing results will be overwritten
+    :param north_angle: float, north angle in degrees
+    :param silent: bool, if True, the console outputs will be disabled
+    :param workers: int, number of processes used by the Radiance recipes of the building
+    :return result_dict: dict, success, duration and error message of the simulation
+    """
+    duration = time()
+    error = None
+    try:
+        building_obj.run_annual_solar_irradiance_simulation(path_simulation_folder=path_simulation_folder,
+                                                            path_weather_file=path_weather_file,
+                                                            overwrite=overwrite, north_angle=north_angle,
+                                                            silent=silent, workers=workers)
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+
+    return {"building_id": building_obj.id, "success": error is None, "duration": time() - duration, "error": error}
+
+
+def run_annual_solar_irradiance_simulation_in_parallel(building_obj_list, path_simulation_folder, path_weather_file,
+                                                       overwrite=False, north_angle=0, silent=False,
+                                                       number_of_workers=None, min_workers_per_recipe=1):
+    """
+    Run the annual solar irradiance simulations of the buildings in parallel.
+    :param building_obj_list: list of BuildingModeled objects
+    :param path_simulation_folder: str, path to the simulation folder
+    :param path_weather_file: str, path to the epw file
+    :param overwrite: bool, if True, the existing results will be overwritten
+    :param north_angle: float, north angle in degrees
+    :param silent: bool, if True, the console outputs will be disabled
+    :param number_of_workers: int, total number of processes used by all the recipes, all the cores if None
+    :param min_workers_per_recipe: int, minimum number of processes of each recipe
+    :return result_dict: dict, success, duration and error message of the simulation by building id
+    """
+    if not building_obj_list:
+        return {}
+    result_dict = {}
+    # Run the first building alone if the sky matrix of the weather file is not in the cache yet, so that the other
+    # buildings do not all generate it at the same time
+    if len(building_obj_list) > 1 and os.path.isfile(path_weather_file) and not is_sky_matrix_in_cache(
+            path_sky_matrix_cache_folder=get_path_sky_matrix_cache_folder(path_simulation_folder),
+            sky_matrix_key=get_sky_matrix_cache_key(path_weather_file=path_weather_file, north=north_angle)):
+        dev_logger.info(f"Generate the sky matrix of the weather file with the building {building_obj_list[0].id}")
+        result_dict[building_obj_list[0].id] = run_annual_solar_irradiance_simulation_of_building(
+            building_obj=building_obj_list[0], path_simulation_folder=path_simulation_folder,
+            path_weather_file=path_weather_file, overwrite=overwrite, north_angle=north_angle, silent=silent,
+            workers=number_of_workers)
+        building_obj_list = building_obj_list[1:]
+    number_of_concurrent_buildings, number_of_workers_per_recipe = split_workers_between_tasks(
+        number_of_workers=number_of_workers, number_of_tasks=len(building_obj_list),
+        min_workers_per_task=min_workers_per_recipe)
+    dev_logger.info(f"Run the annual solar irradiance simulation of {len(building_obj_list)} buildings, "
+                    f"{number_of_concurrent_buildings} at a time with {number_of_workers_per_recipe} workers each")
+    with ThreadPoolExecutor(max_workers=number_of_concurrent_buildings) as executor:
+        future_list = [executor.submit(run_annual_solar_irradiance_simulation_of_building, building_obj=building_obj,
+                                       path_simulation_folder=path_simulation_folder,
+                                       path_weather_file=path_weather_file, overwrite=overwrite,
+                                       north_angle=north_angle, silent=silent,
+                                       workers=number_of_workers_per_recipe)
+                       for building_obj in building_obj_list]
+        for future in future_list:
+            building_result_dict = future.result()
+            result_dict[building_result_dict["building_id"]] = building_result_dict
+    report_failed_buildings(result_dict=result_dict, step_name="annual solar irradiance simulation")
+
+    return result_dict
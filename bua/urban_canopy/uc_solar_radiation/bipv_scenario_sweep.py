@@ -0,0 +1,214 @@
+"""
+Evaluate many BIPV scenarios on the same urban canopy, for instance to explore the design space of the BIPV or to
+feed an optimizer. Each scenario is simulated on copies of the SolarRadAndBipvSimulation objects of the buildings,
+the scenarios of the urban canopy are not modified. The irradiance tables, the area of the faces of the SensorGrids
+and the lifetime energy of the panels on the faces are cached and reused by all the scenarios evaluated by a process.
+The scenarios can be evaluated in a pool of processes, the buildings and the BIPV objects being sent once to each
+worker and each task only containing the parameters of a scenario.
+The life expectancies of the panels of a building are drawn by a random generator derived from the seed of the sweep
+and the id of the building, the same for all the scenarios. The scenarios are thus compared with common random
+numbers, and a scenario gives the same results in sequence, in parallel and with run_bipv_panel_simulation_on_buildings
+with the same seed.
+"""
+
+import logging
+import itertools
+import pandas as pd
+
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bua.urban_canopy.bipv_scenario_urban_canopy import BipvScenario
+from bua.building.solar_radiation_and_bipv.bipv_simulation_cache import BipvSimulationCache
+from bua.utils.utils_parallel import get_number_of_workers, get_run_seed, get_task_random_generator
+from bua.utils.utils_default_values_user_parameters import default_id_pv_tech_roof, default_id_pv_tech_facades, \
+    default_roof_transport_id, default_facades_transport_id, default_roof_inverter_id, default_facades_inverter_id, \
+    default_roof_inverter_sizing_ratio, default_facades_inverter_sizing_ratio, default_minimum_panel_eroi, \
+    default_start_year, default_end_year, default_efficiency_computation_method, default_replacement_scenario, \
+    default_replacement_frequency_in_years
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+# Parameters of a BIPV scenario and their default values, the other parameters are passed to the BIPV simulation
+default_bipv_scenario_parameter_dict = {
+    "roof_id_pv_tech": default_id_pv_tech_roof,
+    "facades_id_pv_tech": default_id_pv_tech_facades,
+    "roof_transport_id": default_roof_transport_id,
+    "facades_transport_id": default_facades_transport_id,
+    "roof_inverter_id": default_roof_inverter_id,
+    "facades_inverter_id": default_facades_inverter_id,
+    "roof_inverter_sizing_ratio": default_roof_inverter_sizing_ratio,
+    "facades_inverter_sizing_ratio": default_facades_inverter_sizing_ratio,
+    "efficiency_computation_method": default_efficiency_computation_method,
+    "minimum_panel_eroi": default_minimum_panel_eroi,
+    "start_year": default_start_year,
+    "end_year": default_end_year,
+    "replacement_scenario": default_replacement_scenario,
+    "replacement_frequency_in_years": default_replacement_frequency_in_years
+}
+# Context of the sweep in the workers, set when the worker starts
+worker_sweep_context_dict = {}
+
+
+def make_bipv_scenario_parameter_grid(parameter_value_list_dict):
+    """
+    Make the parameter sets of all the combinations of the values of the parameters
+    :param parameter_value_list_dict: dict, list of the values of each parameter by parameter name, for instance
+        {"roof_id_pv_tech": ["tech_1", "tech_2"], "minimum_panel_eroi": [1., 1.2, 1.5]}
+    :return parameter_dict_list: list of dict, the parameter sets
+    """
+    parameter_name_list = list(parameter_value_list_dict.keys())
+    return [dict(zip(parameter_name_list, value_tuple)) for value_tuple in
+            itertools.product(*[parameter_value_list_dict[parameter_name] for parameter_name in parameter_name_list])]
+
+
+def complete_bipv_scenario_parameter_dict(parameter_dict):
+    """
+    Complete a parameter set with the default values of the missing parameters
+    :param parameter_dict: dict, parameters of the scenario
+    :return parameter_dict: dict, all the parameters of the scenario
+    """
+    return {**default_bipv_scenario_parameter_dict, **parameter_dict}
+
+
+def flatten_bipv_scenario_kpi_dict(kpi_dict, parent_key="", sep="_"):
+    """
+    Flatten the KPI dictionary of a scenario to a dictionary of values, for instance kpi_dict["eroi"]["total"] becomes
+    flattened_kpi_dict["eroi_total"]
+    :param kpi_dict: dict, the "kpis" of the dictionary of an UrbanCanopyKPIs object
+    :param parent_key: str, key of the parent dictionary
+    :param sep: str, separator of the keys
+    :return flattened_kpi_dict: dict, the KPI values by flattened key
+    """
+    flattened_kpi_dict = {}
+    for key, value in kpi_dict.items():
+        new_key = parent_key + sep + key if parent_key else key
+        if isinstance(value, dict):
+            flattened_kpi_dict.update(flatten_bipv_scenario_kpi_dict(value, parent_key=new_key, sep=sep))
+        else:
+            flattened_kpi_dict[new_key] = value
+    return flattened_kpi_dict
+
+
+def evaluate_bipv_scenario(scenario_index, parameter_dict, sweep_context_dict, bipv_simulation_cache):
+    """
+    Simulate a BIPV scenario on all the buildings of the sweep and compute its KPIs at the urban scale, catching its
+    errors so that the other scenarios are not affected.
+    :param scenario_index: int, index of the scenario in the sweep
+    :param parameter_dict: dict, parameters of the scenario
+    :param sweep_context_dict: dict, buildings, BIPV objects, KPI parameters and seed of the sweep, see
+        UrbanCanopy.run_bipv_scenario_sweep
+    :param bipv_simulation_cache: BipvSimulationCache object
+    :return result_dict: dict, success, duration, error message and flattened KPIs of the scenario
+    """
+    duration = time()
+    error = None
+    kpi_dict = None
+    try:
+        parameter_dict = complete_bipv_scenario_parameter_dict(parameter_dict)
+        kwargs = {key: value for key, value in parameter_dict.items() if
+                  key not in default_bipv_scenario_parameter_dict or key == "replacement_frequency_in_years"}
+        bipv_technology_obj_dict = sweep_context_dict["bipv_technology_obj_dict"]
+        bipv_transportation_obj_dict = sweep_context_dict["bipv_transportation_obj_dict"]
+        bipv_inverter_obj_dict = sweep_context_dict["bipv_inverter_obj_dict"]
+        bipv_scenario_obj = BipvScenario(identifier=f"sweep_scenario_{scenario_index}",
+                                         start_year=parameter_dict["start_year"], end_year=parameter_dict["end_year"])
+        solar_rad_and_bipv_obj_list = []
+        for building_id, solar_rad_and_bipv_obj in sweep_context_dict["solar_rad_and_bipv_obj_dict"].items():
+            solar_rad_and_bipv_obj = solar_rad_and_bipv_obj.copy_for_new_bipv_simulation()
+            solar_rad_and_bipv_obj.run_bipv_panel_simulation(
+                path_simulation_folder=sweep_context_dict["path_simulation_folder"], building_id=building_id,
+                roof_pv_tech_obj=bipv_technology_obj_dict[parameter_dict["roof_id_pv_tech"]],
+                facades_pv_tech_obj=bipv_technology_obj_dict[parameter_dict["facades_id_pv_tech"]],
+                roof_inverter_tech_obj=bipv_inverter_obj_dict[parameter_dict["roof_inverter_id"]],
+                facades_inverter_tech_obj=bipv_inverter_obj_dict[parameter_dict["facades_inverter_id"]],
+                roof_inverter_sizing_ratio=parameter_dict["roof_inverter_sizing_ratio"],
+                facades_inverter_sizing_ratio=parameter_dict["facades_inverter_sizing_ratio"],
+                roof_transport_obj=bipv_transportation_obj_dict[parameter_dict["roof_transport_id"]],
+                facades_transport_obj=bipv_transportation_obj_dict[parameter_dict["facades_transport_id"]],
+                uc_end_year=parameter_dict["end_year"], uc_start_year=parameter_dict["start_year"],
+                uc_current_year=parameter_dict["start_year"],
+                efficiency_computation_method=parameter_dict["efficiency_computation_method"],
+                minimum_panel_eroi=parameter_dict["minimum_panel_eroi"],
+                replacement_scenario=parameter_dict["replacement_scenario"], continue_simulation=False,
+                bipv_simulation_cache=bipv_simulation_cache,
+                random_generator=get_task_random_generator(seed=sweep_context_dict["seed"], task_key=building_id),
+                **kwargs)
+            solar_rad_and_bipv_obj_list.append(solar_rad_and_bipv_obj)
+        bipv_scenario_obj.set_simulated_building_id_list(
+            building_id_list=list(sweep_context_dict["solar_rad_and_bipv_obj_dict"].keys()))
+        bipv_scenario_obj.sum_bipv_results_at_urban_scale(solar_rad_and_bipv_obj_list=solar_rad_and_bipv_obj_list)
+        bipv_scenario_obj.compute_scenario_kpis(**sweep_context_dict["kpi_parameter_dict"])
+        kpi_dict = flatten_bipv_scenario_kpi_dict(bipv_scenario_obj.urban_canopy_bipv_kpis_obj.to_dict()["kpis"])
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+
+    return {"scenario_index": scenario_index, "success": error is None, "duration": time() - duration,
+            "error": error, "kpi_dict": kpi_dict}
+
+
+def init_bipv_scenario_sweep_worker(sweep_context_dict):
+    """
+    Initialize a worker with the context of the sweep and an empty cache.
+    :param sweep_context_dict: dict, buildings, BIPV objects, KPI parameters and seed of the sweep
+    """
+    worker_sweep_context_dict.clear()
+    worker_sweep_context_dict.update(sweep_context_dict)
+    worker_sweep_context_dict["bipv_simulation_cache"] = BipvSimulationCache()
+
+
+def evaluate_bipv_scenario_in_worker(task_tuple):
+    """
+    Evaluate a BIPV scenario in a worker, with the context and the cache of the worker
+    :param task_tuple: tuple, index and parameters of the scenario
+    :return result_dict: dict, success, duration, error message and flattened KPIs of the scenario
+    """
+    scenario_index, parameter_dict = task_tuple
+    return evaluate_bipv_scenario(scenario_index=scenario_index, parameter_dict=parameter_dict,
+                                  sweep_context_dict=worker_sweep_context_dict,
+                                  bipv_simulation_cache=worker_sweep_context_dict["bipv_simulation_cache"])
+
+
+def run_bipv_scenario_sweep(parameter_dict_list, sweep_context_dict, run_in_parallel=False, number_of_workers=None,
+                            seed=None):
+    """
+    Evaluate BIPV scenarios and gather their KPIs in a table.
+    :param parameter_dict_list: list of dict, parameters of each scenario, the missing parameters take their default
+        value, see default_bipv_scenario_parameter_dict
+    :param sweep_context_dict: dict, buildings, BIPV objects and KPI parameters of the sweep, see
+        UrbanCanopy.run_bipv_scenario_sweep
+    :param run_in_parallel: bool, if True, the scenarios are evaluated in a pool of processes
+    :param number_of_workers: int, number of processes if run_in_parallel is True, all the cores if None
+    :param seed: int, seed of the life expectancies of the panels, shared by all the scenarios, a new one is drawn and
+        logged if None
+    :return kpi_table: pandas DataFrame, one row per scenario with its parameters and its KPIs, the KPIs of the
+        scenarios that failed are missing
+    """
+    sweep_context_dict = {**sweep_context_dict, "seed": get_run_seed(seed=seed)}
+    task_tuple_list = list(enumerate(parameter_dict_list))
+    if run_in_parallel and len(task_tuple_list) > 1:
+        number_of_workers = get_number_of_workers(number_of_workers=number_of_workers,
+                                                  number_of_tasks=len(task_tuple_list))
+        dev_logger.info(f"Evaluate {len(task_tuple_list)} BIPV scenarios with {number_of_workers} processes")
+        with ProcessPoolExecutor(max_workers=number_of_workers, initializer=init_bipv_scenario_sweep_worker,
+                                 initargs=(sweep_context_dict,)) as executor:
+            result_dict_list = list(executor.map(evaluate_bipv_scenario_in_worker, task_tuple_list))
+    else:
+        bipv_simulation_cache = BipvSimulationCache()
+        result_dict_list = [evaluate_bipv_scenario(scenario_index=scenario_index, parameter_dict=parameter_dict,
+                                                   sweep_context_dict=sweep_context_dict,
+                                                   bipv_simulation_cache=bipv_simulation_cache)
+                            for scenario_index, parameter_dict in task_tuple_list]
+
+    row_dict_list = []
+    for result_dict in result_dict_list:
+        if not result_dict["success"]:
+            user_logger.warning(f"The BIPV scenario {result_dict['scenario_index']} of the sweep failed, "
+                                f"{result_dict['error']}")
+            dev_logger.warning(f"The BIPV scenario {result_dict['scenario_index']} of the sweep failed, "
+                               f"{result_dict['error']}")
+        parameter_dict = complete_bipv_scenario_parameter_dict(parameter_dict_list[result_dict["scenario_index"]])
+        row_dict_list.append({**parameter_dict, **(result_dict["kpi_dict"] or {})})
+
+    return pd.DataFrame(row_dict_list)
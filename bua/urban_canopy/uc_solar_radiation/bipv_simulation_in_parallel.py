@@ -0,0 +1,185 @@
+"""
+Run the BIPV simulations of the buildings in a pool of processes.
+The simulation of each building only depends on its own irradiance results until the results are summed at the urban
+scale. The workers receive the BIPV technologies, transportations and inverters once when they start, then each task
+only contains the id of the building, the identifiers of the objects to use and the attributes modified by the BIPV
+simulation. The SensorGrids and the annual irradiance results are written once by the main process in a BIPV input file
+of the result folder of the building, the worker rebuilds the SolarRadAndBipvSimulation object of the building from it
+and reads the hourly irradiance table from the same folder. Only the attributes modified by the BIPV simulation are
+sent back.
+The life expectancies of the panels of a building are drawn by a random generator derived from the seed of the run and
+the id of the building, the results do not depend on the process that simulates the building.
+"""
+
+import os
+import logging
+
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bua.building.solar_radiation_and_bipv.solar_rad_and_BIPV import SolarRadAndBipvSimulation
+from bua.utils.utils_parallel import get_number_of_workers, report_failed_buildings, get_task_random_generator
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+# Attributes of the SolarRadAndBipvSimulation objects modified by the BIPV simulation
+bipv_simulation_state_attribute_list = ["parameter_dict", "bipv_results_dict", "roof_panel_fleet",
+                                        "facades_panel_fleet"]
+# BIPV technologies, transportations and inverters of the worker, by identifier
+worker_bipv_obj_dict = {"technology": {}, "transportation": {}, "inverter": {}}
+
+
+def init_bipv_simulation_worker(bipv_technology_obj_dict, bipv_transportation_obj_dict, bipv_inverter_obj_dict):
+    """
+    Initialize a worker with the BIPV objects of the simulation.
+    :param bipv_technology_obj_dict: dict, BipvTechnology objects by identifier
+    :param bipv_transportation_obj_dict: dict, BipvTransportation objects by identifier
+    :param bipv_inverter_obj_dict: dict, BipvInverter objects by identifier
+    """
+    worker_bipv_obj_dict["technology"] = bipv_technology_obj_dict
+    worker_bipv_obj_dict["transportation"] = bipv_transportation_obj_dict
+    worker_bipv_obj_dict["inverter"] = bipv_inverter_obj_dict
+
+
+def run_bipv_panel_simulation_of_building_in_worker(task_dict):
+    """
+    Run the BIPV simulation of a building in a worker and catch its errors, so that the other buildings are not
+    affected.
+    :param task_dict: dict, id of the building and attributes of its SolarRadAndBipvSimulation object modified by the
+        BIPV simulation, identifiers of the BIPV objects, parameters of the simulation and seed of the run
+    :return result_dict: dict, success, duration, error message and modified attributes of the
+        SolarRadAndBipvSimulation object of the building
+    """
+    duration = time()
+    error = None
+    bipv_simulation_state_dict = None
+    kwargs = task_dict["kwargs"]
+    try:
+        solar_rad_and_bipv_obj = SolarRadAndBipvSimulation.from_bipv_input_file(
+            building_id=task_dict["building_id"],
+            path_result_folder=os.path.join(task_dict["path_radiation_and_bipv_result_folder"],
+                                            str(task_dict["building_id"])))
+        for attribute, value in task_dict["bipv_simulation_state_dict"].items():
+            setattr(solar_rad_and_bipv_obj, attribute, value)
+        solar_rad_and_bipv_obj.run_bipv_panel_simulation(
+            path_simulation_folder=task_dict["path_simulation_folder"], building_id=task_dict["building_id"],
+            roof_pv_tech_obj=worker_bipv_obj_dict["technology"][task_dict["roof_id_pv_tech"]],
+            facades_pv_tech_obj=worker_bipv_obj_dict["technology"][task_dict["facades_id_pv_tech"]],
+            roof_inverter_tech_obj=worker_bipv_obj_dict["inverter"][task_dict["roof_inverter_id"]],
+            facades_inverter_tech_obj=worker_bipv_obj_dict["inverter"][task_dict["facades_inverter_id"]],
+            roof_inverter_sizing_ratio=task_dict["roof_inverter_sizing_ratio"],
+            facades_inverter_sizing_ratio=task_dict["facades_inverter_sizing_ratio"],
+            roof_transport_obj=worker_bipv_obj_dict["transportation"][task_dict["roof_transport_id"]],
+            facades_transport_obj=worker_bipv_obj_dict["transportation"][task_dict["facades_transport_id"]],
+            uc_end_year=task_dict["uc_end_year"], uc_start_year=task_dict["uc_start_year"],
+            uc_current_year=task_dict["uc_current_year"],
+            efficiency_computation_method=task_dict["efficiency_computation_method"],
+            minimum_panel_eroi=task_dict["minimum_panel_eroi"],
+            replacement_scenario=task_dict["replacement_scenario"],
+            continue_simulation=task_dict["continue_simulation"],
+            random_generator=get_task_random_generator(seed=task_dict["seed"], task_key=task_dict["building_id"]),
+            **kwargs)
+        # Write the results in a csv file
+        if "no_csv" not in kwargs or not kwargs["no_csv"]:
+            solar_rad_and_bipv_obj.write_building_bipv_results_to_csv(
+                path_radiation_and_bipv_result_folder=task_dict["path_radiation_and_bipv_result_folder"])
+        bipv_simulation_state_dict = {attribute: getattr(solar_rad_and_bipv_obj, attribute) for attribute in
+                                      bipv_simulation_state_attribute_list}
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+
+    return {"building_id": task_dict["building_id"], "success": error is None, "duration": time() - duration,
+            "error": error, "bipv_simulation_state_dict": bipv_simulation_state_dict}
+
+
+def run_bipv_panel_simulation_of_buildings_in_parallel(building_obj_list, path_simulation_folder,
+                                                       path_radiation_and_bipv_result_folder,
+                                                       bipv_technology_obj_dict, bipv_transportation_obj_dict,
+                                                       bipv_inverter_obj_dict, roof_id_pv_tech, facades_id_pv_tech,
+                                                       roof_transport_id, facades_transport_id, roof_inverter_id,
+                                                       facades_inverter_id, roof_inverter_sizing_ratio,
+                                                       facades_inverter_sizing_ratio, uc_start_year, uc_current_year,
+                                                       uc_end_year, efficiency_computation_method, minimum_panel_eroi,
+                                                       replacement_scenario, seed, continue_simulation=False,
+                                                       number_of_workers=None, **kwargs):
+    """
+    Run the BIPV simulations of the buildings in a pool of processes and set their results to the buildings.
+    :param building_obj_list: list of BuildingModeled objects
+    :param path_simulation_folder: str, path to the simulation folder
+    :param path_radiation_and_bipv_result_folder: str, path to the folder of the results
+    :param bipv_technology_obj_dict: dict, BipvTechnology objects by identifier
+    :param bipv_transportation_obj_dict: dict, BipvTransportation objects by identifier
+    :param bipv_inverter_obj_dict: dict, BipvInverter objects by identifier
+    :param roof_id_pv_tech: str, id of the roof technology
+    :param facades_id_pv_tech: str, id of the facades technology
+    :param roof_transport_id: str, id of the roof transportation
+    :param facades_transport_id: str, id of the facades transportation
+    :param roof_inverter_id: str, id of the roof inverter
+    :param facades_inverter_id: str, id of the facades inverter
+    :param roof_inverter_sizing_ratio: float, sizing ratio of the roof inverter
+    :param facades_inverter_sizing_ratio: float, sizing ratio of the facades inverter
+    :param uc_start_year: int, start year of the scenario
+    :param uc_current_year: int, start year of this simulation
+    :param uc_end_year: int, end year of the scenario
+    :param efficiency_computation_method: str, method used to compute the efficiency of the panels
+    :param minimum_panel_eroi: float, minimum energy return on investment of the panels
+    :param replacement_scenario: str, scenario of replacements for the panels
+    :param seed: int, seed of the run, the random generator of each building is derived from it and the building id
+    :param continue_simulation: bool, if True, continue the simulation
+    :param number_of_workers: int, number of processes, all the cores if None
+    :param kwargs: dict, additional arguments of the BIPV simulation
+    :return result_dict: dict, success, duration and error message of the simulation by building id
+    """
+    if not building_obj_list:
+        return {}
+    # The inputs of the buildings are written only if they changed since the last run
+    for building_obj in building_obj_list:
+        building_obj.solar_radiation_and_bipv_simulation_obj.write_bipv_input_file(
+            path_result_folder=os.path.join(path_radiation_and_bipv_result_folder, str(building_obj.id)))
+    task_dict_list = [{
+        "building_id": building_obj.id,
+        "bipv_simulation_state_dict": {
+            attribute: getattr(building_obj.solar_radiation_and_bipv_simulation_obj, attribute) for attribute in
+            bipv_simulation_state_attribute_list},
+        "path_simulation_folder": path_simulation_folder,
+        "path_radiation_and_bipv_result_folder": path_radiation_and_bipv_result_folder,
+        "roof_id_pv_tech": roof_id_pv_tech,
+        "facades_id_pv_tech": facades_id_pv_tech,
+        "roof_transport_id": roof_transport_id,
+        "facades_transport_id": facades_transport_id,
+        "roof_inverter_id": roof_inverter_id,
+        "facades_inverter_id": facades_inverter_id,
+        "roof_inverter_sizing_ratio": roof_inverter_sizing_ratio,
+        "facades_inverter_sizing_ratio": facades_inverter_sizing_ratio,
+        "uc_start_year": uc_start_year,
+        "uc_current_year": uc_current_year,
+        "uc_end_year": uc_end_year,
+        "efficiency_computation_method": efficiency_computation_method,
+        "minimum_panel_eroi": minimum_panel_eroi,
+        "replacement_scenario": replacement_scenario,
+        "continue_simulation": continue_simulation,
+        "seed": seed,
+        "kwargs": kwargs
+    } for building_obj in building_obj_list]
+    building_obj_dict = {building_obj.id: building_obj for building_obj in building_obj_list}
+    number_of_workers = get_number_of_workers(number_of_workers=number_of_workers,
+                                              number_of_tasks=len(task_dict_list))
+    dev_logger.info(f"Run the BIPV simulation of {len(task_dict_list)} buildings with {number_of_workers} processes")
+
+    result_dict = {}
+    with ProcessPoolExecutor(max_workers=number_of_workers, initializer=init_bipv_simulation_worker,
+                             initargs=(bipv_technology_obj_dict, bipv_transportation_obj_dict,
+                                       bipv_inverter_obj_dict)) as executor:
+        # map returns the results in the order of the tasks, the urban scale sum is thus deterministic
+        for building_result_dict in executor.map(run_bipv_panel_simulation_of_building_in_worker, task_dict_list):
+            bipv_simulation_state_dict = building_result_dict.pop("bipv_simulation_state_dict")
+            if building_result_dict["success"]:
+                solar_rad_and_bipv_obj = building_obj_dict[
+                    building_result_dict["building_id"]].solar_radiation_and_bipv_simulation_obj
+                for attribute, value in bipv_simulation_state_dict.items():
+                    setattr(solar_rad_and_bipv_obj, attribute, value)
+            result_dict[building_result_dict["building_id"]] = building_result_dict
+    report_failed_buildings(result_dict=result_dict, step_name="BIPV simulation")
+
+    return result_dict
@@ -6,35 +6,57 @@ import pickle
 import json
 import logging
 import shutil
+import numpy as np
 
 from datetime import datetime
 
 from honeybee.model import Model
+from ladybug_geometry.geometry3d import Vector3D
 
 from bua.urban_canopy.export_to_json import ExportUrbanCanopyToJson
 from bua.urban_canopy.bipv_scenario_urban_canopy import BipvScenario
 from bua.urban_canopy.uc_context_filter.shade_manager import ShadeManager
+from bua.urban_canopy.uc_context_filter.bounding_box_spatial_index import BoundingBoxSpatialIndex, \
+    get_axis_aligned_bounds_of_lb_polyface3d_list, get_distance_between_axis_aligned_bounds
+from bua.building.context_filter.utils_functions_mvfc import make_bounding_box_face_arrays
+from bua.urban_canopy.uc_context_filter.canopy_mesh_bvh import CanopyMeshBvh
+from bua.urban_canopy.uc_context_filter.second_pass_in_parallel import run_second_pass_context_filtering_in_parallel
+from bua.urban_canopy.uc_solar_radiation.annual_irradiance_in_parallel import \
+    run_annual_solar_irradiance_simulation_in_parallel
+from bua.urban_canopy.uc_solar_radiation.bipv_simulation_in_parallel import \
+    run_bipv_panel_simulation_of_buildings_in_parallel
+from bua.urban_canopy.uc_solar_radiation.bipv_scenario_sweep import run_bipv_scenario_sweep
 from bua.urban_canopy.ubes.uc_energy_simulation import UrbanBuildingEnergySimulation
+from bua.urban_canopy.ubes.main_run_idf_in_parallel import generate_idf_files_with_openstudio_in_parallel, \
+    run_idf_files_with_energyplus_in_parallel
 
 from bua.building.building_basic import BuildingBasic
 from bua.building.building_modeled import BuildingModeled
+from bua.building.utils_buildings.lbt_obj_methods.lb_face_addons import \
+    compute_oriented_bounding_rectangles_in_parallel, get_footprint_array_from_LB_Face3D
 from bua.building.context_filter.utils_functions_context_filter import \
     make_pyvista_polydata_from_list_of_hb_model_and_lb_polyface3d
 from bua.urban_canopy.utils_urban_canopy.extract_gis_files import extract_gis
+from bua.urban_canopy.utils_urban_canopy.decoded_hb_model_cache import DecodedHbModelCache
+from bua.urban_canopy.utils_urban_canopy.merged_faces_in_parallel import \
+    make_merged_faces_hb_model_of_buildings_in_parallel
+from bua.urban_canopy.utils_urban_canopy.urban_canopy_store import load_urban_canopy_from_store, \
+    save_urban_canopy_to_store, get_building_summary_dict, LazyBuildingDict
 from bua.typology.typology import Typology
 
-from bua.bipv.bipv_technology import BipvTechnology
-from bua.bipv.bipv_inverter import BipvInverter
-from bua.bipv.bipv_transportation import BipvTransportation
+from bua.bipv.bipv_catalog import bipv_catalog
 
 from bua.utils.utils_configuration import name_urban_canopy_export_file_pkl, name_urban_canopy_export_file_json, \
+    name_urban_canopy_store_folder, \
     name_radiation_simulation_folder, name_temporary_files_folder, name_ubes_temp_simulation_folder, \
     name_ubes_simulation_result_folder, name_ubes_epw_file, \
     path_folder_default_bipv_parameters, \
     path_folder_user_bipv_parameters
 from bua.utils.utils_constants import TOLERANCE_LBT
+from bua.utils.utils_parallel import get_run_seed, get_task_random_generator
 
-from bua.utils.utils_default_values_user_parameters import default_path_weather_file
+from bua.utils.utils_default_values_user_parameters import default_path_weather_file, default_grid_ghg_intensity, \
+    default_grid_energy_intensity, default_grid_electricity_sell_price
 
 dev_logger = logging.getLogger("dev")
 user_logger = logging.getLogger("user")
@@ -48,9 +70,16 @@ class UrbanCanopy:
         self.typology_dict = {}  # dictionary of the typologies loaded the urban canopy
         self.moving_vector_to_origin = None  # moving vector of the urban canopy that moved the urban canopy to the origin
         self.json_dict = {}  # dictionary containing relevant attributes of the urban canopy to be exported to json
+        self.hb_model_cache = DecodedHbModelCache()  # decoded HB models shared by all the simulation steps
 
         # Context filtering
         self.full_context_pyvista_mesh = None  # pyvista mesh of all the buildings within the urban canopy
+        self.bounding_box_spatial_index = None  # spatial index of the bounding boxes for the first pass
+        self.canopy_mesh_bvh = None  # bounding volume hierarchy of the buildings for the second pass, kept in the pkl
+        # Bounding boxes of the buildings added, removed or modified since the last context filtering
+        self.modified_building_bounding_box_dict = {}
+        # Inputs of the first pass of the target buildings, to find the ones affected by the modified buildings
+        self.context_filtering_fingerprint_dict = {}
         self.shade_manager = ShadeManager()  # Shade manager object
 
         # UBES
@@ -88,13 +117,42 @@ class UrbanCanopy:
         with open(os.path.join(path_simulation_folder, name_urban_canopy_export_file_pkl), 'wb') as pkl_file:
             pickle.dump(self, pkl_file)
 
+    @classmethod
+    def make_urban_canopy_from_store(cls, path_store_folder):
+        """
+        Load the urban canopy from a store folder, the buildings are loaded from the store the first time they are
+        accessed
+        """
+        urban_canopy_object = load_urban_canopy_from_store(path_store_folder)
+        # Load attributes from pickling
+        urban_canopy_object.load_attributes_from_pkl()
+        # Reinitialize the json dictionary
+        urban_canopy_object.reinitialize_json_dict()
+
+        return urban_canopy_object
+
+    def to_store(self, path_simulation_folder):
+        """
+        Save the urban canopy to a store folder, with one file per building, writing only the buildings that were
+        modified since the urban canopy was loaded
+        :return nb_buildings_written: int, number of buildings written
+        """
+        self.prepare_attributes_for_pkl()
+        nb_buildings_written = save_urban_canopy_to_store(
+            urban_canopy_obj=self,
+            path_store_folder=os.path.join(path_simulation_folder, name_urban_canopy_store_folder))
+        # The urban canopy can still be used after it was saved
+        self.load_attributes_from_pkl()
+
+        return nb_buildings_written
+
     def to_json(self, path_simulation_folder):
-        """ Save the urban canopy to a pickle json """
-        # Transform the data from the urban canopy in the json dictionary
-        ExportUrbanCanopyToJson.make_urban_canopy_json_dict(urban_canopy_obj=self)
-        # Write json file
-        with open(os.path.join(path_simulation_folder, name_urban_canopy_export_file_json), 'w') as json_file:
-            json.dump(self.json_dict, json_file)
+        """
+        Save the urban canopy to a json manifest, with one json file per building, BIPV scenario and for the UBES
+        """
+        ExportUrbanCanopyToJson.write_urban_canopy_json_shards(
+            urban_canopy_obj=self,
+            path_json_manifest_file=os.path.join(path_simulation_folder, name_urban_canopy_export_file_json))
 
     def reinitialize_json_dict(self):
         """
@@ -106,11 +164,18 @@ class UrbanCanopy:
     def prepare_attributes_for_pkl(self):
         """ Prepare the object for pickling """
         self.full_context_pyvista_mesh = None
+        self.bounding_box_spatial_index = None
         self.shade_manager.prepare_for_pkl()
+        self.hb_model_cache.clear()
 
     def load_attributes_from_pkl(self):
         """ Load the object from pickling """
         self.shade_manager.load_from_pkl()
+        # Urban canopies from older pickles do not have a cache
+        if not hasattr(self, "hb_model_cache"):
+            self.hb_model_cache = DecodedHbModelCache()
+        if not hasattr(self, "context_filtering_fingerprint_dict"):
+            self.context_filtering_fingerprint_dict = {}
 
     def load_typologies(self, typology_folder_path):
         """ Load the typologies from the folder
@@ -159,6 +224,8 @@ class UrbanCanopy:
         else:
             # add the building to the urban canopy
             self.building_dict[building_id] = building_obj
+            # The context filtering of the target buildings around it might be outdated
+            self.mark_building_as_modified(building_id=building_id)
             return True
 
     def add_list_of_buildings_to_dict(self, building_id_list, building_obj_list):
@@ -182,7 +249,201 @@ class UrbanCanopy:
         :param building_id: id of the building to remove
         :return:
         """
+        # The context filtering of the target buildings around it might be outdated
+        self.mark_building_as_modified(building_id=building_id)
         self.building_dict.pop(building_id)
+        self.context_filtering_fingerprint_dict.pop(building_id, None)
+
+    def get_building_id_list(self, building_id_list=None, only_building_modeled=False, only_target=False,
+                             include_to_simulate=False):
+        """
+        Get the ids of the buildings of the urban canopy, filtered by id, type and status. The buildings of a store
+        that were not loaded yet are filtered with the summary of the index, without loading them.
+        :param building_id_list: list of str, ids of the buildings to consider, all the buildings if None or empty
+        :param only_building_modeled: bool, if True, only the BuildingModeled are kept
+        :param only_target: bool, if True, only the target BuildingModeled are kept
+        :param include_to_simulate: bool, if True and only_target is True, the BuildingModeled to simulate are kept
+            as well
+        :return: list of str, ids of the buildings, in the order of the urban canopy
+        """
+        filtered_building_id_list = []
+        for building_id in self.building_dict:
+            if building_id_list and building_id not in building_id_list:
+                continue
+            if only_building_modeled or only_target:
+                building_summary_dict = get_building_summary_dict(building_dict=self.building_dict,
+                                                                  building_id=building_id)
+                if not building_summary_dict["is_building_modeled"]:
+                    continue
+                if only_target and not (building_summary_dict["is_target"] or (
+                        include_to_simulate and building_summary_dict["to_simulate"])):
+                    continue
+            filtered_building_id_list.append(building_id)
+
+        return filtered_building_id_list
+
+    def get_building_obj_list(self, building_id_list=None, only_building_modeled=False, only_target=False,
+                              include_to_simulate=False, to_modify=False):
+        """
+        Get the building objects of the urban canopy, filtered by id, type and status, only the selected buildings
+        are loaded from the store.
+        :param building_id_list: list of str, ids of the buildings to consider, all the buildings if None or empty
+        :param only_building_modeled: bool, if True, only the BuildingModeled are kept
+        :param only_target: bool, if True, only the target BuildingModeled are kept
+        :param include_to_simulate: bool, if True and only_target is True, the BuildingModeled to simulate are kept
+            as well
+        :param to_modify: bool, if True, the buildings are marked as dirty, to be written the next time the urban
+            canopy is saved to a store
+        :return: list of building objects
+        """
+        filtered_building_id_list = self.get_building_id_list(
+            building_id_list=building_id_list, only_building_modeled=only_building_modeled,
+            only_target=only_target, include_to_simulate=include_to_simulate)
+        if to_modify:
+            self.mark_buildings_as_dirty(filtered_building_id_list)
+
+        return [self.building_dict[building_id] for building_id in filtered_building_id_list]
+
+    def mark_buildings_as_dirty(self, building_id_list):
+        """
+        Mark buildings as dirty, to write them again the next time the urban canopy is saved to the store it was
+        loaded from. The methods of the urban canopy mark the buildings they modify, it should be called when a
+        building is modified by other means. It has no effect if the urban canopy was not loaded from a store.
+        :param building_id_list: list of str, ids of the buildings
+        """
+        if isinstance(self.building_dict, LazyBuildingDict):
+            for building_id in building_id_list:
+                self.building_dict.mark_as_dirty(building_id)
+
+    def are_all_buildings_moved_to_origin(self):
+        """
+        Check if all the buildings were moved to the origin, without loading the buildings of a store
+        :return: bool
+        """
+        return all(get_building_summary_dict(building_dict=self.building_dict, building_id=building_id)[
+                       "moved_to_origin"] for building_id in self.building_dict)
+
+    def mark_building_as_modified(self, building_id):
+        """
+        Mark a building as modified, so that the context filtering of the target buildings that could see it is
+        recomputed. It is done automatically when a building is added or removed, and should be called before
+        modifying the geometry of a building.
+        :param building_id: str, id of the building
+        """
+        self.mark_buildings_as_dirty([building_id])
+        # Keep the current bounding box, the building might be removed or its geometry changed. If it does not
+        # exist, the building was not considered in any context filtering yet.
+        bounding_box = self.building_dict[building_id].lb_polyface3d_oriented_bounding_box
+        self.modified_building_bounding_box_dict.setdefault(building_id, [])
+        if bounding_box is not None:
+            self.modified_building_bounding_box_dict[building_id].append(bounding_box)
+        # The spatial index, the BVH and the decoded HB model are not valid anymore
+        self.bounding_box_spatial_index = None
+        self.canopy_mesh_bvh = None
+        self.hb_model_cache.invalidate_building(building_id)
+
+    def record_context_filtering_fingerprint(self, building_id, uc_bounding_box_max_face_area,
+                                             uc_bounding_box_max_diagonal):
+        """
+        Record the inputs of the first pass of a target building that are needed to know if the building is affected
+        by modified buildings, so that the stale buildings are found without loading the target buildings.
+        :param building_id: str, id of the target building, which first pass was just performed
+        :param uc_bounding_box_max_face_area: float, largest face of the bounding boxes of the urban canopy
+        :param uc_bounding_box_max_diagonal: float, largest diagonal of the bounding boxes of the urban canopy
+        """
+        building_obj = self.building_dict[building_id]
+        min_array, max_array = get_axis_aligned_bounds_of_lb_polyface3d_list(
+            [building_obj.lb_polyface3d_oriented_bounding_box])
+        self.context_filtering_fingerprint_dict[building_id] = {
+            "min": min_array[0].tolist(),
+            "max": max_array[0].tolist(),
+            "max_face_area": max(hb_face.area for hb_face in building_obj.hb_model_obj.faces),
+            "min_vf_criterion": building_obj.shading_context_obj.min_vf_criterion,
+            "selected_context_building_id_list": list(
+                building_obj.shading_context_obj.selected_context_building_id_list),
+            "uc_bounding_box_max_face_area": uc_bounding_box_max_face_area,
+            "uc_bounding_box_max_diagonal": uc_bounding_box_max_diagonal
+        }
+
+    def update_bounding_boxes_of_modified_buildings(self):
+        """
+        Make again the bounding boxes of the buildings marked as modified that are still in the urban canopy, and add
+        them to their bounding boxes before the modification
+        """
+        for building_id, bounding_box_list in self.modified_building_bounding_box_dict.items():
+            if building_id in self.building_dict:
+                building_obj = self.building_dict[building_id]
+                building_obj.make_lb_polyface3d_oriented_bounding_box(overwrite=True)
+                self.mark_buildings_as_dirty([building_id])
+                bounding_box_list.append(building_obj.lb_polyface3d_oriented_bounding_box)
+
+    def get_stale_context_filtering_building_id_list(self):
+        """
+        Get the target buildings which context filtering might be outdated because of the buildings marked as
+        modified. A building is stale if it was modified itself, if it selected a modified building in its first
+        pass, or if the bounding box of a modified building, before or after the modification, is within the influence
+        distance of its bounding box.
+        The influence distance is the cutoff distance of the minimum view factor criterion of the building plus the
+        largest diagonal of the bounding boxes in the urban canopy, as the rays of the second pass end on the context
+        buildings, that can extend further than the cutoff distance.
+        Only the fingerprints recorded by the first pass and the bounding boxes of the modified buildings are used,
+        the bounding boxes after the modification are added by update_bounding_boxes_of_modified_buildings.
+        :return stale_building_id_list: list of str, id of the stale buildings
+        """
+        if not self.modified_building_bounding_box_dict or not self.context_filtering_fingerprint_dict:
+            return []
+        # Bounding boxes of the modified buildings, before and after the modification
+        modified_bounding_box_list = [bounding_box for bounding_box_list in
+                                      self.modified_building_bounding_box_dict.values() for bounding_box in
+                                      bounding_box_list]
+        modified_min_array, modified_max_array = get_axis_aligned_bounds_of_lb_polyface3d_list(
+            modified_bounding_box_list)
+        # The modified buildings might be larger than the buildings of the urban canopy during the first pass
+        _, modified_face_area_array, _ = make_bounding_box_face_arrays(
+            uc_building_bounding_box_list=modified_bounding_box_list)
+        modified_max_face_area = float(modified_face_area_array.max()) if len(modified_face_area_array) > 0 else 0.
+        modified_max_diagonal = float(np.max(np.linalg.norm(modified_max_array - modified_min_array, axis=1),
+                                             initial=0.))
+
+        stale_building_id_list = []
+        for building_id, fingerprint_dict in self.context_filtering_fingerprint_dict.items():
+            if building_id in self.modified_building_bounding_box_dict or any(
+                    context_building_id in self.modified_building_bounding_box_dict for context_building_id in
+                    fingerprint_dict["selected_context_building_id_list"]):
+                stale_building_id_list.append(building_id)
+                continue
+            if not modified_bounding_box_list:
+                continue
+            influence_distance = BoundingBoxSpatialIndex.mvfc_cutoff_distance(
+                target_face_area=fingerprint_dict["max_face_area"],
+                max_context_face_area=max(fingerprint_dict["uc_bounding_box_max_face_area"], modified_max_face_area),
+                min_vf_criterion=fingerprint_dict["min_vf_criterion"]) + max(
+                fingerprint_dict["uc_bounding_box_max_diagonal"], modified_max_diagonal)
+            if np.any(get_distance_between_axis_aligned_bounds(
+                    min_array_1=np.array([fingerprint_dict["min"]]), max_array_1=np.array([fingerprint_dict["max"]]),
+                    min_array_2=modified_min_array, max_array_2=modified_max_array) <= influence_distance):
+                stale_building_id_list.append(building_id)
+
+        return stale_building_id_list
+
+    def invalidate_stale_context_filtering(self):
+        """
+        Invalidate the context filtering of the stale buildings, so that both passes are recomputed for them only
+        the next time the context filtering is performed, and clear the buildings marked as modified.
+        :return stale_building_id_list: list of str, id of the buildings which context filtering was invalidated
+        """
+        self.update_bounding_boxes_of_modified_buildings()
+        stale_building_id_list = self.get_stale_context_filtering_building_id_list()
+        self.mark_buildings_as_dirty(stale_building_id_list)
+        for building_id in stale_building_id_list:
+            self.building_dict[building_id].shading_context_obj.overwrite_filtering(overwrite_first_pass=True)
+            self.context_filtering_fingerprint_dict.pop(building_id)
+        if stale_building_id_list:
+            dev_logger.info(f"The context filtering of the buildings {stale_building_id_list} was invalidated, as "
+                            f"buildings close to them were modified")
+        self.modified_building_bounding_box_dict = {}
+
+        return stale_building_id_list
 
     def add_buildings_from_2D_GIS_to_dict(self, path_gis, building_id_key_gis="idbinyan", unit="m",
                                           path_additional_gis_attribute_key_dict=None):
@@ -327,15 +588,28 @@ class UrbanCanopy:
         Make the Ladybug polyface3d extruded footprints of the buildings in the urban canopy.
         :param overwrite: bool, if True, the polyface3d extruded footprints will be made even if they already exist
         """
-        for building in self.building_dict.values():
-            building.make_lb_polyface3d_extruded_footprint(overwrite=overwrite)
+        for building_id, building in self.building_dict.items():
+            if overwrite or building.lb_polyface3d_extruded_footprint is None:
+                building.make_lb_polyface3d_extruded_footprint(overwrite=overwrite)
+                self.mark_buildings_as_dirty([building_id])
 
-    def make_oriented_bounding_boxes_of_buildings(self, overwrite=False):
+    def make_oriented_bounding_boxes_of_buildings(self, overwrite=False, run_in_parallel=False,
+                                                  number_of_workers=None):
         """
         Make the oriented bounding boxes of the buildings in the urban canopy.
         param overwrite: bool, if True, the oriented bounding boxes will be made even if they already exist
+        :param run_in_parallel: bool, if True, the oriented bounding rectangles of the footprints are computed in a
+            pool of processes before making the bounding boxes.
+        :param number_of_workers: int, number of processes used if run_in_parallel is True, all the cores if None.
         """
-        for building in self.building_dict.values():
+        building_obj_list = [building for building in self.building_dict.values() if
+                             overwrite or building.lb_polyface3d_oriented_bounding_box is None]
+        self.mark_buildings_as_dirty([building.id for building in building_obj_list])
+        if run_in_parallel and len(building_obj_list) > 1:
+            compute_oriented_bounding_rectangles_in_parallel(
+                footprint_array_list=[get_footprint_array_from_LB_Face3D(building.lb_face_footprint) for building in
+                                      building_obj_list], number_of_workers=number_of_workers)
+        for building in building_obj_list:
             building.make_lb_polyface3d_oriented_bounding_box(overwrite=overwrite)
 
     def transform_buildingbasic_into_building_model(self, building_id_list=None, use_typology=True,
@@ -407,38 +681,71 @@ class UrbanCanopy:
 
     def move_buildings_to_origin(self):
         """ Move the buildings to the origin if the urban canopy has not already been moved to the origin"""
-       # Check if the the urban canopy has already been moved to the origin
+        # Check if the the urban canopy has already been moved to the origin
         if self.moving_vector_to_origin is not None:
             # Check if a building has not been moved yet
-            flag = False
-            for building in self.building_dict.values():
-                if not building.moved_to_origin:
-                    flag = True
-                    break
-            if not flag:
+            if self.are_all_buildings_moved_to_origin():
                 return  # The urban canopy has already been moved to the origin, no need to move the buildings
             logging.info(
                 "The urban canopy has already been moved to the origin, the building will be moved back and"
                 " then moved again to the origin with the new buildings")
             # Move back the buildings to their original position
             self.move_back_buildings()
+        # The buildings will be moved, the spatial index and the BVH are not valid anymore
+        self.bounding_box_spatial_index = None
+        self.canopy_mesh_bvh = None
         # Compute the moving vector
         self.compute_moving_vector_to_origin()
         # Move the buildings
         for building in self.building_dict.values():
-            building.move(self.moving_vector_to_origin)
+            self.move_building(building_obj=building, vector=self.moving_vector_to_origin)
+        # Move the bounding boxes of the modified buildings with them
+        self.move_modified_building_bounding_boxes(self.moving_vector_to_origin)
 
     def move_back_buildings(self):
         """ Move back the buildings to their original position by the opposite vector """
+        # The buildings will be moved, the spatial index and the BVH are not valid anymore
+        self.bounding_box_spatial_index = None
+        self.canopy_mesh_bvh = None
         for building in self.building_dict.values():
             # Check if the building has been moved to the origin already
             if building.moved_to_origin:
                 # Move by the opposite vector
-                building.move([-coordinate for coordinate in self.moving_vector_to_origin])
+                self.move_building(building_obj=building,
+                                   vector=[-coordinate for coordinate in self.moving_vector_to_origin])
+        # Move back the bounding boxes of the modified buildings with them
+        self.move_modified_building_bounding_boxes([-coordinate for coordinate in self.moving_vector_to_origin])
+
+    def move_building(self, building_obj, vector):
+        """
+        Move a building, keeping the decoded HB model of the BuildingModeled in the cache
+        :param building_obj: BuildingBasic or BuildingModeled object
+        :param vector: [x,y,z]
+        """
+        if isinstance(building_obj, BuildingModeled):
+            building_obj.move(vector, hb_model_cache=self.hb_model_cache)
+        else:
+            building_obj.move(vector)
+        self.mark_buildings_as_dirty([building_obj.id])
+
+    def move_modified_building_bounding_boxes(self, vector):
+        """
+        Move the bounding boxes of the buildings marked as modified and of the fingerprints of the context filtering, to
+        keep them in the same coordinates as the buildings.
+        :param vector: [x,y,z]
+        """
+        for building_id, bounding_box_list in self.modified_building_bounding_box_dict.items():
+            self.modified_building_bounding_box_dict[building_id] = [
+                bounding_box.move(Vector3D(vector[0], vector[1], vector[2])) for bounding_box in bounding_box_list]
+        # The bounding boxes of the fingerprints of the context filtering are moved as well
+        for fingerprint_dict in self.context_filtering_fingerprint_dict.values():
+            fingerprint_dict["min"] = [coordinate + shift for coordinate, shift in zip(fingerprint_dict["min"], vector)]
+            fingerprint_dict["max"] = [coordinate + shift for coordinate, shift in zip(fingerprint_dict["max"], vector)]
 
     def make_merged_faces_hb_model_of_buildings(self, building_id_list=None,
                                                 orient_roof_mesh_to_according_to_building_orientation=True,
-                                                north_angle=0, overwrite=False):
+                                                north_angle=0, overwrite=False, run_in_parallel=False,
+                                                number_of_workers=None):
         """
         Make the merged faces hb model of the buildings in the urban canopy.
         :param building_id_list: list of the building id to make the merged faces hb model,
@@ -446,6 +753,8 @@ class UrbanCanopy:
         :param orient_roof_mesh_to_according_to_building_orientation: boolean, if True, the roof mesh will be oriented
             according to the building orientation.
         :param north_angle: float, angle of the north in degrees.
+        :param run_in_parallel: bool, if True, the faces of the buildings are merged in a pool of processes.
+        :param number_of_workers: int, number of processes used if run_in_parallel is True, all the cores if None.
         """
         # Checks of the building_id_list parameter to give feedback to the user if there is an issue with an id
         if not (building_id_list is None or building_id_list is []):
@@ -461,17 +770,25 @@ class UrbanCanopy:
                         f"possible to merge the faces. You can upgrade the building {building_id} and"
                         f" generate a Honeybee model out of it  with the component xxx.")
 
-        for building_obj in self.building_dict.values():
-            if ((building_id_list is None or building_id_list is []) or building_obj.id in building_id_list) \
-                    and isinstance(building_obj, BuildingModeled):
-                building_obj.make_merged_faces_hb_model(
-                    orient_roof_mesh_to_according_to_building_orientation=orient_roof_mesh_to_according_to_building_orientation,
-                    north_angle=north_angle, overwrite=overwrite)
+        building_obj_list = [building_obj for building_obj in
+                             self.get_building_obj_list(building_id_list=building_id_list, only_building_modeled=True)
+                             if building_obj.merged_faces_hb_model_dict is None or overwrite]
+        self.mark_buildings_as_dirty([building_obj.id for building_obj in building_obj_list])
+        if run_in_parallel:
+            make_merged_faces_hb_model_of_buildings_in_parallel(
+                building_obj_list=building_obj_list,
+                orient_roof_mesh_to_according_to_building_orientation=orient_roof_mesh_to_according_to_building_orientation,
+                north_angle=north_angle, number_of_workers=number_of_workers)
+            return
+        for building_obj in building_obj_list:
+            building_obj.make_merged_faces_hb_model(
+                orient_roof_mesh_to_according_to_building_orientation=orient_roof_mesh_to_according_to_building_orientation,
+                north_angle=north_angle, overwrite=overwrite)
 
     def perform_first_pass_context_filtering_on_buildings(self, building_id_list=None,
                                                           on_building_to_simulate=False,
                                                           min_vf_criterion=0.01,
-                                                          overwrite=False):
+                                                          overwrite=False, vectorized=True):
         """
         Perform the first pass context filtering on the BuildingModeled objects in the urban canopy that need
         to be simulated.
@@ -482,10 +799,16 @@ class UrbanCanopy:
             to simulate.
         :param min_vf_criterion: float, the minimum view factor criterion.
         :param overwrite: bool, if True, the existing context selection will be overwritten.
+        :param vectorized: bool, if True, the majorized view factors are computed with numpy arrays for all the
+            bounding boxes at once instead of one face pair at a time, and only the bounding boxes within the cutoff
+            distance of the criterion given by the spatial index are tested. The selected context buildings are
+            the same.
         :return: context_building_id_list: list of str, the list of building id that are in the context of the buildings
             to simulate
         :return: sim_duration_dict: dict, the dictionary of the simulation duration for each building
         """
+        # Recompute the context filtering of the buildings affected by the modified buildings only
+        self.invalidate_stale_context_filtering()
         # Make oriented bounding boxes of the buildings in the urban canopy if they don't exist already
         self.make_oriented_bounding_boxes_of_buildings(overwrite=overwrite)
         # if we specify the building no need to do it on all the simulated buildings
@@ -511,34 +834,77 @@ class UrbanCanopy:
         uc_building_id_list = list(self.building_dict.keys())
         uc_building_bounding_box_list = [building_obj.lb_polyface3d_oriented_bounding_box for
                                          building_obj in self.building_dict.values()]
+        # Build the spatial index of the bounding boxes once for all the target buildings
+        if vectorized:
+            self.make_bounding_box_spatial_index(overwrite=overwrite)
+            uc_bounding_box_spatial_index = self.bounding_box_spatial_index
+        else:
+            uc_bounding_box_spatial_index = None
+        # Largest face and diagonal of the bounding boxes, recorded with the first pass of the target buildings
+        _, uc_face_area_array, _ = make_bounding_box_face_arrays(
+            uc_building_bounding_box_list=uc_building_bounding_box_list)
+        uc_bounding_box_max_face_area = float(uc_face_area_array.max()) if len(uc_face_area_array) > 0 else 0.
+        uc_min_array, uc_max_array = get_axis_aligned_bounds_of_lb_polyface3d_list(uc_building_bounding_box_list)
+        uc_bounding_box_max_diagonal = float(np.max(np.linalg.norm(uc_max_array - uc_min_array, axis=1), initial=0.))
         # Dictionary of the simulation duration, to get the duration of the simulation for each building
         sim_duration_dict = {}
-        # Loop over the buildings
-        for i, (building_id, building_obj) in enumerate(self.building_dict.items()):
-            if (isinstance(building_obj, BuildingModeled)
-                    and (((
-                                  building_id_list is not None and building_id_list is not []) and building_id in building_id_list)
-                         or (on_building_to_simulate and building_obj.to_simulate)
-                         or ((
-                                     building_id_list is None or building_id_list is []) and building_obj.is_target))):
-                # Perform the first pass context filtering
-                current_building_selected_context_building_id_list, duration = building_obj. \
-                    perform_first_pass_context_filtering(
-                    uc_building_id_list=uc_building_id_list,
-                    uc_building_bounding_box_list=uc_building_bounding_box_list,
-                    min_vf_criterion=min_vf_criterion, overwrite=overwrite)
-                selected_context_building_id_list += current_building_selected_context_building_id_list
-                sim_duration_dict[building_id] = duration
+        # Loop over the target buildings
+        for building_id in self.get_target_building_id_list_for_context_filtering(
+                building_id_list=building_id_list, on_building_to_simulate=on_building_to_simulate):
+            building_obj = self.building_dict[building_id]
+            self.mark_buildings_as_dirty([building_id])
+            # Perform the first pass context filtering
+            current_building_selected_context_building_id_list, duration = building_obj. \
+                perform_first_pass_context_filtering(
+                uc_building_id_list=uc_building_id_list,
+                uc_building_bounding_box_list=uc_building_bounding_box_list,
+                min_vf_criterion=min_vf_criterion, overwrite=overwrite,
+                uc_bounding_box_spatial_index=uc_bounding_box_spatial_index)
+            selected_context_building_id_list += current_building_selected_context_building_id_list
+            sim_duration_dict[building_id] = duration
+            if overwrite or building_id not in self.context_filtering_fingerprint_dict:
+                self.record_context_filtering_fingerprint(
+                    building_id=building_id, uc_bounding_box_max_face_area=uc_bounding_box_max_face_area,
+                    uc_bounding_box_max_diagonal=uc_bounding_box_max_diagonal)
         # Remove duplicates
         selected_context_building_id_list = list(set(selected_context_building_id_list))
 
         return selected_context_building_id_list, sim_duration_dict
 
+    def get_target_building_id_list_for_context_filtering(self, building_id_list=None, on_building_to_simulate=False):
+        """
+        Get the BuildingModeled on which the context filtering is performed, the buildings of the list if it is given,
+        otherwise the target buildings, and the buildings to simulate if on_building_to_simulate is True.
+        :param building_id_list: list of str, ids of the buildings, all the target buildings if None or empty
+        :param on_building_to_simulate: bool, if True, the buildings to simulate are included
+        :return: list of str, ids of the buildings
+        """
+        if building_id_list:
+            return self.get_building_id_list(building_id_list=building_id_list, only_building_modeled=True)
+        return self.get_building_id_list(only_target=True, include_to_simulate=on_building_to_simulate)
+
+    def make_bounding_box_spatial_index(self, overwrite=False):
+        """
+        Make the spatial index of the oriented bounding boxes of the buildings, used to prune the candidate context
+        buildings in the first pass of the context filtering. It is rebuilt only if it does not exist, if the
+        buildings of the urban canopy changed or if overwrite is True.
+        :param overwrite: bool, if True, the spatial index will be rebuilt even if it is up to date
+        """
+        uc_building_id_list = list(self.building_dict.keys())
+        if overwrite or self.bounding_box_spatial_index is None or \
+                not self.bounding_box_spatial_index.is_up_to_date(uc_building_id_list=uc_building_id_list):
+            self.bounding_box_spatial_index = BoundingBoxSpatialIndex.from_building_bounding_boxes(
+                uc_building_id_list=uc_building_id_list,
+                uc_building_bounding_box_list=[building_obj.lb_polyface3d_oriented_bounding_box for
+                                               building_obj in self.building_dict.values()])
+
     def perform_second_pass_context_filtering_on_buildings(self, building_id_list=None, number_of_rays=3,
                                                            on_building_to_simulate=False,
                                                            consider_windows=False,
                                                            keep_shades_from_user=False, no_ray_tracing=False,
-                                                           overwrite=False, keep_discarded_faces=False):
+                                                           overwrite=False, keep_discarded_faces=False,
+                                                           use_bvh=True, run_in_parallel=False,
+                                                           number_of_workers=None):
         """
         Perform the second pass context filtering on BuildingModeled objects in the urban canopy.
         It uses ray-tracing to select the relevant context surfaces for shading computation.
@@ -553,14 +919,28 @@ class UrbanCanopy:
         :param no_ray_tracing: bool, if True, the second pass context filtering will be performed without ray-tracing.
         :param overwrite: bool, if True, the existing context selection will be overwritten.
         :param keep_discarded_faces: bool, if True, the discarded faces will be kept in the context filtering.
+        :param use_bvh: bool, if True, all the rays of a target building are cast at once on the bounding volume
+            hierarchy of the urban canopy instead of one by one with Pyvista. The selected context surfaces are the same.
+        :param run_in_parallel: bool, if True, the target buildings are processed in a pool of processes.
+        :param number_of_workers: int, number of processes used if run_in_parallel is True, all the cores if None.
         :return: result_summary_dict: dict, the dictionary of the number of context faces for each building
             and the duration of the simulation for each building
         """
         # Make extruded footprints of the buildings in the LB polyface3d format if they don't exist already
         self.make_lb_polyface3d_extruded_footprint_of_buildings()
-        # Generate the Pyvista mesh including all the buildings in the urban canopy
-        if overwrite or self.full_context_pyvista_mesh is None:
-            self.make_pyvista_polydata_mesh_of_all_buildings()  # todo @Elie: to be implemented and remove capital letters
+        # The buildings affected by the modified buildings need their first pass to be performed again
+        stale_building_id_list = self.invalidate_stale_context_filtering()
+        if stale_building_id_list:
+            user_logger.warning(f"The buildings {stale_building_id_list} are close to modified buildings, the first "
+                                f"pass of the context filtering needs to be performed again for them")
+        # Generate the BVH or the Pyvista mesh including all the buildings in the urban canopy, only used for ray tracing
+        if not no_ray_tracing:
+            if use_bvh:
+                # The BVH is saved with the urban canopy, it is rebuilt only if the buildings changed
+                self.make_canopy_mesh_bvh()
+            elif overwrite or self.full_context_pyvista_mesh is None:
+                self.make_pyvista_polydata_mesh_of_all_buildings()  # todo @Elie: to be implemented and remove capital letters
+        canopy_mesh_bvh = self.canopy_mesh_bvh if use_bvh and not no_ray_tracing else None
         # If we specify the building no need to do it on all the simulated buildings
         if building_id_list is not None and building_id_list != []:
             on_building_to_simulate = False
@@ -581,24 +961,53 @@ class UrbanCanopy:
         # Dictionary of the simulation duration, to get the duration of the simulation for each building
         result_summary_dict = {}
         flag_use_envelop = False  # To return a message if at least one context building does not have a HB model
-        # Loop over the buildings
-        for i, (building_id, building_obj) in enumerate(self.building_dict.items()):
-            if (isinstance(building_obj, BuildingModeled)
-                    and (((
-                                  building_id_list is not None and building_id_list is not []) and building_id in building_id_list)
-                         or (on_building_to_simulate and building_obj.to_simulate)
-                         or ((
-                                     building_id_list is None or building_id_list is []) and building_obj.is_target))):
+        # Select the target buildings
+        target_building_id_list = self.get_target_building_id_list_for_context_filtering(
+            building_id_list=building_id_list, on_building_to_simulate=on_building_to_simulate)
+        self.mark_buildings_as_dirty(target_building_id_list)
+        if run_in_parallel:
+            # Prepare the buildings in the main process, only the selection of the surfaces is run in parallel
+            building_id_to_run_list = []
+            for building_id in target_building_id_list:
+                is_second_pass_to_run, flag_use_envelop = self.building_dict[
+                    building_id].prepare_second_pass_context_filtering(
+                    uc_building_dictionary=self.building_dict, number_of_rays=number_of_rays,
+                    consider_windows=consider_windows, no_ray_tracing=no_ray_tracing, overwrite=overwrite,
+                    flag_use_envelop=flag_use_envelop)
+                if is_second_pass_to_run:
+                    building_id_to_run_list.append(building_id)
+            run_second_pass_context_filtering_in_parallel(
+                uc_shade_manager=self.shade_manager, uc_building_dictionary=self.building_dict,
+                target_building_id_list=building_id_to_run_list,
+                full_urban_canopy_pyvista_mesh=self.full_context_pyvista_mesh, canopy_mesh_bvh=canopy_mesh_bvh,
+                number_of_rays=number_of_rays, consider_windows=consider_windows,
+                keep_shades_from_user=keep_shades_from_user, no_ray_tracing=no_ray_tracing,
+                keep_discarded_faces=keep_discarded_faces, number_of_workers=number_of_workers)
+            for building_id in target_building_id_list:
+                shading_context_obj = self.building_dict[building_id].shading_context_obj
+                if shading_context_obj.second_pass_done:
+                    result_summary_dict[building_id] = {
+                        "nb_context_faces": len(shading_context_obj.context_shading_hb_shade_list),
+                        "duration": shading_context_obj.second_pass_duration}
+        else:
+            # Loop over the buildings
+            for building_id in target_building_id_list:
+                building_obj = self.building_dict[building_id]
                 # Perform the Second pass context filtering
-                nb_context_faces, duration, flag_use_envelop = building_obj.perform_second_pass_context_filtering(
+                second_pass_result = building_obj.perform_second_pass_context_filtering(
                     uc_shade_manager=self.shade_manager, uc_building_dictionary=self.building_dict,
                     full_urban_canopy_pyvista_mesh=self.full_context_pyvista_mesh,
                     number_of_rays=number_of_rays,
                     consider_windows=consider_windows, keep_shades_from_user=keep_shades_from_user,
                     no_ray_tracing=no_ray_tracing, overwrite=overwrite, flag_use_envelop=flag_use_envelop,
-                    keep_discarded_faces=keep_discarded_faces)
+                    keep_discarded_faces=keep_discarded_faces, canopy_mesh_bvh=canopy_mesh_bvh,
+                    hb_model_cache=self.hb_model_cache)
+                if second_pass_result is None:  # the first pass was not done
+                    continue
+                nb_context_faces, duration, flag_use_envelop = second_pass_result
                 result_summary_dict[building_id] = {"nb_context_faces": nb_context_faces,
                                                     "duration": duration}
+        dev_logger.info(f"Decoded HB model cache after the second pass: {self.hb_model_cache.get_statistics_dict()}")
 
         return result_summary_dict
 
@@ -607,23 +1016,66 @@ class UrbanCanopy:
         Make the Pyvista mesh of all the buildings in the urban canopy to be used for the second pass context filtering.
         That way, the mesh is generated once only and can be reused for all the buildings.
         """
-        # Initialize the list of HB model and LB polyface3d to be used to make the full context mesh
+        _, hb_model_and_lb_polyface3d_list = self.get_hb_model_and_lb_polyface3d_of_all_buildings(
+            make_geometry=True)
+        # Make the full context mesh
+        self.full_context_pyvista_mesh = make_pyvista_polydata_from_list_of_hb_model_and_lb_polyface3d(
+            hb_model_and_lb_polyface3d_list=hb_model_and_lb_polyface3d_list)
+
+    def make_canopy_mesh_bvh(self, overwrite=False):
+        """
+        Make the bounding volume hierarchy of the envelopes of all the buildings in the urban canopy, used to cast the
+        rays of the second pass context filtering. It is saved with the urban canopy and rebuilt only if it does not
+        exist, if the buildings or the geometry used for them changed, or if overwrite is True.
+        :param overwrite: bool, if True, the BVH will be rebuilt even if it is up to date
+        """
+        building_source_key_dict, _ = self.get_hb_model_and_lb_polyface3d_of_all_buildings(make_geometry=False)
+        building_id_list = list(building_source_key_dict.keys())
+        building_source_key_list = list(building_source_key_dict.values())
+        if overwrite or self.canopy_mesh_bvh is None or not self.canopy_mesh_bvh.is_up_to_date(
+                building_id_list=building_id_list, building_source_key_list=building_source_key_list):
+            _, hb_model_and_lb_polyface3d_list = self.get_hb_model_and_lb_polyface3d_of_all_buildings(
+                make_geometry=True)
+            self.canopy_mesh_bvh = CanopyMeshBvh.from_hb_model_and_lb_polyface3d_list(
+                building_id_list=building_id_list,
+                hb_model_and_lb_polyface3d_list=hb_model_and_lb_polyface3d_list,
+                building_source_key_list=building_source_key_list)
+            dev_logger.info(f"The BVH of the urban canopy was built with {self.canopy_mesh_bvh.number_of_triangles} "
+                            f"triangles")
+
+    def get_hb_model_and_lb_polyface3d_of_all_buildings(self, make_geometry=True):
+        """
+        Get the geometry of the buildings to be used to make the full context mesh, preferably the merged faces HB
+        model for BuildingModeled, and the extruded footprint for BuildingBasic.
+        :param make_geometry: bool, if False, only the keys of the geometry used for each building are returned
+        :return: building_source_key_dict: dict, key of the geometry used for each building, by building id
+        :return: hb_model_and_lb_polyface3d_list: list of HB model and LB polyface3d of the buildings, empty if
+            make_geometry is False
+        """
+        building_source_key_dict = {}
         hb_model_and_lb_polyface3d_list = []
 
         for building in self.building_dict.values():
             if isinstance(building, BuildingBasic):
-                # Use the LB Polyface3D extruded footprint for BuildingBasic,
-                building.make_lb_polyface3d_extruded_footprint()  # Create it if it doen't exist
-                hb_model_and_lb_polyface3d_list.append(building.lb_polyface3d_extruded_footprint)
+                building_source_key_dict[building.id] = "lb_polyface3d_extruded_footprint"
+                if make_geometry:
+                    # Use the LB Polyface3D extruded footprint for BuildingBasic,
+                    if building.lb_polyface3d_extruded_footprint is None:
+                        self.mark_buildings_as_dirty([building.id])
+                    building.make_lb_polyface3d_extruded_footprint()  # Create it if it doen't exist
+                    hb_model_and_lb_polyface3d_list.append(building.lb_polyface3d_extruded_footprint)
             elif isinstance(building, BuildingModeled):
                 # Use preferably the merged faces HB model of the building
                 if building.merged_faces_hb_model_dict is not None:
-                    hb_model_and_lb_polyface3d_list.append(
-                        Model.from_dict(building.merged_faces_hb_model_dict))
+                    building_source_key_dict[building.id] = "merged_faces_hb_model"
+                    if make_geometry:
+                        hb_model_and_lb_polyface3d_list.append(
+                            building.get_merged_faces_hb_model_obj(hb_model_cache=self.hb_model_cache))
                 # Check if the building has a HB model
                 elif building.hb_model_obj is not None:
-                    # Make the HB model mesh
-                    hb_model_and_lb_polyface3d_list.append(building.hb_model_obj.to_pyvista_mesh())
+                    building_source_key_dict[building.id] = "hb_model"
+                    if make_geometry:
+                        hb_model_and_lb_polyface3d_list.append(building.hb_model_obj)
                 else:
                     dev_logger.info(
                         f"The building {building.id} does not have a Honeybee model, it will not be included in the "
@@ -633,9 +1085,7 @@ class UrbanCanopy:
                     f"The building {building.id} is not a BuildingBasic or a BuildingModeled type, it will not be "
                     f"included in the full context mesh")
 
-        # Make the full context mesh
-        self.full_context_pyvista_mesh = make_pyvista_polydata_from_list_of_hb_model_and_lb_polyface3d(
-            hb_model_and_lb_polyface3d_list=hb_model_and_lb_polyface3d_list)
+        return building_source_key_dict, hb_model_and_lb_polyface3d_list
 
     def load_epw_and_hb_simulation_parameters_for_ubes(self, path_simulation_folder,
                                                        path_hbjson_simulation_parameter_file,
@@ -664,13 +1114,13 @@ class UrbanCanopy:
             if os.path.exists(path_ubes_temp_folder):
                 shutil.rmtree(path_ubes_temp_folder)
             # Re-initialize the BES of the buildings
-            for building_obj in self.building_dict.values():
-                if isinstance(building_obj, BuildingModeled) and (
-                        building_obj.is_target or building_obj.to_simulate):
-                    building_obj.re_initialize_bes()
+            for building_obj in self.get_building_obj_list(only_target=True, include_to_simulate=True,
+                                                           to_modify=True):
+                building_obj.re_initialize_bes()
 
     def generate_idf_files_for_ubes_with_openstudio(self, path_simulation_folder, building_id_list=None,
-                                                    overwrite=False, silent=False, run_in_parallel=False):
+                                                    overwrite=False, silent=False, run_in_parallel=False,
+                                                    number_of_workers=None, timeout=None):
         """
         Generate the idf files for the buildings in the urban canopy.
         :param path_simulation_folder: string, path to the folder where the simulation will be performed.
@@ -678,7 +1128,10 @@ class UrbanCanopy:
             if None or empty list, all the target buildings will be initialized.
         :param overwrite: bool, if True, the existing idf files will be overwritten.
         :param silent: bool, if True, the OpenStudio messages will not be printed.
-        :param run_in_parallel: bool, if True, the idf files will be generated in parallel, not operational yet.
+        :param run_in_parallel: bool, if True, the idf files will be generated in parallel.
+        :param number_of_workers: int, number of OpenStudio processes if run_in_parallel is True, all the cores if
+            None.
+        :param timeout: float, timeout per building in seconds if run_in_parallel is True, no timeout if None.
         """
         # Checks of the building_id_list parameter to give feedback to the user if there is an issue with an id
         if not (building_id_list is None or building_id_list is []):
@@ -707,10 +1160,15 @@ class UrbanCanopy:
         path_epw_file, path_hbjson_simulation_parameters = self.ubes_obj.write_epw_and_hb_simulation_parameters(
             path_ubes_temp_sim_folder=path_ubes_temp_sim_folder)
         # Generate the idf files for the buildings
-        for building_obj in self.building_dict.values():
-            if ((building_id_list is None or building_id_list is []) or building_obj.id in building_id_list) \
-                    and isinstance(building_obj, BuildingModeled) and (
-                    building_obj.is_target or building_obj.to_simulate) :
+        building_to_simulate_obj_list = self.get_building_obj_list(
+            building_id_list=building_id_list, only_target=True, include_to_simulate=True, to_modify=True)
+        if run_in_parallel:
+            generate_idf_files_with_openstudio_in_parallel(
+                building_obj_list=building_to_simulate_obj_list, path_ubes_temp_sim_folder=path_ubes_temp_sim_folder,
+                path_epw_file=path_epw_file, path_hbjson_simulation_parameters=path_hbjson_simulation_parameters,
+                overwrite=overwrite, silent=silent, number_of_workers=number_of_workers, timeout=timeout)
+        else:
+            for building_obj in building_to_simulate_obj_list:
                 # Generate the hbjson then idf file for the building simulation
                 building_obj.generate_idf_for_bes_with_openstudio(
                     path_ubes_temp_sim_folder=path_ubes_temp_sim_folder,
@@ -718,7 +1176,8 @@ class UrbanCanopy:
                     path_epw_file=path_epw_file, overwrite=overwrite, silent=silent)
 
     def run_idf_files_for_ubes_with_energyplus(self, path_simulation_folder, building_id_list=None,
-                                               overwrite=False, silent=False, run_in_parallel=False):
+                                               overwrite=False, silent=False, run_in_parallel=False,
+                                               number_of_workers=None, timeout=None):
         """
         Run the idf files for the buildings in the urban canopy.
         :param path_simulation_folder: string, path to the folder where the simulation will be performed.
@@ -726,6 +1185,10 @@ class UrbanCanopy:
             if None or empty list, all the target buildings will be initialized.
         :param overwrite: bool, if True, the existing idf files will be overwritten.
         :param silent: bool, if True, the OpenStudio messages will not be printed.
+        :param run_in_parallel: bool, if True, the idf files will be run in parallel.
+        :param number_of_workers: int, number of EnergyPlus processes if run_in_parallel is True, all the cores if
+            None.
+        :param timeout: float, timeout per building in seconds if run_in_parallel is True, no timeout if None.
         """
         # Checks of the building_id_list parameter to give feedback to the user if there is an issue with an id
         if not (building_id_list is None or building_id_list is []):
@@ -749,10 +1212,15 @@ class UrbanCanopy:
         # Initialize the duration directory
         duration_dict = {}
         # run the idf files for the buildings
-        for building_obj in self.building_dict.values():
-            if ((building_id_list is None or building_id_list is []) or building_obj.id in building_id_list) \
-                    and isinstance(building_obj, BuildingModeled) and (
-                    building_obj.is_target or building_obj.to_simulate):
+        building_to_simulate_obj_list = self.get_building_obj_list(
+            building_id_list=building_id_list, only_target=True, include_to_simulate=True, to_modify=True)
+        if run_in_parallel:
+            duration_dict = run_idf_files_with_energyplus_in_parallel(
+                building_obj_list=building_to_simulate_obj_list, path_ubes_temp_sim_folder=path_ubes_temp_sim_folder,
+                path_epw_file=path_epw_file, overwrite=overwrite, silent=silent,
+                number_of_workers=number_of_workers, timeout=timeout)
+        else:
+            for building_obj in building_to_simulate_obj_list:
                 # Run the idf file for the building simulation
                 duration = building_obj.run_idf_with_energyplus_for_bes(
                     path_ubes_temp_sim_folder=path_ubes_temp_sim_folder,
@@ -768,12 +1236,11 @@ class UrbanCanopy:
         else:
             os.mkdir(path_ubes_sim_result_folder)
         # Move the sql and err (=log) file to the UBES result folder
-        for building_obj in self.building_dict.values():
-            if isinstance(building_obj, BuildingModeled):  # no need for more checking
-                building_obj.move_bes_result_files_from_temp_to_result_folder(
-                    path_ubes_temp_sim_folder=path_ubes_temp_sim_folder,
-                    path_ubes_sim_result_folder=path_ubes_sim_result_folder
-                )
+        for building_obj in self.get_building_obj_list(only_target=True, include_to_simulate=True, to_modify=True):
+            building_obj.move_bes_result_files_from_temp_to_result_folder(
+                path_ubes_temp_sim_folder=path_ubes_temp_sim_folder,
+                path_ubes_sim_result_folder=path_ubes_sim_result_folder
+            )
 
         if duration_dict.values() != []:
             self.ubes_obj.has_run = True
@@ -792,16 +1259,15 @@ class UrbanCanopy:
             return
         path_ubes_sim_result_folder = os.path.join(path_simulation_folder, name_ubes_simulation_result_folder)
         bes_result_dict_list = []
-        # Extract the UBES results for the buildings
-        for building_obj in self.building_dict.values():
-            if isinstance(building_obj,
-                          BuildingModeled):  # no need for more checking, the building themselves
-                # will check if they have been simulated
-                bes_result_dict = building_obj.extract_bes_results(
-                    path_ubes_sim_result_folder=path_ubes_sim_result_folder, cop_heating=cop_heating,
-                    cop_cooling=cop_cooling)
-                if bes_result_dict is not None:
-                    bes_result_dict_list.append(bes_result_dict)
+        # Extract the UBES results for the buildings, the buildings themselves check if they have been simulated
+        simulated_building_obj_list = self.get_building_obj_list(only_target=True, include_to_simulate=True,
+                                                                 to_modify=True)
+        for building_obj in simulated_building_obj_list:
+            bes_result_dict = building_obj.extract_bes_results(
+                path_ubes_sim_result_folder=path_ubes_sim_result_folder, cop_heating=cop_heating,
+                cop_cooling=cop_cooling)
+            if bes_result_dict is not None:
+                bes_result_dict_list.append(bes_result_dict)
         # Compute the results at the urban canopy level
         self.ubes_obj.compute_ubes_results(
             bes_result_dict_list=bes_result_dict_list)  # todo @Elie: to be implemented
@@ -809,10 +1275,9 @@ class UrbanCanopy:
         """ The export is made at the end to make sure none of the buildings have failed to extract the results before 
         exporting the results at the urban canopy level."""
         self.ubes_obj.to_csv(path_ubes_sim_result_folder=path_ubes_sim_result_folder)
-        for building_obj in self.building_dict.values():
-            if isinstance(building_obj, BuildingModeled):
-                building_obj.export_bes_results_to_csv(
-                    path_ubes_sim_result_folder=path_ubes_sim_result_folder)
+        for building_obj in simulated_building_obj_list:
+            building_obj.export_bes_results_to_csv(
+                path_ubes_sim_result_folder=path_ubes_sim_result_folder)
 
     def generate_sensor_grid_on_buildings(self, building_id_list=None, bipv_on_roof=True,
                                           bipv_on_facades=True, roof_grid_size_x=1,
@@ -847,22 +1312,23 @@ class UrbanCanopy:
                         f"cannot be performed if the building is not a target. You can update "
                         f"the properties of the building {building_id} to make it a target building.")
         # Generate the sensor grid for the buildings
-        for building_obj in self.building_dict.values():
-            if ((building_id_list is None or building_id_list is []) or building_obj.id in building_id_list) \
-                    and isinstance(building_obj, BuildingModeled) and building_obj.is_target:
-                building_obj.generate_sensor_grid(bipv_on_roof=bipv_on_roof,
-                                                  bipv_on_facades=bipv_on_facades,
-                                                  roof_grid_size_x=roof_grid_size_x,
-                                                  facades_grid_size_x=facades_grid_size_x,
-                                                  roof_grid_size_y=roof_grid_size_y,
-                                                  facades_grid_size_y=facades_grid_size_y,
-                                                  offset_dist=offset_dist,
-                                                  overwrite=overwrite)
+        for building_obj in self.get_building_obj_list(building_id_list=building_id_list, only_target=True,
+                                                       to_modify=True):
+            building_obj.generate_sensor_grid(bipv_on_roof=bipv_on_roof,
+                                              bipv_on_facades=bipv_on_facades,
+                                              roof_grid_size_x=roof_grid_size_x,
+                                              facades_grid_size_x=facades_grid_size_x,
+                                              roof_grid_size_y=roof_grid_size_y,
+                                              facades_grid_size_y=facades_grid_size_y,
+                                              offset_dist=offset_dist,
+                                              overwrite=overwrite,
+                                              hb_model_cache=self.hb_model_cache)
 
     def run_annual_solar_irradiance_simulation_on_buildings(self, path_simulation_folder,
                                                             building_id_list=None,
                                                             path_weather_file=default_path_weather_file,
-                                                            overwrite=False, north_angle=0, silent=False):
+                                                            overwrite=False, north_angle=0, silent=False,
+                                                            run_in_parallel=False, number_of_workers=None):
         """
         Run the solar radiation simulation for the buildings in the urban canopy.
         :param building_id_list: list of the building id to run the simulation, if None or empty list, all the target
@@ -872,6 +1338,8 @@ class UrbanCanopy:
             existing ones.
         :param north_angle: float, angle of the north in degrees.
         :param silent: boolean, if True, the console outputs will be disabled.
+        :param run_in_parallel: bool, if True, several buildings will be simulated at the same time.
+        :param number_of_workers: int, total number of processes used by the simulations, all the cores if None.
         """
 
         # Todo @Elie : can add a progress bar
@@ -891,14 +1359,20 @@ class UrbanCanopy:
                         f"cannot be performed if the building is not a target. You can update "
                         f"the properties of the building {building_id} to make it a target building.")
         # Run the simulation for the buildings
-        for building_obj in self.building_dict.values():
-            if ((building_id_list is None or building_id_list is []) or building_obj.id in building_id_list) \
-                    and isinstance(building_obj, BuildingModeled) and building_obj.is_target:
+        building_to_simulate_obj_list = self.get_building_obj_list(building_id_list=building_id_list,
+                                                                   only_target=True, to_modify=True)
+        if run_in_parallel:
+            run_annual_solar_irradiance_simulation_in_parallel(
+                building_obj_list=building_to_simulate_obj_list, path_simulation_folder=path_simulation_folder,
+                path_weather_file=path_weather_file, overwrite=overwrite, north_angle=north_angle, silent=silent,
+                number_of_workers=number_of_workers)
+        else:
+            for building_obj in building_to_simulate_obj_list:
                 building_obj.run_annual_solar_irradiance_simulation(
                     path_simulation_folder=path_simulation_folder,
                     path_weather_file=path_weather_file,
                     overwrite=overwrite,
-                    north_angle=north_angle, silent=silent)
+                    north_angle=north_angle, silent=silent, workers=number_of_workers)
 
     def run_bipv_panel_simulation_on_buildings(self, path_simulation_folder, bipv_scenario_identifier,
                                                building_id_list, roof_id_pv_tech, facades_id_pv_tech,
@@ -910,7 +1384,8 @@ class UrbanCanopy:
                                                minimum_panel_eroi=1.2, start_year=datetime.now().year,
                                                end_year=datetime.now().year + 50,
                                                replacement_scenario="replace_failed_panels_every_X_years",
-                                               continue_simulation=False, **kwargs):
+                                               continue_simulation=False, run_in_parallel=False,
+                                               number_of_workers=None, seed=None, **kwargs):
         """
         Run the panels simulation on the urban canopy
         :param path_simulation_folder: path to the simulation folder
@@ -931,6 +1406,11 @@ class UrbanCanopy:
         :param end_year: int: end year of the simulation, default = datetime.now().year + 50
         :param replacement_scenario: string: scenario of replacements for the panels, default = 'yearly'
         :param continue_simulation: bool: if True, continue the simulation, default = False
+        :param run_in_parallel: bool: if True, the buildings are simulated in a pool of processes, default = False
+        :param number_of_workers: int: number of processes if run_in_parallel is True, all the cores if None
+        :param seed: int: seed of the life expectancies of the panels, the random generator of each building is
+            derived from it and the building id, the results are the same in sequence and in parallel. A new seed is
+            drawn and logged if None
         :param kwargs: dict: additional arguments to be passed to the run_bipv_panel_simulation method of the
             BuildingModeled object
 
@@ -979,22 +1459,13 @@ class UrbanCanopy:
                                         f"{building_id}, the BIPV simulation will not be run for this building.")
 
         # Read the files in the defauly and library and extract the BIPV technologies, transportation and inverter objects
-        bipv_technology_obj_dict = {}
-        bipv_transportation_obj_dict = {}
-        bipv_inverter_obj_dict = {}
-        for path_folder in [path_folder_default_bipv_parameters, path_folder_user_bipv_parameters]:
-            bipv_technology_obj_dict = BipvTechnology.load_pv_technologies_from_json_to_dictionary(
-                bipv_technology_obj_dict=bipv_technology_obj_dict, path_json_folder=path_folder)
-            bipv_transportation_obj_dict = BipvTransportation.load_bipv_transportation_obj_from_json_to_dictionary(
-                transportation_obj_dict=bipv_transportation_obj_dict, path_json_folder=path_folder)
-            bipv_inverter_obj_dict = BipvInverter.load_bipv_inverter_obj_from_json_to_dictionary(
-                inverter_obj_dict=bipv_inverter_obj_dict, path_json_folder=path_folder)
+        bipv_technology_obj_dict, bipv_transportation_obj_dict, bipv_inverter_obj_dict = \
+            self.load_bipv_obj_dicts_from_libraries()
 
         # Reinitialize the simulation for the all the buildings if the simulation is not continued
         if not continue_simulation:
-            for building_obj in self.building_dict.values():
-                if isinstance(building_obj, BuildingModeled) and building_obj.is_target:
-                    building_obj.solar_radiation_and_bipv_simulation_obj.init_bipv_simulation()
+            for building_obj in self.get_building_obj_list(only_target=True, to_modify=True):
+                building_obj.solar_radiation_and_bipv_simulation_obj.init_bipv_simulation()
 
         #
         roof_pv_tech_obj = bipv_technology_obj_dict[roof_id_pv_tech]
@@ -1009,11 +1480,35 @@ class UrbanCanopy:
                                                              name_radiation_simulation_folder)
 
         # Run the simulation for the buildings
-        solar_rad_and_bipv_obj_list = []
-        for building_obj in self.building_dict.values():
-            if self.does_building_fits_bipv_requirement(building_obj=building_obj,
-                                                        building_id_list=building_id_list,
-                                                        continue_simulation=continue_simulation):
+        building_to_simulate_obj_list = [
+            building_obj for building_obj in self.get_building_obj_list(only_target=True) if
+            self.does_building_fits_bipv_requirement(building_obj=building_obj, building_id_list=building_id_list,
+                                                     continue_simulation=continue_simulation)]
+        self.mark_buildings_as_dirty([building_obj.id for building_obj in building_to_simulate_obj_list])
+        seed = get_run_seed(seed=seed)
+        if run_in_parallel:
+            result_dict = run_bipv_panel_simulation_of_buildings_in_parallel(
+                building_obj_list=building_to_simulate_obj_list, path_simulation_folder=path_simulation_folder,
+                path_radiation_and_bipv_result_folder=path_radiation_and_bipv_result_folder,
+                bipv_technology_obj_dict=bipv_technology_obj_dict,
+                bipv_transportation_obj_dict=bipv_transportation_obj_dict,
+                bipv_inverter_obj_dict=bipv_inverter_obj_dict, roof_id_pv_tech=roof_id_pv_tech,
+                facades_id_pv_tech=facades_id_pv_tech, roof_transport_id=roof_transport_id,
+                facades_transport_id=facades_transport_id, roof_inverter_id=roof_inverter_id,
+                facades_inverter_id=facades_inverter_id, roof_inverter_sizing_ratio=roof_inverter_sizing_ratio,
+                facades_inverter_sizing_ratio=facades_inverter_sizing_ratio,
+                uc_start_year=bipv_scenario_obj.start_year, uc_current_year=start_year,
+                uc_end_year=bipv_scenario_obj.end_year, efficiency_computation_method=efficiency_computation_method,
+                minimum_panel_eroi=minimum_panel_eroi, replacement_scenario=replacement_scenario,
+                seed=seed, continue_simulation=continue_simulation, number_of_workers=number_of_workers, **kwargs)
+            # The buildings which simulation failed are neither summed at the urban scale nor listed as simulated
+            simulated_building_id_list = [building_obj.id for building_obj in building_to_simulate_obj_list if
+                                          result_dict[building_obj.id]["success"]]
+            solar_rad_and_bipv_obj_list = [self.building_dict[building_id].solar_radiation_and_bipv_simulation_obj
+                                           for building_id in simulated_building_id_list]
+        else:
+            solar_rad_and_bipv_obj_list = []
+            for building_obj in building_to_simulate_obj_list:
                 building_obj.building_run_bipv_panel_simulation(path_simulation_folder=path_simulation_folder,
                                                                 roof_pv_tech_obj=roof_pv_tech_obj,
                                                                 facades_pv_tech_obj=facade_pv_tech_obj,
@@ -1031,8 +1526,11 @@ class UrbanCanopy:
                                                                 replacement_scenario=replacement_scenario,
                                                                 continue_simulation=continue_simulation,
                                                                 path_radiation_and_bipv_result_folder=path_radiation_and_bipv_result_folder,
+                                                                random_generator=get_task_random_generator(
+                                                                    seed=seed, task_key=building_obj.id),
                                                                 **kwargs)
                 solar_rad_and_bipv_obj_list.append(building_obj.solar_radiation_and_bipv_simulation_obj)
+            simulated_building_id_list = self.get_list_of_bipv_simulated_buildings()
 
         """ to be implemented potentially, but not likely to be """
         # # Add the selected panels to the building shades
@@ -1040,9 +1538,8 @@ class UrbanCanopy:
         #     if isinstance(building_obj, BuildingModeled):
         #         building_obj.add_selected_bipv_panels_to_shades()
 
-        # Get the list of buildings that were simualted
-        building_id_list = self.get_list_of_bipv_simulated_buildings()
-        bipv_scenario_obj.set_simulated_building_id_list(building_id_list=building_id_list)
+        # Set the list of buildings that were simulated
+        bipv_scenario_obj.set_simulated_building_id_list(building_id_list=simulated_building_id_list)
         # Compute the results at urban scale
         bipv_scenario_obj.sum_bipv_results_at_urban_scale(
             solar_rad_and_bipv_obj_list=solar_rad_and_bipv_obj_list)
@@ -1052,6 +1549,73 @@ class UrbanCanopy:
             bipv_scenario_obj.write_bipv_results_to_csv(
                 path_radiation_and_bipv_result_folder=path_radiation_and_bipv_result_folder)
 
+    @staticmethod
+    def load_bipv_obj_dicts_from_libraries():
+        """
+        Get the BIPV technologies, transportation and inverter objects of the json files of the default and user
+        libraries from the catalog of the process, the files are only parsed again if they changed
+        :return bipv_technology_obj_dict: dict, BipvTechnology objects by identifier
+        :return bipv_transportation_obj_dict: dict, BipvTransportation objects by identifier
+        :return bipv_inverter_obj_dict: dict, BipvInverter objects by identifier
+        """
+        return bipv_catalog.load(path_folder_list=[path_folder_default_bipv_parameters,
+                                                   path_folder_user_bipv_parameters])
+
+    def run_bipv_scenario_sweep(self, path_simulation_folder, bipv_scenario_parameter_dict_list,
+                                building_id_list=None, grid_ghg_intensity=default_grid_ghg_intensity,
+                                grid_energy_intensity=default_grid_energy_intensity,
+                                grid_electricity_sell_price=default_grid_electricity_sell_price, zone_area=None,
+                                run_in_parallel=False, number_of_workers=None, seed=None):
+        """
+        Evaluate many BIPV scenarios on the buildings and return their KPIs at the urban scale, without modifying
+        the BIPV scenarios of the urban canopy and the BIPV simulation of the buildings. The annual irradiance
+        simulation should have been run on the buildings.
+        :param path_simulation_folder: str, path to the simulation folder
+        :param bipv_scenario_parameter_dict_list: list of dict, parameters of each scenario, with the names of the
+            parameters of run_bipv_panel_simulation_on_buildings, the missing parameters take their default value.
+            A grid of parameters can be made with make_bipv_scenario_parameter_grid.
+        :param building_id_list: list of str, id of the buildings to simulate, all the target buildings if None
+        :param grid_ghg_intensity: float, kgCO2/kWh, grid GHG intensity
+        :param grid_energy_intensity: float, kWh/kWh, grid energy intensity
+        :param grid_electricity_sell_price: float, $/kWh, grid electricity sell price
+        :param zone_area: float, m2, area of the zone
+        :param run_in_parallel: bool, if True, the scenarios are evaluated in a pool of processes
+        :param number_of_workers: int, number of processes if run_in_parallel is True, all the cores if None
+        :param seed: int, seed of the life expectancies of the panels, the scenarios are compared with the same random
+            numbers and give the same results as run_bipv_panel_simulation_on_buildings with this seed. A new seed is
+            drawn and logged if None
+        :return kpi_table: pandas DataFrame, one row per scenario with its parameters and its KPIs
+        """
+        bipv_technology_obj_dict, bipv_transportation_obj_dict, bipv_inverter_obj_dict = \
+            self.load_bipv_obj_dicts_from_libraries()
+        # The scenarios are simulated on copies of the SolarRadAndBipvSimulation objects without BIPV results
+        solar_rad_and_bipv_obj_dict = {
+            building_obj.id: building_obj.solar_radiation_and_bipv_simulation_obj.copy_for_new_bipv_simulation()
+            for building_obj in self.get_building_obj_list(only_target=True) if
+            self.does_building_fits_bipv_requirement(building_obj=building_obj, building_id_list=building_id_list,
+                                                     continue_simulation=False)}
+        building_id_list = list(solar_rad_and_bipv_obj_dict.keys())
+        sweep_context_dict = {
+            "path_simulation_folder": path_simulation_folder,
+            "solar_rad_and_bipv_obj_dict": solar_rad_and_bipv_obj_dict,
+            "bipv_technology_obj_dict": bipv_technology_obj_dict,
+            "bipv_transportation_obj_dict": bipv_transportation_obj_dict,
+            "bipv_inverter_obj_dict": bipv_inverter_obj_dict,
+            "kpi_parameter_dict": {
+                "grid_ghg_intensity": grid_ghg_intensity,
+                "grid_energy_intensity": grid_energy_intensity,
+                "grid_electricity_sell_price": grid_electricity_sell_price,
+                "ubes_electricity_consumption": sum(
+                    self.get_ubes_electricity_consumption_from_building_id_list(building_id_list)),
+                "conditioned_apartment_area": sum(self.get_conditioned_area_from_building_id_list(building_id_list)),
+                "zone_area": zone_area
+            }
+        }
+
+        return run_bipv_scenario_sweep(parameter_dict_list=bipv_scenario_parameter_dict_list,
+                                       sweep_context_dict=sweep_context_dict, run_in_parallel=run_in_parallel,
+                                       number_of_workers=number_of_workers, seed=seed)
+
     @staticmethod
     def does_building_fits_bipv_requirement(building_obj, building_id_list, continue_simulation):
         """
@@ -1122,13 +1686,11 @@ class UrbanCanopy:
         Get the list of buildings for which the BIPV simulation was run
         """
         building_list = []
-        for building_id, building_obj in self.building_dict.items():
-            if isinstance(building_obj, BuildingModeled) and building_obj.is_target \
-                    and (building_obj.solar_radiation_and_bipv_simulation_obj.parameter_dict["roof"][
-                             "start_year"] is not None or
-                         building_obj.solar_radiation_and_bipv_simulation_obj.parameter_dict["facades"][
-                             "start_year"] is not None):
-                building_list.append(building_id)
+        for building_obj in self.get_building_obj_list(only_target=True):
+            if (building_obj.solar_radiation_and_bipv_simulation_obj.parameter_dict["roof"]["start_year"] is not None or
+                    building_obj.solar_radiation_and_bipv_simulation_obj.parameter_dict["facades"][
+                        "start_year"] is not None):
+                building_list.append(building_obj.id)
         return building_list
 
     def get_ubes_electricity_consumption_from_building_id_list(self, building_id_list):
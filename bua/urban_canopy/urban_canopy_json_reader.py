@@ -0,0 +1,55 @@
+"""
+Reader of the urban canopy json files written by ExportUrbanCanopyToJson, used by the Grasshopper components.
+The module only uses the standard library, and is compatible with the Python of Rhino 7, so that the components can
+import it from the Scripts folder of the tool.
+"""
+
+import os
+import json
+
+from bua.urban_canopy.export_to_json import name_json_shard_folder, json_shard_key
+
+
+class ShardedJsonDict(dict):
+    """
+    Dictionary of the urban canopy json file, the buildings, BIPV scenarios and UBES are loaded from their own json
+    file when they are accessed, keeping only the last ones in memory
+    """
+
+    def __init__(self, path_json, json_dict, nb_shards_in_memory=2):
+        dict.__init__(self, json_dict)
+        self.path_json = path_json
+        self.nb_shards_in_memory = nb_shards_in_memory
+        self.loaded_shard_list = []  # (key, value) of the last loaded json files
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if not (isinstance(value, dict) and json_shard_key in value):
+            return value
+        for loaded_key, loaded_value in self.loaded_shard_list:
+            if loaded_key == key:
+                return loaded_value
+        path_json_shard = os.path.normpath(os.path.join(os.path.dirname(self.path_json), name_json_shard_folder,
+                                                        value[json_shard_key]))
+        with open(path_json_shard, "r") as json_file:
+            loaded_value = json.load(json_file)
+        self.loaded_shard_list = [(key, loaded_value)] + self.loaded_shard_list[:self.nb_shards_in_memory - 1]
+        return loaded_value
+
+    def get_manifest_entry(self, key):
+        """ Get the entry of the manifest, with the type and status of a building, without loading its json file """
+        return dict.__getitem__(self, key)
+
+
+def load_urban_canopy_json(path_json):
+    """
+    Load the urban canopy json file, the buildings, BIPV scenarios and UBES are loaded when accessed
+    :param path_json: str, path of the urban canopy json file
+    :return urban_canopy_dict: ShardedJsonDict
+    """
+    with open(path_json, "r") as json_file:
+        urban_canopy_dict = ShardedJsonDict(path_json, json.load(json_file))
+    for key in ["buildings", "bipv_scenarios"]:
+        dict.__setitem__(urban_canopy_dict, key,
+                         ShardedJsonDict(path_json, dict.__getitem__(urban_canopy_dict, key)))
+    return urban_canopy_dict
@@ -0,0 +1,132 @@
+"""
+Cache of the Honeybee Models decoded from the dictionaries stored in the buildings, to avoid deserializing the same
+model with Model.from_dict every time it is used, for instance when a building is in the context of many targets.
+"""
+
+import sys
+import logging
+
+from collections import OrderedDict
+
+from honeybee.model import Model
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+default_max_memory_in_mb = 1024
+
+
+def estimate_size_of_object_in_bytes(obj):
+    """
+    Estimate the memory size of a nested structure of dictionaries, lists and tuples, such as the dictionary of a
+    Honeybee Model. It is used as an estimate of the size of the decoded model.
+    :param obj: object to estimate the size of
+    :return size_in_bytes: int, estimated size in bytes
+    """
+    size_in_bytes = 0
+    object_to_visit_list = [obj]
+    while object_to_visit_list:
+        obj = object_to_visit_list.pop()
+        size_in_bytes += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            object_to_visit_list.extend(obj.keys())
+            object_to_visit_list.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            object_to_visit_list.extend(obj)
+
+    return size_in_bytes
+
+
+class DecodedHbModelCache:
+    """
+    Least recently used cache of the decoded Honeybee Models, keyed by building id and by the version stamp of the
+    geometry of the building, with a limit on the estimated memory used by the models.
+    The decoded models are shared by all the consumers and should not be modified in place.
+    """
+
+    def __init__(self, max_memory_in_mb=default_max_memory_in_mb):
+        """
+        Initialize the cache
+        :param max_memory_in_mb: float, maximum estimated memory of the cached models in MB
+        """
+        self.max_memory_in_bytes = max_memory_in_mb * 1024 ** 2
+        # (version stamp, HB Model, estimated size in bytes) by building id, from the least to the most recently used
+        self.cached_model_dict = OrderedDict()
+        self.memory_in_bytes = 0
+        # Statistics
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+
+    def __len__(self):
+        return len(self.cached_model_dict)
+
+    def get_hb_model(self, building_id, version_stamp, hb_model_dict):
+        """
+        Get the decoded Honeybee Model of a building, decoding it from its dictionary if it is not in the cache or if
+        the cached model has a different version stamp
+        :param building_id: str, id of the building
+        :param version_stamp: str, version stamp of the geometry of the building
+        :param hb_model_dict: dict, dictionary of the Honeybee Model, decoded if needed
+        :return hb_model_obj: Honeybee Model
+        """
+        if building_id in self.cached_model_dict and self.cached_model_dict[building_id][0] == version_stamp:
+            self.hit_count += 1
+            self.cached_model_dict.move_to_end(building_id)
+            return self.cached_model_dict[building_id][1]
+        self.miss_count += 1
+        hb_model_obj = Model.from_dict(hb_model_dict)
+        self.add_hb_model(building_id=building_id, version_stamp=version_stamp, hb_model_obj=hb_model_obj,
+                          hb_model_dict=hb_model_dict)
+
+        return hb_model_obj
+
+    def add_hb_model(self, building_id, version_stamp, hb_model_obj, hb_model_dict):
+        """
+        Add the decoded Honeybee Model of a building to the cache, replacing the previous version of the building.
+        The least recently used models are evicted if the memory limit is exceeded.
+        :param building_id: str, id of the building
+        :param version_stamp: str, version stamp of the geometry of the building
+        :param hb_model_obj: Honeybee Model
+        :param hb_model_dict: dict, dictionary of the Honeybee Model, used to estimate its size
+        """
+        self.invalidate_building(building_id)
+        size_in_bytes = estimate_size_of_object_in_bytes(hb_model_dict)
+        if size_in_bytes > self.max_memory_in_bytes:
+            dev_logger.info(f"The Honeybee Model of the building {building_id} is larger than the memory limit of the "
+                            f"cache, it will not be cached")
+            return
+        self.cached_model_dict[building_id] = (version_stamp, hb_model_obj, size_in_bytes)
+        self.memory_in_bytes += size_in_bytes
+        # Evict the least recently used models
+        while self.memory_in_bytes > self.max_memory_in_bytes:
+            _, (_, _, evicted_size_in_bytes) = self.cached_model_dict.popitem(last=False)
+            self.memory_in_bytes -= evicted_size_in_bytes
+            self.eviction_count += 1
+
+    def invalidate_building(self, building_id):
+        """
+        Remove the model of a building from the cache, if it is in it
+        :param building_id: str, id of the building
+        """
+        if building_id in self.cached_model_dict:
+            _, _, size_in_bytes = self.cached_model_dict.pop(building_id)
+            self.memory_in_bytes -= size_in_bytes
+
+    def clear(self):
+        """ Remove all the models from the cache, keeping the statistics """
+        self.cached_model_dict = OrderedDict()
+        self.memory_in_bytes = 0
+
+    def get_statistics_dict(self):
+        """
+        Get the statistics of the cache
+        :return: dict, number of hits, misses and evictions, number of cached models and estimated memory in MB
+        """
+        return {
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "eviction_count": self.eviction_count,
+            "number_of_cached_models": len(self),
+            "memory_in_mb": self.memory_in_bytes / 1024 ** 2
+        }
@@ -0,0 +1,83 @@
+"""
+Functions to make the merged faces Honeybee models of the buildings in a pool of processes.
+Honeybee objects cannot be pickled, the models are thus sent to the workers and back as dictionaries.
+"""
+
+import logging
+
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+
+from honeybee.model import Model
+
+from bua.building.merge_hb_model_faces.merge_hb_model_faces import merge_facades_and_roof_faces_in_hb_model
+from bua.utils.utils_parallel import get_number_of_workers, report_failed_buildings
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+
+def make_merged_faces_hb_model_dict_in_worker(task_dict):
+    """
+    Make the merged faces HB model of a building in a worker and catch its errors, so that the other buildings are
+    not affected.
+    :param task_dict: dict, id and HB model dictionary of the building and parameters of the merge
+    :return result_dict: dict, success, duration, error message and merged faces HB model dictionary of the building
+    """
+    duration = time()
+    error = None
+    merged_faces_hb_model_dict = None
+    try:
+        merged_faces_hb_model_obj = merge_facades_and_roof_faces_in_hb_model(
+            hb_model_obj=Model.from_dict(task_dict["hb_model_dict"]),
+            orient_roof_mesh_to_according_to_building_orientation=task_dict[
+                "orient_roof_mesh_to_according_to_building_orientation"],
+            north_angle=task_dict["north_angle"])
+        merged_faces_hb_model_dict = merged_faces_hb_model_obj.to_dict()
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+
+    return {"building_id": task_dict["building_id"], "success": error is None, "duration": time() - duration,
+            "error": error, "merged_faces_hb_model_dict": merged_faces_hb_model_dict}
+
+
+def make_merged_faces_hb_model_of_buildings_in_parallel(building_obj_list,
+                                                        orient_roof_mesh_to_according_to_building_orientation=True,
+                                                        north_angle=0, number_of_workers=None):
+    """
+    Make the merged faces HB models of the buildings in a pool of processes and set them to the buildings.
+    :param building_obj_list: list of BuildingModeled objects
+    :param orient_roof_mesh_to_according_to_building_orientation: bool, if True, the roof mesh will be oriented
+        according to the orientation of the building
+    :param north_angle: float, angle of the north in degrees
+    :param number_of_workers: int, number of processes, all the cores if None
+    :return result_dict: dict, success, duration and error message of the merge by building id
+    """
+    if not building_obj_list:
+        return {}
+    # Use the HB model dictionary if the model was not decoded since the urban canopy was loaded
+    task_dict_list = [{
+        "building_id": building_obj.id,
+        "hb_model_dict": building_obj.hb_model_dict if building_obj.hb_model_dict is not None else
+        building_obj.hb_model_obj.to_dict(),
+        "orient_roof_mesh_to_according_to_building_orientation":
+            orient_roof_mesh_to_according_to_building_orientation,
+        "north_angle": north_angle
+    } for building_obj in building_obj_list]
+    building_obj_dict = {building_obj.id: building_obj for building_obj in building_obj_list}
+    number_of_workers = get_number_of_workers(number_of_workers=number_of_workers,
+                                              number_of_tasks=len(task_dict_list))
+    dev_logger.info(f"Merge the faces of {len(task_dict_list)} buildings with {number_of_workers} processes")
+
+    result_dict = {}
+    with ProcessPoolExecutor(max_workers=number_of_workers) as executor:
+        # map returns the results in the order of the tasks, the merge is thus deterministic
+        for building_result_dict in executor.map(make_merged_faces_hb_model_dict_in_worker, task_dict_list):
+            merged_faces_hb_model_dict = building_result_dict.pop("merged_faces_hb_model_dict")
+            if building_result_dict["success"]:
+                building_obj_dict[building_result_dict["building_id"]].set_merged_faces_hb_model_dict(
+                    merged_faces_hb_model_dict)
+            result_dict[building_result_dict["building_id"]] = building_result_dict
+    report_failed_buildings(result_dict=result_dict, step_name="merge of the faces")
+
+    return result_dict
@@ -0,0 +1,309 @@
+"""
+Directory-backed store of the urban canopy, replacing the single pickle file of the whole urban canopy.
+The store folder contains a small index file, with the urban canopy without its buildings, and one file per building.
+When the urban canopy is loaded, the buildings are loaded only when they are accessed for the first time, and when it
+is saved, only the buildings marked as dirty by the methods modifying them are written again.
+The index also contains a summary of each building, its type and status, to select the buildings without loading them.
+"""
+
+import os
+import pickle
+import hashlib
+import logging
+
+from collections.abc import MutableMapping
+
+from bua.building.building_modeled import BuildingModeled
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+name_store_index_file = "index.pkl"
+name_store_building_folder = "buildings"
+# The index of the version 1 does not contain the summary of the buildings
+store_format_version = 2
+
+
+def get_building_blob_file_name(building_id):
+    """
+    Get the name of the file of a building in the store, the ids of the buildings might contain characters that cannot
+    be used in file names
+    :param building_id: str, id of the building
+    :return: str, name of the file
+    """
+    return hashlib.sha1(building_id.encode("utf-8")).hexdigest() + ".pkl"
+
+
+def make_building_summary_dict(building_obj):
+    """
+    Make the summary of a building stored in the index, used to select the buildings without loading them
+    :param building_obj: BuildingBasic or BuildingModeled object
+    :return: dict, type and status of the building
+    """
+    is_building_modeled = isinstance(building_obj, BuildingModeled)
+    return {"is_building_modeled": is_building_modeled,
+            "is_target": is_building_modeled and building_obj.is_target,
+            "to_simulate": is_building_modeled and building_obj.to_simulate,
+            "moved_to_origin": building_obj.moved_to_origin}
+
+
+def get_building_summary_dict(building_dict, building_id):
+    """
+    Get the summary of a building of an urban canopy, without loading it if the building dictionary is from a store
+    :param building_dict: dict or LazyBuildingDict, buildings of the urban canopy
+    :param building_id: str, id of the building
+    :return: dict, type and status of the building
+    """
+    if isinstance(building_dict, LazyBuildingDict):
+        return building_dict.get_building_summary_dict(building_id)
+    return make_building_summary_dict(building_dict[building_id])
+
+
+def write_file_atomically(path_file, data):
+    """
+    Write a file to a temporary file first and then rename it, so that an interrupted save does not leave a
+    corrupted file
+    :param path_file: str, path of the file
+    :param data: bytes, content of the file
+    """
+    path_temp_file = path_file + ".tmp"
+    with open(path_temp_file, "wb") as temp_file:
+        temp_file.write(data)
+    os.replace(path_temp_file, path_file)
+
+
+class LazyBuildingDict(MutableMapping):
+    """
+    Dictionary of the buildings of an urban canopy loaded from a store, the buildings are loaded from their file the
+    first time they are accessed. It keeps the order of the buildings of the urban canopy.
+    The buildings are written again to the store only if they are marked as dirty, which is done when they are added
+    to the dictionary and by the methods of the urban canopy modifying them. A building modified by other means should
+    be marked with mark_as_dirty.
+    """
+
+    def __init__(self, path_store_folder, building_blob_dict, urban_canopy_obj=None):
+        """
+        Initialize the dictionary with the buildings of the store, none of them being loaded
+        :param path_store_folder: str, path of the store folder
+        :param building_blob_dict: dict, name of the file and summary of each building in the store, by building id
+        :param urban_canopy_obj: UrbanCanopy object the buildings belong to
+        """
+        self.path_store_folder = path_store_folder
+        self.building_blob_dict = building_blob_dict
+        self.urban_canopy_obj = urban_canopy_obj
+        # Building objects by building id, None if the building was not loaded yet
+        self.building_obj_dict = {building_id: None for building_id in building_blob_dict}
+        # Ids of the buildings to write again the next time the urban canopy is saved
+        self.dirty_building_id_set = set()
+
+    def __getitem__(self, building_id):
+        building_obj = self.building_obj_dict[building_id]
+        if building_obj is None:
+            building_obj = self.load_building(building_id)
+        return building_obj
+
+    def __setitem__(self, building_id, building_obj):
+        self.building_obj_dict[building_id] = building_obj
+        self.dirty_building_id_set.add(building_id)
+
+    def __delitem__(self, building_id):
+        del self.building_obj_dict[building_id]
+        self.dirty_building_id_set.discard(building_id)
+
+    def __iter__(self):
+        return iter(self.building_obj_dict)
+
+    def __len__(self):
+        return len(self.building_obj_dict)
+
+    def is_loaded(self, building_id):
+        """
+        Check if a building was loaded from the store
+        :param building_id: str, id of the building
+        :return: bool, True if the building was loaded, or added after the urban canopy was loaded
+        """
+        return self.building_obj_dict[building_id] is not None
+
+    def mark_as_dirty(self, building_id):
+        """
+        Mark a building as modified, to write it again the next time the urban canopy is saved to the store
+        :param building_id: str, id of the building
+        """
+        if building_id in self.building_obj_dict:
+            self.dirty_building_id_set.add(building_id)
+
+    def is_dirty(self, building_id):
+        """
+        Check if a building has to be written again to the store
+        :param building_id: str, id of the building
+        :return: bool
+        """
+        return building_id in self.dirty_building_id_set
+
+    def release_building(self, building_id):
+        """
+        Release a loaded building that was not modified, it is loaded again from the store the next time it is
+        accessed. The building object should not be used anymore by the caller.
+        :param building_id: str, id of the building
+        :return: bool, True if the building was released, False if it is not in the store or was modified
+        """
+        if building_id not in self.building_blob_dict or self.is_dirty(building_id):
+            return False
+        self.building_obj_dict[building_id] = None
+        return True
+
+    def get_building_summary_dict(self, building_id):
+        """
+        Get the summary of a building, from the index of the store if it was not loaded yet
+        :param building_id: str, id of the building
+        :return: dict, type and status of the building
+        """
+        if self.is_loaded(building_id):
+            return make_building_summary_dict(self.building_obj_dict[building_id])
+        building_blob = self.building_blob_dict[building_id]
+        if "summary" not in building_blob:
+            # The index of the older stores does not have the summary
+            return make_building_summary_dict(self.load_building(building_id))
+        return building_blob["summary"]
+
+    def read_building_blob(self, building_id):
+        """
+        Read the pickled building from its file in the store, without loading it
+        :param building_id: str, id of the building
+        :return: bytes, pickled building
+        """
+        path_building_file = os.path.join(self.path_store_folder, name_store_building_folder,
+                                          self.building_blob_dict[building_id]["file_name"])
+        with open(path_building_file, "rb") as building_file:
+            return building_file.read()
+
+    def load_building(self, building_id):
+        """
+        Load a building from its file in the store
+        :param building_id: str, id of the building
+        :return: building object
+        """
+        building_obj = pickle.loads(self.read_building_blob(building_id))
+        building_obj.load_HB_attributes()
+        building_obj.urban_canopy = self.urban_canopy_obj
+        self.building_obj_dict[building_id] = building_obj
+
+        return building_obj
+
+
+def serialize_building(building_obj):
+    """
+    Pickle a building, converting its Honeybee attributes to dictionaries, and without the reference to its urban
+    canopy, which is stored in the index file. The building is usable again afterward.
+    :param building_obj: BuildingBasic or BuildingModeled object
+    :return: bytes, pickled building
+    """
+    urban_canopy_obj = building_obj.urban_canopy
+    building_obj.urban_canopy = None
+    building_obj.pickle_HB_attributes()
+    try:
+        building_blob = pickle.dumps(building_obj)
+    finally:
+        building_obj.load_HB_attributes()
+        building_obj.urban_canopy = urban_canopy_obj
+
+    return building_blob
+
+
+def read_store_index(path_store_folder):
+    """
+    Read the index file of a store
+    :param path_store_folder: str, path of the store folder
+    :return index_dict: dict, with the urban canopy without its buildings, the list of the building ids and the name
+        of the file and summary of each building
+    """
+    with open(os.path.join(path_store_folder, name_store_index_file), "rb") as index_file:
+        return pickle.load(index_file)
+
+
+def is_urban_canopy_store(path_store_folder):
+    """
+    Check if a folder contains an urban canopy store
+    :param path_store_folder: str, path of the folder
+    :return: bool
+    """
+    return os.path.isfile(os.path.join(path_store_folder, name_store_index_file))
+
+
+def load_urban_canopy_from_store(path_store_folder):
+    """
+    Load an urban canopy from a store, its buildings are loaded when they are accessed
+    :param path_store_folder: str, path of the store folder
+    :return urban_canopy_obj: UrbanCanopy object
+    """
+    index_dict = read_store_index(path_store_folder)
+    urban_canopy_obj = index_dict["urban_canopy"]
+    building_blob_dict = {building_id: index_dict["building_blob_dict"][building_id] for building_id in
+                          index_dict["building_id_list"]}
+    urban_canopy_obj.building_dict = LazyBuildingDict(path_store_folder=path_store_folder,
+                                                      building_blob_dict=building_blob_dict,
+                                                      urban_canopy_obj=urban_canopy_obj)
+    return urban_canopy_obj
+
+
+def save_urban_canopy_to_store(urban_canopy_obj, path_store_folder):
+    """
+    Save an urban canopy to a store. When the urban canopy was loaded from this store, only the buildings marked as
+    dirty are written, otherwise all the buildings are written, the ones that were not loaded being copied from their
+    file. The files of the removed buildings are deleted.
+    :param urban_canopy_obj: UrbanCanopy object, its attributes should be prepared for pickling
+    :param path_store_folder: str, path of the store folder
+    :return nb_buildings_written: int, number of building files written
+    """
+    path_building_folder = os.path.join(path_store_folder, name_store_building_folder)
+    os.makedirs(path_building_folder, exist_ok=True)
+    building_dict = urban_canopy_obj.building_dict
+    is_lazy_building_dict = isinstance(building_dict, LazyBuildingDict)
+    is_same_store = is_lazy_building_dict and \
+        os.path.abspath(building_dict.path_store_folder) == os.path.abspath(path_store_folder)
+
+    building_blob_dict = {}
+    nb_buildings_written = 0
+    for building_id in building_dict:
+        file_name = get_building_blob_file_name(building_id)
+        path_building_file = os.path.join(path_building_folder, file_name)
+        if is_same_store and building_id in building_dict.building_blob_dict and \
+                not building_dict.is_dirty(building_id) and os.path.isfile(path_building_file):
+            # The building was not modified, its file is up-to-date
+            building_blob_dict[building_id] = building_dict.building_blob_dict[building_id]
+            continue
+        if is_lazy_building_dict and not building_dict.is_loaded(building_id):
+            # Copy the file of the building from the other store without loading it
+            building_blob = building_dict.read_building_blob(building_id)
+            building_summary_dict = building_dict.get_building_summary_dict(building_id)
+        else:
+            building_blob = serialize_building(building_dict[building_id])
+            building_summary_dict = make_building_summary_dict(building_dict[building_id])
+        write_file_atomically(path_building_file, building_blob)
+        nb_buildings_written += 1
+        building_blob_dict[building_id] = {"file_name": file_name, "summary": building_summary_dict}
+
+    # Write the index without the buildings
+    urban_canopy_obj.building_dict = {}
+    try:
+        index_blob = pickle.dumps({"format_version": store_format_version,
+                                   "urban_canopy": urban_canopy_obj,
+                                   "building_id_list": list(building_blob_dict.keys()),
+                                   "building_blob_dict": building_blob_dict})
+    finally:
+        urban_canopy_obj.building_dict = building_dict
+    write_file_atomically(os.path.join(path_store_folder, name_store_index_file), index_blob)
+    # The store is now the one of the buildings that are not loaded yet, and all the buildings are saved
+    if is_lazy_building_dict:
+        building_dict.path_store_folder = path_store_folder
+        building_dict.building_blob_dict = building_blob_dict
+        building_dict.dirty_building_id_set = set()
+    # Delete the files of the buildings removed from the urban canopy
+    kept_file_name_set = {blob["file_name"] for blob in building_blob_dict.values()}
+    for file_name in os.listdir(path_building_folder):
+        if file_name not in kept_file_name_set:
+            os.remove(os.path.join(path_building_folder, file_name))
+    dev_logger.info(f"{nb_buildings_written} buildings out of {len(building_blob_dict)} were written to the urban "
+                    f"canopy store")
+
+    return nb_buildings_written
@@ -27,6 +27,7 @@ name_ubes_simulation_result_folder = "UBES_simulation"
 name_urban_canopy_export_file = "urban_canopy"
 name_urban_canopy_export_file_pkl = name_urban_canopy_export_file + ".pkl"
 name_urban_canopy_export_file_json = name_urban_canopy_export_file + ".json"
+name_urban_canopy_store_folder = name_urban_canopy_export_file + "_store"
 
 #
 
@@ -0,0 +1,83 @@
+"""
+Functions shared by the steps of the simulation that can be run in parallel.
+"""
+
+import os
+import hashlib
+import logging
+import numpy as np
+
+user_logger = logging.getLogger("user")
+dev_logger = logging.getLogger("dev")
+
+
+def get_number_of_workers(number_of_workers=None, number_of_tasks=None):
+    """
+    Get the number of workers to use, all the cores by default, and no more than the number of tasks.
+    :param number_of_workers: int, number of workers asked by the user, all the cores if None or below 1
+    :param number_of_tasks: int, number of tasks to run
+    :return: int, number of workers
+    """
+    if number_of_workers is None or number_of_workers < 1:
+        number_of_workers = os.cpu_count() or 1
+    if number_of_tasks is not None:
+        number_of_workers = min(number_of_workers, number_of_tasks)
+
+    return max(number_of_workers, 1)
+
+
+def split_workers_between_tasks(number_of_workers=None, number_of_tasks=1, min_workers_per_task=1):
+    """
+    Split a budget of workers between tasks that use several workers themselves, such as the Radiance recipes.
+    As many tasks as possible run at the same time, each with at least min_workers_per_task workers.
+    :param number_of_workers: int, total number of workers, all the cores if None or below 1
+    :param number_of_tasks: int, number of tasks to run
+    :param min_workers_per_task: int, minimum number of workers of each task
+    :return number_of_concurrent_tasks: int, number of tasks running at the same time
+    :return number_of_workers_per_task: int, number of workers of each task
+    """
+    number_of_workers = get_number_of_workers(number_of_workers=number_of_workers)
+    number_of_concurrent_tasks = max(min(number_of_tasks, number_of_workers // max(min_workers_per_task, 1)), 1)
+    number_of_workers_per_task = max(number_of_workers // number_of_concurrent_tasks, 1)
+
+    return number_of_concurrent_tasks, number_of_workers_per_task
+
+
+def report_failed_buildings(result_dict, step_name):
+    """
+    Log the buildings which simulation failed.
+    :param result_dict: dict, success and error message of the simulation by building id
+    :param step_name: str, name of the step for the messages
+    """
+    for building_id, building_result_dict in result_dict.items():
+        if not building_result_dict["success"]:
+            user_logger.warning(f"The {step_name} of the building {building_id} failed, "
+                                f"{building_result_dict['error']}")
+            dev_logger.warning(f"The {step_name} of the building {building_id} failed, "
+                               f"{building_result_dict['error']}")
+
+
+def get_run_seed(seed=None):
+    """
+    Get the seed of a run, a new one if None, logged so that the run can be reproduced.
+    :param seed: int, seed given by the user
+    :return: int, seed of the run
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+        dev_logger.info(f"The seed of the run is {seed}")
+
+    return seed
+
+
+def get_task_random_generator(seed, task_key):
+    """
+    Get the random generator of a task, derived from the seed of the run and the key of the task, the building id for
+    instance. The random numbers of a task thus do not depend on the process that runs it nor on the other tasks.
+    :param seed: int, seed of the run
+    :param task_key: str, key of the task
+    :return: numpy random Generator
+    """
+    task_entropy = int.from_bytes(hashlib.sha256(str(task_key).encode("utf-8")).digest()[:8], "little")
+
+    return np.random.default_rng([seed, task_entropy])
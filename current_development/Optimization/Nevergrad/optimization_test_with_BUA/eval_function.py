@@ -1,20 +1,120 @@
-import sys
+"""
+Evaluation functions of the optimization, the candidates proposed by the optimizer are evaluated as BIPV scenarios of
+a sweep on the urban canopy, in a pool of processes when there are several of them.
+All the candidates are evaluated with the same seed, the life expectancies of the panels are thus the same random
+numbers for all of them and the fitness values only differ because of the design variables.
+"""
 
 from bua.utils.utils_import_simulation_steps_and_config_var import *
 
 from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.urban_canopy.kpis.urban_canopy_kpis import UrbanCanopyKPIs
 
 from current_development.Optimization.Nevergrad.optimization_test_with_BUA.json_result_dict_methods import \
     update_json_results_dict
 from current_development.Optimization.Nevergrad.optimization_test_with_BUA.design_variable_definition_and_boundaries import \
     ROOF_PANEL_TECHNOLOGIES_DICT, FACADES_PANEL_TECHNOLOGIES_DICT, REPLACEMENT_FREQUENCY_MULTIPLIER
 
+# Fitness value of the candidates which simulation failed, the fitness is minimized
+FAILED_CANDIDATE_FITNESS_VALUE = float("inf")
+
+
+def make_bipv_scenario_parameter_dict(roof_panel_id: int, facades_panel_id: int, roof_inverter_sizing_ratio: float,
+                                      facades_inverter_sizing_ratio: float, min_panel_eroi: float,
+                                      replacement_frequency: int):
+    """
+    Convert the design variables of a candidate to the parameters of a BIPV scenario of the sweep.
+    :param roof_panel_id: int, id of the roof panel technology
+    :param facades_panel_id: int, id of the facades panel technology
+    :param roof_inverter_sizing_ratio: float, inverter sizing ratio for the roof
+    :param facades_inverter_sizing_ratio: float, inverter sizing ratio for the facades
+    :param min_panel_eroi: float, minimum panel eroi
+    :param replacement_frequency: int, replacement frequency, multiplied by REPLACEMENT_FREQUENCY_MULTIPLIER
+    :return: dict, parameters of the BIPV scenario
+    """
+    return {"roof_id_pv_tech": ROOF_PANEL_TECHNOLOGIES_DICT[roof_panel_id],
+            "facades_id_pv_tech": FACADES_PANEL_TECHNOLOGIES_DICT[facades_panel_id],
+            "roof_inverter_sizing_ratio": roof_inverter_sizing_ratio,
+            "facades_inverter_sizing_ratio": facades_inverter_sizing_ratio,
+            "minimum_panel_eroi": min_panel_eroi,
+            "start_year": 0,
+            "end_year": 50,
+            "replacement_scenario": "replace_failed_panels_every_X_years",
+            "replacement_frequency_in_years": replacement_frequency * REPLACEMENT_FREQUENCY_MULTIPLIER}
+
+
+def get_kpi_dict_from_kpi_row(kpi_row, kpi_template_dict=None, parent_key=""):
+    """
+    Get the KPI dict of a scenario, as used by the fitness functions, from its row in the table of the sweep, in which
+    kpi_dict["eroi"]["total"] is the column "eroi_total".
+    :param kpi_row: pandas Series, row of the scenario in the table of the sweep
+    :param kpi_template_dict: dict, structure of the KPI dict, the one of UrbanCanopyKPIs if None
+    :param parent_key: str, flattened key of the parent dictionary
+    :return: dict, KPI values with the structure of the KPI dict of UrbanCanopyKPIs
+    """
+    if kpi_template_dict is None:
+        kpi_template_dict = UrbanCanopyKPIs().to_dict()["kpis"]
+    kpi_dict = {}
+    for key, value in kpi_template_dict.items():
+        flattened_key = parent_key + "_" + key if parent_key else key
+        if isinstance(value, dict):
+            kpi_dict[key] = get_kpi_dict_from_kpi_row(kpi_row, kpi_template_dict=value, parent_key=flattened_key)
+        else:
+            kpi_dict[key] = kpi_row.get(flattened_key)
+    return kpi_dict
+
+
+def eval_func_batch(urban_canopy_object: UrbanCanopy, fitness_func, path_json_results_file: str,
+                    candidate_kwargs_list: list, path_simulation_folder: str = default_path_simulation_folder,
+                    number_of_workers: int = None, seed: int = None):
+    """
+    Compute the fitness values of a batch of candidates, evaluated as the scenarios of a BIPV sweep in a pool of
+    processes.
+    :param urban_canopy_object: UrbanCanopy object, urban canopy object to run the simulation
+    :param fitness_func: function, fitness function to compute the fitness value
+    :param path_json_results_file: str, path to the json file to update
+    :param candidate_kwargs_list: list of dict, design variables of each candidate, see
+        make_bipv_scenario_parameter_dict
+    :param path_simulation_folder: str, path to the simulation folder with the irradiance results of the buildings
+    :param number_of_workers: int, number of processes, all the cores if None
+    :param seed: int, seed of the life expectancies of the panels, the same for all the batches of the optimization
+    :return: list of float, fitness value of each candidate, FAILED_CANDIDATE_FITNESS_VALUE if its simulation failed
+    """
+    parameter_dict_list = [make_bipv_scenario_parameter_dict(**candidate_kwargs) for candidate_kwargs in
+                           candidate_kwargs_list]
+    kpi_table = urban_canopy_object.run_bipv_scenario_sweep(
+        path_simulation_folder=path_simulation_folder, bipv_scenario_parameter_dict_list=parameter_dict_list,
+        grid_ghg_intensity=default_grid_ghg_intensity, grid_energy_intensity=default_grid_energy_intensity,
+        grid_electricity_sell_price=default_grid_electricity_sell_price, zone_area=None,
+        run_in_parallel=len(parameter_dict_list) > 1, number_of_workers=number_of_workers, seed=seed)
+
+    fitness_value_list = []
+    for (_, kpi_row), parameter_dict in zip(kpi_table.iterrows(), parameter_dict_list):
+        # The KPIs of the failed scenarios are missing from the table
+        if "eroi_total" not in kpi_row.index or kpi_row.isna()["eroi_total"]:
+            fitness_value_list.append(FAILED_CANDIDATE_FITNESS_VALUE)
+            continue
+        kpi_dict = get_kpi_dict_from_kpi_row(kpi_row)
+        fitness_value = fitness_func(kpi_dict)
+        fitness_value_list.append(fitness_value)
+        # Save the results in the json file
+        update_json_results_dict(path_json_file=path_json_results_file, fitness_value=fitness_value,
+                                 kpi_dict=kpi_dict, roof_panel_id=parameter_dict["roof_id_pv_tech"],
+                                 facades_panel_id=parameter_dict["facades_id_pv_tech"],
+                                 roof_inverter_sizing_ratio=parameter_dict["roof_inverter_sizing_ratio"],
+                                 facades_inverter_sizing_ratio=parameter_dict["facades_inverter_sizing_ratio"],
+                                 min_panel_eroi=parameter_dict["minimum_panel_eroi"],
+                                 replacement_frequency=parameter_dict["replacement_frequency_in_years"])
+
+    return fitness_value_list
+
 
 def eval_func(urban_canopy_object: UrbanCanopy, fitness_func, path_json_results_file: str,
               roof_panel_id: int, facades_panel_id: int, roof_inverter_sizing_ratio: float,
-              facades_inverter_sizing_ratio: float, min_panel_eroi: float, replacement_frequency: int):
+              facades_inverter_sizing_ratio: float, min_panel_eroi: float, replacement_frequency: int,
+              seed: int = None):
     """
-    Function to compute the fitness value for the optimization.
+    Function to compute the fitness value of a single candidate for the optimization.
     :param urban_canopy_object: UrbanCanopy object, urban canopy object to run the simulation
     :param fitness_func: function, fitness function to compute the fitness value
     :param path_json_results_file: str, path to the json file to update
@@ -24,77 +124,23 @@ def eval_func(urban_canopy_object: UrbanCanopy, fitness_func, path_json_results_
     :param facades_inverter_sizing_ratio: float, inverter sizing ratio for the facades
     :param min_panel_eroi: float, minimum panel eroi
     :param replacement_frequency: int, replacement frequency in years
+    :param seed: int, seed of the life expectancies of the panels
     :return: float, fitness value
     """
-    # Adjust inputs
-    roof_panel_id = ROOF_PANEL_TECHNOLOGIES_DICT[roof_panel_id]
-    facades_panel_id = FACADES_PANEL_TECHNOLOGIES_DICT[facades_panel_id]
-    replacement_frequency = replacement_frequency * REPLACEMENT_FREQUENCY_MULTIPLIER  # The replacement frequency is multiplied by 5
-
-    # Define bipv_scenario_identifier default
-    bipv_scenario_identifier = "optimization_BUA"
-    # run BIPV simulation
-    suppress_print_wrapper(SimFunSolarRadAndBipv.run_bipv_harvesting_and_lca_simulation,
-                           urban_canopy_object=urban_canopy_object,
-                           bipv_scenario_identifier=bipv_scenario_identifier,
-                           roof_id_pv_tech=roof_panel_id,
-                           facades_id_pv_tech=facades_panel_id,
-                           roof_inverter_sizing_ratio=roof_inverter_sizing_ratio,
-                           facades_inverter_sizing_ratio=facades_inverter_sizing_ratio,
-                           minimum_panel_eroi=min_panel_eroi,
-                           start_year=0,
-                           end_year=50,
-                           replacement_scenario="replace_failed_panels_every_X_years",
-                           continue_simulation=False,
-                           update_panel_technology=False,
-                           replacement_frequency_in_years=replacement_frequency
-                           )
-    # Run KPI computation
-    suppress_print_wrapper(SimFunSolarRadAndBipv.run_kpi_simulation, urban_canopy_object=urban_canopy_object,
-                           bipv_scenario_identifier=bipv_scenario_identifier,
-                           grid_ghg_intensity=default_grid_ghg_intensity,
-                           grid_energy_intensity=default_grid_energy_intensity,
-                           grid_electricity_sell_price=default_grid_electricity_sell_price,
-                           zone_area=None)
-
-    # extract the KPI dict
-    kpi_dict = urban_canopy_object.bipv_scenario_dict[
-        bipv_scenario_identifier].urban_canopy_bipv_kpis_obj.to_dict()["kpis"]
-
-    # Compute the fitness value
-    fitness_value = fitness_func(kpi_dict)
-
-    # Save the results in the json file
-    update_json_results_dict(path_json_file=path_json_results_file, fitness_value=fitness_value,
-                             kpi_dict=kpi_dict, roof_panel_id=roof_panel_id,
-                             facades_panel_id=facades_panel_id,
-                             roof_inverter_sizing_ratio=roof_inverter_sizing_ratio,
-                             facades_inverter_sizing_ratio=facades_inverter_sizing_ratio,
-                             min_panel_eroi=min_panel_eroi, replacement_frequency=replacement_frequency)
-
-    return fitness_value
+    return eval_func_batch(urban_canopy_object=urban_canopy_object, fitness_func=fitness_func,
+                           path_json_results_file=path_json_results_file,
+                           candidate_kwargs_list=[{"roof_panel_id": roof_panel_id,
+                                                   "facades_panel_id": facades_panel_id,
+                                                   "roof_inverter_sizing_ratio": roof_inverter_sizing_ratio,
+                                                   "facades_inverter_sizing_ratio": facades_inverter_sizing_ratio,
+                                                   "min_panel_eroi": min_panel_eroi,
+                                                   "replacement_frequency": replacement_frequency}],
+                           seed=seed)[0]
 
 
 # Function to wrap the eval_func with a custom object
-def eval_func_wrapper(urban_canopy_obj, fitness_func, path_json_results_file):
+def eval_func_wrapper(urban_canopy_obj, fitness_func, path_json_results_file, seed=None):
     def wrapped_eval_func(**kwargs):
-        return eval_func(urban_canopy_obj, fitness_func, path_json_results_file, **kwargs)
+        return eval_func(urban_canopy_obj, fitness_func, path_json_results_file, seed=seed, **kwargs)
 
     return wrapped_eval_func
-
-
-def suppress_print_wrapper(func, *args, **kwargs):
-    # Save the current stdout so we can restore it later
-    original_stdout = sys.stdout
-    # Redirect stdout to null
-    sys.stdout = open(os.devnull, 'w')
-    try:
-        result = func(*args, **kwargs)
-    finally:
-        # Restore stdout to its original state
-        sys.stdout = original_stdout
-    return result
-
-
-if __name__ == "__main__":
-    suppress_print_wrapper(print, "Hello, world!")
@@ -1,5 +1,7 @@
 """
-Main script to run optimization with Nevergrad using the BUA evaluation function
+Main script to run optimization with Nevergrad using the BUA evaluation function.
+The optimizer asks batches of num_workers candidates, evaluated together as the scenarios of a BIPV sweep in a pool of
+processes.
 """
 import nevergrad as ng
 
@@ -7,7 +9,9 @@ from nevergrad.optimization.optimizerlib import OnePlusOne
 
 from bua.utils.utils_import_simulation_steps_and_config_var import *
 
-from current_development.Optimization.Nevergrad.optimization_test_with_BUA.eval_function import eval_func_wrapper
+from bua.utils.utils_parallel import get_number_of_workers, get_run_seed
+
+from current_development.Optimization.Nevergrad.optimization_test_with_BUA.eval_function import eval_func_batch
 from current_development.Optimization.Nevergrad.optimization_test_with_BUA.fitness_functions import \
     environmental_oriented_fitness_func, eroi_only_fitness_func
 from current_development.Optimization.Nevergrad.optimization_test_with_BUA.design_variable_definition_and_boundaries import \
@@ -20,9 +24,17 @@ from current_development.Optimization.Nevergrad.optimization_test_with_BUA.json_
 def run_optimization_bua(path_json_results_file: str,
                          optimization_algorithm=OnePlusOne,
                          fitness_function=environmental_oriented_fitness_func,
-                         budget=20):
+                         budget=20, num_workers=None, seed=None):
     """
-
+    Run the optimization of the BIPV scenario of the urban canopy of the default simulation folder.
+    :param path_json_results_file: str, path to the json file with the result of each iteration
+    :param optimization_algorithm: Nevergrad optimizer class
+    :param fitness_function: function, fitness function to minimize
+    :param budget: int, number of candidates to evaluate
+    :param num_workers: int, number of candidates evaluated at the same time in a pool of processes, all the cores if
+        None
+    :param seed: int, seed of the life expectancies of the panels, the same for all the candidates, a new one is drawn
+        and logged if None
     """
     # Initialize json file with the result from each iteration
     init_json_results_dict(path_json_file=path_json_results_file)
@@ -42,13 +54,24 @@ def run_optimization_bua(path_json_results_file: str,
 
     # Define the search space with different boundaries
 
+    num_workers = get_number_of_workers(number_of_workers=num_workers, number_of_tasks=budget)
     optimizer = optimization_algorithm(parametrization=instrumentation, budget=budget,
-                                       num_workers=1)
-
-    # Run the optimization
-    recommendation = optimizer.minimize(
-        eval_func_wrapper(urban_canopy_obj=urban_canopy_object, fitness_func=fitness_function,
-                          path_json_results_file=path_json_results_file), verbosity=1)
+                                       num_workers=num_workers)
+    # All the candidates are evaluated with the same random life expectancies of the panels
+    seed = get_run_seed(seed=seed)
+
+    # Run the optimization, each batch of candidates is evaluated in parallel
+    while optimizer.num_ask < budget:
+        candidate_list = [optimizer.ask() for _ in range(min(num_workers, budget - optimizer.num_ask))]
+        fitness_value_list = eval_func_batch(
+            urban_canopy_object=urban_canopy_object, fitness_func=fitness_function,
+            path_json_results_file=path_json_results_file,
+            candidate_kwargs_list=[candidate.kwargs for candidate in candidate_list],
+            path_simulation_folder=default_path_simulation_folder, number_of_workers=num_workers, seed=seed)
+        for candidate, fitness_value in zip(candidate_list, fitness_value_list):
+            optimizer.tell(candidate, fitness_value)
+        print(f"{optimizer.num_tell} / {budget} candidates evaluated")
+    recommendation = optimizer.provide_recommendation()
 
     # # Print the best individual
     print(f"optimized value: \n")
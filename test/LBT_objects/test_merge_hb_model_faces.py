@@ -0,0 +1,51 @@
+"""
+Unit tests for the merge of the coplanar faces of the Honeybee models of the buildings.
+"""
+
+import os
+
+from ladybug_geometry.geometry3d import Face3D, Point3D, Vector3D
+
+from bua.building.building_modeled import BuildingModeled
+from bua.building.merge_hb_model_faces.merge_hb_model_faces import group_coplanar_lb_face3d
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+
+path_test_hbjson_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons")
+test_hbjson_file_list = ["Building_sample_0.hbjson", "Building_sample_2.hbjson"]
+
+
+def make_wall(x_min, x_max, y=0., reverse=False):
+    """ Make a 3 m high vertical wall along the x axis """
+    vertex_list = [Point3D(x_min, y, 0), Point3D(x_max, y, 0), Point3D(x_max, y, 3), Point3D(x_min, y, 3)]
+    return Face3D(list(reversed(vertex_list)) if reverse else vertex_list)
+
+
+def test_coplanar_faces_are_grouped_with_the_first_coplanar_face():
+    """ Check the groups of walls in the same plane, in a parallel plane and far from the first wall """
+    lb_face3d_list = [make_wall(0, 5), make_wall(10, 15, y=0.5), make_wall(5, 10), make_wall(15, 20, reverse=True),
+                      make_wall(2000, 2005, y=0.005), make_wall(0, 5).rotate_xy(0.05, Point3D(0, 0, 0)),
+                      make_wall(0, 5).rotate_xy(1, Point3D(0, 0, 0)).move(Vector3D(0, 0, 10))]
+
+    face_group_list = group_coplanar_lb_face3d(lb_face3d_list, tolerance=0.01, angle_tolerance=0.1)
+
+    assert [[lb_face3d_list.index(face) for face in face_group] for face_group in face_group_list] == \
+           [[0, 2, 3, 4, 5], [1], [6]]
+
+
+def test_merged_faces_in_parallel_match_sequential_run():
+    """ Check that the merged faces HB models made in a pool of processes are the same as in the main process """
+    merged_faces_hb_model_dict_list = []
+    for run_in_parallel in [False, True]:
+        urban_canopy_obj = UrbanCanopy()
+        for hbjson_file in test_hbjson_file_list:
+            building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+                path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+            urban_canopy_obj.add_building_to_dict(building_id=building_id, building_obj=building_obj)
+        urban_canopy_obj.make_merged_faces_hb_model_of_buildings(run_in_parallel=run_in_parallel, number_of_workers=2)
+        merged_faces_hb_model_dict_list.append(
+            {building_id: building_obj.merged_faces_hb_model_dict for building_id, building_obj in
+             urban_canopy_obj.building_dict.items()})
+
+    assert all(merged_faces_hb_model_dict is not None for merged_faces_hb_model_dict in
+               merged_faces_hb_model_dict_list[0].values())
+    assert merged_faces_hb_model_dict_list[0] == merged_faces_hb_model_dict_list[1]
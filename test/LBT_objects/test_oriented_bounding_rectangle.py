@@ -0,0 +1,55 @@
+"""
+Unit tests for the oriented bounding rectangles of the footprints of the buildings.
+"""
+
+import numpy as np
+
+from math import pi, cos, sin
+
+from ladybug_geometry.geometry3d import Face3D, Point3D
+
+from bua.building.building_basic import BuildingBasic
+from bua.building.utils_buildings.lbt_obj_methods.lb_face_addons import compute_minimum_area_bounding_rectangle, \
+    make_LB_Face3D_oriented_bounding_rectangle_from_LB_Face3D_footprint, oriented_bounding_rectangle_cache_dict
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+
+
+def make_rotated_l_shaped_footprint(angle, x_translation=0.):
+    """ Make a L shaped footprint of 20 m by 10 m rotated by an angle in radians """
+    rotation_matrix = np.array([[cos(angle), sin(angle)], [-sin(angle), cos(angle)]])
+    vertex_array = np.array([[0, 0], [20, 0], [20, 10], [15, 10], [15, 4], [0, 4]]) @ rotation_matrix
+    return Face3D([Point3D(x + x_translation, y, 0) for x, y in vertex_array])
+
+
+def test_minimum_area_rectangle_of_rotated_footprint():
+    """ Check that the rectangle is aligned with the footprint, whatever its first vertex and orientation """
+    for angle in [0., 0.3, pi / 2, 2.]:
+        lb_face3d_rectangle, rectangle_angle = make_LB_Face3D_oriented_bounding_rectangle_from_LB_Face3D_footprint(
+            make_rotated_l_shaped_footprint(angle))
+        assert abs(lb_face3d_rectangle.area - 200.) < 1e-6
+        assert abs(rectangle_angle - angle % (pi / 2)) < 1e-9
+        assert lb_face3d_rectangle.normal.z > 0
+
+    rectangle_vertex_array, _ = compute_minimum_area_bounding_rectangle(
+        np.array([[4, 2], [0, 0], [6, 3], [2, 1]], dtype=float))
+    assert np.allclose(np.ptp(rectangle_vertex_array, axis=0), [6, 3])
+
+
+def test_bounding_boxes_in_parallel_match_sequential_run():
+    """ Check that the bounding boxes computed in a pool of processes are the same as in the main process """
+    bounding_box_dict_list = []
+    for run_in_parallel in [False, True]:
+        oriented_bounding_rectangle_cache_dict.clear()
+        urban_canopy_obj = UrbanCanopy()
+        for index in range(4):
+            building_obj = BuildingBasic(identifier=str(index), lb_face_footprint=make_rotated_l_shaped_footprint(
+                angle=0.2 * index, x_translation=50. * index))
+            building_obj.height, building_obj.elevation = 9., 0.
+            urban_canopy_obj.building_dict[building_obj.id] = building_obj
+        urban_canopy_obj.make_oriented_bounding_boxes_of_buildings(run_in_parallel=run_in_parallel,
+                                                                   number_of_workers=2)
+        assert len(oriented_bounding_rectangle_cache_dict) == 4
+        bounding_box_dict_list.append({building_id: building_obj.lb_polyface3d_oriented_bounding_box.to_dict()
+                                       for building_id, building_obj in urban_canopy_obj.building_dict.items()})
+
+    assert bounding_box_dict_list[0] == bounding_box_dict_list[1]
@@ -0,0 +1,98 @@
+"""
+Unit tests for the batched ray casting of the second pass of the context filtering.
+"""
+
+import pickle
+import numpy as np
+import pyvista as pv
+
+from ladybug_geometry.geometry3d import Point3D, Plane, Polyface3D
+
+from bua.building.context_filter.utils_functions_context_filter import are_hb_face_or_lb_face3d_facing, \
+    ray_list_from_emitter_to_receiver, get_face_arrays_for_ray_tracing, are_faces_facing_vectorized, \
+    ray_arrays_from_emitter_to_receiver_vectorized
+from bua.urban_canopy.uc_context_filter.canopy_mesh_bvh import CanopyMeshBvh
+
+
+def test_batched_ray_casting_matches_pyvista_ray_trace():
+    """
+    Check that the ray casting on the BVH finds the same obstructed rays as the Pyvista ray tracing
+    """
+    pyvista_mesh = pv.Box(bounds=(0, 10, 0, 10, 0, 20)) + pv.Box(bounds=(20, 28, -5, 5, 0, 12)) + pv.Box(
+        bounds=(-15, -8, 15, 30, 0, 30))
+    canopy_mesh_bvh = CanopyMeshBvh.from_pyvista_mesh(pyvista_mesh=pyvista_mesh)
+
+    rng = np.random.default_rng(0)
+    start_point_array = rng.uniform(-30, 40, size=(500, 3)) * np.array([1, 1, 0.5]) + np.array([0, 0, 15])
+    end_point_array = rng.uniform(-30, 40, size=(500, 3)) * np.array([1, 1, 0.5]) + np.array([0, 0, 15])
+
+    is_obstructed_array = canopy_mesh_bvh.are_segments_obstructed(start_point_array=start_point_array,
+                                                                  end_point_array=end_point_array,
+                                                                  number_of_rays_per_block=16)
+    for start_point, end_point, is_obstructed in zip(start_point_array, end_point_array, is_obstructed_array):
+        _, ind = pyvista_mesh.ray_trace(origin=start_point, end_point=end_point, first_point=False, plot=False)
+        assert is_obstructed == (ind.size > 0)
+
+
+def test_vectorized_rays_match_ray_list_from_emitter_to_receiver():
+    """
+    Check that the vectorized facing check and ray generation give the same results as the non vectorized versions
+    """
+    emitter_lb_face3d_list = list(Polyface3D.from_box(width=10, depth=10, height=20).faces)
+    receiver_lb_face3d_list = list(Polyface3D.from_box(width=8, depth=6, height=30, base_plane=Plane(
+        o=Point3D(20, 5, 0))).faces) + list(Polyface3D.from_box(width=8, depth=6, height=12, base_plane=Plane(
+        o=Point3D(-5, -20, 0))).faces)
+    emitter_face_array_dict = get_face_arrays_for_ray_tracing(hb_face_or_lb_face3d_list=emitter_lb_face3d_list)
+    receiver_face_array_dict = get_face_arrays_for_ray_tracing(hb_face_or_lb_face3d_list=receiver_lb_face3d_list)
+    is_facing_array = are_faces_facing_vectorized(
+        emitter_face_array_dict={key: array[None, :] for key, array in emitter_face_array_dict.items()},
+        receiver_face_array_dict={key: array[:, None] for key, array in receiver_face_array_dict.items()})
+
+    for number_of_rays in [1, 3, 9]:
+        for receiver_index, receiver_lb_face3d in enumerate(receiver_lb_face3d_list):
+            for emitter_index, emitter_lb_face3d in enumerate(emitter_lb_face3d_list):
+                assert is_facing_array[receiver_index, emitter_index] == are_hb_face_or_lb_face3d_facing(
+                    emitter_lb_face3d, receiver_lb_face3d)
+                start_point_array, end_point_array = ray_arrays_from_emitter_to_receiver_vectorized(
+                    emitter_face_array_dict={key: array[[emitter_index]] for key, array in
+                                             emitter_face_array_dict.items()},
+                    receiver_face_array_dict={key: array[[receiver_index]] for key, array in
+                                              receiver_face_array_dict.items()},
+                    number_of_rays=number_of_rays)
+                ray_list = ray_list_from_emitter_to_receiver(face_emitter=emitter_lb_face3d,
+                                                             face_receiver=receiver_lb_face3d,
+                                                             number_of_rays=number_of_rays)
+                assert np.allclose(start_point_array[0], [ray[0] for ray in ray_list], rtol=0, atol=1e-12)
+                assert np.allclose(end_point_array[0], [ray[1] for ray in ray_list], rtol=0, atol=1e-12)
+
+
+def test_canopy_mesh_bvh_building_triangle_ranges_and_pickling():
+    """
+    Check that the triangles of the BVH are grouped by building and that the BVH gives the same results once pickled
+    """
+    building_id_list = ["building_0", "building_1"]
+    canopy_mesh_bvh = CanopyMeshBvh.from_hb_model_and_lb_polyface3d_list(
+        building_id_list=building_id_list,
+        hb_model_and_lb_polyface3d_list=[Polyface3D.from_box(width=10, depth=10, height=20),
+                                         Polyface3D.from_box(width=8, depth=6, height=12,
+                                                             base_plane=Plane(o=Point3D(20, 0, 0)))],
+        building_source_key_list=["lb_polyface3d_extruded_footprint"] * 2)
+    # 6 rectangular faces, 12 triangles per box
+    assert canopy_mesh_bvh.get_building_triangle_index_range("building_0") == (0, 12)
+    assert canopy_mesh_bvh.get_building_triangle_index_range("building_1") == (12, 24)
+    start_index, stop_index = canopy_mesh_bvh.get_building_triangle_index_range("building_1")
+    assert (canopy_mesh_bvh.vertex_0_array[start_index:stop_index, 0] >= 20).all()
+    assert canopy_mesh_bvh.is_up_to_date(building_id_list=building_id_list,
+                                         building_source_key_list=["lb_polyface3d_extruded_footprint"] * 2)
+    assert not canopy_mesh_bvh.is_up_to_date(building_id_list=building_id_list[:1],
+                                             building_source_key_list=["lb_polyface3d_extruded_footprint"])
+
+    start_point_array = np.array([[-5, 5, 5], [-5, 5, 25], [15, -5, 5], [15, 3, 5]])
+    end_point_array = np.array([[35, 5, 5], [35, 5, 25], [15, 15, 5], [25, 3, 5]])
+    is_obstructed_array = canopy_mesh_bvh.are_segments_obstructed(start_point_array=start_point_array,
+                                                                  end_point_array=end_point_array)
+    assert is_obstructed_array.tolist() == [True, False, False, True]
+    unpickled_canopy_mesh_bvh = pickle.loads(pickle.dumps(canopy_mesh_bvh))
+    assert (unpickled_canopy_mesh_bvh.are_segments_obstructed(start_point_array=start_point_array,
+                                                              end_point_array=end_point_array)
+            == is_obstructed_array).all()
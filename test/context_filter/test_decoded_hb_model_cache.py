@@ -0,0 +1,93 @@
+"""
+Unit tests for the cache of the decoded merged faces Honeybee Models of the urban canopy.
+"""
+
+import os
+
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.urban_canopy.utils_urban_canopy.decoded_hb_model_cache import DecodedHbModelCache, \
+    estimate_size_of_object_in_bytes
+from bua.building.building_modeled import BuildingModeled
+
+path_test_hbjson_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons")
+test_hbjson_file_list = ["Building_sample_0.hbjson", "Building_sample_1.hbjson", "Building_sample_2.hbjson"]
+
+
+def make_urban_canopy_with_merged_faces_hb_models():
+    """
+    Make an urban canopy with a few target buildings, with their HB model used as merged faces HB model, the merging
+    itself is not tested here
+    """
+    urban_canopy_obj = UrbanCanopy()
+    for hbjson_file in test_hbjson_file_list:
+        building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+            path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+        building_obj.set_merged_faces_hb_model_dict(building_obj.hb_model_obj.to_dict())
+        urban_canopy_obj.add_building_to_dict(building_id=building_id, building_obj=building_obj)
+
+    return urban_canopy_obj
+
+
+def test_decoded_models_are_shared_and_refreshed_when_the_geometry_changes():
+    """
+    Check that the merged faces HB models are decoded once, and decoded again only when their version changes
+    """
+    urban_canopy_obj = make_urban_canopy_with_merged_faces_hb_models()
+    hb_model_cache = urban_canopy_obj.hb_model_cache
+    building_obj = list(urban_canopy_obj.building_dict.values())[0]
+
+    hb_model_obj = building_obj.get_merged_faces_hb_model_obj(hb_model_cache=hb_model_cache)
+    assert building_obj.get_merged_faces_hb_model_obj(hb_model_cache=hb_model_cache) is hb_model_obj
+    assert (hb_model_cache.hit_count, hb_model_cache.miss_count) == (1, 1)
+
+    # Moving the building keeps the moved model in the cache
+    min_z = hb_model_obj.min.z
+    urban_canopy_obj.move_building(building_obj=building_obj, vector=[0., 0., 5.])
+    moved_hb_model_obj = building_obj.get_merged_faces_hb_model_obj(hb_model_cache=hb_model_cache)
+    assert (hb_model_cache.hit_count, hb_model_cache.miss_count) == (3, 1)
+    assert abs(moved_hb_model_obj.min.z - min_z - 5.) < 1e-6
+    # The model previously given by the cache is not moved
+    assert moved_hb_model_obj is not hb_model_obj and hb_model_obj.min.z == min_z
+    assert moved_hb_model_obj.to_dict() == building_obj.merged_faces_hb_model_dict
+
+    # A new merged faces HB model is decoded again
+    building_obj.set_merged_faces_hb_model_dict(building_obj.hb_model_obj.to_dict())
+    assert building_obj.get_merged_faces_hb_model_obj(hb_model_cache=hb_model_cache) is not moved_hb_model_obj
+    assert hb_model_cache.miss_count == 2
+
+    # The context buildings of the second pass come from the cache
+    context_building_id_list = [building_id for building_id in urban_canopy_obj.building_dict
+                                if building_id != building_obj.id]
+    building_obj.shading_context_obj.selected_context_building_id_list = context_building_id_list
+    context_hb_model_list = building_obj.get_context_hb_model_or_lb_polyface3d_list_to_test(
+        uc_building_dictionary=urban_canopy_obj.building_dict, hb_model_cache=hb_model_cache)
+    assert hb_model_cache.miss_count == 2 + len(context_building_id_list)
+    assert all(hb_model_obj is other_hb_model_obj for hb_model_obj, other_hb_model_obj in zip(
+        context_hb_model_list, building_obj.get_context_hb_model_or_lb_polyface3d_list_to_test(
+            uc_building_dictionary=urban_canopy_obj.building_dict, hb_model_cache=hb_model_cache)))
+    assert hb_model_cache.miss_count == 2 + len(context_building_id_list)
+    assert len(hb_model_cache) == len(test_hbjson_file_list)
+
+def test_least_recently_used_models_are_evicted():
+    """ Check that the least recently used models are evicted when the memory limit is exceeded """
+    urban_canopy_obj = make_urban_canopy_with_merged_faces_hb_models()
+    building_obj_list = list(urban_canopy_obj.building_dict.values())
+    size_in_bytes_list = [estimate_size_of_object_in_bytes(building_obj.merged_faces_hb_model_dict) for
+                          building_obj in building_obj_list]
+    # Room for the two largest models only
+    hb_model_cache = DecodedHbModelCache(max_memory_in_mb=(sum(size_in_bytes_list) - 1) / 1024 ** 2)
+
+    for building_obj in building_obj_list:
+        building_obj.get_merged_faces_hb_model_obj(hb_model_cache=hb_model_cache)
+    assert hb_model_cache.eviction_count >= 1
+    assert building_obj_list[0].id not in hb_model_cache.cached_model_dict
+    assert building_obj_list[-1].id in hb_model_cache.cached_model_dict
+    assert hb_model_cache.memory_in_bytes <= hb_model_cache.max_memory_in_bytes
+    statistics_dict = hb_model_cache.get_statistics_dict()
+    assert statistics_dict["miss_count"] == len(building_obj_list)
+    assert statistics_dict["number_of_cached_models"] == len(hb_model_cache)
+
+    # Removing a building removes its model from the cache
+    urban_canopy_obj.hb_model_cache = hb_model_cache
+    urban_canopy_obj.remove_building_from_dict(building_obj_list[-1].id)
+    assert building_obj_list[-1].id not in hb_model_cache.cached_model_dict
@@ -0,0 +1,94 @@
+"""
+Unit tests for the vectorized first pass of the context filtering (minimum view factor criterion).
+"""
+
+import numpy as np
+
+from ladybug_geometry.geometry3d import Point3D, Face3D, Polyface3D
+
+from bua.building.context_filter.building_context import BuildingContextFilter, min_mvfc
+from bua.building.context_filter.utils_functions_mvfc import majorized_vf_between_2_surfaces, \
+    majorized_vf_between_2_surfaces_vectorized
+from bua.urban_canopy.uc_context_filter.bounding_box_spatial_index import BoundingBoxSpatialIndex
+
+
+def make_box(x, y, width, depth, height):
+    """ Make a box Polyface3D """
+    return Polyface3D.from_box(width=width, depth=depth, height=height, base_plane=None).move(
+        Point3D(x, y, 0) - Point3D(0, 0, 0))
+
+
+def test_vectorized_majorized_vf_matches_scalar_version():
+    """
+    Check that the vectorized majorized view factor gives the same values as the scalar version
+    """
+    rng = np.random.default_rng(0)
+    point_array_1 = rng.uniform(-50, 50, size=(20, 3))
+    point_array_2 = rng.uniform(-50, 50, size=(30, 3))
+    area_array_1 = rng.uniform(0.5, 200, size=20)
+    area_array_2 = rng.uniform(0.5, 200, size=30)
+    # Add an overlapping case
+    point_array_2[0] = point_array_1[0]
+
+    distance_matrix = np.linalg.norm(point_array_1[:, None, :] - point_array_2[None, :, :], axis=2)
+    vf_matrix = majorized_vf_between_2_surfaces_vectorized(distance_array=distance_matrix,
+                                                           area_1_array=area_array_1[:, None],
+                                                           area_2_array=area_array_2[None, :])
+    for i in range(20):
+        for j in range(30):
+            vf = majorized_vf_between_2_surfaces(point3d_centroid_1=Point3D(*point_array_1[i]),
+                                                 area_1=area_array_1[i],
+                                                 point3d_centroid_2=Point3D(*point_array_2[j]),
+                                                 area_2=area_array_2[j])
+            assert np.isclose(vf_matrix[i, j], vf, rtol=1e-9, atol=1e-12)
+
+
+def test_vectorized_first_pass_selects_same_buildings():
+    """
+    Check that the vectorized first pass selects the same context buildings as the original one
+    """
+    target_lb_polyface3d = make_box(0, 0, 10, 10, 20)
+    uc_building_id_list = ["target"] + [f"building_{i}" for i in range(12)]
+    uc_building_bounding_box_list = [target_lb_polyface3d] + [make_box(15 * i - 60, 25 + 5 * (i % 3), 8, 8, 10 + i)
+                                                             for i in range(12)]
+    spatial_index = BoundingBoxSpatialIndex.from_building_bounding_boxes(
+        uc_building_id_list=uc_building_id_list, uc_building_bounding_box_list=uc_building_bounding_box_list)
+
+    for min_vf_criterion in [0.1, 0.01, 0.001]:
+        context_filter = BuildingContextFilter()
+        context_filter.min_vf_criterion = min_vf_criterion
+        context_filter_vectorized = BuildingContextFilter()
+        context_filter_vectorized.min_vf_criterion = min_vf_criterion
+
+        selected_id_list, _ = context_filter.select_context_building_using_the_mvfc(
+            target_lb_polyface3d_of_outdoor_faces=target_lb_polyface3d, target_building_id="target",
+            uc_building_id_list=uc_building_id_list, uc_building_bounding_box_list=uc_building_bounding_box_list)
+        selected_id_list_vectorized, _ = context_filter_vectorized.select_context_building_using_the_mvfc_vectorized(
+            target_lb_polyface3d_of_outdoor_faces=target_lb_polyface3d, target_building_id="target",
+            uc_bounding_box_spatial_index=spatial_index)
+
+        assert selected_id_list == selected_id_list_vectorized
+
+
+def test_no_face_beyond_the_cutoff_distance_verifies_the_mvfc():
+    """
+    Check that the majorized view factor of the faces at and beyond the cutoff distance of the spatial index is below
+    the minimum view factor criterion, down to the smallest criterion allowed, where the terms of the view factor
+    cancel out
+    """
+    rng = np.random.default_rng(1)
+    area_array_1 = rng.uniform(0.01, 500, size=20000)
+    area_array_2 = rng.uniform(0.01, 500, size=20000)
+    for min_vf_criterion in [0.1, 0.01, 0.001, 0.0001, min_mvfc]:
+        cutoff_distance_array = BoundingBoxSpatialIndex.mvfc_cutoff_distance(
+            target_face_area=area_array_1, max_context_face_area=float(np.max(area_array_2)),
+            min_vf_criterion=min_vf_criterion)
+        for distance_array in [cutoff_distance_array, cutoff_distance_array * rng.uniform(1, 100, size=20000)]:
+            vf_array = majorized_vf_between_2_surfaces_vectorized(distance_array=distance_array,
+                                                                  area_1_array=area_array_1,
+                                                                  area_2_array=area_array_2)
+            assert np.all(vf_array < min_vf_criterion)
+            for i in range(0, 20000, 500):
+                assert majorized_vf_between_2_surfaces(
+                    point3d_centroid_1=Point3D(0, 0, 0), area_1=area_array_1[i],
+                    point3d_centroid_2=Point3D(distance_array[i], 0, 0), area_2=area_array_2[i]) < min_vf_criterion
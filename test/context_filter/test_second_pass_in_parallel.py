@@ -0,0 +1,64 @@
+"""
+Unit tests for the second pass of the context filtering run in a pool of processes.
+"""
+
+import os
+
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.building.building_modeled import BuildingModeled
+
+path_test_hbjson_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons")
+test_hbjson_file_list = ["Building_sample_0.hbjson", "Building_sample_1.hbjson", "Building_sample_2.hbjson"]
+
+
+def make_urban_canopy_after_first_pass():
+    """ Make an urban canopy with a few target buildings and perform the first pass of the context filtering """
+    urban_canopy_obj = UrbanCanopy()
+    for hbjson_file in test_hbjson_file_list:
+        building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+            path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+        urban_canopy_obj.add_building_to_dict(building_id=building_id, building_obj=building_obj)
+    urban_canopy_obj.perform_first_pass_context_filtering_on_buildings(min_vf_criterion=0.001, overwrite=True)
+
+    return urban_canopy_obj
+
+
+def test_second_pass_in_parallel_matches_sequential_run():
+    """
+    Check that the second pass run in parallel selects the same shades, with the same constructions, as the
+    sequential run
+    """
+    result_list = []
+    for run_in_parallel in [False, True]:
+        urban_canopy_obj = make_urban_canopy_after_first_pass()
+        urban_canopy_obj.perform_second_pass_context_filtering_on_buildings(
+            number_of_rays=3, consider_windows=True, overwrite=True, keep_discarded_faces=True,
+            run_in_parallel=run_in_parallel, number_of_workers=2)
+        shade_dict = {building_id: [hb_shade.to_dict() for hb_shade in
+                                    building_obj.shading_context_obj.context_shading_hb_shade_list]
+                      for building_id, building_obj in urban_canopy_obj.building_dict.items()}
+        result_list.append((shade_dict, list(urban_canopy_obj.shade_manager.shade_construction_dict.keys())))
+        # The shades share the constructions of the ShadeManager of the urban canopy
+        for building_obj in urban_canopy_obj.building_dict.values():
+            for hb_shade in building_obj.shading_context_obj.context_shading_hb_shade_list:
+                construction = hb_shade.properties.energy.construction
+                assert construction is urban_canopy_obj.shade_manager.shade_construction_dict[
+                    (construction.solar_reflectance, construction.visible_reflectance, construction.is_specular)]
+
+    assert sum(len(shade_list) for shade_list in result_list[0][0].values()) > 0
+    assert result_list[0] == result_list[1]
+
+
+def test_second_pass_without_ray_tracing_does_not_build_the_canopy_meshes():
+    """
+    Check that the second pass without ray tracing keeps all the surfaces of the context without building the BVH or
+    the Pyvista mesh of the urban canopy
+    """
+    for use_bvh in [True, False]:
+        urban_canopy_obj = make_urban_canopy_after_first_pass()
+        result_summary_dict = urban_canopy_obj.perform_second_pass_context_filtering_on_buildings(
+            no_ray_tracing=True, overwrite=True, use_bvh=use_bvh)
+        assert urban_canopy_obj.canopy_mesh_bvh is None and urban_canopy_obj.full_context_pyvista_mesh is None
+        assert sum(building_result_dict["nb_context_faces"] for building_result_dict in
+                   result_summary_dict.values()) > 0
+
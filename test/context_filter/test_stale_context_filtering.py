@@ -0,0 +1,91 @@
+"""
+Unit tests for the incremental context filtering, recomputed only for the buildings close to modified buildings.
+"""
+
+import os
+
+from ladybug_geometry.geometry3d import Point3D, Face3D
+
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.building.building_basic import BuildingBasic
+from bua.building.building_modeled import BuildingModeled
+from bua.utils.utils_configuration import name_urban_canopy_store_folder
+
+path_test_hbjson_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons")
+test_hbjson_file_list = ["Building_sample_0.hbjson", "Building_sample_1.hbjson", "Building_sample_2.hbjson"]
+
+
+def make_building_basic(identifier, x, y, size=10., height=10.):
+    """ Make a BuildingBasic with a square footprint """
+    building_obj = BuildingBasic(identifier=identifier, lb_face_footprint=Face3D(
+        [Point3D(x, y, 0), Point3D(x + size, y, 0), Point3D(x + size, y + size, 0), Point3D(x, y + size, 0)]))
+    building_obj.height = height
+
+    return building_obj
+
+
+def test_stale_context_filtering_of_modified_buildings():
+    """
+    Check that only the target buildings close to the added or removed buildings have their context filtering
+    invalidated
+    """
+    urban_canopy_obj = UrbanCanopy()
+    for hbjson_file in test_hbjson_file_list:
+        building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+            path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+        urban_canopy_obj.add_building_to_dict(building_id=building_id, building_obj=building_obj)
+    assert len(urban_canopy_obj.modified_building_bounding_box_dict) == 3
+    urban_canopy_obj.perform_first_pass_context_filtering_on_buildings(min_vf_criterion=0.01, overwrite=True)
+    # The first pass consumes the buildings marked as modified
+    assert urban_canopy_obj.modified_building_bounding_box_dict == {}
+    assert urban_canopy_obj.get_stale_context_filtering_building_id_list() == []
+
+    # A building far away from all the target buildings does not affect them
+    urban_canopy_obj.add_building_to_dict(building_id="far_building",
+                                          building_obj=make_building_basic("far_building", 1e7, 1e7))
+    assert urban_canopy_obj.invalidate_stale_context_filtering() == []
+    assert all(building_obj.shading_context_obj.first_pass_done for building_obj in
+               urban_canopy_obj.building_dict.values() if isinstance(building_obj, BuildingModeled))
+
+    # A building next to a target building affects it
+    bounding_box = urban_canopy_obj.building_dict["Buil_TA_0"].lb_polyface3d_oriented_bounding_box
+    urban_canopy_obj.add_building_to_dict(building_id="close_building", building_obj=make_building_basic(
+        "close_building", bounding_box.max.x + 5., bounding_box.min.y))
+    # The bounding box of the new building is made by the passes, not by the query
+    assert urban_canopy_obj.get_stale_context_filtering_building_id_list() == []
+    assert urban_canopy_obj.building_dict["close_building"].lb_polyface3d_oriented_bounding_box is None
+    urban_canopy_obj.update_bounding_boxes_of_modified_buildings()
+    assert "Buil_TA_0" in urban_canopy_obj.get_stale_context_filtering_building_id_list()
+
+    # Removing a building affects the target buildings that selected it
+    urban_canopy_obj.modified_building_bounding_box_dict = {}
+    urban_canopy_obj.remove_building_from_dict("Buil_TA_2")
+    stale_building_id_list = urban_canopy_obj.invalidate_stale_context_filtering()
+    assert {"Buil_TA_0", "Buil_TA_1"} <= set(stale_building_id_list)
+    assert not urban_canopy_obj.building_dict["Buil_TA_0"].shading_context_obj.first_pass_done
+    assert urban_canopy_obj.modified_building_bounding_box_dict == {}
+    assert "Buil_TA_0" not in urban_canopy_obj.context_filtering_fingerprint_dict
+
+
+def test_stale_context_filtering_does_not_load_the_target_buildings(tmp_path):
+    """
+    Check that the stale buildings are found from the fingerprints of the first pass, without loading the target
+    buildings of an urban canopy loaded from a store
+    """
+    urban_canopy_obj = UrbanCanopy()
+    for hbjson_file in test_hbjson_file_list:
+        building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+            path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+        urban_canopy_obj.add_building_to_dict(building_id=building_id, building_obj=building_obj)
+    urban_canopy_obj.perform_first_pass_context_filtering_on_buildings(min_vf_criterion=0.01, overwrite=True)
+    bounding_box = urban_canopy_obj.building_dict["Buil_TA_0"].lb_polyface3d_oriented_bounding_box
+    urban_canopy_obj.to_store(path_simulation_folder=tmp_path)
+
+    loaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(
+        os.path.join(tmp_path, name_urban_canopy_store_folder))
+    loaded_urban_canopy_obj.add_building_to_dict(building_id="close_building", building_obj=make_building_basic(
+        "close_building", bounding_box.max.x + 5., bounding_box.min.y))
+    loaded_urban_canopy_obj.update_bounding_boxes_of_modified_buildings()
+    assert "Buil_TA_0" in loaded_urban_canopy_obj.get_stale_context_filtering_building_id_list()
+    assert not any(loaded_urban_canopy_obj.building_dict.is_loaded(building_id) for building_id in
+                   ["Buil_TA_0", "Buil_TA_1", "Buil_TA_2"])
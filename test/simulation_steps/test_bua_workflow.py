@@ -45,7 +45,7 @@ def test_make_and_save_urban_canopy_object():
     # Save the UrbanCanopy object to a pickle and json files
     SimulationCommonMethods.save_urban_canopy_object_to_pickle(urban_canopy_object=urban_canopy_object,
                                                                path_simulation_folder=path_simulation_temp_folder)
-    assert os.path.isfile(os.path.join(path_simulation_temp_folder, "urban_canopy.pkl"))
+    assert os.path.isfile(os.path.join(path_simulation_temp_folder, "urban_canopy_store", "index.pkl"))
     SimulationCommonMethods.save_urban_canopy_to_json(urban_canopy_object=urban_canopy_object,
                                                       path_simulation_folder=path_simulation_temp_folder)
     assert os.path.isfile(os.path.join(path_simulation_temp_folder, "urban_canopy.json"))
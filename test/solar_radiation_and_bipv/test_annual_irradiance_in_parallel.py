@@ -0,0 +1,49 @@
+"""
+Unit tests for the annual solar irradiance simulations of several buildings in parallel.
+"""
+
+import threading
+
+from bua.urban_canopy.uc_solar_radiation.annual_irradiance_in_parallel import \
+    run_annual_solar_irradiance_simulation_in_parallel
+from bua.utils.utils_parallel import split_workers_between_tasks
+
+
+class BuildingRecordingIrradianceSimulation:
+    """ Building recording the parameters of its annual solar irradiance simulation instead of running Radiance """
+
+    def __init__(self, building_id, fail=False):
+        self.id = building_id
+        self.fail = fail
+        self.workers = None
+        self.thread_name = None
+
+    def run_annual_solar_irradiance_simulation(self, path_simulation_folder, path_weather_file, overwrite,
+                                               north_angle, silent, workers):
+        self.workers = workers
+        self.thread_name = threading.current_thread().name
+        if self.fail:
+            raise RuntimeError("the recipe failed")
+
+
+def test_split_workers_between_tasks():
+    """ Check that the budget of workers is split between the tasks running at the same time """
+    assert split_workers_between_tasks(number_of_workers=16, number_of_tasks=3) == (3, 5)
+    assert split_workers_between_tasks(number_of_workers=16, number_of_tasks=40) == (16, 1)
+    assert split_workers_between_tasks(number_of_workers=16, number_of_tasks=40, min_workers_per_task=4) == (4, 4)
+    assert split_workers_between_tasks(number_of_workers=2, number_of_tasks=5, min_workers_per_task=4) == (1, 2)
+
+
+def test_failed_building_does_not_stop_the_others():
+    """ Check that each building gets its share of the workers and that a failure is reported in the results """
+    building_obj_list = [BuildingRecordingIrradianceSimulation("building_0"),
+                         BuildingRecordingIrradianceSimulation("building_1", fail=True),
+                         BuildingRecordingIrradianceSimulation("building_2")]
+    result_dict = run_annual_solar_irradiance_simulation_in_parallel(
+        building_obj_list=building_obj_list, path_simulation_folder="", path_weather_file="", number_of_workers=6)
+
+    assert list(result_dict.keys()) == ["building_0", "building_1", "building_2"]
+    assert [result_dict[building_id]["success"] for building_id in result_dict] == [True, False, True]
+    assert "the recipe failed" in result_dict["building_1"]["error"]
+    assert all(building_obj.workers == 2 for building_obj in building_obj_list)
+    assert all(building_obj.thread_name != threading.current_thread().name for building_obj in building_obj_list)
@@ -0,0 +1,180 @@
+"""
+Unit tests for the computation of the energy harvested by the BIPV panels.
+"""
+
+import pickle
+import numpy as np
+
+from bua.bipv.bipv_technology import BipvTechnology
+from bua.bipv.bipv_panel import BipvPanel
+from bua.bipv.bipv_panel_fleet import BipvPanelFleet, not_working_value
+from bua.bipv.bipv_transportation import BipvTransportation
+from bua.building.solar_radiation_and_bipv.utils_bipv import simulate_bipv_yearly_energy_harvesting, \
+    prescreen_faces_for_bipv
+from bua.building.solar_radiation_and_bipv.solar_rad_and_BIPV import SolarRadAndBipvSimulation
+
+
+def make_pv_technology():
+    """ Make a PV technology with a degrading efficiency """
+    pv_tech_obj = BipvTechnology("test_technology")
+    pv_tech_obj.max_power_output = 350
+    pv_tech_obj.panel_area = 2.03
+    pv_tech_obj.weibull_law_failure_parameters = {"lifetime": 30, "shape": 2.49}
+    pv_tech_obj.initial_efficiency = 0.173
+    pv_tech_obj.first_year_degrading_rate = 0.02
+    pv_tech_obj.degrading_rate = 0.005
+    pv_tech_obj.infrastructure_performance_ratio = 0.8
+    pv_tech_obj.efficiency_function = pv_tech_obj.degrading_rate_efficiency_loss
+
+    return pv_tech_obj
+
+
+def test_yearly_energy_harvesting_matches_hourly_sum():
+    """
+    Check that the energy harvested every year is the sum over the sun hours of the power of the panels, capped to
+    the maximum power of the panels and to the inverter capacity
+    """
+    rng = np.random.default_rng(0)
+    hourly_irradiance_table = rng.uniform(0., 1400., size=(40, 300)).tolist()
+    pv_tech_obj = make_pv_technology()
+    bipv_panel_fleet = BipvPanelFleet(index_list=range(0, 40, 2), pv_technology_obj=pv_tech_obj)
+    bipv_panel_fleet.initialize_or_replace_panels()
+    # Make sure no panel fails during the test
+    bipv_panel_fleet.life_expectancy_array[:] = 10
+    inverter_capacity = 0.5 * pv_tech_obj.max_power_output * len(bipv_panel_fleet)
+
+    expected_energy_list = []
+    for age in range(3):
+        efficiency = pv_tech_obj.get_efficiency_over_a_year(age=age)
+        hourly_power_table = [[min(irradiance * efficiency * pv_tech_obj.panel_area *
+                                   pv_tech_obj.infrastructure_performance_ratio, pv_tech_obj.max_power_output)
+                               for irradiance in hourly_irradiance_table[face_index]]
+                              for face_index in bipv_panel_fleet.index_array]
+        expected_energy_list.append(sum(min(sum(hourly_power), inverter_capacity) for hourly_power in
+                                        zip(*hourly_power_table)) / 1000)
+
+    energy_list, nb_of_panels_installed_list = simulate_bipv_yearly_energy_harvesting(
+        bipv_panel_fleet=bipv_panel_fleet, hourly_solar_irradiance_table=hourly_irradiance_table,
+        inverter_capacity=inverter_capacity, start_year=2019, current_study_duration_in_years=1,
+        uc_start_year=2019, uc_end_year=2023, replacement_scenario="no_replacement")
+
+    assert nb_of_panels_installed_list == [0, 0, 0]
+    assert np.allclose(energy_list, expected_energy_list, rtol=1e-12, atol=0.)
+    # Some panels are capped by their maximum power output
+    assert max(max(row) for row in hourly_irradiance_table) > pv_tech_obj.max_power_output / (
+            pv_tech_obj.panel_area * pv_tech_obj.initial_efficiency * pv_tech_obj.infrastructure_performance_ratio)
+
+
+def test_panel_fleet_aging_failure_and_replacement():
+    """
+    Check that the panels fail when they reach their life expectancy and that only the failed panels are replaced
+    """
+    pv_tech_obj = make_pv_technology()
+    bipv_panel_fleet = BipvPanelFleet(index_list=range(6), pv_technology_obj=pv_tech_obj)
+    assert not bipv_panel_fleet.get_working_mask().any()
+    assert bipv_panel_fleet.initialize_or_replace_panels() == 6
+    assert (bipv_panel_fleet.life_expectancy_array >= 1).all()
+
+    bipv_panel_fleet.life_expectancy_array[:] = [1, 2, 2, 3, 5, 5]
+    bipv_panel_fleet.increment_age_by_one_year()
+    bipv_panel_fleet.increment_age_by_one_year()
+    assert bipv_panel_fleet.get_working_mask().tolist() == [False, False, False, True, True, True]
+    assert bipv_panel_fleet.age_array.tolist() == [not_working_value] * 3 + [2, 2, 2]
+
+    new_pv_tech_obj = make_pv_technology()
+    assert bipv_panel_fleet.initialize_or_replace_panels(panel_mask=~bipv_panel_fleet.get_working_mask(),
+                                                         pv_tech_obj=new_pv_tech_obj) == 3
+    assert bipv_panel_fleet.get_working_mask().all()
+    assert bipv_panel_fleet.age_array.tolist() == [0, 0, 0, 2, 2, 2]
+    assert bipv_panel_fleet.technology_index_array.tolist() == [1, 1, 1, 0, 0, 0]
+    assert bipv_panel_fleet.get_sum_of_technology_attribute("panel_area") == 6 * pv_tech_obj.panel_area
+
+
+def test_array_efficiency_power_and_life_expectancy_match_single_panel():
+    """
+    Check that the efficiency and the power computed for arrays of panels are the same as panel by panel, and that
+    the life expectancies are reproducible with a seeded generator
+    """
+    pv_tech_obj = make_pv_technology()
+    age_array = np.array([0, 1, 5, 12])
+    hourly_irradiance_array = np.random.default_rng(0).uniform(0., 1400., size=(4, 50))
+
+    assert np.allclose(pv_tech_obj.get_efficiency_of_age_array(age_array=age_array),
+                       [pv_tech_obj.get_efficiency_over_a_year(age=int(age)) for age in age_array])
+    assert np.allclose(pv_tech_obj.get_efficiency_of_age_array(age_array=age_array,
+                                                               efficiency_function="constant_efficiency"),
+                       pv_tech_obj.initial_efficiency)
+    assert pv_tech_obj.get_efficiency_over_a_year(age=3, efficiency_function=BipvTechnology.constant_efficiency) == \
+           pv_tech_obj.initial_efficiency
+    assert np.allclose(pv_tech_obj.get_hourly_power_generation_array(hourly_irradiance_array, age=age_array),
+                       [pv_tech_obj.get_hourly_power_generation_over_a_year_by_panel(hourly_irradiance_list, age=age)
+                        for hourly_irradiance_list, age in zip(hourly_irradiance_array.tolist(), age_array)])
+    assert pv_tech_obj.get_hourly_power_generation_array(hourly_irradiance_array, age=0).max() == \
+           pv_tech_obj.max_power_output
+
+    life_expectancy_array = pv_tech_obj.get_life_expectancy_of_panels(
+        number_of_panels=1000, random_generator=np.random.default_rng(1))
+    assert np.array_equal(life_expectancy_array, pv_tech_obj.get_life_expectancy_of_panels(
+        number_of_panels=1000, random_generator=np.random.default_rng(1)))
+    # The mean of the Weibull distribution is about 0.89 times its scale parameter for a shape of 2.49
+    assert abs(life_expectancy_array.mean() - 0.5 - 0.887 * pv_tech_obj.weibull_law_failure_parameters[
+        "lifetime"]) < 1.
+
+
+def test_eroi_prescreening_matches_yearly_sum():
+    """
+    Check that the lifetime energy factor in closed form is the sum of the yearly energy, and that the faces are
+    selected according to their area and eroi
+    """
+    pv_tech_obj = make_pv_technology()
+    pv_tech_obj.primary_energy_manufacturing = 2840
+    pv_tech_obj.estimated_primary_energy_inverter = 284
+    pv_tech_obj.gtg_transportation = {"ghg_included": True, "primary_energy_included": False, "cost_included": True}
+    pv_tech_obj.recycling_transportation = {"ghg_included": True, "primary_energy_included": True,
+                                            "cost_included": True}
+    bipv_transportation_obj = BipvTransportation("test_transportation")
+    bipv_transportation_obj.gate_to_gate["pe_consumption"] = 76
+    for lifetime in [1, 2, 30]:
+        pv_tech_obj.weibull_law_failure_parameters["lifetime"] = lifetime
+        assert np.isclose(pv_tech_obj.get_lifetime_energy_factor(), sum(
+            pv_tech_obj.estimate_yearly_energy_harvested_by_panel_not_considering_inverter(irradiance=1., age=age)
+            for age in range(lifetime)))
+
+    primary_energy = 2840 + 284 + 76
+    annual_irradiance_array = np.array([100., 1000., 1000., 2000.])
+    eroi_array = pv_tech_obj.get_lifetime_energy_factor() * annual_irradiance_array / primary_energy
+    panel_face_index_array, area_mask, eroi_mask = prescreen_faces_for_bipv(
+        face_area_array=np.array([4., 4., 1., 4.]), annual_panel_irradiance_array=annual_irradiance_array,
+        pv_technology_obj=pv_tech_obj, bipv_transportation_obj=bipv_transportation_obj,
+        minimum_panel_eroi=float(eroi_array[1]) + 0.01)
+
+    assert panel_face_index_array.tolist() == [3]
+    assert area_mask.tolist() == [False, False, True, False]
+    assert eroi_mask.tolist() == [True, True, False, False]
+
+
+def test_panel_lists_of_older_pickles_are_converted_to_fleets():
+    """ Check that the lists of BipvPanel objects of older pickles are converted to panel fleets when unpickled """
+    pv_tech_obj = make_pv_technology()
+    bipv_panel_list = [BipvPanel(index=index, pv_technology_object=pv_tech_obj) for index in [1, 4, 6]]
+    bipv_panel_list[0].age, bipv_panel_list[0].life_expectancy = 3, 20
+    bipv_panel_list[2].age, bipv_panel_list[2].life_expectancy = 0, 12
+    solar_rad_and_bipv_obj = SolarRadAndBipvSimulation("test_building")
+    solar_rad_and_bipv_obj.parameter_dict["facades"]["panel_technology"] = pv_tech_obj
+    # Attributes of the older versions of the object
+    del solar_rad_and_bipv_obj.roof_panel_fleet
+    del solar_rad_and_bipv_obj.facades_panel_fleet
+    solar_rad_and_bipv_obj.roof_panel_list = bipv_panel_list
+    solar_rad_and_bipv_obj.facades_panel_list = []
+
+    loaded_solar_rad_and_bipv_obj = pickle.loads(pickle.dumps(solar_rad_and_bipv_obj))
+
+    assert not hasattr(loaded_solar_rad_and_bipv_obj, "roof_panel_list")
+    roof_panel_fleet = loaded_solar_rad_and_bipv_obj.roof_panel_fleet
+    assert roof_panel_fleet.index_array.tolist() == [1, 4, 6]
+    assert roof_panel_fleet.age_array.tolist() == [3, not_working_value, 0]
+    assert roof_panel_fleet.life_expectancy_array.tolist() == [20, not_working_value, 12]
+    assert roof_panel_fleet.technology_obj_list[0].identifier == "test_technology"
+    assert len(loaded_solar_rad_and_bipv_obj.facades_panel_fleet) == 0
+    assert loaded_solar_rad_and_bipv_obj.facades_panel_fleet.technology_obj_list[0].identifier == "test_technology"
+    loaded_solar_rad_and_bipv_obj.to_dict()
@@ -0,0 +1,326 @@
+"""
+Unit tests for the BIPV simulations of several buildings and of several scenarios in a pool of processes, and for the
+catalog of the BIPV libraries sending its objects to the processes as references.
+The irradiance results of the buildings are written to their result folders instead of running Radiance.
+"""
+
+import os
+import json
+import pytest
+import numpy as np
+import pandas as pd
+
+from multiprocessing.reduction import ForkingPickler
+
+import bua.urban_canopy.urban_canopy as urban_canopy_module
+
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.bipv.bipv_catalog import BipvCatalog, bipv_catalog
+from bua.bipv.bipv_panel_fleet import BipvPanelFleet
+from bua.bipv.bipv_technology import BipvTechnology
+from bua.building.building_modeled import BuildingModeled
+from bua.building.solar_radiation_and_bipv.solar_rad_and_BIPV import name_roof_ill_file, name_facades_ill_file, \
+    name_bipv_input_file
+from bua.building.solar_radiation_and_bipv.bipv_simulation_cache import BipvSimulationCache
+from bua.building.solar_radiation_and_bipv.utils_solar_radiation import get_path_npy_file_of_ill_file
+from bua.urban_canopy.uc_solar_radiation.bipv_scenario_sweep import make_bipv_scenario_parameter_grid
+from bua.utils.utils_configuration import name_radiation_simulation_folder
+
+path_test_hbjson_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons")
+test_hbjson_file_list = ["Building_sample_0.hbjson", "Building_sample_1.hbjson", "Building_sample_2.hbjson"]
+number_of_sun_up_hours = 50
+start_year = 2025
+
+bipv_library_dict = {
+    "test_technology": {
+        "type": "pv_technology", "id": "test_technology", "pv_type": "roof", "max_power_output_per_panel": 350,
+        "physical_parameters": {"panel_area": 2.03, "panel_weight": 22., "panel_volume": 0.05},
+        "failure_parameters": {"weibull_scale_parameter": 30, "weibull_shape_parameter": 2.49},
+        "efficiency_parameters": {"initial_efficiency": 0.173, "first_year_degrading_rate": 0.02,
+                                  "degrading_rate": 0.005, "infrastructure_performance_ratio": 0.8,
+                                  "efficiency_function": "degrading_rate_efficiency_loss"},
+        "lca_primary_energy_use": {"manufacturing_in_kWh_per_panel": 900., "end_of_life_in_kWh_per_panel": 20.},
+        "lca_ghg_emission": {"manufacturing_in_kgCO2eq_per_panel": 300., "end_of_life_in_kgCO2eq_per_panel": 5.},
+        "economic_parameters": {
+            "costs": {"total_investment_in_USD_per_panel": 250., "recycling_in_USD_per_panel": 10.},
+            "revenues": {"substituted_construction_material_roof_in_USD_per_panel": 20.,
+                         "substituted_construction_material_facade_in_USD_per_panel": 40.,
+                         "material_recovery_in_USD_per_panel": 5.}},
+        "annual_maintenance": {"primary_energy_use_in_kWh_per_panel": 1., "ghg_emission_in_kgCO2eq_per_panel": 0.5,
+                               "cost_in_USD_per_panel": 2.},
+        "inverter": {"estimated_ghg_emission_in_fraction_of_manufacturing": 0.1,
+                     "estimated_primary_energy_use_in_fraction_of_manufacturing": 0.1,
+                     "estimated_cost_in_fraction_investement_cost": 0.1},
+        "gate_to_gate_transportation": {"included_in_ghg_emission": False, "included_in_primary_energy_use": False,
+                                        "included_in_investements": False},
+        "recycling_transportation": {"included_in_ghg_emission": False, "included_in_primary_energy_use": False,
+                                     "included_in_investements": False}},
+    "test_transportation": {
+        "type": "transportation", "id": "test_transportation", "source": "factory", "destination": "site",
+        "from_factory_to_construction_site": {"ghg_emission_in_kgCo2_per_panel": 3.,
+                                              "pe_consumption_in_kWh_per_panel": 10., "cost_in_USD_per_panel": 4.},
+        "from_construction_site_to_recycling_factory": {"ghg_emission_in_kgCo2_per_panel": 1.,
+                                                        "pe_consumption_in_kWh_per_panel": 3.,
+                                                        "cost_in_USD_per_panel": 1.}},
+    "test_inverter": {
+        "type": "inverter", "id": "test_inverter", "replacement_frequency_in_year": 10,
+        "capacity_in_kW_vs_cost_in_USD": {"1": 300, "5": 900, "10": 1500, "50": 5000},
+        "environmental_impact": {"function": "linear", "coefficient_ghg_emission_in_kgCO2eq_per_kWp": 50.,
+                                 "offset_ghg_emission_in_kgCO2eq": 10.},
+        "primary_energy": {"function": "linear", "coefficient_primary_energy_in_kWh_per_kWp": 150.,
+                           "offset_primary_energy_in_kWh": 30.}}
+}
+# Technology which panels fail during the tests, the results depend on the random life expectancies of the panels
+bipv_library_dict["fragile_test_technology"] = {
+    **bipv_library_dict["test_technology"], "id": "fragile_test_technology",
+    "failure_parameters": {"weibull_scale_parameter": 2, "weibull_shape_parameter": 1.5}}
+
+
+def use_test_bipv_library(path_folder, monkeypatch):
+    """
+    Write the BIPV library of the tests and make the urban canopy load it instead of the library of the tool
+    :return: str, path of the json file of the library
+    """
+    path_default_folder = os.path.join(path_folder, "bipv_library", "default")
+    path_user_folder = os.path.join(path_folder, "bipv_library", "user")
+    os.makedirs(path_default_folder)
+    os.makedirs(path_user_folder)
+    with open(os.path.join(path_default_folder, "test_library.json"), "w") as json_file:
+        json.dump(bipv_library_dict, json_file)
+    monkeypatch.setattr(urban_canopy_module, "path_folder_default_bipv_parameters", path_default_folder)
+    monkeypatch.setattr(urban_canopy_module, "path_folder_user_bipv_parameters", path_user_folder)
+    return os.path.join(path_default_folder, "test_library.json")
+
+
+def make_urban_canopy_with_irradiance_results(path_simulation_folder):
+    """ Make an urban canopy of target buildings with the irradiance results of their roof and facades """
+    rng = np.random.default_rng(0)
+    urban_canopy_obj = UrbanCanopy()
+    for hbjson_file in test_hbjson_file_list:
+        building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+            path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+        urban_canopy_obj.add_building_to_dict(building_id=building_id, building_obj=building_obj)
+    urban_canopy_obj.generate_sensor_grid_on_buildings(roof_grid_size_x=2, roof_grid_size_y=2, facades_grid_size_x=2,
+                                                       facades_grid_size_y=2)
+    for building_obj in urban_canopy_obj.building_dict.values():
+        solar_rad_and_bipv_obj = building_obj.solar_radiation_and_bipv_simulation_obj
+        path_result_folder = os.path.join(path_simulation_folder, name_radiation_simulation_folder,
+                                          str(building_obj.id))
+        os.makedirs(path_result_folder, exist_ok=True)
+        for sensorgrid_dict, ill_file in [(solar_rad_and_bipv_obj.roof_sensorgrid_dict, name_roof_ill_file),
+                                          (solar_rad_and_bipv_obj.facades_sensorgrid_dict, name_facades_ill_file)]:
+            irradiance_array = rng.uniform(0., 1000., size=(len(sensorgrid_dict["sensors"]), number_of_sun_up_hours))
+            np.savetxt(os.path.join(path_result_folder, ill_file), irradiance_array)
+            annual_panel_irradiance_list = (irradiance_array.sum(axis=1) / 1000).tolist()
+            if ill_file == name_roof_ill_file:
+                solar_rad_and_bipv_obj.roof_annual_panel_irradiance_list = annual_panel_irradiance_list
+            else:
+                solar_rad_and_bipv_obj.facades_annual_panel_irradiance_list = annual_panel_irradiance_list
+
+    return urban_canopy_obj
+
+
+def run_bipv_panel_simulation(urban_canopy_obj, path_simulation_folder, **kwargs):
+    urban_canopy_obj.run_bipv_panel_simulation_on_buildings(
+        path_simulation_folder=path_simulation_folder, bipv_scenario_identifier="test_scenario",
+        building_id_list=None, roof_id_pv_tech="test_technology", facades_id_pv_tech="test_technology",
+        roof_transport_id="test_transportation", facades_transport_id="test_transportation",
+        roof_inverter_id="test_inverter", facades_inverter_id="test_inverter", minimum_panel_eroi=0.,
+        start_year=start_year, end_year=start_year + 3, replacement_frequency_in_years=1, no_csv=True, **kwargs)
+
+
+def test_parallel_bipv_simulation_matches_sequential(tmp_path, monkeypatch):
+    """
+    Check that the buildings simulated in a pool of processes with the same seed get the same panels, life expectancies
+    and results as the ones simulated sequentially, with a technology which life expectancies are random, that the
+    workers read the inputs of the buildings from their result folder, and that the results are summed at the urban
+    scale
+    """
+    use_test_bipv_library(tmp_path, monkeypatch)
+    sequential_urban_canopy_obj = make_urban_canopy_with_irradiance_results(tmp_path)
+    run_bipv_panel_simulation(sequential_urban_canopy_obj, tmp_path, seed=42)
+    parallel_urban_canopy_obj = make_urban_canopy_with_irradiance_results(tmp_path)
+    run_bipv_panel_simulation(parallel_urban_canopy_obj, tmp_path, run_in_parallel=True, number_of_workers=2, seed=42)
+    assert all(os.path.isfile(os.path.join(tmp_path, name_radiation_simulation_folder, str(building_id),
+                                           name_bipv_input_file))
+               for building_id in parallel_urban_canopy_obj.building_dict)
+
+    parallel_bipv_scenario_obj = parallel_urban_canopy_obj.bipv_scenario_dict["test_scenario"]
+    assert parallel_bipv_scenario_obj.bipv_simulated_building_id_list == \
+           sequential_urban_canopy_obj.bipv_scenario_dict["test_scenario"].bipv_simulated_building_id_list
+    for building_id, building_obj in sequential_urban_canopy_obj.building_dict.items():
+        solar_rad_and_bipv_obj = building_obj.solar_radiation_and_bipv_simulation_obj
+        parallel_solar_rad_and_bipv_obj = parallel_urban_canopy_obj.building_dict[
+            building_id].solar_radiation_and_bipv_simulation_obj
+        for roof_or_facades in ["roof", "facades"]:
+            panel_fleet = getattr(solar_rad_and_bipv_obj, f"{roof_or_facades}_panel_fleet")
+            parallel_panel_fleet = getattr(parallel_solar_rad_and_bipv_obj, f"{roof_or_facades}_panel_fleet")
+            assert np.array_equal(parallel_panel_fleet.index_array, panel_fleet.index_array)
+            assert np.array_equal(parallel_panel_fleet.life_expectancy_array, panel_fleet.life_expectancy_array)
+            parameter_dict = solar_rad_and_bipv_obj.parameter_dict[roof_or_facades]
+            parallel_parameter_dict = parallel_solar_rad_and_bipv_obj.parameter_dict[roof_or_facades]
+            # The technologies sent back by the workers are the ones of the catalog of the main process
+            assert parallel_parameter_dict["panel_technology"] is parameter_dict["panel_technology"]
+            assert parallel_panel_fleet.technology_obj_list[0] is panel_fleet.technology_obj_list[0]
+            assert parallel_parameter_dict["inverter"]["capacity"] == parameter_dict["inverter"]["capacity"]
+            assert parallel_parameter_dict["study_duration_in_years"] == parameter_dict["study_duration_in_years"]
+            assert parallel_solar_rad_and_bipv_obj.bipv_results_dict[roof_or_facades]["ghg"]["gate_to_gate"][
+                       "yearly"] == \
+                   solar_rad_and_bipv_obj.bipv_results_dict[roof_or_facades]["ghg"]["gate_to_gate"]["yearly"]
+
+    energy_harvested_list = [
+        building_obj.solar_radiation_and_bipv_simulation_obj.bipv_results_dict["total"]["energy_harvested"]["total"]
+        for building_obj in parallel_urban_canopy_obj.building_dict.values()]
+    assert np.isclose(parallel_bipv_scenario_obj.bipv_results_dict["total"]["energy_harvested"]["total"],
+                      sum(energy_harvested_list))
+    assert parallel_bipv_scenario_obj.bipv_results_dict["total"]["energy_harvested"]["yearly"] == \
+           sequential_urban_canopy_obj.bipv_scenario_dict["test_scenario"].bipv_results_dict["total"][
+               "energy_harvested"]["yearly"]
+
+
+def test_buildings_which_parallel_bipv_simulation_failed_are_not_listed_as_simulated(tmp_path, monkeypatch):
+    """
+    Check that a building which simulation failed in a process when continuing the simulation is neither summed at the
+    urban scale nor listed as simulated, while it was simulated in the previous run
+    """
+    use_test_bipv_library(tmp_path, monkeypatch)
+    urban_canopy_obj = make_urban_canopy_with_irradiance_results(tmp_path)
+    run_bipv_panel_simulation(urban_canopy_obj, tmp_path, run_in_parallel=True, number_of_workers=2, seed=42)
+    building_id_list = list(urban_canopy_obj.building_dict.keys())
+    # The simulation of the second building fails without its irradiance results
+    path_failed_result_folder = os.path.join(tmp_path, name_radiation_simulation_folder, str(building_id_list[1]))
+    for ill_file in [name_roof_ill_file, name_facades_ill_file]:
+        os.remove(os.path.join(path_failed_result_folder, ill_file))
+        os.remove(get_path_npy_file_of_ill_file(os.path.join(path_failed_result_folder, ill_file)))
+
+    urban_canopy_obj.run_bipv_panel_simulation_on_buildings(
+        path_simulation_folder=tmp_path, bipv_scenario_identifier="test_scenario", building_id_list=[],
+        roof_id_pv_tech="test_technology", facades_id_pv_tech="test_technology",
+        roof_transport_id="test_transportation", facades_transport_id="test_transportation",
+        roof_inverter_id="test_inverter", facades_inverter_id="test_inverter", minimum_panel_eroi=0.,
+        start_year=start_year + 3, end_year=start_year + 6, replacement_frequency_in_years=1, no_csv=True,
+        continue_simulation=True, update_panel_technology=False, run_in_parallel=True, number_of_workers=2, seed=42)
+
+    bipv_scenario_obj = urban_canopy_obj.bipv_scenario_dict["test_scenario"]
+    assert bipv_scenario_obj.bipv_simulated_building_id_list == [building_id_list[0], building_id_list[2]]
+    energy_harvested_list = [
+        urban_canopy_obj.building_dict[building_id].solar_radiation_and_bipv_simulation_obj.bipv_results_dict[
+            "total"]["energy_harvested"]["total"] for building_id in bipv_scenario_obj.bipv_simulated_building_id_list]
+    assert np.isclose(bipv_scenario_obj.bipv_results_dict["total"]["energy_harvested"]["total"],
+                      sum(energy_harvested_list))
+
+
+def test_bipv_scenario_sweep_matches_the_simulation_of_the_scenarios(tmp_path, monkeypatch):
+    """
+    Check that the KPIs of the scenarios of a sweep are the ones of the scenarios simulated on the urban canopy with
+    the same seed, in sequence and in parallel, with panels that fail and are replaced, that a failed scenario does not
+    stop the others and that the urban canopy is not modified
+    """
+    use_test_bipv_library(tmp_path, monkeypatch)
+    urban_canopy_obj = make_urban_canopy_with_irradiance_results(tmp_path)
+    parameter_dict_list = make_bipv_scenario_parameter_grid({
+        "roof_id_pv_tech": ["fragile_test_technology"], "facades_id_pv_tech": ["fragile_test_technology"],
+        "roof_transport_id": ["test_transportation"], "facades_transport_id": ["test_transportation"],
+        "roof_inverter_id": ["test_inverter"], "facades_inverter_id": ["test_inverter"],
+        "start_year": [start_year], "end_year": [start_year + 3], "replacement_frequency_in_years": [1],
+        "minimum_panel_eroi": [0., 0.5], "roof_inverter_sizing_ratio": [0.5, 0.9]})
+    assert len(parameter_dict_list) == 4
+    parameter_dict_list.append({**parameter_dict_list[0], "roof_id_pv_tech": "unknown_technology"})
+
+    kpi_table = urban_canopy_obj.run_bipv_scenario_sweep(path_simulation_folder=tmp_path,
+                                                         bipv_scenario_parameter_dict_list=parameter_dict_list, seed=7)
+    parallel_kpi_table = urban_canopy_obj.run_bipv_scenario_sweep(
+        path_simulation_folder=tmp_path, bipv_scenario_parameter_dict_list=parameter_dict_list, run_in_parallel=True,
+        number_of_workers=2, seed=7)
+    other_seed_kpi_table = urban_canopy_obj.run_bipv_scenario_sweep(
+        path_simulation_folder=tmp_path, bipv_scenario_parameter_dict_list=parameter_dict_list[:1], seed=8)
+
+    pd.testing.assert_frame_equal(parallel_kpi_table, kpi_table)
+    assert other_seed_kpi_table["eroi_total"].iloc[0] != kpi_table["eroi_total"].iloc[0]
+    assert list(kpi_table["minimum_panel_eroi"]) == [0., 0., 0.5, 0.5, 0.]
+    assert kpi_table["eroi_total"].iloc[:4].notna().all() and np.isnan(kpi_table["eroi_total"].iloc[4])
+    assert urban_canopy_obj.bipv_scenario_dict == {}
+    assert all(building_obj.solar_radiation_and_bipv_simulation_obj.roof_panel_fleet is None for building_obj in
+               urban_canopy_obj.building_dict.values())
+    os.makedirs(os.path.join(tmp_path, name_radiation_simulation_folder, "test_scenario"))
+    for scenario_index, parameter_dict in enumerate(parameter_dict_list[:4]):
+        urban_canopy_obj.run_bipv_panel_simulation_on_buildings(
+            path_simulation_folder=tmp_path, bipv_scenario_identifier="test_scenario", building_id_list=None,
+            no_csv=True, seed=7, **parameter_dict)
+        urban_canopy_obj.compute_bipv_kpis_at_urban_scale(
+            path_simulation_folder=tmp_path, bipv_scenario_identifier="test_scenario", grid_ghg_intensity=0.66,
+            grid_energy_intensity=2.84, grid_electricity_sell_price=0.14, zone_area=None)
+        urban_canopy_kpis_obj = urban_canopy_obj.bipv_scenario_dict["test_scenario"].urban_canopy_bipv_kpis_obj
+        assert np.isclose(kpi_table["eroi_total"].iloc[scenario_index], urban_canopy_kpis_obj.eroi["total"])
+        assert np.isclose(kpi_table["net economical benefit [$]_total"].iloc[scenario_index],
+                          urban_canopy_kpis_obj.net_economical_benefit["total"])
+
+
+def test_bipv_simulation_cache_reloads_modified_irradiance_tables(tmp_path):
+    """ Check that the cached irradiance tables are reused until their .ill file is modified """
+    path_ill_file = os.path.join(tmp_path, name_roof_ill_file)
+    np.savetxt(path_ill_file, np.ones((3, 4)))
+    bipv_simulation_cache = BipvSimulationCache()
+
+    hourly_irradiance_table = bipv_simulation_cache.get_hourly_irradiance_table(path_ill_file)
+    assert bipv_simulation_cache.get_hourly_irradiance_table(path_ill_file) is hourly_irradiance_table
+    assert hourly_irradiance_table.dtype == float and hourly_irradiance_table.shape == (3, 4)
+    np.savetxt(path_ill_file, np.full((3, 4), 2.))
+    npy_modification_time = os.path.getmtime(get_path_npy_file_of_ill_file(path_ill_file))
+    os.utime(path_ill_file, (npy_modification_time + 10, npy_modification_time + 10))
+    assert (bipv_simulation_cache.get_hourly_irradiance_table(path_ill_file) == 2.).all()
+    assert bipv_simulation_cache.get_statistics_dict()["hit_count"] == 1
+
+
+def test_bipv_catalog_parses_the_libraries_only_when_they_change(tmp_path, monkeypatch):
+    """ Check that the libraries are parsed again only if the content of their json files changed """
+    path_json_file = use_test_bipv_library(tmp_path, monkeypatch)
+    bipv_technology_obj_dict = UrbanCanopy.load_bipv_obj_dicts_from_libraries()[0]
+    load_count = bipv_catalog.load_count
+
+    # Same files, or same content with a new modification time
+    assert UrbanCanopy.load_bipv_obj_dicts_from_libraries()[0]["test_technology"] is \
+           bipv_technology_obj_dict["test_technology"]
+    file_stat = os.stat(path_json_file)
+    os.utime(path_json_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10 ** 9))
+    assert UrbanCanopy.load_bipv_obj_dicts_from_libraries()[0]["test_technology"] is \
+           bipv_technology_obj_dict["test_technology"]
+    assert bipv_catalog.load_count == load_count
+
+    # A technology was modified and a new one added in the user library
+    with open(path_json_file, "w") as json_file:
+        json.dump({**bipv_library_dict, "test_technology": {**bipv_library_dict["test_technology"],
+                                                            "max_power_output_per_panel": 400}}, json_file)
+    path_user_json_file = os.path.join(urban_canopy_module.path_folder_user_bipv_parameters, "user_library.json")
+    with open(path_user_json_file, "w") as json_file:
+        json.dump({"user_technology": {**bipv_library_dict["test_technology"], "id": "user_technology"}}, json_file)
+    new_bipv_technology_obj_dict = UrbanCanopy.load_bipv_obj_dicts_from_libraries()[0]
+    assert bipv_catalog.load_count == load_count + 1
+    assert new_bipv_technology_obj_dict["test_technology"].max_power_output == 400
+    assert "user_technology" in new_bipv_technology_obj_dict
+
+
+def test_bipv_objects_are_sent_to_the_processes_as_references(tmp_path, monkeypatch):
+    """
+    Check that the objects of the catalog are pickled for the processes as references resolved by the catalog of the
+    receiving process, and that the other objects are pickled as usual
+    """
+    path_json_file = use_test_bipv_library(tmp_path, monkeypatch)
+    bipv_technology_obj_dict = UrbanCanopy.load_bipv_obj_dicts_from_libraries()[0]
+    pv_tech_obj = bipv_technology_obj_dict["test_technology"]
+    panel_fleet = BipvPanelFleet(index_list=list(range(100)), pv_technology_obj=pv_tech_obj)
+    pv_tech_obj_out_of_catalog = BipvTechnology("test_technology")
+
+    assert len(ForkingPickler.dumps(pv_tech_obj)) < len(ForkingPickler.dumps(pv_tech_obj_out_of_catalog)) / 2
+    assert ForkingPickler.loads(ForkingPickler.dumps(panel_fleet)).technology_obj_list[0] is pv_tech_obj
+    assert ForkingPickler.loads(ForkingPickler.dumps(pv_tech_obj_out_of_catalog)) is not pv_tech_obj_out_of_catalog
+
+    # A process which catalog is not loaded, like a spawned worker, loads the libraries of the reference
+    bipv_obj_reference = bipv_catalog.get_reference(pv_tech_obj)
+    new_bipv_catalog = BipvCatalog()
+    assert new_bipv_catalog.resolve_reference(bipv_obj_reference).max_power_output == pv_tech_obj.max_power_output
+    # The reference cannot be resolved once the libraries were modified
+    with open(path_json_file, "w") as json_file:
+        json.dump({"test_technology": bipv_library_dict["test_technology"]}, json_file)
+    with pytest.raises(ValueError):
+        BipvCatalog().resolve_reference(bipv_obj_reference)
@@ -0,0 +1,134 @@
+"""
+Unit tests for the annual irradiance recipe of the roof and facades SensorGrids of a building and its result cache.
+The Radiance recipe is replaced by a function writing the result files the recipe would write.
+"""
+
+import os
+import numpy as np
+
+from copy import deepcopy
+
+import bua.building.solar_radiation_and_bipv.solar_rad_and_BIPV as solar_rad_and_bipv_module
+
+from bua.building.building_modeled import BuildingModeled
+from bua.building.solar_radiation_and_bipv.solar_rad_and_BIPV import SolarRadAndBipvSimulation, \
+    name_roof_ill_file, name_facades_ill_file, name_roof_sun_up_hours_file, name_facades_sun_up_hours_file, \
+    sun_up_hours_file_name
+from bua.building.solar_radiation_and_bipv.utils_solar_radiation import load_irradiance_array
+from bua.utils.utils_configuration import name_radiation_simulation_folder
+
+path_test_hbjson = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons",
+                                "Building_sample_0.hbjson")
+number_of_sun_up_hours = 4
+
+
+def make_solar_rad_and_bipv_obj():
+    """ Make the solar radiation and BIPV object of a building with SensorGrids on the roof and on the facades """
+    building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(path_hbjson=path_test_hbjson,
+                                                                                 is_target=True)
+    solar_rad_and_bipv_obj = SolarRadAndBipvSimulation(building_id)
+    solar_rad_and_bipv_obj.generate_sensor_grid(building_obj.hb_model_obj, roof_grid_size_x=2, roof_grid_size_y=2,
+                                                facades_grid_size_x=2, facades_grid_size_y=2)
+    return solar_rad_and_bipv_obj, building_obj.hb_model_obj
+
+
+def make_recipe_recording_runs(recipe_run_list):
+    """ Make a function writing the result files of the annual irradiance recipe and recording its runs """
+
+    def run_recipe(hb_model_obj, path_folder_run, grid_identifier_list, **kwargs):
+        sensorgrid_list = hb_model_obj.properties.radiance.sensor_grids
+        recipe_run_list.append([sensorgrid.identifier for sensorgrid in sensorgrid_list])
+        path_result_folder = os.path.join(path_folder_run, "annual_irradiance", "results", "total")
+        os.makedirs(path_result_folder)
+        with open(os.path.join(path_result_folder, sun_up_hours_file_name), "w") as sun_up_hours_file:
+            sun_up_hours_file.write("\n".join(str(hour + 0.5) for hour in range(number_of_sun_up_hours)))
+        annual_panel_irradiance_dict = {}
+        for sensorgrid in sensorgrid_list:
+            irradiance_array = np.full((len(sensorgrid.sensors), number_of_sun_up_hours), len(sensorgrid.sensors))
+            np.savetxt(os.path.join(path_result_folder, sensorgrid.identifier + ".ill"), irradiance_array)
+            annual_panel_irradiance_dict[sensorgrid.identifier] = irradiance_array.sum(axis=1).tolist()
+        return annual_panel_irradiance_dict
+
+    return run_recipe
+
+
+def write_weather_file(path_folder):
+    """ Write a weather file, its content is only used in the keys of the cache """
+    path_weather_file = os.path.join(path_folder, "weather.epw")
+    with open(path_weather_file, "w") as weather_file:
+        weather_file.write("LOCATION,Tel Aviv")
+    return path_weather_file
+
+
+def test_roof_and_facades_are_simulated_with_a_single_recipe(tmp_path, monkeypatch):
+    """ Check that a single recipe is run for both SensorGrids and that its results are split to each of them """
+    path_weather_file = write_weather_file(tmp_path)
+    recipe_run_list = []
+    monkeypatch.setattr(solar_rad_and_bipv_module, "run_hb_model_annual_irradiance_simulation",
+                        make_recipe_recording_runs(recipe_run_list))
+    solar_rad_and_bipv_obj, hb_model_obj = make_solar_rad_and_bipv_obj()
+    number_of_roof_sensors = len(solar_rad_and_bipv_obj.roof_sensorgrid_dict["sensors"])
+    number_of_facades_sensors = len(solar_rad_and_bipv_obj.facades_sensorgrid_dict["sensors"])
+
+    solar_rad_and_bipv_obj.run_annual_solar_irradiance_simulation(
+        path_simulation_folder=tmp_path, hb_model_obj=hb_model_obj, context_shading_hb_shade_list=[],
+        path_weather_file=path_weather_file)
+
+    assert recipe_run_list == [[solar_rad_and_bipv_obj.roof_sensorgrid_dict["identifier"],
+                                solar_rad_and_bipv_obj.facades_sensorgrid_dict["identifier"]]]
+    assert solar_rad_and_bipv_obj.roof_annual_panel_irradiance_list == \
+           [number_of_roof_sensors * number_of_sun_up_hours] * number_of_roof_sensors
+    assert solar_rad_and_bipv_obj.facades_annual_panel_irradiance_list == \
+           [number_of_facades_sensors * number_of_sun_up_hours] * number_of_facades_sensors
+    path_result_folder = os.path.join(tmp_path, name_radiation_simulation_folder,
+                                      str(solar_rad_and_bipv_obj.building_id))
+    assert load_irradiance_array(os.path.join(path_result_folder, name_roof_ill_file)).shape == \
+           (number_of_roof_sensors, number_of_sun_up_hours)
+    assert load_irradiance_array(os.path.join(path_result_folder, name_facades_ill_file)).shape == \
+           (number_of_facades_sensors, number_of_sun_up_hours)
+    for sun_up_hours_file in [name_roof_sun_up_hours_file, name_facades_sun_up_hours_file]:
+        assert os.path.isfile(os.path.join(path_result_folder, sun_up_hours_file))
+
+    # Without combining them, one recipe is run for each SensorGrid
+    recipe_run_list.clear()
+    solar_rad_and_bipv_obj.run_annual_solar_irradiance_simulation(
+        path_simulation_folder=os.path.join(tmp_path, "separate_recipes"), hb_model_obj=hb_model_obj,
+        context_shading_hb_shade_list=[], path_weather_file=path_weather_file, overwrite=True,
+        combine_roof_and_facades=False)
+    assert len(recipe_run_list) == 2 and all(len(grid_id_list) == 1 for grid_id_list in recipe_run_list)
+
+
+def test_unchanged_irradiance_results_are_taken_from_the_cache(tmp_path, monkeypatch):
+    """ Check that the results are taken from the cache when overwriting, unless the inputs of a SensorGrid changed """
+    path_weather_file = write_weather_file(tmp_path)
+    recipe_run_list = []
+    monkeypatch.setattr(solar_rad_and_bipv_module, "run_hb_model_annual_irradiance_simulation",
+                        make_recipe_recording_runs(recipe_run_list))
+    solar_rad_and_bipv_obj, hb_model_obj = make_solar_rad_and_bipv_obj()
+    solar_rad_and_bipv_obj.run_annual_solar_irradiance_simulation(
+        path_simulation_folder=tmp_path, hb_model_obj=hb_model_obj, context_shading_hb_shade_list=[],
+        path_weather_file=path_weather_file)
+    roof_annual_panel_irradiance_list = solar_rad_and_bipv_obj.roof_annual_panel_irradiance_list
+
+    # Nothing changed, the results are taken from the cache, even for a new building object
+    solar_rad_and_bipv_obj.run_annual_solar_irradiance_simulation(
+        path_simulation_folder=tmp_path, hb_model_obj=hb_model_obj, context_shading_hb_shade_list=[],
+        path_weather_file=path_weather_file, overwrite=True)
+    new_solar_rad_and_bipv_obj = SolarRadAndBipvSimulation(solar_rad_and_bipv_obj.building_id)
+    new_solar_rad_and_bipv_obj.roof_sensorgrid_dict = solar_rad_and_bipv_obj.roof_sensorgrid_dict
+    new_solar_rad_and_bipv_obj.run_annual_solar_irradiance_simulation(
+        path_simulation_folder=tmp_path, hb_model_obj=hb_model_obj, context_shading_hb_shade_list=[],
+        path_weather_file=path_weather_file)
+    assert len(recipe_run_list) == 1
+    assert new_solar_rad_and_bipv_obj.roof_annual_panel_irradiance_list == roof_annual_panel_irradiance_list
+
+    # A sensor of the facades moved, only the facades are simulated again, without overwriting
+    facades_sensorgrid_dict = deepcopy(solar_rad_and_bipv_obj.facades_sensorgrid_dict)
+    facades_sensorgrid_dict["identifier"] = "new_facades_grid"
+    facades_sensorgrid_dict["sensors"][0]["pos"] = [coordinate + 0.1 for coordinate in
+                                                    facades_sensorgrid_dict["sensors"][0]["pos"]]
+    solar_rad_and_bipv_obj.facades_sensorgrid_dict = facades_sensorgrid_dict
+    solar_rad_and_bipv_obj.run_annual_solar_irradiance_simulation(
+        path_simulation_folder=tmp_path, hb_model_obj=hb_model_obj, context_shading_hb_shade_list=[],
+        path_weather_file=path_weather_file)
+    assert recipe_run_list[1:] == [["new_facades_grid"]]
@@ -0,0 +1,66 @@
+"""
+Unit tests for the binary cache of the .ill annual irradiance result files.
+"""
+
+import os
+import numpy as np
+
+from bua.building.solar_radiation_and_bipv.utils_solar_radiation import get_hourly_irradiance_table, \
+    cumulative_values, move_annual_irr_hb_radiance_results, get_path_npy_file_of_ill_file
+
+
+def write_ill_file(path_ill_file, irradiance_table):
+    """ Write an irradiance table in the text format of the .ill files """
+    with open(path_ill_file, "w") as ill_file:
+        for row in irradiance_table:
+            ill_file.write("  ".join(str(value) for value in row) + "\n")
+
+
+def test_ill_file_is_converted_once_and_memory_mapped(tmp_path):
+    """
+    Check that the .ill file is converted to a .npy file that is memory-mapped, and converted again only if the .ill
+    file is modified
+    """
+    irradiance_table = np.random.default_rng(0).uniform(0., 1000., size=(5, 12)).round(2)
+    path_ill_file = os.path.join(tmp_path, "grid.ill")
+    write_ill_file(path_ill_file, irradiance_table)
+
+    hourly_irradiance_table = get_hourly_irradiance_table(path_ill_file)
+    assert isinstance(hourly_irradiance_table, np.memmap)
+    assert hourly_irradiance_table.dtype == np.float32
+    assert np.allclose(hourly_irradiance_table, irradiance_table, rtol=1e-6)
+    assert cumulative_values(path_ill_file, None, 1) == \
+           np.asarray(hourly_irradiance_table).sum(axis=1, dtype=float).tolist()
+    su_pattern = [hour % 2 == 0 for hour in range(12)]
+    assert np.allclose(cumulative_values(path_ill_file, su_pattern, 2),
+                       irradiance_table[:, ::2].sum(axis=1) / 2, rtol=1e-6)
+
+    # Modify the .ill file, the .npy file should be updated
+    write_ill_file(path_ill_file, 2 * irradiance_table)
+    os.utime(path_ill_file, (os.path.getmtime(get_path_npy_file_of_ill_file(path_ill_file)) + 10,) * 2)
+    assert np.allclose(get_hourly_irradiance_table(path_ill_file), 2 * irradiance_table, rtol=1e-6)
+
+
+def test_results_are_moved_as_npy_file(tmp_path):
+    """
+    Check that only the .npy file is kept in the result folder, and that it is used to get the irradiance table
+    """
+    irradiance_table = [[0., 10.5, 200.25], [3., 0., 1.]]
+    path_temp_folder = os.path.join(tmp_path, "temp")
+    path_result_folder = os.path.join(tmp_path, "result")
+    os.makedirs(path_temp_folder)
+    path_temp_ill_file = os.path.join(path_temp_folder, "grid.ill")
+    path_temp_sun_hours_file = os.path.join(path_temp_folder, "sun-up-hours.txt")
+    write_ill_file(path_temp_ill_file, irradiance_table)
+    with open(path_temp_sun_hours_file, "w") as sun_hours_file:
+        sun_hours_file.write("10.5\n11.5\n12.5\n")
+
+    move_annual_irr_hb_radiance_results(path_temp_ill_result_file=path_temp_ill_file,
+                                        path_temp_sun_hours_file=path_temp_sun_hours_file,
+                                        new_ill_file_name="roof.ill",
+                                        new_sun_hours_file_name="roof_sun-up-hours.txt",
+                                        path_result_folder=path_result_folder)
+
+    assert sorted(os.listdir(path_result_folder)) == ["roof.ill.npy", "roof_sun-up-hours.txt"]
+    assert os.listdir(path_temp_folder) == []
+    assert np.allclose(get_hourly_irradiance_table(os.path.join(path_result_folder, "roof.ill")), irradiance_table)
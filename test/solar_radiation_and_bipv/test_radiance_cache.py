@@ -0,0 +1,51 @@
+"""
+Unit tests for the cache of the Radiance files shared by the annual irradiance simulations of the buildings.
+"""
+
+import os
+
+from bua.building.solar_radiation_and_bipv.utils_radiance_cache import get_sky_matrix_cache_key, \
+    is_sky_matrix_in_cache, copy_sky_matrix_from_cache, add_sky_matrix_to_cache, sky_matrix_file_name_list
+
+
+def write_file(path_file, content):
+    os.makedirs(os.path.dirname(path_file), exist_ok=True)
+    with open(path_file, "w") as file:
+        file.write(content)
+
+
+def test_sky_matrix_cache_key_depends_on_weather_file_content_and_sky_parameters(tmp_path):
+    """ Check that the key changes with the content of the weather file and the parameters of the sky only """
+    path_weather_file = os.path.join(tmp_path, "weather.epw")
+    write_file(path_weather_file, "LOCATION,Tel Aviv")
+    sky_matrix_key = get_sky_matrix_cache_key(path_weather_file)
+    path_copied_weather_file = os.path.join(tmp_path, "copy", "weather.epw")
+    write_file(path_copied_weather_file, "LOCATION,Tel Aviv")
+
+    assert get_sky_matrix_cache_key(path_copied_weather_file) == sky_matrix_key
+    assert get_sky_matrix_cache_key(path_weather_file, north=10) != sky_matrix_key
+    assert get_sky_matrix_cache_key(path_weather_file, visible=True) != sky_matrix_key
+    write_file(path_weather_file, "LOCATION,Haifa")
+    assert get_sky_matrix_cache_key(path_weather_file) != sky_matrix_key
+
+
+def test_sky_matrix_generated_by_a_recipe_is_copied_to_the_next_ones(tmp_path):
+    """ Check that the sky matrix of the first recipe is added to the cache and copied to the folder of the next one """
+    path_cache_folder = os.path.join(tmp_path, "cache")
+    path_first_resources_folder = os.path.join(tmp_path, "building_0", "resources")
+    path_second_resources_folder = os.path.join(tmp_path, "building_1", "resources")
+
+    assert not copy_sky_matrix_from_cache(path_cache_folder, "key", path_second_resources_folder)
+    # An incomplete sky matrix is not added to the cache
+    write_file(os.path.join(path_first_resources_folder, sky_matrix_file_name_list[0]), "0")
+    add_sky_matrix_to_cache(path_cache_folder, "key", path_first_resources_folder)
+    assert not is_sky_matrix_in_cache(path_cache_folder, "key")
+
+    for file_name in sky_matrix_file_name_list:
+        write_file(os.path.join(path_first_resources_folder, file_name), file_name)
+    add_sky_matrix_to_cache(path_cache_folder, "key", path_first_resources_folder)
+    assert is_sky_matrix_in_cache(path_cache_folder, "key")
+    assert copy_sky_matrix_from_cache(path_cache_folder, "key", path_second_resources_folder)
+    for file_name in sky_matrix_file_name_list:
+        with open(os.path.join(path_second_resources_folder, file_name)) as file:
+            assert file.read() == file_name
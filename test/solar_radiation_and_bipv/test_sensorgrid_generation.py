@@ -0,0 +1,56 @@
+"""
+Unit tests for the generation of the grids of the SensorGrids on numpy arrays.
+"""
+
+import numpy as np
+
+from ladybug_geometry.geometry2d.pointvector import Point2D
+from ladybug_geometry.geometry2d.polygon import Polygon2D
+from ladybug_geometry.geometry3d.pointvector import Point3D, Vector3D
+from ladybug_geometry.geometry3d.face import Face3D
+
+from bua.building.solar_radiation_and_bipv.utils_sensorgrid import are_points_inside_polygon, \
+    generate_grid_arrays_from_lb_face3d, generate_sensorgrid_obj_on_lb_punched_face_list
+
+
+def make_facade_with_window():
+    """ Make a 10 m by 6 m facade facing south with a 2 m by 2 m window """
+    boundary = [Point3D(0, 0, 0), Point3D(10, 0, 0), Point3D(10, 0, 6), Point3D(0, 0, 6)]
+    window = [Point3D(4, 0, 2), Point3D(6, 0, 2), Point3D(6, 0, 4), Point3D(4, 0, 4)]
+    return Face3D(boundary=boundary, holes=[window])
+
+
+def test_points_inside_polygon_match_ladybug():
+    """ Check that the points inside a concave polygon are the same as with Polygon2D.is_point_inside """
+    polygon = Polygon2D([Point2D(0, 0), Point2D(6, 0), Point2D(6, 4), Point2D(3, 2), Point2D(0, 4)])
+    point_array = np.random.default_rng(0).uniform(-1, 7, size=(500, 2))
+
+    assert are_points_inside_polygon(point_array, np.array([[pt.x, pt.y] for pt in polygon.vertices])).tolist() == \
+           [polygon.is_point_inside(Point2D(x, y)) for x, y in point_array]
+
+
+def test_grid_does_not_overlap_the_window():
+    """ Check that the grid of a facade is offset from it and that no cell overlaps the window """
+    lb_face3d = make_facade_with_window()
+    vertex_array, face_array, centroid_array, normal_array = generate_grid_arrays_from_lb_face3d(lb_face3d, 1,
+                                                                                                offset=0.1)
+
+    # 60 cells of 1 m2, minus the 4 cells of the window and the 12 cells touching it
+    assert len(face_array) == len(centroid_array) == 44
+    assert np.allclose(normal_array, [0, -1, 0])
+    assert np.allclose(vertex_array[:, 1], -0.1)
+    assert not np.any((centroid_array[:, 0] > 3) & (centroid_array[:, 0] < 7) &
+                      (centroid_array[:, 2] > 1) & (centroid_array[:, 2] < 5))
+    # all the vertices are used by the faces
+    assert sorted(set(face_array.ravel().tolist())) == list(range(len(vertex_array)))
+
+
+def test_sensorgrid_of_several_faces():
+    """ Check that the grids of several faces are joined in a single SensorGrid """
+    lb_face3d = make_facade_with_window()
+    sensor_grid_obj = generate_sensorgrid_obj_on_lb_punched_face_list([lb_face3d, lb_face3d.move(Vector3D(0, -5, 0))],
+                                                                      1, 1, 0.1, "facades")
+
+    assert len(sensor_grid_obj.sensors) == len(sensor_grid_obj.mesh.faces) == 88
+    assert max(max(face) for face in sensor_grid_obj.mesh.faces) == len(sensor_grid_obj.mesh.vertices) - 1
+    assert sensor_grid_obj.sensors[44].pos[1] == sensor_grid_obj.sensors[0].pos[1] - 5
@@ -0,0 +1,59 @@
+"""
+Unit tests for the EnergyPlus simulations run in parallel, with a stub script replacing the EnergyPlus executable.
+"""
+
+import os
+import sys
+
+from time import time
+
+from bua.building.building_modeled import BuildingModeled
+from bua.urban_canopy.ubes.main_run_idf_in_parallel import run_idf_files_with_energyplus_in_parallel
+
+path_test_hbjson_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons")
+test_hbjson_file_list = ["Building_sample_0.hbjson", "Building_sample_1.hbjson", "Building_sample_2.hbjson"]
+
+# Stub of EnergyPlus, behaving according to the content of the in.idf file of the working directory
+energyplus_stub_script = f"""#!{sys.executable}
+import sys
+import time
+idf_content = open("in.idf").read()
+if "fail" in idf_content:
+    sys.exit(1)
+if "hang" in idf_content:
+    time.sleep(60)
+open("eplusout.sql", "w").close()
+open("eplusout.err", "w").close()
+"""
+
+
+def test_failing_and_hanging_buildings_do_not_stop_the_others(tmp_path):
+    """
+    Check that a building failing or exceeding the timeout does not prevent the other buildings from running
+    """
+    path_energyplus_exe = os.path.join(tmp_path, "energyplus_stub")
+    with open(path_energyplus_exe, "w") as f:
+        f.write(energyplus_stub_script)
+    os.chmod(path_energyplus_exe, 0o755)
+    path_epw_file = os.path.join(tmp_path, "weather.epw")
+    open(path_epw_file, "w").close()
+
+    building_obj_list = []
+    for hbjson_file, idf_content in zip(test_hbjson_file_list, ["ok", "fail", "hang"]):
+        building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+            path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+        os.makedirs(os.path.join(tmp_path, building_id, "run"))
+        with open(os.path.join(tmp_path, building_id, "run", "in.idf"), "w") as f:
+            f.write(idf_content)
+        building_obj.bes_obj.idf_generated = True
+        building_obj_list.append(building_obj)
+
+    timer = time()
+    duration_dict = run_idf_files_with_energyplus_in_parallel(
+        building_obj_list=building_obj_list, path_ubes_temp_sim_folder=str(tmp_path), path_epw_file=path_epw_file,
+        silent=True, number_of_workers=3, timeout=2., path_energyplus_exe=path_energyplus_exe)
+
+    # The hanging simulation was killed after the timeout
+    assert time() - timer < 30.
+    assert list(duration_dict.keys()) == [building_obj_list[0].id]
+    assert [building_obj.bes_obj.has_run for building_obj in building_obj_list] == [True, False, False]
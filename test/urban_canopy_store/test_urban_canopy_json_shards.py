@@ -0,0 +1,133 @@
+"""
+Unit tests for the export of the urban canopy to a json manifest with one json file per building.
+"""
+
+import os
+import json
+
+from ladybug_geometry.geometry3d import Point3D, Face3D
+from honeybee.shade import Shade
+
+from bua.urban_canopy.export_to_json import json_shard_key, name_json_shard_folder, name_building_json_shard_folder
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.urban_canopy.urban_canopy_json_reader import load_urban_canopy_json
+from bua.utils.utils_configuration import name_urban_canopy_export_file_json, name_urban_canopy_store_folder
+
+from .test_urban_canopy_store import make_urban_canopy
+
+
+def load_json_shard_dict(path_json_manifest_file, shard_reference_dict):
+    """ Load the json file referenced in the manifest """
+    with open(os.path.join(os.path.dirname(path_json_manifest_file), name_json_shard_folder,
+                           shard_reference_dict[json_shard_key]), "r") as json_file:
+        return json.load(json_file)
+
+
+def test_urban_canopy_json_manifest_references_building_files(tmp_path):
+    """
+    Check that the manifest references one json file per building with the type and status of the building, that
+    they contain the dictionary of the buildings, and that the file of a removed building is deleted
+    """
+    urban_canopy_obj = make_urban_canopy()
+    urban_canopy_obj.building_dict[list(urban_canopy_obj.building_dict.keys())[0]].is_target = False
+    building_id_list = list(urban_canopy_obj.building_dict.keys())
+    urban_canopy_obj.to_json(path_simulation_folder=tmp_path)
+
+    path_json_manifest_file = os.path.join(tmp_path, name_urban_canopy_export_file_json)
+    with open(path_json_manifest_file, "r") as json_file:
+        manifest_dict = json.load(json_file)
+    assert manifest_dict["list_of_building_ids"] == building_id_list
+    for building_id, building_obj in urban_canopy_obj.building_dict.items():
+        shard_reference_dict = manifest_dict["buildings"][building_id]
+        assert shard_reference_dict["type"] == "BuildingModeled"
+        assert shard_reference_dict["is_target_building"] == building_obj.is_target
+        assert shard_reference_dict["is_building_to_simulate"] == building_obj.to_simulate
+        assert load_json_shard_dict(path_json_manifest_file, shard_reference_dict) == \
+               json.loads(json.dumps(building_obj.to_dict()))
+    assert load_json_shard_dict(path_json_manifest_file, manifest_dict["ubes"]) == \
+           json.loads(json.dumps(urban_canopy_obj.ubes_obj.to_dict()))
+
+    # The file of a removed building is deleted when the urban canopy is exported again
+    urban_canopy_obj.remove_building_from_dict(building_id_list[0])
+    urban_canopy_obj.to_json(path_simulation_folder=tmp_path)
+    path_building_json_folder = os.path.join(tmp_path, name_json_shard_folder, name_building_json_shard_folder)
+    assert len(os.listdir(path_building_json_folder)) == len(building_id_list) - 1
+
+
+def test_urban_canopy_saved_to_store_can_be_exported_to_json(tmp_path):
+    """
+    Check that the context shades of the buildings, converted back to Shade objects when the buildings are saved to
+    or loaded from the store, are exported to json
+    """
+    urban_canopy_obj = make_urban_canopy()
+    building_id = list(urban_canopy_obj.building_dict.keys())[0]
+    hb_shade = Shade("context_shade", Face3D([Point3D(0, 0, 0), Point3D(1, 0, 0), Point3D(1, 0, 1)]))
+    urban_canopy_obj.building_dict[building_id].shading_context_obj.context_shading_hb_shade_list = [hb_shade]
+    urban_canopy_obj.to_store(path_simulation_folder=tmp_path)
+    urban_canopy_obj.to_json(path_simulation_folder=tmp_path)
+    loaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(
+        os.path.join(tmp_path, name_urban_canopy_store_folder))
+    loaded_urban_canopy_obj.to_json(path_simulation_folder=os.path.join(tmp_path, "loaded"))
+
+    for path_folder in [tmp_path, os.path.join(tmp_path, "loaded")]:
+        path_json_manifest_file = os.path.join(path_folder, name_urban_canopy_export_file_json)
+        with open(path_json_manifest_file, "r") as json_file:
+            manifest_dict = json.load(json_file)
+        building_dict = load_json_shard_dict(path_json_manifest_file, manifest_dict["buildings"][building_id])
+        assert building_dict["context_surfaces"]["context_shading_hb_shade_list"] == [
+            json.loads(json.dumps(hb_shade.to_dict()))]
+
+
+def test_buildings_which_model_was_read_are_saved_and_exported_with_their_model(tmp_path):
+    """
+    Check that reading the HB model of a building loaded from the store, which converts and releases its dictionary,
+    does not lose the model when the urban canopy is saved again and exported to json
+    """
+    urban_canopy_obj = make_urban_canopy()
+    building_id = list(urban_canopy_obj.building_dict.keys())[0]
+    hb_model_dict = urban_canopy_obj.building_dict[building_id].hb_model_obj.to_dict()
+    urban_canopy_obj.to_store(path_simulation_folder=tmp_path)
+    path_store_folder = os.path.join(tmp_path, name_urban_canopy_store_folder)
+
+    loaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(path_store_folder)
+    assert loaded_urban_canopy_obj.building_dict[building_id].hb_model_obj.to_dict() == hb_model_dict
+    # The model was only read, the building in the store is still valid
+    assert loaded_urban_canopy_obj.to_store(path_simulation_folder=tmp_path) == 0
+    loaded_urban_canopy_obj.to_json(path_simulation_folder=tmp_path)
+    path_json_manifest_file = os.path.join(tmp_path, name_urban_canopy_export_file_json)
+    with open(path_json_manifest_file, "r") as json_file:
+        manifest_dict = json.load(json_file)
+    assert load_json_shard_dict(path_json_manifest_file, manifest_dict["buildings"][building_id])["hb_model"] == \
+           json.loads(json.dumps(hb_model_dict))
+
+    reloaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(path_store_folder)
+    assert reloaded_urban_canopy_obj.building_dict[building_id].hb_model_obj.to_dict() == hb_model_dict
+
+
+def test_urban_canopy_json_is_read_by_the_reader_of_the_components(tmp_path):
+    """
+    Check that the reader of the Grasshopper components gives the status of the buildings from the manifest and loads
+    their json file when they are accessed, and that the export of an urban canopy loaded from a store releases the
+    buildings it loaded
+    """
+    urban_canopy_obj = make_urban_canopy()
+    building_id_list = list(urban_canopy_obj.building_dict.keys())
+    urban_canopy_obj.to_store(path_simulation_folder=tmp_path)
+    loaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(
+        os.path.join(tmp_path, name_urban_canopy_store_folder))
+    building_dict = loaded_urban_canopy_obj.building_dict
+    building_dict[building_id_list[0]].is_target = False
+    loaded_urban_canopy_obj.mark_buildings_as_dirty([building_id_list[0]])
+    loaded_urban_canopy_obj.to_json(path_simulation_folder=tmp_path)
+    # The modified building is kept, the others were loaded by the export only
+    assert building_dict.is_loaded(building_id_list[0])
+    assert not any(building_dict.is_loaded(building_id) for building_id in building_id_list[1:])
+
+    urban_canopy_dict = load_urban_canopy_json(os.path.join(tmp_path, name_urban_canopy_export_file_json))
+    assert urban_canopy_dict["list_of_building_ids"] == building_id_list
+    assert urban_canopy_dict["buildings"].get_manifest_entry(building_id_list[0])["is_target_building"] is False
+    assert urban_canopy_dict["buildings"].loaded_shard_list == []
+    for building_id in building_id_list:
+        assert urban_canopy_dict["buildings"][building_id] == \
+               json.loads(json.dumps(building_dict[building_id].to_dict()))
+    assert len(urban_canopy_dict["buildings"].loaded_shard_list) == 2
@@ -0,0 +1,108 @@
+"""
+Unit tests for the directory-backed store of the urban canopy.
+"""
+
+import os
+
+from bua.urban_canopy.urban_canopy import UrbanCanopy
+from bua.urban_canopy.utils_urban_canopy.urban_canopy_store import LazyBuildingDict, name_store_building_folder
+from bua.building.building_modeled import BuildingModeled
+from bua.utils.utils_configuration import name_urban_canopy_store_folder
+
+path_test_hbjson_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_files", "test_hbjsons")
+test_hbjson_file_list = ["Building_sample_0.hbjson", "Building_sample_1.hbjson", "Building_sample_2.hbjson"]
+
+
+def make_urban_canopy():
+    """ Make an urban canopy with a few buildings """
+    urban_canopy_obj = UrbanCanopy()
+    for hbjson_file in test_hbjson_file_list:
+        building_obj, building_id = BuildingModeled.make_buildingmodeled_from_hbjson(
+            path_hbjson=os.path.join(path_test_hbjson_folder, hbjson_file), is_target=True)
+        urban_canopy_obj.add_building_to_dict(building_id=building_id, building_obj=building_obj)
+
+    return urban_canopy_obj
+
+
+def test_buildings_are_loaded_lazily_and_only_modified_ones_are_written(tmp_path):
+    """
+    Check that the buildings are loaded from the store when they are accessed, and that only the modified buildings
+    are written back
+    """
+    urban_canopy_obj = make_urban_canopy()
+    building_id_list = list(urban_canopy_obj.building_dict.keys())
+    hb_model_dict_list = [building_obj.hb_model_obj.to_dict() for building_obj in
+                          urban_canopy_obj.building_dict.values()]
+    assert urban_canopy_obj.to_store(path_simulation_folder=tmp_path) == len(building_id_list)
+    # The urban canopy is still usable after it is saved
+    assert urban_canopy_obj.building_dict[building_id_list[0]].hb_model_obj.to_dict() == hb_model_dict_list[0]
+    path_store_folder = os.path.join(tmp_path, name_urban_canopy_store_folder)
+    assert len(os.listdir(os.path.join(path_store_folder, name_store_building_folder))) == len(building_id_list)
+
+    loaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(path_store_folder)
+    building_dict = loaded_urban_canopy_obj.building_dict
+    assert isinstance(building_dict, LazyBuildingDict)
+    assert list(building_dict.keys()) == building_id_list
+    assert not any(building_dict.is_loaded(building_id) for building_id in building_id_list)
+    # The HB model is converted only when it is accessed
+    building_obj = building_dict[building_id_list[1]]
+    assert building_dict.is_loaded(building_id_list[1]) and not building_dict.is_loaded(building_id_list[0])
+    assert building_obj.urban_canopy is loaded_urban_canopy_obj
+    assert building_obj.hb_model_dict is not None
+    assert building_obj.hb_model_obj.to_dict() == hb_model_dict_list[1]
+    assert building_obj.hb_model_dict is None
+
+    # Accessed but not modified buildings are not written again
+    assert loaded_urban_canopy_obj.to_store(path_simulation_folder=tmp_path) == 0
+    assert not building_dict.is_loaded(building_id_list[0])
+    # Buildings modified outside the methods of the urban canopy are not written again until they are marked as dirty
+    building_obj.is_target = False
+    assert loaded_urban_canopy_obj.to_store(path_simulation_folder=tmp_path) == 0
+    # Modified buildings are written again, removed ones are deleted
+    loaded_urban_canopy_obj.mark_buildings_as_dirty([building_id_list[1]])
+    loaded_urban_canopy_obj.remove_building_from_dict(building_id_list[2])
+    assert loaded_urban_canopy_obj.to_store(path_simulation_folder=tmp_path) == 1
+    assert len(os.listdir(os.path.join(path_store_folder, name_store_building_folder))) == 2
+
+    reloaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(path_store_folder)
+    assert list(reloaded_urban_canopy_obj.building_dict.keys()) == building_id_list[:2]
+    assert reloaded_urban_canopy_obj.building_dict[building_id_list[1]].is_target is False
+    assert reloaded_urban_canopy_obj.building_dict[building_id_list[0]].hb_model_obj.to_dict() == \
+           hb_model_dict_list[0]
+
+
+def test_buildings_are_filtered_without_being_loaded(tmp_path):
+    """
+    Check that the buildings are selected with the summary of the index without being loaded, and that the buildings
+    modified by the methods of the urban canopy are written again
+    """
+    urban_canopy_obj = make_urban_canopy()
+    building_id_list = list(urban_canopy_obj.building_dict.keys())
+    urban_canopy_obj.building_dict[building_id_list[0]].is_target = False
+    urban_canopy_obj.to_store(path_simulation_folder=tmp_path)
+
+    loaded_urban_canopy_obj = UrbanCanopy.make_urban_canopy_from_store(
+        os.path.join(tmp_path, name_urban_canopy_store_folder))
+    building_dict = loaded_urban_canopy_obj.building_dict
+    assert loaded_urban_canopy_obj.get_building_id_list(only_target=True) == building_id_list[1:]
+    assert loaded_urban_canopy_obj.get_building_id_list(building_id_list=building_id_list[:2],
+                                                        only_building_modeled=True) == building_id_list[:2]
+    assert loaded_urban_canopy_obj.are_all_buildings_moved_to_origin()
+    assert not any(building_dict.is_loaded(building_id) for building_id in building_id_list)
+    target_building_obj_list = loaded_urban_canopy_obj.get_building_obj_list(only_target=True)
+    assert [building_obj.id for building_obj in target_building_obj_list] == building_id_list[1:]
+    assert not building_dict.is_loaded(building_id_list[0])
+    assert not any(building_dict.is_dirty(building_id) for building_id in building_id_list)
+
+    # Moving a building marks it as dirty
+    loaded_urban_canopy_obj.move_building(building_obj=target_building_obj_list[0], vector=[1., 0., 0.])
+    assert building_dict.is_dirty(building_id_list[1])
+    assert loaded_urban_canopy_obj.to_store(path_simulation_folder=tmp_path) == 1
+    assert not building_dict.is_dirty(building_id_list[1])
+
+    # The summary of the buildings is not in the index of the older stores, the buildings are then loaded to get it
+    for building_blob in building_dict.building_blob_dict.values():
+        building_blob.pop("summary")
+    building_dict.building_obj_dict[building_id_list[2]] = None
+    assert loaded_urban_canopy_obj.get_building_id_list(only_target=True) == building_id_list[1:]
+    assert building_dict.is_loaded(building_id_list[0]) and building_dict.is_loaded(building_id_list[2])